@@ -1,8 +1,10 @@
 """
 Adaptive difficulty helper.
 
-Reads from each app's existing attempts table to compute a mastery level,
-then returns the target difficulty band for the next question.
+Reads the user's attempt counts for the lesson from user_lesson_mastery
+(app.repositories.mastery_repository, kept current on every attempt insert)
+to compute a mastery level, then returns the target difficulty band for the
+next question.
 
 Mastery levels:
   - beginner  : < 10 attempts OR accuracy < 50%
@@ -17,6 +19,8 @@ Difficulty mapping:
 
 from __future__ import annotations
 
+from app.repositories.mastery_repository import get_lesson_mastery
+
 MASTERY_MIN_ATTEMPTS = 10
 MASTERY_THRESHOLD = 75.0   # percent
 DEVELOPING_THRESHOLD = 50.0
@@ -41,95 +45,32 @@ def target_difficulty(mastery: str) -> list[str]:
     return ["easy", "medium", "hard"]
 
 
+def _lesson_mastery(cur, module: str, user_id: int, lesson_id: int) -> str:
+    return _mastery_level(*get_lesson_mastery(cur, module, user_id, lesson_id))
+
+
 def get_student_mastery_math(cur, user_id: int, lesson_id: int) -> str:
-    cur.execute(
-        """
-        SELECT COUNT(*) AS attempts,
-               COALESCE(AVG(CASE WHEN is_correct THEN 100.0 ELSE 0.0 END), 0) AS accuracy
-        FROM math_attempts
-        WHERE student_id = %s AND lesson_id = %s
-        """,
-        (user_id, lesson_id),
-    )
-    row = cur.fetchone()
-    attempts, accuracy = (int(row[0] or 0), float(row[1] or 0)) if row else (0, 0.0)
-    return _mastery_level(attempts, accuracy)
+    return _lesson_mastery(cur, "math", user_id, lesson_id)
 
 
 def get_student_mastery_nvr(cur, user_id: int, lesson_id: int) -> str:
-    cur.execute(
-        """
-        SELECT COUNT(*) AS attempts,
-               COALESCE(AVG(CASE WHEN is_correct THEN 100.0 ELSE 0.0 END), 0) AS accuracy
-        FROM nvr_attempts na
-        JOIN nvr_lesson_questions lq ON lq.question_id = na.pattern_id::integer
-        WHERE na.user_id = %s AND lq.lesson_id = %s
-        """,
-        (user_id, lesson_id),
-    )
-    row = cur.fetchone()
-    attempts, accuracy = (int(row[0] or 0), float(row[1] or 0)) if row else (0, 0.0)
-    return _mastery_level(attempts, accuracy)
+    return _lesson_mastery(cur, "nvr", user_id, lesson_id)
 
 
 def get_student_mastery_grammar(cur, user_id: int, lesson_id: int) -> str:
-    cur.execute(
-        """
-        SELECT COUNT(*) AS attempts,
-               COALESCE(AVG(CASE WHEN correct THEN 100.0 ELSE 0.0 END), 0) AS accuracy
-        FROM grammar_attempts
-        WHERE user_id = %s AND lesson_id = %s
-        """,
-        (user_id, lesson_id),
-    )
-    row = cur.fetchone()
-    attempts, accuracy = (int(row[0] or 0), float(row[1] or 0)) if row else (0, 0.0)
-    return _mastery_level(attempts, accuracy)
+    return _lesson_mastery(cur, "grammar", user_id, lesson_id)
 
 
 def get_student_mastery_words(cur, user_id: int, lesson_id: int) -> str:
-    cur.execute(
-        """
-        SELECT COUNT(*) AS attempts,
-               COALESCE(AVG(CASE WHEN correct THEN 100.0 ELSE 0.0 END), 0) AS accuracy
-        FROM words_attempts
-        WHERE user_id = %s AND lesson_id = %s
-        """,
-        (user_id, lesson_id),
-    )
-    row = cur.fetchone()
-    attempts, accuracy = (int(row[0] or 0), float(row[1] or 0)) if row else (0, 0.0)
-    return _mastery_level(attempts, accuracy)
+    return _lesson_mastery(cur, "words", user_id, lesson_id)
 
 
 def get_student_mastery_spelling(cur, user_id: int, lesson_id: int) -> str:
-    cur.execute(
-        """
-        SELECT COUNT(*) AS attempts,
-               COALESCE(AVG(CASE WHEN correct THEN 100.0 ELSE 0.0 END), 0) AS accuracy
-        FROM spelling_attempts
-        WHERE user_id = %s AND lesson_id = %s
-        """,
-        (user_id, lesson_id),
-    )
-    row = cur.fetchone()
-    attempts, accuracy = (int(row[0] or 0), float(row[1] or 0)) if row else (0, 0.0)
-    return _mastery_level(attempts, accuracy)
+    return _lesson_mastery(cur, "spelling", user_id, lesson_id)
 
 
 def get_student_mastery_comprehension(cur, user_id: int, passage_id: int) -> str:
-    cur.execute(
-        """
-        SELECT COUNT(*) AS attempts,
-               COALESCE(AVG(CASE WHEN correct THEN 100.0 ELSE 0.0 END), 0) AS accuracy
-        FROM comprehension_attempts
-        WHERE user_id = %s AND passage_id = %s
-        """,
-        (user_id, passage_id),
-    )
-    row = cur.fetchone()
-    attempts, accuracy = (int(row[0] or 0), float(row[1] or 0)) if row else (0, 0.0)
-    return _mastery_level(attempts, accuracy)
+    return _lesson_mastery(cur, "comprehension", user_id, passage_id)
 
 
 def filter_by_difficulty(items: list[dict], preferred_difficulties: list[str], difficulty_key: str = "difficulty") -> list[dict]:
@@ -145,26 +86,8 @@ def filter_by_difficulty(items: list[dict], preferred_difficulties: list[str], d
 
 
 def get_student_mastery_synonym(cur, user_id: int, lesson_id: int) -> str:
-    """Mastery for synonym/WordSprint — uses synonym_attempts or words_attempts."""
-    # Determine which table and correct column exist
-    for table, col in (("synonym_attempts", "is_correct"), ("synonym_attempts", "correct"),
-                       ("words_attempts", "is_correct"), ("words_attempts", "correct")):
-        try:
-            cur.execute(
-                f"""
-                SELECT COUNT(*) AS attempts,
-                       COALESCE(AVG(CASE WHEN {col} THEN 100.0 ELSE 0.0 END), 0) AS accuracy
-                FROM {table}
-                WHERE user_id = %s AND lesson_id = %s
-                """,
-                (user_id, lesson_id),
-            )
-            row = cur.fetchone()
-            attempts, accuracy = (int(row[0] or 0), float(row[1] or 0)) if row else (0, 0.0)
-            return _mastery_level(attempts, accuracy)
-        except Exception:
-            continue
-    return "beginner"
+    """Mastery for synonym/WordSprint — attempts on the lesson's lesson_words."""
+    return _lesson_mastery(cur, "synonym", user_id, lesson_id)
 
 
 def get_synonym_mastery_difficulty(user_id: int, lesson_id: int) -> list[int] | None:
@@ -5,6 +5,7 @@ from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
 from app.admin.ingestion_router import require_admin
+from app.content_cache import invalidate_lesson_content
 from app.admin.repositories.math_practice_ingest_admin import (
     build_blank_template_csv,
     export_lesson_csv,
@@ -59,6 +60,22 @@ from app.admin.repositories.words_admin_repository import (
 
 router = APIRouter(prefix="/admin/curriculum", tags=["admin-curriculum"])
 
+# Curriculum module -> app.content_cache modules reading its tables.
+CONTENT_CACHE_MODULES = {
+    "words": ("words", "synonym"),
+    "spelling": ("spelling",),
+    "nvr": ("nvr",),
+    "maths": ("math",),
+}
+
+
+def _invalidate_content(normalized: str, lesson_id=None) -> None:
+    for cache_module in CONTENT_CACHE_MODULES.get(normalized, ()):
+        try:
+            invalidate_lesson_content(cache_module, lesson_id)
+        except Exception as e:
+            print("lesson content invalidation failed:", e)
+
 
 class CreateCourseRequest(BaseModel):
     name: str
@@ -166,6 +183,7 @@ def create_module_course(module: str, payload: CreateCourseRequest, _user=Depend
             detail="Course creation is not supported for maths without schema changes",
         )
 
+    _invalidate_content(normalized)
     return {"status": "ok", "data": data}
 
 
@@ -225,6 +243,7 @@ def create_module_lesson(module: str, payload: CreateLessonRequest, _user=Depend
             is_active=payload.is_active,
         )
 
+    _invalidate_content(normalized)
     return {"status": "ok", "data": data}
 
 
@@ -273,6 +292,7 @@ def update_module_lesson(
     if not data:
         raise HTTPException(status_code=404, detail="Lesson not found")
 
+    _invalidate_content(normalized, lesson_id)
     return {"status": "ok", "data": data}
 
 
@@ -281,12 +301,15 @@ def delete_maths_lesson(lesson_id: int, _user=Depends(require_admin)):
     data = delete_math_lesson(lesson_id)
     if not data:
         raise HTTPException(status_code=404, detail="Lesson not found")
+    _invalidate_content("maths", lesson_id)
     return {"status": "ok", "data": data}
 
 
 @router.delete("/maths/test-fixtures")
 def delete_maths_test_fixtures(_user=Depends(require_admin)):
-    return {"status": "ok", "data": delete_e2e_math_lessons()}
+    data = delete_e2e_math_lessons()
+    _invalidate_content("maths")
+    return {"status": "ok", "data": data}
 
 
 @router.get("/maths/lessons/{lesson_id}/questions")
@@ -310,6 +333,7 @@ def patch_maths_question_correct_answer(
 
     if not data:
         raise HTTPException(status_code=404, detail="Question not found")
+    _invalidate_content("maths")
     return {"status": "ok", "data": data}
 
 
@@ -369,6 +393,7 @@ def patch_maths_question_content(
     if not updated:
         raise HTTPException(status_code=404, detail="Question not found")
 
+    _invalidate_content("maths")
     data = {
         "item_id": updated["question_id"],
         "prompt": updated["stem"],
@@ -406,6 +431,7 @@ def patch_module_content_answer(
     if not data:
         raise HTTPException(status_code=404, detail="Item not found")
 
+    _invalidate_content(normalized)
     return {"status": "ok", "data": data}
 
 
@@ -455,6 +481,7 @@ async def upload_maths_practice_csv(
         raise HTTPException(status_code=400, detail=str(exc)) from exc
     except Exception as exc:
         raise HTTPException(status_code=500, detail=str(exc)) from exc
+    _invalidate_content("maths")
     return {"status": "ok", "data": result}
 
 
@@ -467,6 +494,7 @@ def delete_nvr_lesson_endpoint(lesson_id: int, _user=Depends(require_admin)):
     data = delete_nvr_lesson(lesson_id)
     if not data:
         raise HTTPException(status_code=404, detail="Lesson not found")
+    _invalidate_content("nvr", lesson_id)
     return {"status": "ok", "data": data}
 
 
@@ -521,4 +549,5 @@ async def upload_nvr_practice_csv(
         raise HTTPException(status_code=400, detail=str(exc)) from exc
     except Exception as exc:
         raise HTTPException(status_code=500, detail=str(exc)) from exc
+    _invalidate_content("nvr")
     return {"status": "ok", "data": result}
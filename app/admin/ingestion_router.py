@@ -10,6 +10,8 @@ from pydantic import BaseModel
 
 from app.auth import get_current_user
 from app.database import get_connection
+from app.content_cache import invalidate_lesson_content
+from app.schema_registry import schema_changed
 from app.ingestion.comprehension.service import ingest_comprehension_file
 from app.ingestion.english_printable.service import upload_english_answer_csv
 from app.ingestion.maths.service import ingest_math_pdf
@@ -170,6 +172,7 @@ def _upload_math_answer_csv(file: UploadFile, selected_paper_code: str | None =
 
     try:
         cur.execute("ALTER TABLE math_printable_answer_keys ADD COLUMN IF NOT EXISTS explanation TEXT")
+        schema_changed(cur)
         for idx, row in enumerate(reader, start=2):
             clean = {
                 (key.strip() if key else key): (value.strip() if isinstance(value, str) else value)
@@ -1214,4 +1217,5 @@ def upload_comprehension(
     else:
         ingest_comprehension_file(file, paper_code)
 
+    invalidate_lesson_content("comprehension")
     return {"status": "success"}
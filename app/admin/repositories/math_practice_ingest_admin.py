@@ -10,6 +10,7 @@ from typing import BinaryIO, Dict
 import pandas as pd
 import psycopg2.extras
 
+from app.bulk_ingest import copy_rows, create_staging_table, use_bulk_ingest
 from app.database import get_connection
 
 
@@ -119,11 +120,124 @@ def export_lesson_csv(lesson_id: int) -> bytes:
     return buf.getvalue()
 
 
-def ingest_math_practice_csv(file_obj: BinaryIO, *, course_id: int = 1) -> Dict[str, int]:
+QUESTION_COLUMNS = [
+    "question_id", "stem", "option_a", "option_b", "option_c", "option_d", "option_e",
+    "correct_option", "topic", "difficulty", "explanation", "hint", "geometry_schema",
+]
+
+
+def _staged_rows(df: pd.DataFrame) -> list:
+    """
+    (line_no, lesson_name, display_name, *QUESTION_COLUMNS values) for each
+    CSV line the row-by-row path writes, with the same cell values and checks.
+    """
+    columns = list(df.columns)
+    staged = []
+    for idx, values in zip(df.index, df.itertuples(index=False, name=None)):
+        row = {c: str(v) for c, v in zip(columns, values)}
+        if not row["question_id"]:
+            continue
+        correct = row["correct_option"]
+        if correct not in {"A", "B", "C", "D", "E"}:
+            raise ValueError(f"Invalid correct_option '{correct}' for question_id={row['question_id']}")
+        geometry_schema = _parse_geometry_schema(row.get("geometry_schema", ""))
+        staged.append(
+            (
+                idx + 1,
+                _norm_topic_to_lesson_name(row["topic"]),
+                row["topic"].strip(),
+                row["question_id"], row["stem"],
+                row["option_a"], row["option_b"], row["option_c"], row["option_d"],
+                row.get("option_e", ""), correct,
+                row["topic"], row["difficulty"],
+                row.get("explanation", ""), row.get("hint", ""),
+                geometry_schema.dumps(geometry_schema.adapted) if geometry_schema is not None else None,
+            )
+        )
+    return staged
+
+
+def _bulk_ingest_rows(df: pd.DataFrame, course_id: int) -> Dict[str, int]:
+    """COPY the rows into a staging table, then upsert lessons, questions and mappings in one statement."""
+    staged = _staged_rows(df)
+    question_columns = ", ".join(QUESTION_COLUMNS)
+
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        create_staging_table(
+            cur,
+            "math_ingest_stage",
+            "math_questions",
+            QUESTION_COLUMNS,
+            [("line_no", "INTEGER"), ("lesson_name", "TEXT"), ("display_name", "TEXT")],
+        )
+        copy_rows(cur, "math_ingest_stage", ["line_no", "lesson_name", "display_name", *QUESTION_COLUMNS], staged)
+        # A key repeated in the file ends with its last line's values, as row by row.
+        cur.execute(
+            f"""
+            WITH lessons AS (
+                INSERT INTO math_lessons (course_id, lesson_code, lesson_name, display_name, is_active)
+                SELECT DISTINCT ON (lesson_name) %s, lesson_name, lesson_name, display_name, TRUE
+                FROM math_ingest_stage
+                ORDER BY lesson_name, line_no DESC
+                ON CONFLICT (course_id, lesson_name)
+                DO UPDATE SET display_name = EXCLUDED.display_name
+                RETURNING id, lesson_name
+            ),
+            questions AS (
+                INSERT INTO math_questions ({question_columns})
+                SELECT DISTINCT ON (question_id) {question_columns}
+                FROM math_ingest_stage
+                ORDER BY question_id, line_no DESC
+                ON CONFLICT (question_id)
+                DO UPDATE SET
+                    stem = EXCLUDED.stem,
+                    option_a = EXCLUDED.option_a,
+                    option_b = EXCLUDED.option_b,
+                    option_c = EXCLUDED.option_c,
+                    option_d = EXCLUDED.option_d,
+                    option_e = EXCLUDED.option_e,
+                    correct_option = EXCLUDED.correct_option,
+                    topic = EXCLUDED.topic,
+                    difficulty = EXCLUDED.difficulty,
+                    explanation = EXCLUDED.explanation,
+                    hint = EXCLUDED.hint,
+                    geometry_schema = EXCLUDED.geometry_schema
+                RETURNING id, question_id
+            )
+            INSERT INTO math_lesson_questions (lesson_id, question_id, position)
+            SELECT DISTINCT ON (l.id, q.id) l.id, q.id, s.line_no
+            FROM math_ingest_stage s
+            JOIN lessons l ON l.lesson_name = s.lesson_name
+            JOIN questions q ON q.question_id = s.question_id
+            ORDER BY l.id, q.id, s.line_no DESC
+            ON CONFLICT (lesson_id, question_id)
+            DO UPDATE SET position = EXCLUDED.position;
+            """,
+            (course_id,),
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+
+    return {
+        "lessons_processed": len({row[1] for row in staged}),
+        "questions_upserted": len(staged),
+        "mappings_processed": len(staged),
+    }
+
+
+def ingest_math_practice_csv(file_obj: BinaryIO, *, course_id: int = 1, bulk: bool | None = None) -> Dict[str, int]:
     """
     Idempotent ingestion for MathSprint practice CSVs.
     Upserts lessons (by topic->lesson_name), questions (by question_id),
     and lesson<->question mappings. Never deletes.
+    bulk (default CSV_BULK_INGEST) loads through app.bulk_ingest instead of row by row.
     """
     try:
         content = file_obj.read()
@@ -148,6 +262,9 @@ def ingest_math_practice_csv(file_obj: BinaryIO, *, course_id: int = 1) -> Dict[
     df["stem"] = df["stem"].astype(str).str.strip()
     df["correct_option"] = df["correct_option"].astype(str).str.strip().str.upper()
 
+    if use_bulk_ingest(bulk):
+        return _bulk_ingest_rows(df, course_id)
+
     lessons_seen: set = set()
     questions_upserted = 0
     mappings_created = 0
@@ -11,6 +11,7 @@ from typing import BinaryIO, Dict
 import pandas as pd
 import psycopg2.extras
 
+from app.bulk_ingest import copy_rows, create_staging_table, use_bulk_ingest
 from app.database import get_connection
 
 
@@ -119,12 +120,138 @@ def export_lesson_csv(lesson_id: int) -> bytes:
     return buf.getvalue()
 
 
-def ingest_nvr_practice_csv(file_obj: BinaryIO, lesson_id: int | None = None) -> Dict[str, int]:
+QUESTION_COLUMNS = [
+    "question_id", "stem", "option_a", "option_b", "option_c", "option_d", "option_e",
+    "correct_option", "topic", "difficulty", "explanation", "hint", "geometry_schema",
+]
+
+
+def _staged_rows(df: pd.DataFrame) -> list:
+    """
+    (line_no, lesson_name, display_name, *QUESTION_COLUMNS values) for each
+    CSV line the row-by-row path writes, with the same cell values and checks.
+    """
+    columns = list(df.columns)
+    staged = []
+    for idx, values in zip(df.index, df.itertuples(index=False, name=None)):
+        row = {c: str(v) for c, v in zip(columns, values)}
+        if not row["question_id"]:
+            continue
+        correct = row["correct_option"]
+        if correct not in {"A", "B", "C", "D", "E"}:
+            raise ValueError(
+                f"Invalid correct_option '{correct}' for question_id={row['question_id']}"
+            )
+        geometry_schema = _parse_geometry_schema(row.get("geometry_schema", ""))
+        staged.append(
+            (
+                idx + 1,
+                _norm_topic_to_lesson_name(row["topic"]),
+                row["topic"].strip(),
+                row["question_id"], row["stem"],
+                row["option_a"], row["option_b"], row["option_c"], row["option_d"],
+                row.get("option_e", ""), correct,
+                row["topic"], row["difficulty"],
+                row.get("explanation", ""), row.get("hint", ""),
+                geometry_schema.dumps(geometry_schema.adapted) if geometry_schema is not None else None,
+            )
+        )
+    return staged
+
+
+def _bulk_ingest_rows(df: pd.DataFrame, lesson_id: int | None) -> Dict[str, int]:
+    """COPY the rows into a staging table, then upsert lessons, questions and mappings in one statement."""
+    staged = _staged_rows(df)
+    question_columns = ", ".join(QUESTION_COLUMNS)
+
+    if lesson_id is not None:
+        lessons_cte = ""
+        mapping_source = "%(lesson_id)s, q.id, s.line_no FROM nvr_ingest_stage s"
+        mapping_key = "q.id"
+    else:
+        lessons_cte = """
+            lessons AS (
+                INSERT INTO nvr_lessons (lesson_code, lesson_name, display_name, is_active)
+                SELECT DISTINCT ON (lesson_name) lesson_name, lesson_name, display_name, TRUE
+                FROM nvr_ingest_stage
+                ORDER BY lesson_name, line_no DESC
+                ON CONFLICT (lesson_name)
+                DO UPDATE SET display_name = EXCLUDED.display_name
+                RETURNING id, lesson_name
+            ),
+        """
+        mapping_source = (
+            "l.id, q.id, s.line_no FROM nvr_ingest_stage s JOIN lessons l ON l.lesson_name = s.lesson_name"
+        )
+        mapping_key = "l.id, q.id"
+
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        create_staging_table(
+            cur,
+            "nvr_ingest_stage",
+            "nvr_questions",
+            QUESTION_COLUMNS,
+            [("line_no", "INTEGER"), ("lesson_name", "TEXT"), ("display_name", "TEXT")],
+        )
+        copy_rows(cur, "nvr_ingest_stage", ["line_no", "lesson_name", "display_name", *QUESTION_COLUMNS], staged)
+        # A key repeated in the file ends with its last line's values, as row by row.
+        cur.execute(
+            f"""
+            WITH {lessons_cte}
+            questions AS (
+                INSERT INTO nvr_questions ({question_columns})
+                SELECT DISTINCT ON (question_id) {question_columns}
+                FROM nvr_ingest_stage
+                ORDER BY question_id, line_no DESC
+                ON CONFLICT (question_id)
+                DO UPDATE SET
+                    stem            = EXCLUDED.stem,
+                    option_a        = EXCLUDED.option_a,
+                    option_b        = EXCLUDED.option_b,
+                    option_c        = EXCLUDED.option_c,
+                    option_d        = EXCLUDED.option_d,
+                    option_e        = EXCLUDED.option_e,
+                    correct_option  = EXCLUDED.correct_option,
+                    topic           = EXCLUDED.topic,
+                    difficulty      = EXCLUDED.difficulty,
+                    explanation     = EXCLUDED.explanation,
+                    hint            = EXCLUDED.hint,
+                    geometry_schema = EXCLUDED.geometry_schema
+                RETURNING id, question_id
+            )
+            INSERT INTO nvr_lesson_questions (lesson_id, question_id, position)
+            SELECT DISTINCT ON ({mapping_key}) {mapping_source}
+            JOIN questions q ON q.question_id = s.question_id
+            ORDER BY {mapping_key}, s.line_no DESC
+            ON CONFLICT (lesson_id, question_id)
+            DO UPDATE SET position = EXCLUDED.position;
+            """,
+            {"lesson_id": lesson_id},
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+
+    return {
+        "lessons_processed": len({row[1] for row in staged}) if lesson_id is None else 0,
+        "questions_upserted": len(staged),
+        "mappings_processed": len(staged),
+    }
+
+
+def ingest_nvr_practice_csv(file_obj: BinaryIO, lesson_id: int | None = None, *, bulk: bool | None = None) -> Dict[str, int]:
     """
     Idempotent ingestion for NVRSprint practice CSVs.
     If lesson_id is provided, all questions are pinned to that lesson and
     no new lessons are created from the CSV topic column.
     Otherwise, lessons are upserted by topic->lesson_name.
+    bulk (default CSV_BULK_INGEST) loads through app.bulk_ingest instead of row by row.
     """
     try:
         content = file_obj.read()
@@ -149,6 +276,9 @@ def ingest_nvr_practice_csv(file_obj: BinaryIO, lesson_id: int | None = None) ->
     df["stem"] = df["stem"].astype(str).str.strip()
     df["correct_option"] = df["correct_option"].astype(str).str.strip().str.upper()
 
+    if use_bulk_ingest(bulk):
+        return _bulk_ingest_rows(df, lesson_id)
+
     lessons_seen: set = set()
     questions_upserted = 0
     mappings_created = 0
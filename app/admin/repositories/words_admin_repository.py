@@ -1,19 +1,9 @@
 from app.database import get_connection
+from app.schema_registry import get_table_columns
 
 
 def _table_has_column(cur, table_schema: str, table_name: str, column_name: str) -> bool:
-    cur.execute(
-        """
-        SELECT 1
-        FROM information_schema.columns
-        WHERE table_schema = %s
-          AND table_name = %s
-          AND column_name = %s
-        LIMIT 1
-        """,
-        (table_schema, table_name, column_name),
-    )
-    return cur.fetchone() is not None
+    return column_name in get_table_columns(table_name, schema=table_schema, cur=cur)
 
 
 def get_words_overview():
@@ -0,0 +1,641 @@
+"""
+Write-behind attempt ingestion.
+
+With ATTEMPT_WRITE_BEHIND=1 the practice submits no longer insert their
+attempt row (and the counter upserts that go with it) before responding:
+they hand the row and the counter statements to enqueue_attempt(). A
+background flusher groups queued attempts into one multi-row INSERT per
+table, runs their counter statements after it and commits the lot, every
+ATTEMPT_FLUSH_INTERVAL_MS or as soon as ATTEMPT_FLUSH_BATCH_SIZE attempts
+are waiting. Class-time bursts then cost one commit per batch instead of
+one per answer.
+
+Every accepted attempt is first appended to this process's journal in
+ATTEMPT_SPILL_DIR, which also records the sequence numbers each flush
+committed. The directory must be set explicitly and must survive a restart
+(a volume, not the container's temp dir); the queue does not start without
+it. enqueue_attempt() returns once the attempt's journal line is fsynced;
+the fsync runs outside the queue lock and covers every line written before
+it, so concurrent submits share one (ATTEMPT_SPILL_FSYNC=0 skips it). When
+the in-memory queue holds ATTEMPT_QUEUE_MAX_JOBS attempts, further ones stay
+in the journal only (spilled) and are read back by file offset as the queue
+drains. A journal left behind by a dead process is replayed by the next
+process to start; an attempt committed just before a crash may be replayed
+once more (at-least-once).
+
+Queued attempts are not in the tables yet. pending_attempts() is the
+read-your-writes overlay: the spelling selection context and the prefetch
+marker merge it into what they read. Other readers that must see the
+learner's latest answer call ensure_attempts_visible(user_id, tables), which
+flushes only that learner's attempts in those tables, and only when there
+are any: everyone else's stay batched. Under the async bridge the flush runs
+on a worker thread, not on the event loop. Dashboards read the rollups and
+may lag by one flush interval.
+
+The queue, the overlay and the barrier are per process. A learner whose
+next request lands on another worker (or another instance) does not see
+answers still queued here until this process flushes them, at most one
+ATTEMPT_FLUSH_INTERVAL_MS later. Deployments that do not pin a learner to
+one worker should keep ATTEMPT_FLUSH_INTERVAL_MS short or leave write-behind
+off.
+
+Counter statements run at flush time, so the hooks take the answer's own
+timestamp (attempted_at) for anything dated: the day buckets and the
+spelling stats' last_attempt_at.
+
+Spelling, words/synonym, math and comprehension attempts go through the
+queue. Grammar (returns the inserted row) and NVR (counts only a row that
+was actually inserted) always write synchronously.
+"""
+
+from __future__ import annotations
+
+import fcntl
+import glob
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from datetime import date, datetime, timezone
+
+import psycopg2
+
+from app.batched_writes import execute_batched, join_statements
+from app.database import get_psycopg2_connection
+
+
+ATTEMPT_WRITE_BEHIND = os.getenv("ATTEMPT_WRITE_BEHIND", "0").strip().lower() in {"1", "true", "yes"}
+ATTEMPT_QUEUE_MAX_JOBS = max(1, int(os.getenv("ATTEMPT_QUEUE_MAX_JOBS", "10000")))
+ATTEMPT_FLUSH_INTERVAL_MS = float(os.getenv("ATTEMPT_FLUSH_INTERVAL_MS", "200"))
+ATTEMPT_FLUSH_BATCH_SIZE = max(1, int(os.getenv("ATTEMPT_FLUSH_BATCH_SIZE", "500")))
+ATTEMPT_SPILL_DIR = os.getenv("ATTEMPT_SPILL_DIR", "").strip()
+ATTEMPT_SPILL_FSYNC = os.getenv("ATTEMPT_SPILL_FSYNC", "1").strip().lower() not in {"0", "false", "no"}
+# How long a read-your-writes barrier waits before reading without the learner's queued attempts.
+ATTEMPT_BARRIER_TIMEOUT_SECONDS = float(os.getenv("ATTEMPT_BARRIER_TIMEOUT_SECONDS", "5"))
+
+_JOURNAL_PATTERN = "attempts-*.jsonl"
+_DEAD_LETTER_FILE = "dead-attempts.jsonl"
+# Errors an attempt's own data can cause (SQLSTATE classes 22 and 23); only
+# these send it to the dead-letter file. Anything else keeps it queued:
+# connection loss, and also ProgrammingError (a missing table or column, a
+# revoked grant), which every attempt would hit until the schema is fixed.
+_DATA_ERRORS = (psycopg2.DataError, psycopg2.IntegrityError)
+
+
+class StatementRecorder:
+    """Cursor stand-in for the counter hooks (record_*(cur, ...)): keeps (query, params) instead of running them."""
+
+    def __init__(self):
+        self.statements: list = []
+
+    def execute(self, query, vars=None):
+        self.statements.append((query, vars))
+
+
+# =========================
+# Journal
+# =========================
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {"$datetime": value.isoformat()}
+    if isinstance(value, date):
+        return {"$date": value.isoformat()}
+    raise TypeError(f"cannot journal {type(value).__name__}")
+
+
+def _decode_value(obj: dict):
+    if "$datetime" in obj:
+        return datetime.fromisoformat(obj["$datetime"])
+    if "$date" in obj:
+        return date.fromisoformat(obj["$date"])
+    return obj
+
+
+def _read_journal(path: str) -> list[dict]:
+    """The journal's jobs that no flush recorded as committed, oldest first."""
+    jobs: dict[int, dict] = {}
+    committed: set[int] = set()
+    with open(path, "rb") as journal_file:
+        for line in journal_file:
+            try:
+                record = json.loads(line, object_hook=_decode_value)
+            except ValueError:
+                # A line cut short by a crash.
+                continue
+            if "job" in record:
+                jobs[record["job"]["seq"]] = record["job"]
+            committed.update(record.get("done", ()))
+    return [jobs[seq] for seq in sorted(jobs) if seq not in committed]
+
+
+class _Journal:
+    """
+    This process's append-only journal, held under an exclusive flock while
+    the process lives. append() and reset() run under the queue lock; sync()
+    does not.
+    """
+
+    def __init__(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"attempts-{os.getpid()}-{time.time_ns()}.jsonl")
+        self._file = open(self.path, "ab")
+        fcntl.flock(self._file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        self._size = 0
+        # Lines appended / lines known to be on disk; sync() compares them.
+        self._written = 0
+        self._synced = 0
+        self._sync_lock = threading.Lock()
+
+    def append(self, record: dict) -> tuple[int, int]:
+        """Write one line; returns (its byte offset, its position for sync())."""
+        line = (json.dumps(record, default=_encode_value) + "\n").encode("utf-8")
+        offset = self._size
+        self._file.write(line)
+        self._file.flush()
+        self._size += len(line)
+        self._written += 1
+        return offset, self._written
+
+    def sync(self, position: int) -> None:
+        """fsync up to position, unless a concurrent sync already covered it (group commit)."""
+        if not ATTEMPT_SPILL_FSYNC:
+            return
+        with self._sync_lock:
+            if self._synced >= position:
+                return
+            # Every line up to here was flushed to the OS before _written moved.
+            target = self._written
+            try:
+                os.fsync(self._file.fileno())
+            except ValueError:
+                # Closed by stop_attempt_flusher(); the line was already flushed.
+                return
+            self._synced = max(self._synced, target)
+
+    def read_jobs(self, offsets: list[int]) -> list[dict]:
+        """The jobs whose lines start at offsets (spilled jobs), in that order."""
+        jobs = []
+        with open(self.path, "rb") as journal_file:
+            for offset in offsets:
+                journal_file.seek(offset)
+                jobs.append(json.loads(journal_file.readline(), object_hook=_decode_value)["job"])
+        return jobs
+
+    def reset(self) -> None:
+        self._file.truncate(0)
+        self._size = 0
+
+    def close(self) -> None:
+        is_empty = not _read_journal(self.path)
+        self._file.close()
+        if is_empty:
+            os.unlink(self.path)
+
+
+# =========================
+# Queue state
+# =========================
+_lock = threading.Lock()
+_changed = threading.Condition(_lock)
+_queue: deque = deque()
+# (journal offset, table, user_id) of the spilled jobs, oldest first.
+_spilled: list[tuple[int, str, object]] = []
+# (table, user_id) -> {seq: row}; every accepted attempt until its flush commits.
+_pending: dict[tuple[str, object], dict[int, dict]] = {}
+_seq = 0
+_in_flight = 0
+# user_id -> jobs of that user in _in_flight.
+_in_flight_users: dict[object, int] = {}
+_journal: _Journal | None = None
+_flusher: "_AttemptFlusher | None" = None
+_stats = {
+    "enqueued": 0,
+    "flushed": 0,
+    "batches": 0,
+    "spilled": 0,
+    "spill_reads": 0,
+    "recovered": 0,
+    "dead_lettered": 0,
+    "errors": 0,
+    "sync_flushes": 0,
+    "flush_ms_total": 0.0,
+}
+
+
+def write_behind_enabled() -> bool:
+    """True while the flusher runs; until then (and in scripts) submits write synchronously."""
+    return _flusher is not None and _journal is not None
+
+
+def _accept(job: dict) -> int:
+    """Journal, index and queue (or spill) one job; returns its journal position for sync(). Caller holds _lock."""
+    global _seq
+    _seq += 1
+    job["seq"] = _seq
+    offset, position = _journal.append({"job": job})
+    _pending.setdefault((job["table"], job["user_id"]), {})[_seq] = job["row"]
+    if _spilled or len(_queue) >= ATTEMPT_QUEUE_MAX_JOBS:
+        _spilled.append((offset, job["table"], job["user_id"]))
+        _stats["spilled"] += 1
+    else:
+        _queue.append(job)
+    _stats["enqueued"] += 1
+    if len(_queue) >= ATTEMPT_FLUSH_BATCH_SIZE:
+        _changed.notify_all()
+    return position
+
+
+def enqueue_attempt(table: str, row: dict, statements=(), *, user_column: str = "user_id") -> None:
+    """
+    Queue one attempt row (column -> value, every column explicit: no SQL
+    defaults such as NOW()) and the statements that go with it, e.g. a
+    StatementRecorder's. Statements run after the batch's INSERTs, in order.
+    """
+    job = {
+        "table": table,
+        "row": dict(row),
+        "statements": [[query, params] for query, params in statements],
+        "user_id": row.get(user_column),
+    }
+    with _lock:
+        journal = _journal
+        if journal is not None:
+            position = _accept(job)
+    if journal is not None:
+        journal.sync(position)
+        return
+    # Stopped meanwhile (shutdown): write it now.
+    conn = get_psycopg2_connection()
+    try:
+        _write_and_commit(conn, [job])
+    finally:
+        conn.close()
+
+
+def pending_attempts(table: str, user_id) -> list[dict]:
+    """The user's queued attempt rows for table, oldest first. Timestamps are UTC-aware; see match_timestamp()."""
+    with _lock:
+        return [dict(row) for row in (_pending.get((table, user_id)) or {}).values()]
+
+
+def match_timestamp(value, like):
+    """
+    A queued timestamp in the form of like, a value read from the table:
+    naive UTC for TIMESTAMP columns, aware for TIMESTAMPTZ (or no like).
+    """
+    if not isinstance(value, datetime) or value.tzinfo is None:
+        return value
+    if isinstance(like, datetime) and like.tzinfo is None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+# =========================
+# Flushing
+# =========================
+def _track_in_flight(jobs: list[dict], change: int) -> None:
+    """Count jobs (change=1) or stop counting them (change=-1) as in flight. Caller holds _lock."""
+    global _in_flight
+    _in_flight += change * len(jobs)
+    for job in jobs:
+        count = _in_flight_users.get(job["user_id"], 0) + change
+        if count:
+            _in_flight_users[job["user_id"]] = count
+        else:
+            _in_flight_users.pop(job["user_id"], None)
+
+
+def _take_batch(limit: int) -> list[dict]:
+    """Caller holds _lock."""
+    room = ATTEMPT_QUEUE_MAX_JOBS - len(_queue)
+    if _spilled and room > 0:
+        wanted = _spilled[:room]
+        del _spilled[:room]
+        _queue.extend(_journal.read_jobs([offset for offset, _, _ in wanted]))
+        _stats["spill_reads"] += len(wanted)
+    batch = []
+    while _queue and len(batch) < limit:
+        batch.append(_queue.popleft())
+    _track_in_flight(batch, 1)
+    return batch
+
+
+def _table_matches(table: str, tables) -> bool:
+    # Jobs may name the table schema-qualified (public.synonym_attempts).
+    return tables is None or table.rpartition(".")[2] in tables
+
+
+def _take_user_jobs(user_id, tables) -> list[dict]:
+    """Take user_id's queued and spilled jobs in tables (or all) out of line, oldest first. Caller holds _lock."""
+    batch = [job for job in _queue if job["user_id"] == user_id and _table_matches(job["table"], tables)]
+    if batch:
+        taken = {job["seq"] for job in batch}
+        kept = [job for job in _queue if job["seq"] not in taken]
+        _queue.clear()
+        _queue.extend(kept)
+    spilled = [entry for entry in _spilled if entry[2] == user_id and _table_matches(entry[1], tables)]
+    if spilled:
+        _spilled[:] = [entry for entry in _spilled if not (entry[2] == user_id and _table_matches(entry[1], tables))]
+        # Spilling starts only once the queue is full, so these follow the queued ones.
+        batch.extend(_journal.read_jobs([offset for offset, _, _ in spilled]))
+        _stats["spill_reads"] += len(spilled)
+    _track_in_flight(batch, 1)
+    return batch
+
+
+def _write_jobs(cur, jobs: list[dict]) -> None:
+    groups: dict[tuple, list] = {}
+    for job in jobs:
+        columns = tuple(job["row"])
+        groups.setdefault((job["table"], columns), []).append(tuple(job["row"][column] for column in columns))
+
+    for (table, columns), rows in groups.items():
+        execute_batched(cur, f"INSERT INTO {table} ({', '.join(columns)}) VALUES %s", rows)
+
+    statements = [(query, params) for job in jobs for query, params in job["statements"]]
+    if statements:
+        cur.execute(*join_statements(statements))
+
+
+def _settle(jobs: list[dict]) -> None:
+    """Mark jobs committed (or dead-lettered) in the journal and drop them from the overlay. Caller holds _lock."""
+    _journal.append({"done": [job["seq"] for job in jobs]})
+    for job in jobs:
+        key = (job["table"], job["user_id"])
+        rows = _pending.get(key)
+        if rows is not None:
+            rows.pop(job["seq"], None)
+            if not rows:
+                del _pending[key]
+    _track_in_flight(jobs, -1)
+    if not _queue and not _spilled and _in_flight == 0:
+        _journal.reset()
+    _changed.notify_all()
+
+
+def _requeue(jobs: list[dict], error: Exception) -> None:
+    print("attempt queue flush failed, retrying:", error)
+    with _lock:
+        _queue.extendleft(reversed(jobs))
+        _track_in_flight(jobs, -1)
+        _stats["errors"] += 1
+        _changed.notify_all()
+
+
+def _dead_letter(job: dict, error: Exception) -> None:
+    path = os.path.join(ATTEMPT_SPILL_DIR, _DEAD_LETTER_FILE)
+    with open(path, "a", encoding="utf-8") as dead_file:
+        dead_file.write(json.dumps({"job": job, "error": str(error)}, default=_encode_value) + "\n")
+
+
+def _write_and_commit(conn, jobs: list[dict]) -> None:
+    cur = conn.cursor()
+    try:
+        _write_jobs(cur, jobs)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+def _flush_batch(batch: list[dict]) -> bool:
+    """Write one batch; False when it could not be written (the batch is then requeued)."""
+    started_at = time.perf_counter()
+    try:
+        # Always a psycopg2 connection: a flush called from a request under
+        # the async bridge must not write on (and commit) the bridge's.
+        conn = get_psycopg2_connection()
+    except Exception as e:
+        _requeue(batch, e)
+        return False
+
+    try:
+        _write_and_commit(conn, batch)
+    except _DATA_ERRORS as e:
+        # One bad attempt must not hold back the rest: write them one by one.
+        print("attempt queue batch rejected, writing attempts singly:", e)
+        with _lock:
+            _stats["errors"] += 1
+        return _flush_singly(conn, batch)
+    except Exception as e:
+        _requeue(batch, e)
+        return False
+    finally:
+        conn.close()
+
+    with _lock:
+        _settle(batch)
+        _stats["flushed"] += len(batch)
+        _stats["batches"] += 1
+        _stats["flush_ms_total"] += (time.perf_counter() - started_at) * 1000
+    return True
+
+
+def _flush_singly(conn, batch: list[dict]) -> bool:
+    for index, job in enumerate(batch):
+        try:
+            _write_and_commit(conn, [job])
+            outcome = "flushed"
+        except _DATA_ERRORS as e:
+            print("attempt queue moved an attempt to the dead-letter file:", e)
+            _dead_letter(job, e)
+            outcome = "dead_lettered"
+        except Exception as e:
+            _requeue(batch[index:], e)
+            return False
+        with _lock:
+            _settle([job])
+            _stats[outcome] += 1
+    return True
+
+
+def flush_attempts(timeout: float = 30.0) -> bool:
+    """Flush everything queued or spilled and wait for in-flight batches. False on timeout or an unreachable database."""
+    deadline = time.monotonic() + timeout
+    while True:
+        with _lock:
+            if _journal is None:
+                return True
+            if not _queue and not _spilled and _in_flight == 0:
+                return True
+            batch = _take_batch(ATTEMPT_FLUSH_BATCH_SIZE)
+            if not batch:
+                # The flusher has the rest in flight.
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                _changed.wait(timeout=remaining)
+                continue
+        if not _flush_batch(batch) or time.monotonic() > deadline:
+            return False
+
+
+def flush_user_attempts(user_id, tables=None, timeout: float = ATTEMPT_BARRIER_TIMEOUT_SECONDS) -> bool:
+    """
+    Write user_id's queued attempts in tables (unqualified names, or all) and
+    wait for the user's batches already in flight. Other users' attempts stay
+    queued. False on timeout or an unreachable database.
+    """
+    deadline = time.monotonic() + timeout
+    with _lock:
+        if _journal is None:
+            return True
+        batch = _take_user_jobs(user_id, tables)
+    if batch and not _flush_batch(batch):
+        return False
+    with _lock:
+        while _in_flight_users.get(user_id):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            _changed.wait(timeout=remaining)
+    return True
+
+
+def ensure_attempts_visible(user_id, tables=None) -> None:
+    """
+    Read-your-writes barrier: when the user still has attempts queued in
+    tables (unqualified names, or any), flush those. Runs the flush on a
+    worker thread when called under the async bridge, so the event loop
+    keeps serving other requests.
+    """
+    if not write_behind_enabled() or not user_id:
+        return
+    with _lock:
+        has_pending = any(
+            key_user == user_id and _table_matches(table, tables)
+            for table, key_user in _pending
+        )
+        if has_pending:
+            _stats["sync_flushes"] += 1
+    if not has_pending:
+        return
+    bridge = sys.modules.get("app.database_async")
+    if bridge is not None and bridge.in_async_bridge():
+        import anyio.to_thread
+
+        bridge.await_only(anyio.to_thread.run_sync(flush_user_attempts, user_id, tables))
+    else:
+        flush_user_attempts(user_id, tables)
+
+
+class _AttemptFlusher(threading.Thread):
+    def __init__(self):
+        super().__init__(name="attempt-queue-flusher", daemon=True)
+        self._stop_event = threading.Event()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        with _lock:
+            _changed.notify_all()
+
+    def run(self) -> None:
+        retry_delay = ATTEMPT_FLUSH_INTERVAL_MS / 1000
+        while not self._stop_event.is_set():
+            with _lock:
+                if len(_queue) < ATTEMPT_FLUSH_BATCH_SIZE and not _spilled:
+                    _changed.wait(timeout=ATTEMPT_FLUSH_INTERVAL_MS / 1000)
+                batch = _take_batch(ATTEMPT_FLUSH_BATCH_SIZE)
+            if not batch:
+                continue
+            try:
+                flushed = _flush_batch(batch)
+            except Exception as e:
+                print("attempt queue flusher error:", e)
+                flushed = False
+            if flushed:
+                retry_delay = ATTEMPT_FLUSH_INTERVAL_MS / 1000
+            else:
+                self._stop_event.wait(retry_delay)
+                retry_delay = min(retry_delay * 2, 30.0)
+
+
+# =========================
+# Lifecycle
+# =========================
+def recover_spilled_attempts() -> int:
+    """Queue the uncommitted attempts of journals whose process is gone. Returns attempts recovered."""
+    recovered = 0
+    for path in sorted(glob.glob(os.path.join(ATTEMPT_SPILL_DIR, _JOURNAL_PATTERN))):
+        if _journal is not None and path == _journal.path:
+            continue
+        with open(path, "a+", encoding="utf-8") as orphan:
+            try:
+                fcntl.flock(orphan.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                # A live process still owns it.
+                continue
+            jobs = _read_journal(path)
+            position = 0
+            with _lock:
+                for job in jobs:
+                    job.pop("seq", None)
+                    position = _accept(job)
+                _stats["recovered"] += len(jobs)
+            # On disk in this process's journal before the orphan goes.
+            _journal.sync(position)
+            os.unlink(path)
+        recovered += len(jobs)
+    return recovered
+
+
+def start_attempt_flusher() -> bool:
+    global _journal, _flusher
+    if not ATTEMPT_WRITE_BEHIND:
+        return False
+    if not ATTEMPT_SPILL_DIR:
+        # A temp dir default would lose queued answers with the container.
+        raise RuntimeError("ATTEMPT_WRITE_BEHIND=1 needs ATTEMPT_SPILL_DIR, a directory that survives restarts")
+    if _flusher is None or not _flusher.is_alive():
+        with _lock:
+            if _journal is None:
+                _journal = _Journal(ATTEMPT_SPILL_DIR)
+        recovered = recover_spilled_attempts()
+        if recovered:
+            print("attempt queue recovered", recovered, "spilled attempts")
+        _flusher = _AttemptFlusher()
+        _flusher.start()
+    return True
+
+
+def stop_attempt_flusher(timeout: float = 30.0) -> None:
+    """Stop taking attempts, flush what is queued and release the journal (kept on disk if anything is left)."""
+    global _journal, _flusher
+    flusher, _flusher = _flusher, None
+    if flusher is not None:
+        flusher.stop()
+        flusher.join(timeout)
+    if not flush_attempts(timeout):
+        print("attempt queue stopped with attempts left in", _journal.path if _journal else ATTEMPT_SPILL_DIR)
+    with _lock:
+        journal, _journal = _journal, None
+        _queue.clear()
+        _spilled.clear()
+        _pending.clear()
+        _in_flight_users.clear()
+    if journal is not None:
+        journal.close()
+
+
+def get_attempt_queue_stats() -> dict:
+    with _lock:
+        stats = dict(_stats)
+        stats.update(
+            {
+                "enabled": ATTEMPT_WRITE_BEHIND,
+                "running": _flusher is not None and _flusher.is_alive(),
+                "queued": len(_queue),
+                "spilled_now": len(_spilled),
+                "in_flight": _in_flight,
+                "pending_users": len({user_id for _, user_id in _pending}),
+                "journal": _journal.path if _journal else None,
+            }
+        )
+    stats["avg_batch_size"] = round(stats["flushed"] / stats["batches"], 2) if stats["batches"] else 0.0
+    stats["avg_flush_ms"] = round(stats["flush_ms_total"] / stats["batches"], 2) if stats["batches"] else 0.0
+    stats["flush_ms_total"] = round(stats["flush_ms_total"], 2)
+    return stats
@@ -1,8 +1,14 @@
+from collections import OrderedDict
 from fastapi import Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 import os
-from app.database import get_connection
+import threading
+import time
+from app.database import get_request_connection
+from app.database_async import get_async_request_connection, run_sync_async
+from app.entitlement_cache import get_member_entitlements, get_member_ids_for_email
+from app.entitlements import token_member_app_codes
 
 # OAuth2 token extractor
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login")
@@ -10,6 +16,163 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login")
 JWT_SECRET = os.getenv("JWT_SECRET")
 JWT_ALGO = "HS256"
 
+IDENTITY_CACHE_ENABLED = os.getenv("IDENTITY_CACHE_ENABLED", "1").strip().lower() not in {"0", "false", "no"}
+IDENTITY_CACHE_TTL_SECONDS = float(os.getenv("IDENTITY_CACHE_TTL_SECONDS", "60"))
+IDENTITY_CACHE_MAX_ENTRIES = int(os.getenv("IDENTITY_CACHE_MAX_ENTRIES", "5000"))
+
+
+# =========================
+# Identity cache
+# =========================
+class IdentityCache:
+    """
+    Bounded TTL/LRU cache of (user_id, member_id) keyed by (email, token iat).
+
+    Entries are per process; invalidate(email) drops every token of that user
+    and the TTL bounds staleness across workers.
+    """
+
+    def __init__(self, *, ttl: float = IDENTITY_CACHE_TTL_SECONDS, max_entries: int = IDENTITY_CACHE_MAX_ENTRIES):
+        self.ttl = float(ttl)
+        self.max_entries = max(1, int(max_entries))
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[tuple, tuple] = OrderedDict()
+        self._keys_by_email: dict[str, set] = {}
+        self._stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0, "invalidations": 0}
+
+    def get(self, key: tuple):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            expires_at, value = entry
+            if expires_at <= now:
+                self._drop(key)
+                self._stats["expired"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return value
+
+    def put(self, key: tuple, value: tuple) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._keys_by_email.setdefault(key[0], set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest_key = next(iter(self._entries))
+                self._drop(oldest_key)
+                self._stats["evictions"] += 1
+
+    def invalidate(self, email: str) -> int:
+        normalized = (email or "").strip().lower()
+        with self._lock:
+            keys = self._keys_by_email.pop(normalized, set())
+            for key in keys:
+                self._entries.pop(key, None)
+            self._stats["invalidations"] += 1
+        return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_email.clear()
+
+    def _drop(self, key: tuple) -> None:
+        self._entries.pop(key, None)
+        keys = self._keys_by_email.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                self._keys_by_email.pop(key[0], None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats.update(
+            {
+                "enabled": IDENTITY_CACHE_ENABLED,
+                "ttl_seconds": self.ttl,
+                "max_entries": self.max_entries,
+                "hit_ratio": round(stats["hits"] / lookups, 4) if lookups else 0.0,
+            }
+        )
+        return stats
+
+
+_identity_cache = IdentityCache()
+
+
+def invalidate_identity(email: str | None) -> None:
+    """Call after anything that changes who an email resolves to (users/members rows, role)."""
+    if email:
+        _identity_cache.invalidate(email)
+
+
+def clear_identity_cache() -> None:
+    _identity_cache.clear()
+
+
+def get_identity_cache_stats() -> dict:
+    return _identity_cache.stats()
+
+
+def _identity_cache_key(payload) -> tuple:
+    email = str(payload.get("sub") or payload.get("email") or "").strip().lower()
+    # Tokens issued before iat was added fall back to exp, which is just as unique per token.
+    return (email, payload.get("iat") or payload.get("exp"))
+
+
+def _has_signed_identity(payload) -> bool:
+    # Tokens minted with an entitlement stamp carry user_id/member_id resolved at issue time.
+    return payload.get("ev") is not None and bool(payload.get("member_id")) and payload.get("user_id") is not None
+
+
+def _resolve_identity(payload, conn) -> None:
+    if _has_signed_identity(payload):
+        return
+
+    key = _identity_cache_key(payload)
+    identity = _identity_cache.get(key) if IDENTITY_CACHE_ENABLED else None
+    if identity is None:
+        cur = conn.cursor()
+        try:
+            identity = (
+                resolve_verified_learning_user_id(cur, payload),
+                resolve_member_id(cur, payload),
+            )
+        finally:
+            cur.close()
+        if IDENTITY_CACHE_ENABLED:
+            _identity_cache.put(key, identity)
+
+    payload["user_id"], payload["member_id"] = identity
+
+
+# Identity lookups by email; email_index_explain.py EXPLAINs these strings.
+VERIFIED_LEARNING_USER_ID_SQL = """
+    SELECT user_id
+    FROM users
+    WHERE LOWER(email) = LOWER(%s)
+    ORDER BY user_id ASC
+    LIMIT 1
+"""
+
+# Newest member row for an email.
+MEMBER_ID_FOR_EMAIL_SQL = """
+    SELECT id
+    FROM kiaro_membership.members
+    WHERE LOWER(email) = LOWER(%s)
+    ORDER BY id DESC
+    LIMIT 1
+"""
+
 
 def resolve_verified_learning_user_id(cur, user) -> int | None:
     email = user.get("sub") or user.get("email")
@@ -18,16 +181,7 @@ def resolve_verified_learning_user_id(cur, user) -> int | None:
     if not email:
         return None
 
-    cur.execute(
-        """
-        SELECT user_id
-        FROM users
-        WHERE LOWER(email) = LOWER(%s)
-        ORDER BY user_id ASC
-        LIMIT 1
-        """,
-        (email,),
-    )
+    cur.execute(VERIFIED_LEARNING_USER_ID_SQL, (email,))
     row = cur.fetchone()
     if not row:
         return None
@@ -42,7 +196,7 @@ def resolve_verified_learning_user_id(cur, user) -> int | None:
     return email_user_id
 
 
-def get_current_user(token: str = Depends(oauth2_scheme)):
+def get_current_user(token: str = Depends(oauth2_scheme), conn=Depends(get_request_connection, scope="function")):
     try:
         payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGO])
 
@@ -50,14 +204,9 @@ def get_current_user(token: str = Depends(oauth2_scheme)):
         if not email:
             raise HTTPException(status_code=401, detail="Invalid token")
 
-        conn = get_connection()
-        cur = conn.cursor()
-        try:
-            payload["user_id"] = resolve_verified_learning_user_id(cur, payload)
-            payload["member_id"] = resolve_member_id(cur, payload)
-        finally:
-            cur.close()
-            conn.close()
+        # Request-scoped connection: only checked out on a cache miss, and the
+        # endpoint reuses it via the same dependency.
+        _resolve_identity(payload, conn)
 
         # Return full payload so role/user_id/account_type are preserved
         return payload
@@ -66,10 +215,18 @@ def get_current_user(token: str = Depends(oauth2_scheme)):
         raise HTTPException(status_code=401, detail="Invalid or expired token")
 
 
+async def get_current_user_async(token: str = Depends(oauth2_scheme), conn=Depends(get_async_request_connection, scope="function")):
+    """get_current_user for async routes: same checks, on the async request connection."""
+    return await run_sync_async(get_current_user, token, conn)
+
+
 optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login", auto_error=False)
 
 
-def get_optional_current_user(token: str | None = Depends(optional_oauth2_scheme)):
+def get_optional_current_user(
+    token: str | None = Depends(optional_oauth2_scheme),
+    conn=Depends(get_request_connection, scope="function"),
+):
     if not token:
         return None
     try:
@@ -78,14 +235,7 @@ def get_optional_current_user(token: str | None = Depends(optional_oauth2_scheme
         if not email:
             return None
 
-        conn = get_connection()
-        cur = conn.cursor()
-        try:
-            payload["user_id"] = resolve_verified_learning_user_id(cur, payload)
-            payload["member_id"] = resolve_member_id(cur, payload)
-        finally:
-            cur.close()
-            conn.close()
+        _resolve_identity(payload, conn)
         return payload
     except JWTError:
         return None
@@ -96,16 +246,7 @@ def resolve_member_id(cur, user) -> int | None:
     if not email:
         return None
 
-    cur.execute(
-        """
-        SELECT id
-        FROM kiaro_membership.members
-        WHERE LOWER(email) = LOWER(%s)
-        ORDER BY id DESC
-        LIMIT 1
-        """,
-        (email,),
-    )
+    cur.execute(MEMBER_ID_FOR_EMAIL_SQL, (email,))
     row = cur.fetchone()
     return int(row[0]) if row else None
 
@@ -114,21 +255,15 @@ def user_has_member_app_access(cur, user, app_code: str) -> bool:
     if user.get("role") == "admin":
         return True
 
-    member_id = resolve_member_id(cur, user)
-    if not member_id:
+    if app_code in (token_member_app_codes(user, conn=cur.connection) or ()):
+        return True
+
+    # Latest member row for the email, as in resolve_member_id().
+    member_ids = get_member_ids_for_email(user.get("sub") or user.get("email"), conn=cur.connection)
+    if not member_ids:
         return False
 
-    cur.execute(
-        """
-        SELECT 1
-        FROM kiaro_membership.member_apps
-        WHERE member_id = %s
-          AND app_code = %s
-        LIMIT 1
-        """,
-        (member_id, app_code),
-    )
-    return cur.fetchone() is not None
+    return app_code in get_member_entitlements(member_ids[-1], conn=cur.connection).app_codes
 
 
 def require_member_app_access(cur, user, app_code: str):
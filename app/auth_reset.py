@@ -2,20 +2,15 @@ import secrets
 from datetime import datetime, timedelta
 
 from fastapi import APIRouter, Depends, HTTPException
-from passlib.context import CryptContext
 from pydantic import BaseModel, ConfigDict, EmailStr, Field
 
-from app.auth import get_current_user
+from app.auth import get_current_user, invalidate_identity
 from app.database import get_connection
+from app.passwords import hash_password
 
 
 router = APIRouter()
 
-pwd_context = CryptContext(
-    schemes=["bcrypt", "pbkdf2_sha256"],
-    deprecated="auto",
-)
-
 RESET_MESSAGE = "If account exists, reset link sent"
 RESET_TOKEN_MINUTES = 30
 
@@ -70,7 +65,7 @@ def init_password_reset_tables():
 
 
 def _hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+    return hash_password(password)
 
 
 def _update_password_hashes(cur, user_id: int, password_hash: str):
@@ -107,6 +102,8 @@ def _update_password_hashes(cur, user_id: int, password_hash: str):
         (password_hash, email),
     )
 
+    return email
+
 
 @router.post("/auth/request-reset")
 def request_reset(payload: RequestResetPayload):
@@ -168,7 +165,7 @@ def reset_password(payload: ResetPasswordPayload):
 
         token_id, user_id = row
         password_hash = _hash_password(payload.new_password)
-        _update_password_hashes(cur, user_id, password_hash)
+        email = _update_password_hashes(cur, user_id, password_hash)
 
         cur.execute(
             """
@@ -180,6 +177,7 @@ def reset_password(payload: ResetPasswordPayload):
         )
 
         conn.commit()
+        invalidate_identity(email)
         return {"message": "Password reset successful"}
     except HTTPException:
         conn.rollback()
@@ -214,6 +212,7 @@ def reset_password_direct(payload: DirectResetPasswordPayload):
             password_hash = _hash_password(payload.new_password)
             _update_password_hashes(cur, row[0], password_hash)
             conn.commit()
+            invalidate_identity(email)
 
         return {"message": "If account exists, password updated"}
     except Exception:
@@ -237,8 +236,9 @@ def admin_reset_password(
 
     try:
         password_hash = _hash_password(payload.new_password)
-        _update_password_hashes(cur, payload.user_id, password_hash)
+        email = _update_password_hashes(cur, payload.user_id, password_hash)
         conn.commit()
+        invalidate_identity(email)
 
         return {"message": "Password updated by admin"}
     except HTTPException:
@@ -267,12 +267,15 @@ def admin_reset_password_bulk(
     try:
         password_hash = _hash_password(payload.new_password)
         updated_user_ids: list[int] = []
+        updated_emails: list[str] = []
 
         for user_id in normalized_user_ids:
-            _update_password_hashes(cur, user_id, password_hash)
+            updated_emails.append(_update_password_hashes(cur, user_id, password_hash))
             updated_user_ids.append(user_id)
 
         conn.commit()
+        for email in updated_emails:
+            invalidate_identity(email)
 
         return {
             "message": "Passwords updated by admin",
@@ -0,0 +1,77 @@
+"""
+COPY-based bulk loading for the admin CSV imports.
+
+The MathSprint, NVRSprint and GrammarSprint CSV imports used to upsert one
+row at a time (a lesson upsert, a question upsert and a mapping insert per
+CSV line). With CSV_BULK_INGEST=1 (the default) they parse the file in
+Python, COPY the rows into a temporary staging table and merge it into the
+content tables with a handful of set-based upserts, in one transaction.
+The counters they return are unchanged.
+
+Helpers:
+- create_staging_table() makes an ON COMMIT DROP temp table whose columns
+  copy the types of the target table's, plus any extra columns.
+- copy_rows() streams rows into it with COPY ... FROM STDIN (text format).
+
+bulk_ingest_benchmark.py at the repo root times both paths on generated
+files (10k questions by default).
+"""
+
+from __future__ import annotations
+
+import io
+import os
+
+
+CSV_BULK_INGEST = os.getenv("CSV_BULK_INGEST", "1").strip().lower() not in {"0", "false", "no"}
+
+
+def use_bulk_ingest(bulk: bool | None = None) -> bool:
+    """The caller's explicit choice, else CSV_BULK_INGEST."""
+    return CSV_BULK_INGEST if bulk is None else bool(bulk)
+
+
+def _copy_text(value) -> str:
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def create_staging_table(cur, name: str, like_table: str, columns, extra_columns=()) -> None:
+    """
+    Temp table name with like_table's columns (same types, no constraints)
+    and extra_columns, given as (column, type) pairs. Dropped at commit.
+    """
+    cur.execute(
+        f"""
+        CREATE TEMP TABLE {name} ON COMMIT DROP AS
+        SELECT {", ".join(columns)}
+        FROM {like_table}
+        WITH NO DATA
+        """
+    )
+    for column, column_type in extra_columns:
+        cur.execute(f"ALTER TABLE {name} ADD COLUMN {column} {column_type}")
+
+
+def copy_rows(cur, table: str, columns, rows) -> int:
+    """COPY rows (sequences in columns order; None is NULL) into table. Returns rows copied."""
+    buffer = io.StringIO()
+    count = 0
+    for row in rows:
+        buffer.write("\t".join(_copy_text(value) for value in row))
+        buffer.write("\n")
+        count += 1
+    if not count:
+        return 0
+    buffer.seek(0)
+    cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", buffer)
+    return count
@@ -1,7 +1,14 @@
 import json
 import logging
+from datetime import datetime, timezone
 
+from app.attempt_queue import StatementRecorder, enqueue_attempt, write_behind_enabled
+from app.content_cache import get_lesson_content
 from app.database import get_connection
+from app.repositories.daily_attempts_repository import record_daily_attempt
+from app.repositories.mastery_repository import record_lesson_mastery_attempt
+from app.repositories.module_rollup_repository import record_module_attempt
+from app.schema_registry import get_table_columns
 
 logger = logging.getLogger(__name__)
 COMPREHENSION_COOLDOWN_DISTANCE = 3
@@ -108,6 +115,31 @@ def insert_passage(title, passage_text, difficulty=None, word_count=None):
 # QUESTIONS
 # =========================
 
+def _load_passage_questions(cur, passage_id):
+    cur.execute(
+        """
+        SELECT question_id, question_text, option_a, option_b, option_c, option_d, sort_order
+        FROM comprehension_questions
+        WHERE passage_id = %s
+        ORDER BY sort_order ASC, question_id ASC
+        """,
+        (passage_id,),
+    )
+    return cur.fetchall()
+
+
+def get_ordered_passage_questions(cur, passage_id):
+    """
+    (question_id, question_text, option_a..d, sort_order) rows in display
+    order, from app.content_cache.
+    """
+    return get_lesson_content("comprehension", passage_id, lambda: _load_passage_questions(cur, passage_id))
+
+
+def get_ordered_passage_question_ids(cur, passage_id) -> list[int]:
+    return [row[0] for row in get_ordered_passage_questions(cur, passage_id) if row and row[0] is not None]
+
+
 def get_questions_for_passage(passage_id):
     conn = get_connection()
     cur = conn.cursor()
@@ -167,16 +199,7 @@ def get_next_comprehension_question(
             if question_id is not None
         }
 
-        cur.execute(
-            """
-            SELECT question_id
-            FROM comprehension_questions
-            WHERE passage_id = %s
-            ORDER BY sort_order ASC, question_id ASC
-            """,
-            (passage_id,),
-        )
-        ordered_question_ids = [row[0] for row in cur.fetchall() if row and row[0] is not None]
+        ordered_question_ids = get_ordered_passage_question_ids(cur, passage_id)
 
         if not ordered_question_ids:
             return None
@@ -307,7 +330,32 @@ def insert_question(passage_id, question_text, a, b, c, d, correct, qtype, order
 # ATTEMPTS (Append Only)
 # =========================
 
+def _record_comprehension_counters(cur, user_id, passage_id, correct, attempted_at=None):
+    record_lesson_mastery_attempt(cur, "comprehension", user_id, passage_id, correct)
+    record_module_attempt(cur, "comprehension", user_id, correct, passage_id, attempted_at)
+    record_daily_attempt(cur, "comprehension", user_id, correct, attempted_at)
+
+
 def insert_attempt(user_id, passage_id, question_id, selected_answer, correct):
+    if write_behind_enabled():
+        row = {
+            "user_id": user_id,
+            "passage_id": passage_id,
+            "question_id": question_id,
+            "selected_answer": selected_answer,
+            "correct": correct,
+        }
+        # The table's timestamp default would be the flush time.
+        attempted_at = datetime.now(timezone.utc)
+        columns = get_table_columns("comprehension_attempts")
+        timestamp_column = next((column for column in ("created_at", "submitted_at") if column in columns), None)
+        if timestamp_column:
+            row[timestamp_column] = attempted_at
+        counters = StatementRecorder()
+        _record_comprehension_counters(counters, user_id, passage_id, correct, attempted_at)
+        enqueue_attempt("comprehension_attempts", row, counters.statements)
+        return
+
     conn = get_connection()
     cur = conn.cursor()
 
@@ -316,6 +364,7 @@ def insert_attempt(user_id, passage_id, question_id, selected_answer, correct):
         (user_id, passage_id, question_id, selected_answer, correct)
         VALUES (%s, %s, %s, %s, %s);
     """, (user_id, passage_id, question_id, selected_answer, correct))
+    _record_comprehension_counters(cur, user_id, passage_id, correct)
 
     conn.commit()
 
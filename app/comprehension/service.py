@@ -2,6 +2,7 @@
 
 from app.comprehension.repository import (
     get_active_passages,
+    get_ordered_passage_questions,
     get_question_by_id,
     insert_attempt
 )
@@ -37,13 +38,7 @@ def start_passage(passage_id, user_id=None):
             return None
 
         # Fetch questions
-        cur.execute("""
-            SELECT question_id, question_text, option_a, option_b, option_c, option_d, sort_order
-            FROM comprehension_questions
-            WHERE passage_id = %s
-            ORDER BY sort_order ASC, question_id ASC
-        """, (passage_id,))
-        questions = cur.fetchall()
+        questions = get_ordered_passage_questions(cur, passage_id)
 
         # NEW: get attempted questions for this user + passage
         attempted = set()
@@ -0,0 +1,191 @@
+"""
+In-process cache of lesson content.
+
+Lesson content (words, questions, their order) only changes through the admin
+curriculum and ingestion endpoints, yet every next-question request used to
+re-read it, usually joined with the learner's stats. Content is now cached per
+(module, lesson, kind) as an immutable tuple of read-only mappings, and the
+per-user stats are read separately by the callers with a narrow query and
+merged in memory.
+
+Invalidation:
+- invalidate_lesson_content(module) bumps the module's version, which retires
+  every cached lesson of that module at once; passing lesson_id bumps only that
+  lesson's version. A load that was in flight when either version moved is
+  returned to its caller but not stored. Either way a NOTIFY on LESSON_CONTENT_CHANNEL tells the other
+  workers (via the app.entitlement_cache listener).
+- LESSON_CONTENT_TTL_SECONDS bounds staleness for content written outside the
+  admin endpoints (scripts, manual SQL).
+
+Entries beyond LESSON_CONTENT_CACHE_MAX_ENTRIES are evicted least recently used
+first.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from types import MappingProxyType
+
+from app.database import get_connection
+from app.entitlement_cache import add_notification_handler
+
+
+LESSON_CONTENT_CACHE_ENABLED = os.getenv("LESSON_CONTENT_CACHE_ENABLED", "1").strip().lower() not in {"0", "false", "no"}
+LESSON_CONTENT_CACHE_MAX_ENTRIES = int(os.getenv("LESSON_CONTENT_CACHE_MAX_ENTRIES", "2000"))
+LESSON_CONTENT_TTL_SECONDS = float(os.getenv("LESSON_CONTENT_TTL_SECONDS", "900"))
+LESSON_CONTENT_CHANNEL = os.getenv("LESSON_CONTENT_CHANNEL", "kiaro_lesson_content")
+
+# NOTIFY payload is "<module>|<lesson_id>"; an empty lesson_id means the whole module.
+
+_lock = threading.Lock()
+# (module, lesson_id, kind) -> (module_version, expires_at, approx_bytes, items)
+_entries: OrderedDict = OrderedDict()
+_module_versions: dict[str, int] = {}
+# (module, str(lesson_id)) -> version, bumped by single-lesson invalidations.
+_lesson_versions: dict[tuple[str, str], int] = {}
+# Bumped when every module is dropped at once (listener reconnect).
+_generation = 0
+_stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0, "bytes": 0}
+
+
+def _freeze(item):
+    if isinstance(item, dict):
+        return MappingProxyType(dict(item))
+    return item
+
+
+def _approx_size(value) -> int:
+    size = sys.getsizeof(value)
+    if isinstance(value, (dict, MappingProxyType)):
+        size += sum(_approx_size(key) + _approx_size(item) for key, item in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(_approx_size(item) for item in value)
+    return size
+
+
+def _pop_entry(key) -> None:
+    entry = _entries.pop(key, None)
+    if entry is not None:
+        _stats["bytes"] -= entry[2]
+
+
+def _version(module: str, lesson_id) -> tuple[int, int, int]:
+    return _generation, _module_versions.get(module, 0), _lesson_versions.get((module, str(lesson_id)), 0)
+
+
+def get_lesson_content(module: str, lesson_id, loader, *, kind: str = "items") -> tuple:
+    """
+    Cached content for one lesson. loader() runs on a miss and returns the
+    items (rows or dicts, in display order); dicts come back read-only.
+    """
+    key = (module, lesson_id, kind)
+    if LESSON_CONTENT_CACHE_ENABLED:
+        with _lock:
+            version = _version(module, lesson_id)
+            entry = _entries.get(key)
+            if entry is not None and entry[0] == version and entry[1] > time.monotonic():
+                _entries.move_to_end(key)
+                _stats["hits"] += 1
+                return entry[3]
+            _stats["misses"] += 1
+    else:
+        version = (0, 0, 0)
+
+    items = tuple(_freeze(item) for item in loader())
+    if not LESSON_CONTENT_CACHE_ENABLED:
+        return items
+
+    approx_bytes = _approx_size(items)
+    with _lock:
+        # Skip the store if the module or lesson was invalidated while we were loading.
+        if _version(module, lesson_id) != version:
+            return items
+        _pop_entry(key)
+        _entries[key] = (version, time.monotonic() + LESSON_CONTENT_TTL_SECONDS, approx_bytes, items)
+        _stats["bytes"] += approx_bytes
+        while len(_entries) > max(1, LESSON_CONTENT_CACHE_MAX_ENTRIES):
+            _pop_entry(next(iter(_entries)))
+            _stats["evictions"] += 1
+    return items
+
+
+def _drop_local(module: str | None, lesson_id=None) -> None:
+    global _generation
+    with _lock:
+        _stats["invalidations"] += 1
+        if module is None:
+            _generation += 1
+            _entries.clear()
+            _stats["bytes"] = 0
+        elif lesson_id is None:
+            _module_versions[module] = _module_versions.get(module, 0) + 1
+            for key in [key for key in _entries if key[0] == module]:
+                _pop_entry(key)
+        else:
+            lesson_key = (module, str(lesson_id))
+            _lesson_versions[lesson_key] = _lesson_versions.get(lesson_key, 0) + 1
+            for key in [key for key in _entries if key[0] == module and str(key[1]) == str(lesson_id)]:
+                _pop_entry(key)
+
+
+def invalidate_lesson_content(module: str, lesson_id=None, *, cur=None) -> None:
+    """
+    Forget cached content for a module (or one of its lessons) in every
+    worker. Pass the writing transaction's cursor to deliver the NOTIFY on
+    commit; otherwise it is sent on a short-lived connection of its own, so
+    call this after the content change has committed.
+    """
+    _drop_local(module, lesson_id)
+    payload = f"{module}|{'' if lesson_id is None else lesson_id}"
+    if cur is not None:
+        cur.execute("SELECT pg_notify(%s, %s)", (LESSON_CONTENT_CHANNEL, payload))
+        return
+
+    conn = get_connection()
+    notify_cur = conn.cursor()
+    try:
+        notify_cur.execute("SELECT pg_notify(%s, %s)", (LESSON_CONTENT_CHANNEL, payload))
+        conn.commit()
+    except Exception as e:
+        print("lesson content notify failed:", e)
+    finally:
+        notify_cur.close()
+        conn.close()
+
+
+def _on_notification(payload: str | None) -> None:
+    if payload is None:
+        _drop_local(None)
+        return
+    module, _, lesson_id = payload.partition("|")
+    if module:
+        _drop_local(module, lesson_id or None)
+
+
+def get_lesson_content_stats() -> dict:
+    with _lock:
+        stats = dict(_stats)
+        entries = len(_entries)
+        modules: dict[str, int] = {}
+        for module, _lesson_id, _kind in _entries:
+            modules[module] = modules.get(module, 0) + 1
+    lookups = stats["hits"] + stats["misses"]
+    stats.update(
+        {
+            "enabled": LESSON_CONTENT_CACHE_ENABLED,
+            "entries": entries,
+            "max_entries": LESSON_CONTENT_CACHE_MAX_ENTRIES,
+            "ttl_seconds": LESSON_CONTENT_TTL_SECONDS,
+            "hit_ratio": round(stats["hits"] / lookups, 4) if lookups else 0.0,
+            "approx_mb": round(stats["bytes"] / (1024 * 1024), 3),
+            "modules": modules,
+        }
+    )
+    return stats
+
+
+add_notification_handler(LESSON_CONTENT_CHANNEL, _on_notification)
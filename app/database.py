@@ -1,5 +1,516 @@
+import contextvars
 import os
+import sys
+import threading
+import time
+from collections import deque
+
 import psycopg2
+import psycopg2.extensions
+import psycopg2.pool
+
+
+# =========================
+# Pool config
+# =========================
+# DB_POOL_ENABLED=0 restores the old one-connect-per-call behaviour.
+DB_POOL_ENABLED = os.getenv("DB_POOL_ENABLED", "1").strip().lower() not in {"0", "false", "no"}
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+# Connection budget. Each process opens up to DB_POOL_MAX_SIZE (this pool)
+# + DB_ASYNC_POOL_MAX_SIZE (app.database_async) + 1 (the entitlement
+# listener's own connection), and every uvicorn worker (WEB_CONCURRENCY) is a
+# process. By default the pools split DB_MAX_CONNECTIONS, this service's share
+# of the server's max_connections, evenly between the workers: a quarter of a
+# process's share to the async pool, one for the listener, the rest to this
+# pool. 40 lets a rolling restart run two generations of workers under a stock
+# max_connections=100, with room left for the reserved superuser slots and
+# migrations. Setting the pool sizes overrides the split; keep
+# WEB_CONCURRENCY * (DB_POOL_MAX_SIZE + DB_ASYNC_POOL_MAX_SIZE + 1) within it.
+DB_MAX_CONNECTIONS = int(os.getenv("DB_MAX_CONNECTIONS", "40"))
+WEB_CONCURRENCY = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+DB_PROCESS_CONNECTIONS = max(8, DB_MAX_CONNECTIONS // WEB_CONCURRENCY)
+DB_LISTENER_CONNECTIONS = 1
+DB_ASYNC_POOL_DEFAULT_MAX_SIZE = max(2, DB_PROCESS_CONNECTIONS // 4)
+DB_POOL_MAX_SIZE = int(
+    os.getenv(
+        "DB_POOL_MAX_SIZE",
+        str(DB_PROCESS_CONNECTIONS - DB_ASYNC_POOL_DEFAULT_MAX_SIZE - DB_LISTENER_CONNECTIONS),
+    )
+)
+# Sync endpoints run on AnyIO's worker threadpool. A handler can hold its
+# request connection and a nested get_connection() at the same time, so the
+# pool needs two connections per worker thread, plus a few for the background
+# threads (the attempt flusher). configure_threadpool() caps the threads to
+# what DB_POOL_MAX_SIZE can serve; otherwise busy workers wait on each other
+# until the checkout times out.
+THREADPOOL_SIZE = max(1, int(os.getenv("THREADPOOL_SIZE", "20")))
+DB_POOL_BACKGROUND_CONNECTIONS = 2
+DB_POOL_TIMEOUT_SECONDS = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "10"))
+DB_POOL_MAX_LIFETIME_SECONDS = float(os.getenv("DB_POOL_MAX_LIFETIME_SECONDS", "1800"))
+DB_POOL_HEALTHCHECK_IDLE_SECONDS = float(os.getenv("DB_POOL_HEALTHCHECK_IDLE_SECONDS", "30"))
+
+
+class PoolTimeoutError(psycopg2.pool.PoolError):
+    pass
+
+
+# =========================
+# Per-request accounting
+# =========================
+# Holds a mutable {"connections": n, "queries": n} dict while a request is in
+# flight. The dict is shared (not copied) into threadpool workers, so sync
+# endpoints and dependencies all count into the same bucket.
+_request_db_stats: contextvars.ContextVar[dict | None] = contextvars.ContextVar(
+    "request_db_stats", default=None
+)
+
+
+def begin_request_db_stats():
+    return _request_db_stats.set({"connections": 0, "queries": 0})
+
+
+def end_request_db_stats(token) -> dict:
+    stats = _request_db_stats.get() or {"connections": 0, "queries": 0}
+    _request_db_stats.reset(token)
+    return stats
+
+
+def get_request_db_stats() -> dict | None:
+    return _request_db_stats.get()
+
+
+def _count_request_db(key: str, amount: int = 1) -> None:
+    stats = _request_db_stats.get()
+    if stats is not None:
+        stats[key] = stats.get(key, 0) + amount
+
+
+class CountingCursor(psycopg2.extensions.cursor):
+    def execute(self, query, vars=None):
+        _count_request_db("queries")
+        return super().execute(query, vars)
+
+    def executemany(self, query, vars_list):
+        _count_request_db("queries")
+        return super().executemany(query, vars_list)
+
+
+def _connect():
+    return psycopg2.connect(os.environ["DATABASE_URL"], cursor_factory=CountingCursor)
+
+
+class _PoolEntry:
+    __slots__ = ("conn", "created_at", "last_used_at")
+
+    def __init__(self, conn):
+        now = time.monotonic()
+        self.conn = conn
+        self.created_at = now
+        self.last_used_at = now
+
+
+class PooledConnection:
+    """
+    Thin proxy over a psycopg2 connection.
+    close() hands the socket back to the pool instead of closing it.
+    """
+
+    __slots__ = ("_pool", "_entry")
+
+    def __init__(self, pool, entry):
+        object.__setattr__(self, "_pool", pool)
+        object.__setattr__(self, "_entry", entry)
+
+    def _raw(self):
+        entry = self._entry
+        if entry is None:
+            raise psycopg2.InterfaceError("connection already closed")
+        return entry.conn
+
+    def close(self):
+        entry = self._entry
+        if entry is None:
+            return
+        object.__setattr__(self, "_entry", None)
+        self._pool._release(entry)
+
+    @property
+    def closed(self):
+        entry = self._entry
+        return 1 if entry is None else entry.conn.closed
+
+    def __getattr__(self, name):
+        return getattr(self._raw(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._raw(), name, value)
+
+    def __enter__(self):
+        self._raw().__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return self._raw().__exit__(exc_type, exc, tb)
+
+    def __del__(self):
+        # Safety net for call sites that never call close().
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """
+    Bounded, thread-safe psycopg2 pool.
+
+    - min_size connections are kept warm, at most max_size are ever open.
+    - checkout blocks up to timeout seconds when the pool is exhausted.
+    - idle connections are pinged before reuse and recycled after max_lifetime.
+    """
+
+    def __init__(
+        self,
+        connect=_connect,
+        *,
+        min_size: int = DB_POOL_MIN_SIZE,
+        max_size: int = DB_POOL_MAX_SIZE,
+        timeout: float = DB_POOL_TIMEOUT_SECONDS,
+        max_lifetime: float = DB_POOL_MAX_LIFETIME_SECONDS,
+        healthcheck_idle: float = DB_POOL_HEALTHCHECK_IDLE_SECONDS,
+    ):
+        self._connect = connect
+        self.min_size = max(0, int(min_size))
+        self.max_size = max(1, int(max_size), self.min_size)
+        self.timeout = float(timeout)
+        self.max_lifetime = float(max_lifetime)
+        self.healthcheck_idle = float(healthcheck_idle)
+
+        self._lock = threading.RLock()
+        self._available = threading.Condition(self._lock)
+        self._idle: deque[_PoolEntry] = deque()
+        self._open_count = 0
+        self._in_use = 0
+        self._waiting = 0
+        self._stats = {
+            "checkouts": 0,
+            "connections_opened": 0,
+            "connections_closed": 0,
+            "healthcheck_failures": 0,
+            "lifetime_recycles": 0,
+            "timeouts": 0,
+            "wait_count": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0,
+        }
+
+    # -------------------------
+    # Checkout / release
+    # -------------------------
+    def getconn(self) -> PooledConnection:
+        started_at = time.monotonic()
+        waited = False
+        while True:
+            entry = None
+            should_open = False
+            with self._lock:
+                if self._idle:
+                    entry = self._idle.pop()
+                    self._in_use += 1
+                elif self._open_count < self.max_size:
+                    self._open_count += 1
+                    self._in_use += 1
+                    should_open = True
+                else:
+                    remaining = self.timeout - (time.monotonic() - started_at)
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise PoolTimeoutError(
+                            f"Timed out after {self.timeout:.1f}s waiting for a database connection "
+                            f"(max_size={self.max_size})"
+                        )
+                    waited = True
+                    self._waiting += 1
+                    try:
+                        self._available.wait(remaining)
+                    finally:
+                        self._waiting -= 1
+                    continue
+
+            if should_open:
+                try:
+                    entry = self._open_entry()
+                except Exception:
+                    with self._lock:
+                        self._open_count -= 1
+                        self._in_use -= 1
+                        self._available.notify()
+                    raise
+            elif not self._is_usable(entry):
+                self._discard(entry, in_use=True)
+                continue
+
+            self._record_checkout(time.monotonic() - started_at if waited else 0.0, waited)
+            return PooledConnection(self, entry)
+
+    def _release(self, entry: _PoolEntry) -> None:
+        conn = entry.conn
+        reusable = not conn.closed
+        if reusable:
+            try:
+                # Matches psycopg2 close(): uncommitted work is discarded.
+                if conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+                if conn.autocommit:
+                    conn.autocommit = False
+            except Exception:
+                reusable = False
+
+        if not reusable or self._is_expired(entry):
+            self._discard(entry, in_use=True)
+            return
+
+        entry.last_used_at = time.monotonic()
+        with self._lock:
+            self._in_use -= 1
+            self._idle.append(entry)
+            self._available.notify()
+
+    # -------------------------
+    # Lifecycle helpers
+    # -------------------------
+    def _open_entry(self) -> _PoolEntry:
+        entry = _PoolEntry(self._connect())
+        with self._lock:
+            self._stats["connections_opened"] += 1
+        return entry
+
+    def _is_expired(self, entry: _PoolEntry) -> bool:
+        if self.max_lifetime <= 0:
+            return False
+        if time.monotonic() - entry.created_at < self.max_lifetime:
+            return False
+        with self._lock:
+            self._stats["lifetime_recycles"] += 1
+        return True
+
+    def _is_usable(self, entry: _PoolEntry) -> bool:
+        conn = entry.conn
+        if conn.closed or self._is_expired(entry):
+            return False
+        if time.monotonic() - entry.last_used_at < self.healthcheck_idle:
+            return True
+        try:
+            cur = conn.cursor()
+            try:
+                cur.execute("SELECT 1")
+                cur.fetchone()
+            finally:
+                cur.close()
+            conn.rollback()
+            return True
+        except Exception:
+            with self._lock:
+                self._stats["healthcheck_failures"] += 1
+            return False
+
+    def _discard(self, entry: _PoolEntry, *, in_use: bool) -> None:
+        try:
+            entry.conn.close()
+        except Exception:
+            pass
+        with self._lock:
+            self._open_count -= 1
+            if in_use:
+                self._in_use -= 1
+            self._stats["connections_closed"] += 1
+            self._available.notify()
+
+    def _record_checkout(self, wait_seconds: float, waited: bool) -> None:
+        with self._lock:
+            self._stats["checkouts"] += 1
+            if waited:
+                self._stats["wait_count"] += 1
+                self._stats["wait_seconds_total"] += wait_seconds
+                self._stats["wait_seconds_max"] = max(self._stats["wait_seconds_max"], wait_seconds)
+
+    def warm(self) -> None:
+        """Open connections until min_size are available."""
+        while True:
+            with self._lock:
+                if self._open_count >= self.min_size:
+                    return
+                self._open_count += 1
+            try:
+                entry = self._open_entry()
+            except Exception:
+                with self._lock:
+                    self._open_count -= 1
+                raise
+            with self._lock:
+                self._idle.append(entry)
+                self._available.notify()
+
+    def closeall(self) -> None:
+        with self._lock:
+            idle_entries = list(self._idle)
+            self._idle.clear()
+        for entry in idle_entries:
+            self._discard(entry, in_use=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update(
+                {
+                    "min_size": self.min_size,
+                    "max_size": self.max_size,
+                    "open": self._open_count,
+                    "in_use": self._in_use,
+                    "idle": len(self._idle),
+                    "waiting": self._waiting,
+                }
+            )
+        checkouts = stats["checkouts"]
+        stats["wait_seconds_avg"] = round(stats["wait_seconds_total"] / checkouts, 6) if checkouts else 0.0
+        stats["wait_seconds_total"] = round(stats["wait_seconds_total"], 6)
+        stats["wait_seconds_max"] = round(stats["wait_seconds_max"], 6)
+        return stats
+
+
+_pool: ConnectionPool | None = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool()
+    return _pool
+
+
+def get_pool_stats() -> dict:
+    if not DB_POOL_ENABLED:
+        return {"enabled": False}
+    stats = get_pool().stats()
+    stats["enabled"] = True
+    return stats
+
+
+def close_pool() -> None:
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.closeall()
+
+
+def configure_threadpool() -> int:
+    """
+    Cap AnyIO's default thread limiter (sync endpoints, run_in_threadpool) so
+    every worker thread can hold two pooled connections. Call from the event
+    loop at startup. Returns the thread count.
+    """
+    import anyio.to_thread
+
+    threads = THREADPOOL_SIZE
+    if DB_POOL_ENABLED:
+        threads = max(1, min(threads, (DB_POOL_MAX_SIZE - DB_POOL_BACKGROUND_CONNECTIONS) // 2))
+    anyio.to_thread.current_default_thread_limiter().total_tokens = threads
+    return threads
+
 
 def get_connection():
-    return psycopg2.connect(os.environ["DATABASE_URL"])
+    _count_request_db("connections")
+    # Sync code running under app.database_async.run_sync_async() gets a
+    # connection from the async pool so it never blocks the event loop.
+    bridge = sys.modules.get("app.database_async")
+    if bridge is not None and bridge.in_async_bridge():
+        return bridge.get_bridged_connection()
+    return get_psycopg2_connection()
+
+
+def get_psycopg2_connection():
+    """
+    A psycopg2 connection (pooled when the pool is enabled), even under the
+    async bridge: for background work such as the attempt queue's flushes,
+    which must not run on the request's event loop connection.
+    """
+    if not DB_POOL_ENABLED:
+        return _connect()
+    return get_pool().getconn()
+
+
+class RequestConnection:
+    """
+    Connection handle for get_request_connection().
+
+    Nothing is taken from the pool until the first attribute access, so a
+    request that is served entirely from caches never touches Postgres.
+    """
+
+    __slots__ = ("_conn",)
+
+    def __init__(self):
+        object.__setattr__(self, "_conn", None)
+
+    def _checkout(self):
+        conn = self._conn
+        if conn is None:
+            conn = get_connection()
+            object.__setattr__(self, "_conn", conn)
+        return conn
+
+    @property
+    def checked_out(self) -> bool:
+        return self._conn is not None
+
+    def release(self, *, commit: bool) -> None:
+        conn = self._conn
+        if conn is None:
+            return
+        object.__setattr__(self, "_conn", None)
+        try:
+            if commit:
+                conn.commit()
+            else:
+                conn.rollback()
+        finally:
+            conn.close()
+
+    def __getattr__(self, name):
+        return getattr(self._checkout(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._checkout(), name, value)
+
+
+def get_request_connection():
+    """
+    FastAPI dependency: one connection and one transaction per request.
+
+    FastAPI caches dependencies per request, so every
+    Depends(get_request_connection, scope="function") in the same request (auth,
+    access checks, the endpoint itself) gets the same connection. Pass it down
+    through the existing conn=None parameters; helpers that receive a conn leave
+    commit/close to this dependency.
+
+    Always declare it with scope="function": the commit then runs before the
+    response is sent, so a failed commit is a 500 instead of a 200 for a write
+    that was rolled back, and the client's next request sees the write. The
+    cache key includes the scope, so a site without it would get a second
+    connection.
+
+    The connection is checked out lazily on first use. Commits when the endpoint
+    returns cleanly, rolls back if it raised.
+    """
+    conn = RequestConnection()
+    try:
+        yield conn
+    except Exception:
+        conn.release(commit=False)
+        raise
+    else:
+        conn.release(commit=True)
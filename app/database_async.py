@@ -0,0 +1,352 @@
+"""
+Async counterpart to app.database.
+
+- get_async_connection() checks a connection out of a psycopg (v3) async pool.
+- get_async_request_connection() is the async twin of get_request_connection().
+- run_sync_async() runs existing sync code (engines, repositories, sync
+  endpoints) on the event loop. Inside it, cursor calls on a bridged
+  connection suspend the calling coroutine instead of blocking a threadpool
+  worker, and app.database.get_connection() hands out bridged connections from
+  the async pool. That lets a module move to async routes without rewriting
+  its SQL or selection logic.
+
+The bridge is greenlet based: the sync code runs in a child greenlet and every
+await is handed back to the parent coroutine.
+"""
+
+import contextvars
+import io
+import os
+import sys
+
+import greenlet
+import psycopg
+import psycopg2
+import psycopg2.errors
+import psycopg2.extras
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool
+
+from app.database import (
+    DB_ASYNC_POOL_DEFAULT_MAX_SIZE,
+    DB_POOL_MAX_LIFETIME_SECONDS,
+    DB_POOL_MIN_SIZE,
+    DB_POOL_TIMEOUT_SECONDS,
+    _count_request_db,
+)
+
+
+# =========================
+# Async pool config
+# =========================
+DB_ASYNC_POOL_MIN_SIZE = int(os.getenv("DB_ASYNC_POOL_MIN_SIZE", str(DB_POOL_MIN_SIZE)))
+# Defaults to this process's share of the connection budget (app.database).
+DB_ASYNC_POOL_MAX_SIZE = int(os.getenv("DB_ASYNC_POOL_MAX_SIZE", str(DB_ASYNC_POOL_DEFAULT_MAX_SIZE)))
+DB_ASYNC_POOL_TIMEOUT_SECONDS = float(os.getenv("DB_ASYNC_POOL_TIMEOUT_SECONDS", str(DB_POOL_TIMEOUT_SECONDS)))
+
+# Comma separated practice modules served by the async routes,
+# e.g. ASYNC_PRACTICE_MODULES=spelling,math. Empty keeps everything on the sync path.
+ASYNC_PRACTICE_MODULES = {
+    module.strip().lower()
+    for module in os.getenv("ASYNC_PRACTICE_MODULES", "").split(",")
+    if module.strip()
+}
+
+
+# =========================
+# Sync -> async bridge
+# =========================
+class _BridgeGreenlet(greenlet.greenlet):
+    pass
+
+
+def in_async_bridge() -> bool:
+    return isinstance(greenlet.getcurrent(), _BridgeGreenlet)
+
+
+def await_only(awaitable):
+    current = greenlet.getcurrent()
+    if not isinstance(current, _BridgeGreenlet):
+        raise RuntimeError("await_only() called outside run_sync_async()")
+    return current.parent.switch(awaitable)
+
+
+async def run_sync_async(func, *args, **kwargs):
+    bridge = _BridgeGreenlet(func, greenlet.getcurrent())
+    # Keep request-scoped contextvars (DB counters) visible to the sync code.
+    bridge.gr_context = contextvars.copy_context()
+
+    result = bridge.switch(*args, **kwargs)
+    while not bridge.dead:
+        try:
+            value = await result
+        except BaseException:
+            result = bridge.throw(*sys.exc_info())
+        else:
+            result = bridge.switch(value)
+    return result
+
+
+# psycopg (v3) DBAPI classes, most specific first, and their psycopg2 twins.
+_DBAPI_ERRORS = (
+    "IntegrityError",
+    "DataError",
+    "OperationalError",
+    "ProgrammingError",
+    "NotSupportedError",
+    "InternalError",
+    "InterfaceError",
+    "DatabaseError",
+    "Error",
+)
+
+
+def translate_error(exc: psycopg.Error) -> psycopg2.Error:
+    """
+    The psycopg2 exception repository code expects for a psycopg error: the
+    SQLSTATE's class from psycopg2.errors when there is one, else the matching
+    DBAPI class. pgcode is read-only on psycopg2 errors, so it stays None; the
+    psycopg error (with .sqlstate) is chained as __cause__.
+    """
+    error_class = None
+    if getattr(exc, "sqlstate", None):
+        try:
+            error_class = psycopg2.errors.lookup(exc.sqlstate)
+        except KeyError:
+            error_class = None
+    if error_class is None:
+        name = next(name for name in _DBAPI_ERRORS if isinstance(exc, getattr(psycopg, name)))
+        error_class = getattr(psycopg2, name)
+    return error_class(str(exc))
+
+
+def _bridge_call(awaitable):
+    """await_only() with psycopg errors raised as their psycopg2 equivalents."""
+    try:
+        return await_only(awaitable)
+    except psycopg.Error as exc:
+        raise translate_error(exc) from exc
+
+
+class AsyncBridgeCursor:
+    """psycopg2-style cursor over a psycopg AsyncClientCursor."""
+
+    __slots__ = ("_cur", "connection")
+
+    def __init__(self, cur, connection):
+        self._cur = cur
+        self.connection = connection
+
+    def execute(self, query, vars=None):
+        _count_request_db("queries")
+        _bridge_call(self._cur.execute(query, vars))
+
+    def executemany(self, query, vars_list):
+        _count_request_db("queries")
+        _bridge_call(self._cur.executemany(query, vars_list))
+
+    def mogrify(self, query, vars=None) -> bytes:
+        # Client-side cursors interpolate without a round trip; psycopg2 returns bytes.
+        try:
+            return self._cur.mogrify(query, vars).encode("utf-8")
+        except psycopg.Error as exc:
+            raise translate_error(exc) from exc
+
+    def copy_expert(self, sql, file, size=8192):
+        _count_request_db("queries")
+        _bridge_call(self._copy(sql, file, size))
+
+    async def _copy(self, sql, file, size):
+        async with self._cur.copy(sql) as copy:
+            if "FROM STDIN" in sql.upper():
+                while True:
+                    data = file.read(size)
+                    if not data:
+                        break
+                    await copy.write(data)
+            else:
+                text = isinstance(file, io.TextIOBase)
+                async for data in copy:
+                    file.write(bytes(data).decode("utf-8") if text else bytes(data))
+
+    def fetchone(self):
+        return _bridge_call(self._cur.fetchone())
+
+    def fetchmany(self, size=None):
+        return _bridge_call(self._cur.fetchmany(size or self._cur.arraysize))
+
+    def fetchall(self):
+        return _bridge_call(self._cur.fetchall())
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    @property
+    def rowcount(self):
+        return self._cur.rowcount
+
+    @property
+    def description(self):
+        return self._cur.description
+
+    def close(self):
+        _bridge_call(self._cur.close())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class AsyncBridgeConnection:
+    """
+    Pooled psycopg AsyncConnection with a psycopg2-style sync surface:
+    cursor() (plain or RealDictCursor), commit(), rollback(), close(),
+    get_transaction_status(), and cursors with mogrify() and copy_expert().
+    psycopg errors surface as psycopg2 exceptions (translate_error()).
+
+    The sync methods only work inside run_sync_async(); coroutines use
+    acommit()/arollback()/aclose().
+    """
+
+    __slots__ = ("_pool", "_aconn")
+
+    def __init__(self, pool, aconn):
+        self._pool = pool
+        self._aconn = aconn
+
+    def _raw(self):
+        if self._aconn is None:
+            raise psycopg2.InterfaceError("connection already closed")
+        return self._aconn
+
+    @property
+    def closed(self):
+        return 1 if self._aconn is None else int(self._aconn.closed)
+
+    @property
+    def autocommit(self):
+        return self._raw().autocommit
+
+    @autocommit.setter
+    def autocommit(self, value):
+        _bridge_call(self._raw().set_autocommit(value))
+
+    def cursor(self, cursor_factory=None):
+        if cursor_factory is None:
+            return AsyncBridgeCursor(self._raw().cursor(), self)
+        if cursor_factory is psycopg2.extras.RealDictCursor:
+            return AsyncBridgeCursor(self._raw().cursor(row_factory=dict_row), self)
+        raise TypeError(f"cursor_factory={cursor_factory.__name__} is not supported on bridged connections")
+
+    def get_transaction_status(self) -> int:
+        # psycopg's TransactionStatus values are psycopg2's TRANSACTION_STATUS_* constants.
+        return int(self._raw().info.transaction_status)
+
+    def commit(self):
+        _bridge_call(self.acommit())
+
+    def rollback(self):
+        _bridge_call(self.arollback())
+
+    def close(self):
+        _bridge_call(self.aclose())
+
+    async def acommit(self):
+        await self._raw().commit()
+
+    async def arollback(self):
+        await self._raw().rollback()
+
+    async def aclose(self):
+        aconn = self._aconn
+        if aconn is None:
+            return
+        self._aconn = None
+        try:
+            # Same contract as PooledConnection: uncommitted work is discarded.
+            if aconn.info.transaction_status != psycopg.pq.TransactionStatus.IDLE:
+                await aconn.rollback()
+            if aconn.autocommit:
+                await aconn.set_autocommit(False)
+        except Exception:
+            pass
+        await self._pool.putconn(aconn)
+
+
+# =========================
+# Async pool
+# =========================
+_async_pool: AsyncConnectionPool | None = None
+
+
+def get_async_pool() -> AsyncConnectionPool:
+    global _async_pool
+    if _async_pool is None:
+        _async_pool = AsyncConnectionPool(
+            os.environ["DATABASE_URL"],
+            min_size=max(0, DB_ASYNC_POOL_MIN_SIZE),
+            max_size=max(1, DB_ASYNC_POOL_MAX_SIZE, DB_ASYNC_POOL_MIN_SIZE),
+            timeout=DB_ASYNC_POOL_TIMEOUT_SECONDS,
+            max_lifetime=DB_POOL_MAX_LIFETIME_SECONDS,
+            # Client-side binding keeps psycopg2 query semantics (%s, literal %%).
+            kwargs={"cursor_factory": psycopg.AsyncClientCursor},
+            open=False,
+        )
+    return _async_pool
+
+
+async def open_async_pool() -> AsyncConnectionPool:
+    pool = get_async_pool()
+    if pool.closed:
+        await pool.open()
+    return pool
+
+
+async def close_async_pool() -> None:
+    global _async_pool
+    pool, _async_pool = _async_pool, None
+    if pool is not None and not pool.closed:
+        await pool.close()
+
+
+def get_async_pool_stats() -> dict:
+    if _async_pool is None or _async_pool.closed:
+        return {"enabled": False, "modules": sorted(ASYNC_PRACTICE_MODULES)}
+    stats = _async_pool.get_stats()
+    stats.update({"enabled": True, "modules": sorted(ASYNC_PRACTICE_MODULES)})
+    return stats
+
+
+async def _checkout() -> AsyncBridgeConnection:
+    pool = await open_async_pool()
+    aconn = await pool.getconn()
+    return AsyncBridgeConnection(pool, aconn)
+
+
+async def get_async_connection() -> AsyncBridgeConnection:
+    _count_request_db("connections")
+    return await _checkout()
+
+
+def get_bridged_connection() -> AsyncBridgeConnection:
+    """get_connection() inside run_sync_async(); app.database counts the checkout."""
+    return await_only(_checkout())
+
+
+async def get_async_request_connection():
+    """
+    Async twin of app.database.get_request_connection(). Declare it with
+    Depends(get_async_request_connection, scope="function") everywhere, so the
+    commit finishes before the response is sent.
+    """
+    conn = await get_async_connection()
+    try:
+        yield conn
+        await conn.acommit()
+    except Exception:
+        await conn.arollback()
+        raise
+    finally:
+        await conn.aclose()
@@ -0,0 +1,418 @@
+"""
+Per-member entitlement cache.
+
+One snapshot per member holds app codes (member_apps), mock test access
+(math_user_test_access) and active owned products (member_product_access)
+so the access gates in app.entitlements, app.auth, app.product_catalog and the
+practice routers stop resolving the member and re-reading those tables on
+every call.
+
+Invalidation:
+- invalidate_member_entitlements() drops the local entry and, when given the
+  writer's cursor, sends a NOTIFY on ENTITLEMENT_CACHE_CHANNEL in the same
+  transaction. Until that transaction ends, loads in this worker read the
+  tables but do not cache what they read (it may predate the commit), so the
+  old entitlements are not cached again, with or without the listener.
+- start_entitlement_listener() LISTENs on that channel from a background
+  thread so every uvicorn worker drops the member once the write commits.
+- ENTITLEMENT_CACHE_TTL_SECONDS bounds staleness if a notification is missed.
+
+Other process-local caches can ride on the same listener connection with
+add_notification_handler().
+"""
+
+from __future__ import annotations
+
+import os
+import select
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+import psycopg2
+import psycopg2.extensions
+
+from app.database import get_connection
+
+
+ENTITLEMENT_CACHE_ENABLED = os.getenv("ENTITLEMENT_CACHE_ENABLED", "1").strip().lower() not in {"0", "false", "no"}
+ENTITLEMENT_CACHE_TTL_SECONDS = float(os.getenv("ENTITLEMENT_CACHE_TTL_SECONDS", "60"))
+ENTITLEMENT_CACHE_MAX_ENTRIES = int(os.getenv("ENTITLEMENT_CACHE_MAX_ENTRIES", "10000"))
+ENTITLEMENT_CACHE_LISTEN = os.getenv("ENTITLEMENT_CACHE_LISTEN", "1").strip().lower() not in {"0", "false", "no"}
+ENTITLEMENT_CACHE_CHANNEL = os.getenv("ENTITLEMENT_CACHE_CHANNEL", "kiaro_entitlements")
+
+# NOTIFY payload is "<member_id>|<email>"; both empty drops everything.
+
+
+@dataclass(frozen=True)
+class MemberEntitlements:
+    member_id: int
+    app_codes: frozenset[str] = frozenset()
+    mock_test_ids: frozenset[str] = frozenset()
+    # Active owned product_code -> product_family ("" when not in the catalog).
+    product_families: dict[str, str] = field(default_factory=dict)
+
+    def owned_product_codes(self, families: set[str] | None = None) -> set[str]:
+        if not families:
+            return set(self.product_families)
+        return {code for code, family in self.product_families.items() if family in families}
+
+
+class _TTLCache:
+    def __init__(self, *, ttl: float, max_entries: int):
+        self.ttl = float(ttl)
+        self.max_entries = max(1, int(max_entries))
+        self._lock = threading.Lock()
+        self._entries: OrderedDict = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                self._entries.pop(key, None)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def pop(self, key) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def drop_where(self, predicate) -> None:
+        with self._lock:
+            for key in [key for key, (_, value) in self._entries.items() if predicate(value)]:
+                self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_members = _TTLCache(ttl=ENTITLEMENT_CACHE_TTL_SECONDS, max_entries=ENTITLEMENT_CACHE_MAX_ENTRIES)
+# normalized email -> member ids with that email, ascending.
+_member_ids_by_email = _TTLCache(ttl=ENTITLEMENT_CACHE_TTL_SECONDS, max_entries=ENTITLEMENT_CACHE_MAX_ENTRIES)
+_invalidation_hooks: list = []
+# channel -> callbacks(payload | None); None means notifications may have been missed.
+_notification_handlers: dict[str, list] = {}
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "invalidations": 0, "notifications": 0}
+# Bumped by every drop; a load only caches when no drop happened while it ran.
+_generation = 0
+# ("member", id) / ("email", email) / _ALL_KEYS -> [(writer connection, give-up time)]
+# for invalidations whose transaction may not have committed yet.
+_open_writes: dict[tuple, list] = {}
+_open_writes_lock = threading.Lock()
+_ALL_KEYS = ("all",)
+
+
+def _count(key: str) -> None:
+    with _stats_lock:
+        _stats[key] += 1
+
+
+def add_invalidation_hook(callback) -> None:
+    """callback(member_id | None) runs on every local or notified invalidation; None means all."""
+    _invalidation_hooks.append(callback)
+
+
+def add_notification_handler(channel: str, callback) -> None:
+    """LISTEN on channel from the listener thread and call callback(payload) per notification."""
+    _notification_handlers.setdefault(channel, []).append(callback)
+
+
+def _in_transaction(conn) -> bool:
+    try:
+        return not conn.closed and conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE
+    except Exception:
+        # Closed or unusable: its transaction is over either way.
+        return False
+
+
+def _track_write(keys: list[tuple], cur) -> None:
+    conn = getattr(cur, "connection", None)
+    if conn is None:
+        return
+    # A pooled connection may be idle-in-transaction for unrelated work later; give up after a TTL.
+    give_up_at = time.monotonic() + ENTITLEMENT_CACHE_TTL_SECONDS
+    with _open_writes_lock:
+        for key in keys:
+            _open_writes.setdefault(key, []).append((conn, give_up_at))
+
+
+def _write_in_flight(key: tuple) -> bool:
+    """True while a transaction that invalidated key (or everything) may still be uncommitted."""
+    now = time.monotonic()
+    in_flight = False
+    with _open_writes_lock:
+        for write_key in (key, _ALL_KEYS):
+            writes = [
+                (conn, give_up_at)
+                for conn, give_up_at in _open_writes.get(write_key, ())
+                if give_up_at > now and _in_transaction(conn)
+            ]
+            if writes:
+                _open_writes[write_key] = writes
+                in_flight = True
+            else:
+                _open_writes.pop(write_key, None)
+    return in_flight
+
+
+def _drop_member(member_id: int | None) -> None:
+    global _generation
+    _generation += 1
+    if member_id is None:
+        _members.clear()
+        _member_ids_by_email.clear()
+    else:
+        _members.pop(member_id)
+        _member_ids_by_email.drop_where(lambda member_ids: member_id in member_ids)
+    for callback in _invalidation_hooks:
+        callback(member_id)
+
+
+def _drop_local(member_id: int | None, email: str) -> None:
+    if member_id is not None:
+        _drop_member(member_id)
+    if email:
+        for cached_member_id in _member_ids_by_email.get(email) or ():
+            _drop_member(cached_member_id)
+        _member_ids_by_email.pop(email)
+    if member_id is None and not email:
+        _drop_member(None)
+
+
+def invalidate_member_entitlements(member_id: int | None = None, *, email: str | None = None, cur=None) -> None:
+    """
+    Drop cached entitlements for member_id and/or email (including the
+    email -> member mapping, e.g. after a member is created).
+
+    Pass the writing transaction's cursor to notify the other workers; the
+    NOTIFY is only delivered if that transaction commits. With neither
+    member_id nor email every entry is dropped.
+    """
+    member_id = int(member_id) if member_id is not None else None
+    normalized_email = str(email or "").strip().lower()
+    _count("invalidations")
+    if cur is not None:
+        # Before the drop, so no load can cache between the two.
+        keys = [("member", member_id)] if member_id is not None else []
+        keys += [("email", normalized_email)] if normalized_email else []
+        _track_write(keys or [_ALL_KEYS], cur)
+    _drop_local(member_id, normalized_email)
+
+    if cur is not None and ENTITLEMENT_CACHE_ENABLED:
+        payload = f"{member_id if member_id is not None else ''}|{normalized_email}"
+        cur.execute("SELECT pg_notify(%s, %s)", (ENTITLEMENT_CACHE_CHANNEL, payload))
+
+
+MEMBER_IDS_FOR_EMAIL_SQL = """
+    SELECT id
+    FROM kiaro_membership.members
+    WHERE LOWER(email) = LOWER(%s)
+    ORDER BY id ASC
+"""
+
+
+def get_member_ids_for_email(email: str | None, conn=None) -> tuple[int, ...]:
+    normalized_email = str(email or "").strip().lower()
+    if not normalized_email:
+        return ()
+    if ENTITLEMENT_CACHE_ENABLED:
+        cached = _member_ids_by_email.get(normalized_email)
+        if cached is not None:
+            return cached
+    generation = _generation
+    cacheable = not _write_in_flight(("email", normalized_email))
+
+    owns_connection = conn is None
+    if owns_connection:
+        conn = get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute(MEMBER_IDS_FOR_EMAIL_SQL, (normalized_email,))
+        member_ids = tuple(int(row[0]) for row in (cur.fetchall() or []) if row and row[0] is not None)
+    finally:
+        cur.close()
+        if owns_connection:
+            conn.close()
+
+    if ENTITLEMENT_CACHE_ENABLED and cacheable and generation == _generation:
+        _member_ids_by_email.put(normalized_email, member_ids)
+    return member_ids
+
+
+def get_member_entitlements(member_id: int, conn=None) -> MemberEntitlements:
+    member_id = int(member_id)
+    if ENTITLEMENT_CACHE_ENABLED:
+        cached = _members.get(member_id)
+        if cached is not None:
+            _count("hits")
+            return cached
+    _count("misses")
+    generation = _generation
+    cacheable = not _write_in_flight(("member", member_id))
+
+    owns_connection = conn is None
+    if owns_connection:
+        conn = get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            """
+            SELECT
+                ARRAY(
+                    SELECT DISTINCT LOWER(app_code)
+                    FROM kiaro_membership.member_apps
+                    WHERE member_id = %s
+                ),
+                ARRAY(
+                    SELECT DISTINCT test_id
+                    FROM math_user_test_access
+                    WHERE member_id = %s
+                ),
+                ARRAY(
+                    SELECT mpa.product_code || '|' || COALESCE(p.product_family, '')
+                    FROM member_product_access mpa
+                    LEFT JOIN catalog_products p
+                      ON p.product_code = mpa.product_code
+                    WHERE mpa.member_id = %s
+                      AND mpa.status = 'active'
+                )
+            """,
+            (member_id, member_id, member_id),
+        )
+        app_codes, mock_test_ids, products = cur.fetchone()
+    finally:
+        cur.close()
+        if owns_connection:
+            conn.close()
+
+    product_families = {}
+    for item in products or []:
+        code, _, family = str(item).partition("|")
+        if code.strip():
+            product_families[code.strip().upper()] = family
+
+    entitlements = MemberEntitlements(
+        member_id=member_id,
+        app_codes=frozenset(str(code).strip().lower() for code in (app_codes or []) if code),
+        mock_test_ids=frozenset(str(test_id) for test_id in (mock_test_ids or []) if test_id),
+        product_families=product_families,
+    )
+    if ENTITLEMENT_CACHE_ENABLED and cacheable and generation == _generation:
+        _members.put(member_id, entitlements)
+    return entitlements
+
+
+def get_entitlement_cache_stats() -> dict:
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats["hits"] + stats["misses"]
+    stats.update(
+        {
+            "enabled": ENTITLEMENT_CACHE_ENABLED,
+            "members": len(_members),
+            "emails": len(_member_ids_by_email),
+            "ttl_seconds": ENTITLEMENT_CACHE_TTL_SECONDS,
+            "hit_ratio": round(stats["hits"] / lookups, 4) if lookups else 0.0,
+            "listener": _listener.is_running() if _listener else False,
+        }
+    )
+    return stats
+
+
+# =========================
+# LISTEN/NOTIFY
+# =========================
+class _EntitlementListener(threading.Thread):
+    """Background LISTEN on a dedicated (non-pooled) connection."""
+
+    def __init__(self):
+        super().__init__(name="entitlement-cache-listener", daemon=True)
+        self._stop_event = threading.Event()
+        self._conn = None
+
+    def is_running(self) -> bool:
+        return self.is_alive() and self._conn is not None and not self._conn.closed
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    def _listen(self) -> None:
+        self._conn = psycopg2.connect(os.environ["DATABASE_URL"])
+        self._conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        cur = self._conn.cursor()
+        cur.execute(f'LISTEN "{ENTITLEMENT_CACHE_CHANNEL}"')
+        for channel in _notification_handlers:
+            cur.execute(f'LISTEN "{channel}"')
+        cur.close()
+        # Anything written while we were not listening may be cached stale.
+        _drop_member(None)
+        for callbacks in _notification_handlers.values():
+            for callback in callbacks:
+                callback(None)
+
+        while not self._stop_event.is_set():
+            if select.select([self._conn], [], [], 5) == ([], [], []):
+                continue
+            self._conn.poll()
+            while self._conn.notifies:
+                notify = self._conn.notifies.pop(0)
+                if notify.channel != ENTITLEMENT_CACHE_CHANNEL:
+                    for callback in _notification_handlers.get(notify.channel, ()):
+                        callback(notify.payload)
+                    continue
+                _count("notifications")
+                raw_member_id, _, email = (notify.payload or "").partition("|")
+                raw_member_id = raw_member_id.strip()
+                _drop_local(int(raw_member_id) if raw_member_id.isdigit() else None, email.strip().lower())
+
+    def run(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                self._listen()
+            except Exception as e:
+                print("entitlement cache listener error:", e)
+                self._stop_event.wait(5)
+            finally:
+                if self._conn is not None:
+                    try:
+                        self._conn.close()
+                    except Exception:
+                        pass
+                    self._conn = None
+
+
+_listener: _EntitlementListener | None = None
+
+
+def start_entitlement_listener() -> bool:
+    global _listener
+    if not (ENTITLEMENT_CACHE_ENABLED and ENTITLEMENT_CACHE_LISTEN):
+        return False
+    if _listener is None or not _listener.is_alive():
+        _listener = _EntitlementListener()
+        _listener.start()
+    return True
+
+
+def stop_entitlement_listener() -> None:
+    global _listener
+    listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
@@ -1,9 +1,20 @@
 from __future__ import annotations
 
+import os
 import re
+import threading
+import time
+from collections import OrderedDict
 from fastapi import HTTPException
+from psycopg2.extras import execute_values
 
 from app.database import get_connection
+from app.entitlement_cache import (
+    add_invalidation_hook,
+    get_member_entitlements,
+    get_member_ids_for_email,
+    invalidate_member_entitlements,
+)
 from app.product_catalog import get_current_printable_catalog, get_owned_product_codes_for_email
 
 
@@ -129,6 +140,10 @@ MATHS_PAPER_CODE_TO_KEY = {
 }
 
 
+ENTITLEMENT_VERSION_TTL_SECONDS = float(os.getenv("ENTITLEMENT_VERSION_TTL_SECONDS", "30"))
+ENTITLEMENT_VERSION_CACHE_MAX_ENTRIES = int(os.getenv("ENTITLEMENT_VERSION_CACHE_MAX_ENTRIES", "10000"))
+
+
 def _normalize_codes(codes: str | list[str] | tuple[str, ...] | set[str]) -> set[str]:
     if isinstance(codes, str):
         return {codes.strip().lower()} if codes.strip() else set()
@@ -139,12 +154,13 @@ def _is_admin_user(user: dict | None) -> bool:
     return str((user or {}).get("role", "")).strip().lower() == "admin"
 
 
-def _resolve_member_id(cur, user: dict | None) -> int | None:
+def _resolve_member_id(user: dict | None, conn=None) -> int | None:
     if not user:
         return None
 
     raw_member_id = user.get("member_id")
     email = str(user.get("sub") or user.get("email") or "").strip().lower()
+    member_ids = get_member_ids_for_email(email, conn=conn) if email else ()
 
     if raw_member_id:
         try:
@@ -154,35 +170,185 @@ def _resolve_member_id(cur, user: dict | None) -> int | None:
         if member_id is not None:
             if not email:
                 return member_id
-            cur.execute(
-                """
-                SELECT id
-                FROM kiaro_membership.members
-                WHERE id = %s
-                  AND LOWER(email) = LOWER(%s)
-                LIMIT 1
-                """,
-                (member_id, email),
+            # The token's member_id only counts while it still belongs to the email.
+            if member_id in member_ids:
+                return member_id
+
+    return member_ids[0] if member_ids else None
+
+
+# =========================
+# Entitlement versions
+# =========================
+# Access tokens carry a signed snapshot of the member's app codes ("apps")
+# stamped with the member's entitlement version ("ev"). Every write that
+# changes member_apps or mock access bumps the version in the same
+# transaction, so a token is only trusted while its stamp is current.
+class _EntitlementVersionCache:
+    """Per-process TTL/LRU of member_id -> entitlement version."""
+
+    def __init__(self, *, ttl: float, max_entries: int):
+        self.ttl = float(ttl)
+        self.max_entries = max(1, int(max_entries))
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[int, tuple[float, int]] = OrderedDict()
+
+    def get(self, member_id: int) -> int | None:
+        with self._lock:
+            entry = self._entries.get(member_id)
+            if entry is None:
+                return None
+            expires_at, version = entry
+            if expires_at <= time.monotonic():
+                self._entries.pop(member_id, None)
+                return None
+            self._entries.move_to_end(member_id)
+            return version
+
+    def put(self, member_id: int, version: int) -> None:
+        with self._lock:
+            self._entries[member_id] = (time.monotonic() + self.ttl, int(version))
+            self._entries.move_to_end(member_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def pop(self, member_id: int | None) -> None:
+        with self._lock:
+            if member_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(member_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_entitlement_versions = _EntitlementVersionCache(
+    ttl=ENTITLEMENT_VERSION_TTL_SECONDS,
+    max_entries=ENTITLEMENT_VERSION_CACHE_MAX_ENTRIES,
+)
+# Other workers' bumps arrive through the entitlement cache's NOTIFY.
+add_invalidation_hook(_entitlement_versions.pop)
+
+
+def init_entitlement_version_table() -> None:
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS kiaro_membership.member_entitlement_versions (
+                member_id INTEGER PRIMARY KEY,
+                version BIGINT NOT NULL DEFAULT 0,
+                updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
             )
-            row = cur.fetchone()
-            if row:
-                return int(row[0])
+            """
+        )
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
 
-    if not email:
-        return None
 
+def bump_entitlement_version(cur, member_id: int) -> int:
+    """Invalidate every token snapshot of member_id. Call inside the writing transaction."""
     cur.execute(
         """
-        SELECT id
-        FROM kiaro_membership.members
-        WHERE LOWER(email) = LOWER(%s)
-        ORDER BY id ASC
-        LIMIT 1
+        INSERT INTO kiaro_membership.member_entitlement_versions (member_id, version, updated_at)
+        VALUES (%s, 1, NOW())
+        ON CONFLICT (member_id)
+        DO UPDATE SET
+            version = kiaro_membership.member_entitlement_versions.version + 1,
+            updated_at = NOW()
+        RETURNING version
+        """,
+        (member_id,),
+    )
+    version = int(cur.fetchone()[0])
+    invalidate_member_entitlements(member_id, cur=cur)
+    # Recording the new version before commit is safe: until then it only
+    # sends older stamps to the database check.
+    _entitlement_versions.put(int(member_id), version)
+    return version
+
+
+def get_entitlement_version(member_id: int, conn=None) -> int:
+    member_id = int(member_id)
+    cached = _entitlement_versions.get(member_id)
+    if cached is not None:
+        return cached
+
+    owns_connection = conn is None
+    if owns_connection:
+        conn = get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            """
+            SELECT version
+            FROM kiaro_membership.member_entitlement_versions
+            WHERE member_id = %s
+            """,
+            (member_id,),
+        )
+        row = cur.fetchone()
+    finally:
+        cur.close()
+        if owns_connection:
+            conn.close()
+
+    version = int(row[0]) if row else 0
+    _entitlement_versions.put(member_id, version)
+    return version
+
+
+def build_entitlement_claims(cur, member_id: int | None) -> dict:
+    """Token claims for member_id: {"ev": version, "apps": [app codes]}."""
+    if not member_id:
+        return {}
+    cur.execute(
+        """
+        SELECT
+            COALESCE(
+                (
+                    SELECT version
+                    FROM kiaro_membership.member_entitlement_versions
+                    WHERE member_id = %s
+                ),
+                0
+            ),
+            ARRAY(
+                SELECT DISTINCT LOWER(app_code)
+                FROM kiaro_membership.member_apps
+                WHERE member_id = %s
+                ORDER BY 1
+            )
         """,
-        (email,),
+        (member_id, member_id),
     )
-    row = cur.fetchone()
-    return int(row[0]) if row else None
+    version, app_codes = cur.fetchone()
+    return {"ev": int(version), "apps": list(app_codes or [])}
+
+
+def token_member_app_codes(user: dict | None, conn=None) -> set[str] | None:
+    """
+    App codes signed into the user's token, or None when the token has no
+    snapshot or its entitlement version is stale.
+
+    Only grants should be trusted from the snapshot; callers fall back to the
+    database when the snapshot does not contain the code they need.
+    """
+    if not user or user.get("ev") is None or not user.get("member_id"):
+        return None
+    try:
+        token_version = int(user["ev"])
+        member_id = int(user["member_id"])
+    except (TypeError, ValueError):
+        return None
+    if get_entitlement_version(member_id, conn=conn) != token_version:
+        return None
+    return _normalize_codes(user.get("apps") or [])
 
 
 def _extract_permalink_from_url(url_value: str | None) -> str:
@@ -257,6 +423,226 @@ def _resolve_printable_or_active_key(product_name: str, product_permalink: str,
     return None
 
 
+# =========================
+# Materialized printable purchase state
+# =========================
+# member_printable_state holds, per (email, product key), the outcome of
+# replaying that email's math_gumroad_events in id order. The webhook applies
+# each event in its own transaction; rebuild_member_printable_state() replays
+# from scratch (backfill, or after the permalink/key maps above change).
+# Startup only creates the table: printable_state_backfill.py fills it, as a
+# deploy step run before the first release that reads it.
+def init_member_printable_state_table() -> None:
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS member_printable_state (
+                email TEXT NOT NULL,
+                product_key TEXT NOT NULL,
+                is_active BOOLEAN NOT NULL,
+                permalink TEXT,
+                last_event_id INTEGER NOT NULL,
+                updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                PRIMARY KEY (email, product_key)
+            )
+            """
+        )
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+
+
+def _printable_event_entry(product_name: str | None) -> tuple[str | None, str]:
+    payload = str(product_name or "")
+    permalink_match = re.search(r"permalink=([A-Za-z0-9_-]+)", payload)
+    permalink = (permalink_match.group(1).lower() if permalink_match else "")
+    base_name = payload.split("|", 1)[0].strip()
+    return _resolve_printable_or_active_key(base_name, permalink, ""), permalink
+
+
+def _replay_printable_events(rows) -> dict[str, dict]:
+    """(product_name, event_type, id) rows in id order -> {key: {is_active, permalink, last_event_id}}."""
+    state: dict[str, dict] = {}
+    for product_name, event_type, event_id in rows:
+        key, permalink = _printable_event_entry(product_name)
+        if not key:
+            continue
+        if _is_purchase_event_type(event_type):
+            entry = state.setdefault(key, {"is_active": True, "permalink": None, "last_event_id": event_id})
+            entry["is_active"] = True
+            if permalink:
+                entry["permalink"] = permalink
+        elif _is_refund_event_type(event_type):
+            entry = state.setdefault(key, {"is_active": False, "permalink": None, "last_event_id": event_id})
+            entry["is_active"] = False
+        else:
+            continue
+        entry["last_event_id"] = event_id
+    return state
+
+
+def apply_printable_event(cur, *, email: str, product_name: str | None, event_type: str | None, event_id: int) -> None:
+    """Fold one math_gumroad_events row into member_printable_state (same transaction as the insert)."""
+    normalized_email = str(email or "").strip().lower()
+    key, permalink = _printable_event_entry(product_name)
+    if not normalized_email or not key:
+        return
+    if _is_purchase_event_type(event_type):
+        is_active = True
+    elif _is_refund_event_type(event_type):
+        is_active = False
+    else:
+        return
+
+    # Events committed out of order must not undo a later one.
+    cur.execute(
+        """
+        INSERT INTO member_printable_state (email, product_key, is_active, permalink, last_event_id, updated_at)
+        VALUES (%s, %s, %s, %s, %s, NOW())
+        ON CONFLICT (email, product_key) DO UPDATE
+        SET
+            is_active = EXCLUDED.is_active,
+            permalink = COALESCE(EXCLUDED.permalink, member_printable_state.permalink),
+            last_event_id = EXCLUDED.last_event_id,
+            updated_at = NOW()
+        WHERE member_printable_state.last_event_id < EXCLUDED.last_event_id
+        """,
+        (normalized_email, key, is_active, (permalink or None) if is_active else None, int(event_id)),
+    )
+
+
+PRINTABLE_EVENTS_FOR_EMAIL_SQL = """
+    SELECT LOWER(TRIM(email)), product_name, event_type, id
+    FROM math_gumroad_events
+    WHERE LOWER(TRIM(email)) = LOWER(TRIM(%s))
+    ORDER BY id ASC
+"""
+
+
+def _load_printable_events_by_email(cur, email: str | None) -> dict[str, list]:
+    # LOWER(TRIM()) to key rows the way apply_printable_event() normalizes them.
+    if email:
+        cur.execute(PRINTABLE_EVENTS_FOR_EMAIL_SQL, (email,))
+    else:
+        cur.execute(
+            """
+            SELECT LOWER(TRIM(email)), product_name, event_type, id
+            FROM math_gumroad_events
+            WHERE COALESCE(TRIM(email), '') <> ''
+            ORDER BY LOWER(TRIM(email)), id ASC
+            """
+        )
+    rows_by_email: dict[str, list] = {}
+    for row_email, product_name, event_type, event_id in cur.fetchall() or []:
+        rows_by_email.setdefault(row_email, []).append((product_name, event_type, event_id))
+    return rows_by_email
+
+
+def rebuild_member_printable_state(email: str | None = None, conn=None) -> int:
+    """Replay math_gumroad_events into member_printable_state for one email or everyone. Returns rows written."""
+    normalized_email = str(email or "").strip().lower() or None
+    owns_connection = conn is None
+    if owns_connection:
+        conn = get_connection()
+    cur = conn.cursor()
+    try:
+        # Webhook upserts wait for the rebuild, then apply on top of it.
+        cur.execute("LOCK TABLE member_printable_state IN EXCLUSIVE MODE")
+        rows_by_email = _load_printable_events_by_email(cur, normalized_email)
+
+        if normalized_email:
+            cur.execute("DELETE FROM member_printable_state WHERE email = %s", (normalized_email,))
+        else:
+            cur.execute("DELETE FROM member_printable_state")
+
+        values = [
+            (row_email, key, entry["is_active"], entry["permalink"], entry["last_event_id"])
+            for row_email, rows in rows_by_email.items()
+            for key, entry in _replay_printable_events(rows).items()
+        ]
+        if values:
+            execute_values(
+                cur,
+                """
+                INSERT INTO member_printable_state (email, product_key, is_active, permalink, last_event_id)
+                VALUES %s
+                """,
+                values,
+                page_size=500,
+            )
+        if owns_connection:
+            conn.commit()
+        return len(values)
+    except Exception:
+        if owns_connection:
+            conn.rollback()
+        raise
+    finally:
+        cur.close()
+        if owns_connection:
+            conn.close()
+
+
+def check_member_printable_state(email: str | None = None, conn=None) -> list[dict]:
+    """Compare member_printable_state with a full replay; returns one entry per mismatching email."""
+    normalized_email = str(email or "").strip().lower() or None
+    owns_connection = conn is None
+    if owns_connection:
+        conn = get_connection()
+    cur = conn.cursor()
+    try:
+        rows_by_email = _load_printable_events_by_email(cur, normalized_email)
+        if normalized_email:
+            cur.execute(
+                """
+                SELECT email, product_key, permalink
+                FROM member_printable_state
+                WHERE email = %s
+                  AND is_active
+                """,
+                (normalized_email,),
+            )
+        else:
+            cur.execute(
+                """
+                SELECT email, product_key, permalink
+                FROM member_printable_state
+                WHERE is_active
+                """
+            )
+        stored: dict[str, dict[str, str | None]] = {}
+        for row_email, key, permalink in cur.fetchall() or []:
+            stored.setdefault(row_email, {})[key] = permalink
+    finally:
+        cur.close()
+        if owns_connection:
+            conn.close()
+
+    mismatches = []
+    for row_email in sorted(set(rows_by_email) | set(stored)):
+        expected = {
+            key: entry["permalink"]
+            for key, entry in _replay_printable_events(rows_by_email.get(row_email, [])).items()
+            if entry["is_active"]
+        }
+        actual = stored.get(row_email, {})
+        if expected != actual:
+            mismatches.append(
+                {
+                    "email": row_email,
+                    "missing": sorted(set(expected) - set(actual)),
+                    "unexpected": sorted(set(actual) - set(expected)),
+                    "permalink_mismatch": sorted(
+                        key for key in set(expected) & set(actual) if expected[key] != actual[key]
+                    ),
+                }
+            )
+    return mismatches
+
+
 def get_printable_purchase_state_for_email(user_email: str | None) -> tuple[set[str], set[str]]:
     email = str(user_email or "").strip().lower()
     if not email:
@@ -267,10 +653,10 @@ def get_printable_purchase_state_for_email(user_email: str | None) -> tuple[set[
     try:
         cur.execute(
             """
-            SELECT product_name, event_type, id
-            FROM math_gumroad_events
-            WHERE LOWER(email) = LOWER(%s)
-            ORDER BY id ASC
+            SELECT product_key, permalink
+            FROM member_printable_state
+            WHERE email = %s
+              AND is_active
             """,
             (email,),
         )
@@ -279,29 +665,11 @@ def get_printable_purchase_state_for_email(user_email: str | None) -> tuple[set[
         cur.close()
         conn.close()
 
-    is_active_by_key: dict[str, bool] = {}
-    permalink_by_key: dict[str, str] = {}
-
-    for product_name, event_type, _event_id in rows:
-        payload = str(product_name or "")
-        permalink_match = re.search(r"permalink=([A-Za-z0-9_-]+)", payload)
-        permalink = (permalink_match.group(1).lower() if permalink_match else "")
-        base_name = payload.split("|", 1)[0].strip()
-        key = _resolve_printable_or_active_key(base_name, permalink, "")
-        if not key:
-            continue
-        if _is_purchase_event_type(event_type):
-            is_active_by_key[key] = True
-            if permalink:
-                permalink_by_key[key] = permalink
-        elif _is_refund_event_type(event_type):
-            is_active_by_key[key] = False
-
-    purchased_keys = {key for key, active in is_active_by_key.items() if active}
+    purchased_keys = {key for key, _permalink in rows}
     purchased_permalinks = {
-        permalink_by_key[key]
-        for key in purchased_keys
-        if key.startswith("printable_") and permalink_by_key.get(key)
+        permalink
+        for key, permalink in rows
+        if key.startswith("printable_") and permalink
     }
 
     owned_product_codes = get_owned_product_codes_for_email(
@@ -328,29 +696,11 @@ def email_has_printable_key_access(user_email: str | None, product_key: str) ->
     return product_key in purchased_keys
 
 
-def get_member_app_codes_for_user(user: dict | None) -> set[str]:
-    conn = get_connection()
-    cur = conn.cursor()
-    try:
-        member_id = _resolve_member_id(cur, user)
-        if not member_id:
-            return set()
-        cur.execute(
-            """
-            SELECT app_code
-            FROM kiaro_membership.member_apps
-            WHERE member_id = %s
-            """,
-            (member_id,),
-        )
-        return {
-            str(row[0]).strip().lower()
-            for row in (cur.fetchall() or [])
-            if row and row[0]
-        }
-    finally:
-        cur.close()
-        conn.close()
+def get_member_app_codes_for_user(user: dict | None, conn=None) -> set[str]:
+    member_id = _resolve_member_id(user, conn=conn)
+    if not member_id:
+        return set()
+    return set(get_member_entitlements(member_id, conn=conn).app_codes)
 
 
 def user_has_member_app_access(user: dict | None, required_codes: str | list[str] | tuple[str, ...] | set[str], *, allow_admin: bool = True) -> bool:
@@ -359,6 +709,8 @@ def user_has_member_app_access(user: dict | None, required_codes: str | list[str
         return False
     if allow_admin and _is_admin_user(user):
         return True
+    if required.intersection(token_member_app_codes(user) or ()):
+        return True
     user_codes = get_member_app_codes_for_user(user)
     return bool(user_codes.intersection(required))
 
@@ -369,37 +721,10 @@ def email_has_member_app_access(user_email: str | None, required_codes: str | li
     if not email or not required:
         return False
 
-    conn = get_connection()
-    cur = conn.cursor()
-    try:
-        cur.execute(
-            """
-            SELECT m.id
-            FROM kiaro_membership.members m
-            WHERE LOWER(m.email) = LOWER(%s)
-            ORDER BY m.id ASC
-            LIMIT 1
-            """,
-            (email,),
-        )
-        row = cur.fetchone()
-        if not row:
-            return False
-        member_id = int(row[0])
-        cur.execute(
-            """
-            SELECT 1
-            FROM kiaro_membership.member_apps
-            WHERE member_id = %s
-              AND app_code = ANY(%s)
-            LIMIT 1
-            """,
-            (member_id, list(required)),
-        )
-        return cur.fetchone() is not None
-    finally:
-        cur.close()
-        conn.close()
+    member_ids = get_member_ids_for_email(email)
+    if not member_ids:
+        return False
+    return bool(get_member_entitlements(member_ids[0]).app_codes.intersection(required))
 
 
 def require_member_app_access(
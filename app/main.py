@@ -1,14 +1,51 @@
+import json
 import os
 import re
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi import FastAPI, Request, HTTPException, Depends, Body
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 #from fastapi.security import OAuth2PasswordBearer
-from app.auth import get_current_user, resolve_verified_learning_user_id
+from app.passwords import (
+    get_password_hashing_stats,
+    hash_password,
+    verify_and_update_password_async,
+    verify_password,
+)
+from app.auth import (
+    MEMBER_ID_FOR_EMAIL_SQL,
+    get_current_user,
+    get_identity_cache_stats,
+    invalidate_identity,
+    resolve_member_id,
+    resolve_verified_learning_user_id,
+)
 from pydantic import BaseModel, EmailStr
-from app.database import get_connection
+from app.attempt_queue import (
+    flush_attempts,
+    get_attempt_queue_stats,
+    start_attempt_flusher,
+    stop_attempt_flusher,
+)
+from app.database import (
+    DB_POOL_ENABLED,
+    begin_request_db_stats,
+    close_pool,
+    configure_threadpool,
+    end_request_db_stats,
+    get_connection,
+    get_pool,
+    get_pool_stats,
+    get_request_connection,
+)
+from app.database_async import (
+    ASYNC_PRACTICE_MODULES,
+    close_async_pool,
+    get_async_pool_stats,
+    open_async_pool,
+)
 from app.database_init_words import init_words_tables
 from datetime import datetime, timedelta
-from passlib.context import CryptContext
 from jose import jwt, JWTError
 from app.admin.ingestion_router import printable_router
 from app.admin.ingestion_router import router as admin_ingestion_router
@@ -16,19 +53,45 @@ from app.admin.branding_router import router as admin_branding_router
 from app.admin.curriculum_router import router as admin_curriculum_router
 from app.practice.router import admin_router as practice_admin_router
 from app.practice.router import router as practice_router
+from app.practice.async_router import ASYNC_PRACTICE_ROUTERS
 from app.practice.grammar_router import router as grammar_router
 from app.practice.math_test_engine import init_math_submission_tables
 from app.repositories.nvr_init import init_nvr_tables
+from app.repositories.activity_repository import get_activity_streak, init_user_activity_tables
+from app.repositories.daily_attempts_repository import init_user_daily_attempts_table
+from app.services.engagement_service import init_user_engagement_table
+from app.repositories.module_rollup_repository import get_user_module_rollup, init_user_module_rollup_table
+from app.repositories.mastery_repository import (
+    REPORT_MODULES,
+    decode_report_cursor,
+    encode_report_cursor,
+    init_user_lesson_mastery_table,
+    iter_student_mastery_report,
+)
 from app.ingestion.english_printable.service import init_english_paper_printable_tables
 from app.ingestion.verbal_reasoning.service import init_verbal_reasoning_printable_tables
 from typing import Optional
 from app.comprehension.router import router as comprehension_router
 from app.auth_reset import init_password_reset_tables, router as auth_reset_router
-from app.practice.synonym_engine import get_synonym_attempt_summary
+from app.content_cache import get_lesson_content_stats, invalidate_lesson_content
+from app.question_prefetch import get_question_prefetch_stats
+from app.practice.spelling_engine import get_spelling_answer_stats
+from app.schema_registry import get_schema_registry_stats, get_table_columns, refresh_schema_registry
+from app.entitlement_cache import (
+    get_entitlement_cache_stats,
+    invalidate_member_entitlements,
+    start_entitlement_listener,
+    stop_entitlement_listener,
+)
 from app.entitlements import (
     ACTIVE_MATH_MOCK_PERMALINK_TEST_ID,
     ACTIVE_ONLINE_PRACTICE_PERMALINK_APP_CODE,
     DISABLED_OR_IGNORED_PERMALINKS,
+    apply_printable_event,
+    build_entitlement_claims,
+    bump_entitlement_version,
+    init_entitlement_version_table,
+    init_member_printable_state_table,
     normalize_gumroad_identifier,
     get_printable_purchase_state_for_email,
 )
@@ -48,10 +111,6 @@ JWT_SECRET = os.getenv("JWT_SECRET", "dev-secret-change-me")
 JWT_ALGO = "HS256"
 ACCESS_TOKEN_EXPIRE_HOURS = 2
 
-pwd_context = CryptContext(
-    schemes=["bcrypt", "pbkdf2_sha256"],
-    deprecated="auto"
-)
 #oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login")
 
 app = FastAPI()
@@ -59,6 +118,13 @@ app = FastAPI()
 
 @app.on_event("startup")
 def startup_event():
+    if DB_POOL_ENABLED:
+        try:
+            get_pool().warm()
+            print("database pool warmed")
+        except Exception as e:
+            print("database pool warm failed:", e)
+
     try:
         init_words_tables()
         print("✅ words tables initialized")
@@ -95,12 +161,143 @@ def startup_event():
     except Exception as e:
         print("product catalog init failed:", e)
 
+    try:
+        init_entitlement_version_table()
+        print("entitlement version table initialized")
+    except Exception as e:
+        print("entitlement version init failed:", e)
+
+    try:
+        conn = get_connection()
+        cur = conn.cursor()
+        try:
+            # Written by /login; added here once instead of on every login.
+            cur.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS last_login TIMESTAMPTZ")
+            conn.commit()
+        finally:
+            cur.close()
+            conn.close()
+    except Exception as e:
+        print("users.last_login init failed:", e)
+
+    try:
+        init_member_printable_state_table()
+        print("member printable state initialized")
+    except Exception as e:
+        print("member printable state init failed:", e)
+
+    try:
+        if start_entitlement_listener():
+            print("entitlement cache listener started")
+    except Exception as e:
+        print("entitlement cache listener failed:", e)
+
     try:
         init_nvr_tables()
         print("✅ NVR tables initialized")
     except Exception as e:
         print("❌ NVR init failed:", e)
 
+    try:
+        init_user_lesson_mastery_table()
+        print("user lesson mastery initialized")
+    except Exception as e:
+        print("user lesson mastery init failed:", e)
+
+    try:
+        init_user_module_rollup_table()
+        print("user module rollup initialized")
+    except Exception as e:
+        print("user module rollup init failed:", e)
+
+    try:
+        init_user_activity_tables()
+        print("user activity days initialized")
+    except Exception as e:
+        print("user activity days init failed:", e)
+
+    try:
+        init_user_daily_attempts_table()
+        print("user daily attempts initialized")
+    except Exception as e:
+        print("user daily attempts init failed:", e)
+
+    try:
+        init_user_engagement_table()
+        print("user engagement initialized")
+    except Exception as e:
+        print("user engagement init failed:", e)
+
+    # Last, so it sees every table the init functions above created.
+    try:
+        stats = refresh_schema_registry()
+        print("schema registry loaded:", stats["tables"], "tables")
+    except Exception as e:
+        print("schema registry load failed:", e)
+
+    try:
+        if start_attempt_flusher():
+            print("attempt write-behind queue started")
+    except Exception as e:
+        print("attempt write-behind queue start failed:", e)
+
+
+@app.on_event("startup")
+async def startup_threadpool():
+    try:
+        threads = configure_threadpool()
+        print("worker threadpool sized to", threads, "threads")
+    except Exception as e:
+        print("worker threadpool sizing failed:", e)
+
+
+@app.on_event("startup")
+async def startup_async_pool():
+    if not ASYNC_PRACTICE_MODULES:
+        return
+    try:
+        await open_async_pool()
+        print("async database pool opened for:", ", ".join(sorted(ASYNC_PRACTICE_MODULES)))
+    except Exception as e:
+        print("async database pool open failed:", e)
+
+
+@app.on_event("shutdown")
+def shutdown_event():
+    stop_entitlement_listener()
+    # Before the pool closes: the queue's last flush needs a connection.
+    stop_attempt_flusher()
+    close_pool()
+
+
+@app.on_event("shutdown")
+async def shutdown_async_pool():
+    await close_async_pool()
+
+
+# =========================
+# Per-request DB accounting
+# =========================
+DB_REQUEST_STATS_LOG = os.getenv("DB_REQUEST_STATS_LOG", "0").strip().lower() in {"1", "true", "yes"}
+
+
+@app.middleware("http")
+async def db_request_stats_middleware(request: Request, call_next):
+    token = begin_request_db_stats()
+    try:
+        response = await call_next(request)
+    finally:
+        stats = end_request_db_stats(token)
+
+    response.headers["X-DB-Connections"] = str(stats["connections"])
+    response.headers["X-DB-Queries"] = str(stats["queries"])
+    if DB_REQUEST_STATS_LOG:
+        print(
+            f"DB {request.method} {request.url.path} "
+            f"connections={stats['connections']} queries={stats['queries']}"
+        )
+    return response
+
 # =========================
 # CORS
 # =========================
@@ -113,6 +310,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 # =========================
 # Models
@@ -212,29 +410,33 @@ AVAILABLE_APP_CATALOG = [
 # =========================
 # Helpers
 # =========================
-def create_access_token(email: str, account_type: str, user_id: str | None = None):
+def create_access_token(
+    email: str,
+    account_type: str,
+    user_id: str | None = None,
+    member_id: int | None = None,
+    entitlement_claims: dict | None = None,
+):
     expire = datetime.utcnow() + timedelta(hours=ACCESS_TOKEN_EXPIRE_HOURS)
 
     payload = {
         "sub": email,
         "user_id": user_id,
         "account_type": account_type,
+        "iat": datetime.utcnow(),
         "exp": expire
     }
+    if member_id is not None:
+        payload["member_id"] = member_id
+    # {"ev", "apps"} from build_entitlement_claims(): lets requests authorize from the token.
+    if entitlement_claims:
+        payload.update(entitlement_claims)
 
     token = jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGO)
 
     return token, expire
 
 
-def verify_password(plain: str, hashed: str) -> bool:
-    return pwd_context.verify(plain, hashed)
-
-
-def hash_password(plain: str) -> str:
-    return pwd_context.hash(plain)
-
-
 #def get_current_user(token: str = Depends(oauth2_scheme)):
 #    try:
 #        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGO])
@@ -261,41 +463,8 @@ def derive_subscription_state(subscription_status: str | None, subscription_end)
     return False, subscription_status or "inactive"
 
 
-def _get_table_columns(cur, table_name: str) -> set[str]:
-    cur.execute(
-        """
-        SELECT column_name
-        FROM information_schema.columns
-        WHERE table_name = %s
-        """,
-        (table_name,),
-    )
-    return {row[0] for row in cur.fetchall()}
-
-
-def _fetch_attempt_accuracy(cur, table_name: str, user_id: int, *, user_columns: list[str], correct_columns: list[str]):
-    columns = _get_table_columns(cur, table_name)
-    matched_user_columns = [column for column in user_columns if column in columns]
-    matched_correct_column = next((column for column in correct_columns if column in columns), None)
-
-    if not matched_user_columns or not matched_correct_column:
-        return 0, 0.0
-
-    where_clause = " OR ".join(f"{column} = %s" for column in matched_user_columns)
-    params = tuple(user_id for _ in matched_user_columns)
-
-    cur.execute(
-        f"""
-        SELECT
-            COUNT(*),
-            COALESCE(AVG(CASE WHEN {matched_correct_column} THEN 1 ELSE 0 END) * 100, 0)
-        FROM {table_name}
-        WHERE {where_clause}
-        """,
-        params,
-    )
-    attempts, accuracy = cur.fetchone()
-    return attempts or 0, round(accuracy or 0, 2)
+def _get_table_columns(cur, table_name: str) -> frozenset[str]:
+    return get_table_columns(table_name, cur=cur)
 
 
 def _safe_completion_percent(completed_lessons: int, total_lessons: int) -> int:
@@ -308,181 +477,6 @@ def _first_matching_column(columns: set[str], candidates: list[str]) -> str | No
     return next((candidate for candidate in candidates if candidate in columns), None)
 
 
-def _fetch_spelling_completion(cur, user_id: int):
-    cur.execute(
-        """
-        SELECT COUNT(*)
-        FROM spelling_lessons
-        WHERE COALESCE(is_active, TRUE) = TRUE
-        """
-    )
-    total_lessons = cur.fetchone()[0] or 0
-
-    cur.execute(
-        """
-        SELECT COUNT(DISTINCT sa.lesson_id)
-        FROM spelling_attempts sa
-        JOIN spelling_lessons l
-          ON l.lesson_id = sa.lesson_id
-        WHERE sa.user_id = %s
-          AND sa.lesson_id IS NOT NULL
-          AND COALESCE(l.is_active, TRUE) = TRUE
-        """,
-        (user_id,),
-    )
-    completed_lessons = cur.fetchone()[0] or 0
-    return completed_lessons, total_lessons, _safe_completion_percent(completed_lessons, total_lessons)
-
-
-def _fetch_words_completion(cur, user_id: int):
-    words_lessons_columns = _get_table_columns(cur, "words_lessons")
-    has_words_is_active = "is_active" in words_lessons_columns
-    total_where = "WHERE COALESCE(is_active, TRUE) = TRUE" if has_words_is_active else ""
-    completed_where = "AND COALESCE(l.is_active, TRUE) = TRUE" if has_words_is_active else ""
-    attempt_table = None
-
-    if _get_table_columns(cur, "synonym_attempts"):
-        attempt_table = "synonym_attempts"
-    elif _get_table_columns(cur, "words_attempts"):
-        attempt_table = "words_attempts"
-
-    cur.execute(f"SELECT COUNT(*) FROM words_lessons {total_where}")
-    total_lessons = cur.fetchone()[0] or 0
-
-    if not attempt_table:
-        return 0, total_lessons, _safe_completion_percent(0, total_lessons)
-
-    cur.execute(
-        f"""
-        SELECT COUNT(DISTINCT lw.lesson_id)
-        FROM {attempt_table} wa
-        JOIN words_lesson_words lw
-          ON lw.word_id = wa.word_id
-        JOIN words_lessons l
-          ON l.id = lw.lesson_id
-        WHERE wa.user_id = %s
-        {completed_where}
-        """,
-        (user_id,),
-    )
-    completed_lessons = cur.fetchone()[0] or 0
-    return completed_lessons, total_lessons, _safe_completion_percent(completed_lessons, total_lessons)
-
-
-def _fetch_math_completion(cur, user_id: int):
-    math_lessons_columns = _get_table_columns(cur, "math_lessons")
-    math_attempts_columns = _get_table_columns(cur, "math_attempts")
-    lesson_pk_column = _first_matching_column(math_lessons_columns, ["lesson_id", "id"])
-    has_is_active = "is_active" in math_lessons_columns
-    user_columns = [column for column in ("student_id", "user_id") if column in math_attempts_columns]
-
-    if not math_lessons_columns:
-        return 0, 0, 0
-
-    cur.execute(
-        f"""
-        SELECT COUNT(*)
-        FROM math_lessons
-        {"WHERE COALESCE(is_active, TRUE) = TRUE" if has_is_active else ""}
-        """
-    )
-    total_lessons = cur.fetchone()[0] or 0
-
-    if "lesson_id" not in math_attempts_columns or not user_columns:
-        return 0, total_lessons, _safe_completion_percent(0, total_lessons)
-
-    where_clause = " OR ".join(f"ma.{column} = %s" for column in user_columns)
-    params = tuple(user_id for _ in user_columns)
-
-    if lesson_pk_column:
-        join_clause = f"JOIN math_lessons ml ON ml.{lesson_pk_column} = ma.lesson_id"
-        active_clause = "AND COALESCE(ml.is_active, TRUE) = TRUE" if has_is_active else ""
-    else:
-        join_clause = ""
-        active_clause = ""
-
-    cur.execute(
-        f"""
-        SELECT COUNT(DISTINCT ma.lesson_id)
-        FROM math_attempts ma
-        {join_clause}
-        WHERE ({where_clause})
-          AND ma.lesson_id IS NOT NULL
-          {active_clause}
-        """,
-        params,
-    )
-    completed_lessons = cur.fetchone()[0] or 0
-    return completed_lessons, total_lessons, _safe_completion_percent(completed_lessons, total_lessons)
-
-
-def _fetch_comprehension_completion(cur, user_id: int):
-    cur.execute("SELECT COUNT(*) FROM comprehension_passages")
-    total_lessons = cur.fetchone()[0] or 0
-
-    cur.execute(
-        """
-        SELECT COUNT(DISTINCT passage_id)
-        FROM comprehension_attempts
-        WHERE user_id = %s
-          AND passage_id IS NOT NULL
-        """,
-        (user_id,),
-    )
-    completed_lessons = cur.fetchone()[0] or 0
-    return completed_lessons, total_lessons, _safe_completion_percent(completed_lessons, total_lessons)
-
-
-def _fetch_legacy_dashboard_attempts(cur, user_id: int):
-    cur.execute(
-        """
-        SELECT
-            COUNT(*) as attempts,
-            COALESCE(AVG(CASE WHEN correct THEN 1 ELSE 0 END) * 100, 0)
-        FROM spelling_attempts
-        WHERE user_id = %s
-        """,
-        (user_id,),
-    )
-    spelling_row = cur.fetchone() or (0, 0)
-    spelling_attempts = spelling_row[0] or 0
-    spelling_accuracy = round(spelling_row[1] or 0, 2)
-
-    words_summary = get_synonym_attempt_summary(user_id)
-
-    math_attempts, math_accuracy = _fetch_attempt_accuracy(
-        cur,
-        "math_attempts",
-        user_id,
-        user_columns=["student_id", "user_id"],
-        correct_columns=["is_correct", "correct"],
-    )
-
-    cur.execute(
-        """
-        SELECT
-            COUNT(*) as attempts,
-            COALESCE(AVG(CASE WHEN correct THEN 1 ELSE 0 END) * 100, 0)
-        FROM comprehension_attempts
-        WHERE user_id = %s
-        """,
-        (user_id,),
-    )
-    comprehension_row = cur.fetchone() or (0, 0)
-    comprehension_attempts = comprehension_row[0] or 0
-    comprehension_accuracy = round(comprehension_row[1] or 0, 2)
-
-    return {
-        "spelling": {"attempts": spelling_attempts, "accuracy": spelling_accuracy},
-        "words": {
-            "attempts": words_summary.get("attempts", 0) or 0,
-            "accuracy": round(words_summary.get("accuracy", 0) or 0, 2),
-        },
-        "math": {"attempts": math_attempts or 0, "accuracy": round(math_accuracy or 0, 2)},
-        "comprehension": {"attempts": comprehension_attempts, "accuracy": comprehension_accuracy},
-    }
-
-
 def get_available_app_catalog():
     return AVAILABLE_APP_CATALOG
 
@@ -542,6 +536,7 @@ def _resolve_member_for_admin_update(cur, *, raw_member_id: str, raw_email: str)
 
 
 def _replace_member_apps(cur, member_id: int, normalized_apps: list[str]):
+    bump_entitlement_version(cur, member_id)
     cur.execute(
         """
         DELETE FROM kiaro_membership.member_apps
@@ -561,6 +556,7 @@ def _replace_member_apps(cur, member_id: int, normalized_apps: list[str]):
 
 
 def _add_member_apps(cur, member_id: int, normalized_apps: list[str]):
+    bump_entitlement_version(cur, member_id)
     for app_code in normalized_apps:
         cur.execute(
             """
@@ -573,6 +569,7 @@ def _add_member_apps(cur, member_id: int, normalized_apps: list[str]):
 
 
 def _remove_member_apps(cur, member_id: int, normalized_apps: list[str]):
+    bump_entitlement_version(cur, member_id)
     for app_code in normalized_apps:
         cur.execute(
             """
@@ -613,32 +610,131 @@ def health_check():
         }
 
 
+@app.get("/admin/db-pool")
+def get_db_pool_stats(user=Depends(get_current_user)):
+    if user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    stats = get_pool_stats()
+    stats["async"] = get_async_pool_stats()
+    return stats
+
+
+@app.get("/admin/identity-cache")
+def get_identity_cache(user=Depends(get_current_user)):
+    if user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    return get_identity_cache_stats()
+
+
+@app.get("/admin/entitlement-cache")
+def get_entitlement_cache(user=Depends(get_current_user)):
+    if user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    return get_entitlement_cache_stats()
+
+
+@app.get("/admin/password-hashing")
+def get_password_hashing(user=Depends(get_current_user)):
+    if user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    return get_password_hashing_stats()
+
+
+@app.get("/admin/schema-registry")
+def get_schema_registry(user=Depends(get_current_user)):
+    if user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    return get_schema_registry_stats()
+
+
+@app.post("/admin/schema-registry/refresh")
+def post_schema_registry_refresh(user=Depends(get_current_user)):
+    if user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    return refresh_schema_registry(broadcast=True)
+
+
+@app.get("/admin/spelling-answer-timings")
+def get_spelling_answer_timings(user=Depends(get_current_user)):
+    if user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    return get_spelling_answer_stats()
+
+
+@app.get("/admin/lesson-content-cache")
+def get_lesson_content_cache(user=Depends(get_current_user)):
+    if user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    return get_lesson_content_stats()
+
+
+@app.post("/admin/lesson-content-cache/invalidate")
+def post_lesson_content_cache_invalidate(module: str, lesson_id: int | None = None, user=Depends(get_current_user)):
+    if user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    invalidate_lesson_content(module, lesson_id)
+    return get_lesson_content_stats()
+
+
+@app.get("/admin/question-prefetch")
+def get_question_prefetch(user=Depends(get_current_user)):
+    if user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    return get_question_prefetch_stats()
+
+
+@app.get("/admin/attempt-queue")
+def get_attempt_queue(user=Depends(get_current_user)):
+    if user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    return get_attempt_queue_stats()
+
+
+@app.post("/admin/attempt-queue/flush")
+def post_attempt_queue_flush(user=Depends(get_current_user)):
+    if user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    if not flush_attempts():
+        raise HTTPException(status_code=503, detail="Attempt queue flush did not complete")
+    return get_attempt_queue_stats()
+
+
 # =========================
 # Auth: Register
 # =========================
+PENDING_GUMROAD_EVENTS_SQL = """
+    SELECT id, product_name, event_type
+    FROM math_gumroad_events
+    WHERE LOWER(email) = LOWER(%s)
+      AND COALESCE(processed, FALSE) = FALSE
+"""
+
+
 def _replay_pending_gumroad_grants(conn, cur, email: str) -> None:
     """Grant any app/product access for Gumroad purchases that arrived before the user registered."""
     try:
-        cur.execute(
-            """
-            SELECT id, product_name, event_type
-            FROM math_gumroad_events
-            WHERE LOWER(email) = LOWER(%s)
-              AND COALESCE(processed, FALSE) = FALSE
-            """,
-            (email,),
-        )
+        cur.execute(PENDING_GUMROAD_EVENTS_SQL, (email,))
         rows = cur.fetchall() or []
         if not rows:
             return
-        cur.execute(
-            "SELECT id FROM kiaro_membership.members WHERE LOWER(email) = LOWER(%s) ORDER BY id DESC LIMIT 1",
-            (email,),
-        )
+        cur.execute(MEMBER_ID_FOR_EMAIL_SQL, (email,))
         member_row = cur.fetchone()
         if not member_row:
             return
         member_id = member_row[0]
+        bump_entitlement_version(cur, member_id)
         for (event_id, product_name_raw, event_type) in rows:
             if not _is_purchase_event(event_type or ""):
                 continue
@@ -745,9 +841,34 @@ def register(req: RegisterRequest):
         _replay_pending_gumroad_grants(conn, cur, email)
     except Exception:
         pass
+
+    user_id = member_id = None
+    entitlement_claims = {}
+    try:
+        # Replay commits its own work; this only clears a transaction it left aborted.
+        conn.rollback()
+        user_id = resolve_verified_learning_user_id(cur, {"sub": email})
+        member_id = resolve_member_id(cur, {"sub": email})
+        entitlement_claims = build_entitlement_claims(cur, member_id)
+        # Workers may have cached "no member" for this email before it registered.
+        invalidate_member_entitlements(member_id, email=email, cur=cur)
+        conn.commit()
+    except Exception as e:
+        # The token still works without the stamp; identity is then resolved per request.
+        print("REGISTER TOKEN CLAIMS ERROR:", str(e))
+        conn.rollback()
+        user_id = member_id = None
+        entitlement_claims = {}
     cur.close()
     conn.close()
-    token, exp = create_access_token(email, "free")
+    invalidate_identity(email)
+    token, exp = create_access_token(
+        email,
+        "free",
+        user_id,
+        member_id=member_id,
+        entitlement_claims=entitlement_claims,
+    )
     return {
         "access_token": token,
         "token_type": "bearer",
@@ -779,107 +900,173 @@ async def login(request: Request):
     if not email or not password:
         raise HTTPException(status_code=400, detail="Missing credentials")
 
+    # Postgres work runs on the threadpool and bcrypt on the password hashing
+    # pool, so a login never blocks the event loop. One round trip reads
+    # everything the token needs; one more records the login.
+    login_state = await run_in_threadpool(_load_login_state, email)
+    if not login_state:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+
+    valid, new_password_hash = await verify_and_update_password_async(password, login_state["password_hash"])
+    if not valid:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+
+    if login_state["is_active"] is False:
+        raise HTTPException(status_code=403, detail="User is inactive")
+
+    return await run_in_threadpool(_complete_login, email, login_state, new_password_hash)
+
+
+LOGIN_STATE_SQL = """
+    SELECT
+        m.email,
+        m.password_hash,
+        m.account_type,
+        m.id,
+        u.user_id,
+        u.role,
+        u.is_active,
+        COALESCE(v.version, 0),
+        ARRAY(
+            SELECT DISTINCT LOWER(ma.app_code)
+            FROM kiaro_membership.member_apps ma
+            WHERE ma.member_id = m.id
+            ORDER BY 1
+        )
+    FROM (
+        SELECT id, email, password_hash, account_type
+        FROM kiaro_membership.members
+        WHERE LOWER(email) = LOWER(%s)
+        ORDER BY id DESC
+        LIMIT 1
+    ) m
+    LEFT JOIN LATERAL (
+        SELECT user_id, role, is_active
+        FROM users
+        WHERE LOWER(email) = LOWER(m.email)
+        ORDER BY user_id ASC
+        LIMIT 1
+    ) u ON TRUE
+    LEFT JOIN kiaro_membership.member_entitlement_versions v
+        ON v.member_id = m.id
+"""
+
+# Provisions the users row on first login and stamps last_login otherwise.
+LOGIN_RECORD_SQL = """
+    WITH touched AS (
+        UPDATE users
+        SET last_login = NOW()
+        WHERE LOWER(email) = LOWER(%s)
+        RETURNING user_id, role, is_active
+    ),
+    inserted AS (
+        INSERT INTO users (email, name, password_hash, role, is_active, created_at, last_login)
+        SELECT %s, %s, %s, 'student', TRUE, NOW(), NOW()
+        WHERE NOT EXISTS (SELECT 1 FROM touched)
+        RETURNING user_id, role, is_active
+    )
+    SELECT user_id, role, is_active FROM (
+        SELECT user_id, role, is_active FROM touched
+        UNION ALL
+        SELECT user_id, role, is_active FROM inserted
+    ) login_user
+    ORDER BY user_id ASC
+    LIMIT 1
+"""
+
+
+def _load_login_state(email: str) -> dict | None:
     conn = get_connection()
     cur = conn.cursor()
 
     try:
-        # 1) Auth ONLY against membership table
-        cur.execute(
-            """
-            SELECT email, password_hash, account_type
-            FROM kiaro_membership.members
-            WHERE LOWER(email) = LOWER(%s)
-            ORDER BY id DESC
-            LIMIT 1
-            """,
-            (email,),
-        )
-        member_row = cur.fetchone()
-
-        if not member_row:
-            raise HTTPException(status_code=401, detail="Invalid credentials")
+        # Auth ONLY against membership table; users row and entitlement stamp ride along.
+        cur.execute(LOGIN_STATE_SQL, (email,))
+        row = cur.fetchone()
+        if not row:
+            return None
+        return {
+            "member_email": row[0],
+            "password_hash": row[1],
+            "account_type": row[2],
+            "member_id": row[3],
+            "user_id": row[4],
+            "role": row[5],
+            "is_active": row[6],
+            "entitlement_claims": {"ev": int(row[7]), "apps": list(row[8] or [])},
+        }
+    finally:
+        cur.close()
+        conn.close()
 
-        member_email, member_password_hash, account_type = member_row
 
-        valid = False
-        if member_password_hash:
-            try:
-                valid = pwd_context.verify(password, member_password_hash)
-            except Exception:
-                valid = False
+def _complete_login(email: str, login_state: dict, new_password_hash: str | None):
+    member_email = login_state["member_email"]
+    member_password_hash = login_state["password_hash"]
+    account_type = login_state["account_type"]
 
-        if not valid:
-            raise HTTPException(status_code=401, detail="Invalid credentials")
+    # Inactive users are refused before anything is written for them.
+    if login_state["user_id"] is not None and login_state["is_active"] is False:
+        raise HTTPException(status_code=403, detail="User is inactive")
 
-        # 2) Ensure user exists in users table
-        cur.execute(
-            """
-            SELECT user_id, role, is_active
-            FROM users
-            WHERE LOWER(email) = LOWER(%s)
-            """,
-            (email,),
-        )
-        user_row = cur.fetchone()
+    conn = get_connection()
+    cur = conn.cursor()
 
-        if not user_row:
+    try:
+        try:
             cur.execute(
-                """
-                INSERT INTO users (email, name, password_hash, role, is_active, created_at)
-                VALUES (%s, %s, %s, 'student', TRUE, NOW())
-                RETURNING user_id, role, is_active
-                """,
-                (email, email.split("@")[0], member_password_hash),
+                LOGIN_RECORD_SQL,
+                (email, email, email.split("@")[0], member_password_hash),
             )
-            user_row = cur.fetchone()
+            legacy_user_id, role, is_active = cur.fetchone()
             conn.commit()
-
-        legacy_user_id, role, is_active = user_row
+        except Exception as e:
+            conn.rollback()
+            # Provisioning a missing users row is required; stamping last_login
+            # on an existing one is best effort and must not fail the login.
+            if login_state["user_id"] is None:
+                raise
+            print("LOGIN LAST_LOGIN ERROR:", str(e))
+            legacy_user_id, role, is_active = login_state["user_id"], login_state["role"], login_state["is_active"]
 
         if is_active is False:
             raise HTTPException(status_code=403, detail="User is inactive")
 
-        # 3) Optional member_id from members.id via separate query
-        member_id = None
-        try:
-            cur.execute(
-                """
-                SELECT id
-                FROM kiaro_membership.members
-                WHERE LOWER(email) = LOWER(%s)
-                ORDER BY id DESC
-                LIMIT 1
-                """,
-                (email,),
-            )
-            row = cur.fetchone()
-            if row:
-                member_id = row[0]
-        except Exception:
-            member_id = None
-
-        # Track last login
-        try:
-            cur.execute(
-                "ALTER TABLE users ADD COLUMN IF NOT EXISTS last_login TIMESTAMPTZ"
-            )
-            cur.execute(
-                "UPDATE users SET last_login = NOW() WHERE LOWER(email) = LOWER(%s)",
-                (email,),
-            )
-            conn.commit()
-        except Exception:
-            pass
+        # Stored hash uses a deprecated scheme/cost: replace it now that we know the password.
+        if new_password_hash:
+            try:
+                cur.execute(
+                    """
+                    WITH updated_member AS (
+                        UPDATE kiaro_membership.members
+                        SET password_hash = %s, updated_at = NOW()
+                        WHERE LOWER(email) = LOWER(%s)
+                          AND password_hash = %s
+                    )
+                    UPDATE users
+                    SET password_hash = %s
+                    WHERE LOWER(email) = LOWER(%s)
+                      AND password_hash = %s
+                    """,
+                    (new_password_hash, email, member_password_hash, new_password_hash, email, member_password_hash),
+                )
+                conn.commit()
+            except Exception as e:
+                print("LOGIN REHASH ERROR:", str(e))
+                conn.rollback()
 
         token = jwt.encode(
             {
                 "sub": member_email,
                 "member_email": member_email,
                 "user_id": legacy_user_id,
-                "member_id": member_id,
+                "member_id": login_state["member_id"],
                 "role": role,
                 "account_type": account_type or "free",
-                "exp": datetime.utcnow() + timedelta(hours=ACCESS_TOKEN_EXPIRE_HOURS)
+                "iat": datetime.utcnow(),
+                "exp": datetime.utcnow() + timedelta(hours=ACCESS_TOKEN_EXPIRE_HOURS),
+                # Signed entitlement snapshot; see app.entitlements.token_member_app_codes().
+                **login_state["entitlement_claims"],
             },
             JWT_SECRET,
             algorithm=JWT_ALGO
@@ -893,7 +1080,9 @@ async def login(request: Request):
             "role": role,
             "account_type": account_type or "free",
         }
-
+    except Exception:
+        conn.rollback()
+        raise
     finally:
         cur.close()
         conn.close()
@@ -913,8 +1102,7 @@ def me(user=Depends(get_current_user)):
     }
 
 @app.get("/dashboard")
-def dashboard(user=Depends(get_current_user)):
-    conn = get_connection()
+def dashboard(user=Depends(get_current_user), conn=Depends(get_request_connection, scope="function")):
     cur = conn.cursor()
 
     # -------------------------
@@ -924,7 +1112,6 @@ def dashboard(user=Depends(get_current_user)):
     member_id = None
     if not user_id:
         cur.close()
-        conn.close()
         return {
             "role": user.get("role", "student"),
             "modules": {
@@ -991,23 +1178,27 @@ def dashboard(user=Depends(get_current_user)):
         rows = cur.fetchall()
         apps = [r[0] for r in rows] if rows else []
 
-    legacy_attempts = _fetch_legacy_dashboard_attempts(cur, user_id)
-    s_total = legacy_attempts["spelling"]["attempts"]
-    s_acc = legacy_attempts["spelling"]["accuracy"]
-    w_total = legacy_attempts["words"]["attempts"]
-    w_acc = legacy_attempts["words"]["accuracy"]
-    m_total = legacy_attempts["math"]["attempts"]
-    m_acc = legacy_attempts["math"]["accuracy"]
-    c_total = legacy_attempts["comprehension"]["attempts"]
-    c_acc = legacy_attempts["comprehension"]["accuracy"]
-
-    s_completed, s_lessons_total, s_completion = _fetch_spelling_completion(cur, user_id)
-    w_completed, w_lessons_total, w_completion = _fetch_words_completion(cur, user_id)
-    m_completed, m_lessons_total, m_completion = _fetch_math_completion(cur, user_id)
-    c_completed, c_lessons_total, c_completion = _fetch_comprehension_completion(cur, user_id)
+    # Attempts, accuracy and lesson completion for every module in one read.
+    rollup = get_user_module_rollup(cur, user_id, lessons=True)
+    s_total = rollup["spelling"]["attempts"]
+    s_acc = round(rollup["spelling"]["accuracy"] or 0, 2)
+    w_total = rollup["words"]["attempts"]
+    w_acc = round(float(rollup["words"]["accuracy"]), 2) or 0
+    m_total = rollup["math"]["attempts"]
+    m_acc = round(rollup["math"]["accuracy"] or 0, 2)
+    c_total = rollup["comprehension"]["attempts"]
+    c_acc = round(rollup["comprehension"]["accuracy"] or 0, 2)
+
+    def _completion(module):
+        completed, total = rollup[module]["completed_lessons"], rollup[module]["total_lessons"]
+        return completed, total, _safe_completion_percent(completed, total)
+
+    s_completed, s_lessons_total, s_completion = _completion("spelling")
+    w_completed, w_lessons_total, w_completion = _completion("words")
+    m_completed, m_lessons_total, m_completion = _completion("math")
+    c_completed, c_lessons_total, c_completion = _completion("comprehension")
 
     cur.close()
-    conn.close()
 
     # -------------------------
     # MODULE ACCESS LOGIC
@@ -1100,8 +1291,7 @@ def dashboard(user=Depends(get_current_user)):
 
 
 @app.get("/dashboard/insights")
-def dashboard_insights(user=Depends(get_current_user)):
-    conn = get_connection()
+def dashboard_insights(user=Depends(get_current_user), conn=Depends(get_request_connection, scope="function")):
     cur = conn.cursor()
 
     try:
@@ -1126,73 +1316,6 @@ def dashboard_insights(user=Depends(get_current_user)):
                 },
             }
 
-        def _collect_activity_days(table_name: str, *, user_candidates: list[str], timestamp_candidates: list[str], collected_days: set):
-            columns = _get_table_columns(cur, table_name)
-            timestamp_column = _first_matching_column(columns, timestamp_candidates)
-            matched_user_columns = [column for column in user_candidates if column in columns]
-
-            if not timestamp_column or not matched_user_columns:
-                return
-
-            where_clause = " OR ".join(f"{column} = %s" for column in matched_user_columns)
-            params = tuple(user_id for _ in matched_user_columns)
-
-            try:
-                cur.execute(
-                    f"""
-                    SELECT DISTINCT DATE({timestamp_column})
-                    FROM {table_name}
-                    WHERE {where_clause}
-                    """,
-                    params,
-                )
-                for activity_day, in cur.fetchall():
-                    if not activity_day:
-                        continue
-                    collected_days.add(activity_day.date() if hasattr(activity_day, "date") else activity_day)
-            except Exception as exc:
-                print(f"dashboard_insights practice streak query failed for {table_name}: {exc}")
-
-        practice_activity_days = set()
-
-        _collect_activity_days(
-            "spelling_attempts",
-            user_candidates=["user_id"],
-            timestamp_candidates=["created_at", "submitted_at"],
-            collected_days=practice_activity_days,
-        )
-
-        words_table = None
-        words_columns = _get_table_columns(cur, "synonym_attempts")
-        if words_columns:
-            words_table = "synonym_attempts"
-        else:
-            words_columns = _get_table_columns(cur, "words_attempts")
-            if words_columns:
-                words_table = "words_attempts"
-
-        if words_table:
-            _collect_activity_days(
-                words_table,
-                user_candidates=["user_id"],
-                timestamp_candidates=["created_at", "submitted_at"],
-                collected_days=practice_activity_days,
-            )
-
-        _collect_activity_days(
-            "math_attempts",
-            user_candidates=["student_id", "user_id"],
-            timestamp_candidates=["created_at", "submitted_at"],
-            collected_days=practice_activity_days,
-        )
-
-        _collect_activity_days(
-            "comprehension_attempts",
-            user_candidates=["user_id"],
-            timestamp_candidates=["created_at", "submitted_at"],
-            collected_days=practice_activity_days,
-        )
-
         math_attempt_columns = _get_table_columns(cur, "math_attempts")
         has_paper_attempts = {"user_id", "paper_code", "score", "total", "created_at"}.issubset(math_attempt_columns)
         math_submission_columns = _get_table_columns(cur, "math_submission_attempts")
@@ -1232,45 +1355,13 @@ def dashboard_insights(user=Depends(get_current_user)):
                 print(f"dashboard_insights attempt query failed for {attempts_table}: {exc}")
                 attempts = []
 
-        today = datetime.utcnow().date()
-        activity_days = sorted(practice_activity_days, reverse=True)
-        current_streak = 0
-
-        for i, day in enumerate(activity_days):
-            if i == 0:
-                if day == today or day == today - timedelta(days=1):
-                    current_streak = 1
-                else:
-                    break
-            elif activity_days[i - 1] - day == timedelta(days=1):
-                current_streak += 1
-            else:
-                break
-
-        longest_streak = 0
-        streak_run = 0
-        previous_day = None
-
-        for day in activity_days:
-            if previous_day is None:
-                streak_run = 1
-            elif previous_day - day == timedelta(days=1):
-                streak_run += 1
-            else:
-                streak_run = 1
-
-            longest_streak = max(longest_streak, streak_run)
-            previous_day = day
-
+        activity_streak = get_activity_streak(cur, user_id)
         streak = {
-            "current": current_streak,
-            "current_streak": current_streak,
-            "longest": longest_streak,
-            "last_active": activity_days[0] if activity_days else None,
-            "active_days_last_7": [
-                (today - timedelta(days=offset)) in practice_activity_days
-                for offset in range(6, -1, -1)
-            ],
+            "current": activity_streak["current"],
+            "current_streak": activity_streak["current"],
+            "longest": activity_streak["longest"],
+            "last_active": activity_streak["last_active"],
+            "active_days_last_7": activity_streak["active_days_last_7"],
         }
 
         if not attempts:
@@ -1418,14 +1509,33 @@ def dashboard_insights(user=Depends(get_current_user)):
         }
     finally:
         cur.close()
-        conn.close()
 
 
 @app.get("/progress/weekly-improvement")
-def legacy_weekly_improvement(user=Depends(get_current_user)):
+def legacy_weekly_improvement(user=Depends(get_current_user), conn=Depends(get_request_connection, scope="function")):
     from app.practice.router import get_weekly_improvement
 
-    return get_weekly_improvement(user)
+    return get_weekly_improvement(user, conn=conn)
+
+
+ADMIN_USERS_SQL = """
+    SELECT
+        m.id,
+        u.user_id,
+        m.email,
+        COALESCE(u.role, 'student') as role,
+        m.account_type,
+        m.created_at,
+        COALESCE(array_agg(ma.app_code) FILTER (WHERE ma.app_code IS NOT NULL), '{}') as apps,
+        u.name
+    FROM kiaro_membership.members m
+    LEFT JOIN users u
+        ON LOWER(u.email) = LOWER(m.email)
+    LEFT JOIN kiaro_membership.member_apps ma
+        ON ma.member_id = m.id
+    GROUP BY m.id, u.user_id, m.email, u.role, m.account_type, m.created_at, u.name
+    ORDER BY m.created_at DESC
+"""
 
 
 @app.get("/admin/users")
@@ -1437,26 +1547,7 @@ def get_all_users(user=Depends(get_current_user)):
     cur = conn.cursor()
 
     try:
-        cur.execute(
-            """
-            SELECT
-                m.id,
-                u.user_id,
-                m.email,
-                COALESCE(u.role, 'student') as role,
-                m.account_type,
-                m.created_at,
-                COALESCE(array_agg(ma.app_code) FILTER (WHERE ma.app_code IS NOT NULL), '{}') as apps,
-                u.name
-            FROM kiaro_membership.members m
-            LEFT JOIN users u
-                ON LOWER(u.email) = LOWER(m.email)
-            LEFT JOIN kiaro_membership.member_apps ma
-                ON ma.member_id = m.id
-            GROUP BY m.id, u.user_id, m.email, u.role, m.account_type, m.created_at, u.name
-            ORDER BY m.created_at DESC
-            """
-        )
+        cur.execute(ADMIN_USERS_SQL)
 
         rows = cur.fetchall()
 
@@ -1492,68 +1583,79 @@ def get_all_users(user=Depends(get_current_user)):
 
 
 @app.get("/admin/student-mastery")
-def get_student_mastery_overview(user=Depends(get_current_user)):
-    """Returns per-student, per-lesson mastery levels and the difficulty band currently being served."""
+def get_student_mastery_overview(
+    module: Optional[str] = None,
+    mastery: Optional[str] = None,
+    email: Optional[str] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    user=Depends(get_current_user),
+):
+    """
+    Returns per-student, per-lesson mastery levels and the difficulty band currently being served.
+
+    Streams a JSON array. Optional filters: module (math/nvr/grammar or the app name, comma separated),
+    mastery (beginner/developing/mastered) and email (substring). With limit the array holds one page and
+    the X-Next-Cursor header, when present, is the cursor for the next page.
+    """
     if user.get("role") != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
-    conn = get_connection()
-    cur = conn.cursor()
-    results = []
-    def _mastery(att, acc):
-        att, acc = int(att or 0), float(acc or 0)
-        if att < 10: return att, acc, "beginner"
-        if acc >= 75: return att, acc, "mastered"
-        if acc >= 50: return att, acc, "developing"
-        return att, acc, "beginner"
+
+    module_keys = {key: key for key in REPORT_MODULES}
+    module_keys.update({name.lower(): key for key, name in REPORT_MODULES.items()})
+    modules = None
+    if module:
+        requested = [part.strip().lower() for part in module.split(",") if part.strip()]
+        unknown = [part for part in requested if part not in module_keys]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown module: {', '.join(unknown)}")
+        modules = [module_keys[part] for part in requested]
+
     diff_map = {"beginner": "easy", "developing": "medium", "mastered": "hard"}
-    try:
-        # MathSprint
-        cur.execute("""
-            SELECT u.user_id, u.name, LOWER(u.email),
-                   ml.id, COALESCE(ml.display_name, ml.lesson_name),
-                   COUNT(ma.id), COALESCE(AVG(CASE WHEN ma.is_correct THEN 100.0 ELSE 0.0 END),0)
-            FROM users u JOIN math_attempts ma ON ma.student_id=u.user_id
-            JOIN math_lessons ml ON ml.id=ma.lesson_id
-            WHERE u.role!='admin' GROUP BY u.user_id,u.name,u.email,ml.id,ml.lesson_name,ml.display_name
-            HAVING COUNT(ma.id)>=1 ORDER BY u.email,ml.id""")
-        for r in cur.fetchall():
-            att, acc, mastery = _mastery(r[5], r[6])
-            results.append({"user_id":r[0],"name":r[1] or "","email":r[2],"module":"MathSprint",
-                "lesson":r[4],"lesson_id":r[3],"attempts":att,"accuracy":round(acc,1),
-                "mastery_level":mastery,"serving_difficulty":diff_map[mastery]})
-        # NVRSprint — nvr_attempts has no lesson_id; join via pattern_id(text)->nvr_questions.question_id->topic->nvr_lessons.topic
-        cur.execute("""
-            SELECT u.user_id, u.name, LOWER(u.email),
-                   nl.id, COALESCE(nl.display_name, nl.lesson_name),
-                   COUNT(na.id), COALESCE(AVG(CASE WHEN na.is_correct THEN 100.0 ELSE 0.0 END),0)
-            FROM users u JOIN nvr_attempts na ON na.user_id=u.user_id
-            JOIN nvr_questions nq ON nq.question_id=na.pattern_id
-            JOIN nvr_lessons nl ON nl.topic=nq.topic
-            WHERE u.role!='admin' GROUP BY u.user_id,u.name,u.email,nl.id,nl.lesson_name,nl.display_name
-            HAVING COUNT(na.id)>=1 ORDER BY u.email,nl.id""")
-        for r in cur.fetchall():
-            att, acc, mastery = _mastery(r[5], r[6])
-            results.append({"user_id":r[0],"name":r[1] or "","email":r[2],"module":"NVRSprint",
-                "lesson":r[4],"lesson_id":r[3],"attempts":att,"accuracy":round(acc,1),
-                "mastery_level":mastery,"serving_difficulty":diff_map[mastery]})
-        # GrammarSprint — grammar_attempts PK is attempt_id
-        cur.execute("""
-            SELECT u.user_id, u.name, LOWER(u.email),
-                   gl.lesson_id, COALESCE(gl.display_name, gl.lesson_name),
-                   COUNT(ga.attempt_id), COALESCE(AVG(CASE WHEN ga.correct THEN 100.0 ELSE 0.0 END),0)
-            FROM users u JOIN grammar_attempts ga ON ga.user_id=u.user_id
-            JOIN grammar_lessons gl ON gl.lesson_id=ga.lesson_id
-            WHERE u.role!='admin' GROUP BY u.user_id,u.name,u.email,gl.lesson_id,gl.lesson_name,gl.display_name
-            HAVING COUNT(ga.attempt_id)>=1 ORDER BY u.email,gl.lesson_id""")
-        for r in cur.fetchall():
-            att, acc, mastery = _mastery(r[5], r[6])
-            results.append({"user_id":r[0],"name":r[1] or "","email":r[2],"module":"GrammarSprint",
-                "lesson":r[4],"lesson_id":r[3],"attempts":att,"accuracy":round(acc,1),
-                "mastery_level":mastery,"serving_difficulty":diff_map[mastery]})
-        return results
-    finally:
-        cur.close()
-        conn.close()
+    mastery = str(mastery or "").strip().lower() or None
+    if mastery and mastery not in diff_map:
+        raise HTTPException(status_code=400, detail="mastery must be beginner, developing or mastered")
+
+    after = None
+    if cursor:
+        try:
+            after = decode_report_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    page_limit = max(1, min(int(limit), 5000)) if limit is not None else None
+    report = dict(modules=modules, mastery_level=mastery, email=email, after=after)
+
+    def _entry(row):
+        return {
+            "user_id": row["user_id"],
+            "name": row["name"] or "",
+            "email": row["email"],
+            "module": REPORT_MODULES[row["module"]],
+            "lesson": row["lesson"],
+            "lesson_id": row["lesson_id"],
+            "attempts": row["attempts"],
+            "accuracy": round(row["accuracy"], 1),
+            "mastery_level": row["mastery_level"],
+            "serving_difficulty": diff_map[row["mastery_level"]],
+        }
+
+    def _stream(rows):
+        yield "["
+        for index, row in enumerate(rows):
+            yield ("," if index else "") + json.dumps(_entry(row))
+        yield "]"
+
+    if page_limit is None:
+        return StreamingResponse(_stream(iter_student_mastery_report(**report)), media_type="application/json")
+
+    # One page: read a row past the limit to know whether another page follows.
+    rows = list(iter_student_mastery_report(**report, limit=page_limit + 1))
+    headers = {}
+    if len(rows) > page_limit:
+        rows = rows[:page_limit]
+        headers["X-Next-Cursor"] = encode_report_cursor(rows[-1])
+    return StreamingResponse(_stream(rows), media_type="application/json", headers=headers)
 
 
 @app.get("/admin/user-activity")
@@ -1797,6 +1899,7 @@ def fix_user_access(payload: dict, user=Depends(get_current_user)):
 
         apps = ["math", "mock", "practice", "grammar"]
 
+        bump_entitlement_version(cur, member_id)
         for app_code in apps:
             cur.execute(
                 """
@@ -1985,6 +2088,7 @@ def set_user_role(payload: dict, user=Depends(get_current_user)):
             );
             """
             with conn.cursor() as grant_cur:
+                bump_entitlement_version(grant_cur, member_id)
                 grant_cur.execute(query, (member_id, member_id))
 
         cur.execute(
@@ -2013,6 +2117,7 @@ def set_user_role(payload: dict, user=Depends(get_current_user)):
                 grant_all_apps_to_member(conn, member_id)
 
         conn.commit()
+        invalidate_identity(target_email)
         return {"status": "success"}
     finally:
         cur.close()
@@ -2233,18 +2338,16 @@ async def gumroad_webhook(request: Request):
                 (email, event_product_payload, event_type, resolved_mock_test_id),
             )
             event_id = cur.fetchone()[0]
+            apply_printable_event(
+                cur,
+                email=email,
+                product_name=event_product_payload,
+                event_type=event_type,
+                event_id=event_id,
+            )
 
             # Find user
-            cur.execute(
-                """
-                SELECT id
-                FROM kiaro_membership.members
-                WHERE LOWER(email) = LOWER(%s)
-                ORDER BY id DESC
-                LIMIT 1
-                """,
-                (email,),
-            )
+            cur.execute(MEMBER_ID_FOR_EMAIL_SQL, (email,))
 
             row = cur.fetchone()
 
@@ -2254,6 +2357,8 @@ async def gumroad_webhook(request: Request):
                 return {"status": "user_not_found"}
 
             member_id = row[0]
+            # Any processed event may change member_apps or mock access.
+            bump_entitlement_version(cur, member_id)
 
             is_purchase_event = _is_purchase_event(event_type)
             is_refund_event = _is_refund_event(event_type)
@@ -2365,6 +2470,7 @@ async def gumroad_webhook(request: Request):
         finally:
             cur.close()
             conn.close()
+            invalidate_identity(email)
     except Exception as e:
         print("❌ WEBHOOK ERROR:", str(e))
         return {"status": "error"}
@@ -2437,6 +2543,12 @@ def validate_user(email: str):
 # =========================
 # Practice Engine Routes
 # =========================
+# Async routes go first so they shadow the sync ones for migrated modules.
+for _module in sorted(ASYNC_PRACTICE_MODULES):
+    if _module in ASYNC_PRACTICE_ROUTERS:
+        app.include_router(ASYNC_PRACTICE_ROUTERS[_module])
+    else:
+        print("unknown ASYNC_PRACTICE_MODULES entry ignored:", _module)
 app.include_router(practice_router, prefix="")
 app.include_router(practice_admin_router)
 app.include_router(grammar_router)
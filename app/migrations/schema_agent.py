@@ -87,6 +87,9 @@ def main():
             )
         )
 
+        # Running services reload their schema registry (app.schema_registry) on commit.
+        cur.execute("NOTIFY kiaro_schema")
+
         conn.commit()
         print("Schema agent completed successfully.")
         print("Created/validated:")
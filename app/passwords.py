@@ -0,0 +1,119 @@
+"""
+Password hashing on a dedicated, bounded worker pool.
+
+bcrypt is deliberately slow; run inline it stalls the event loop (async
+routes) or ties up a request threadpool worker. Every hash/verify goes
+through one small executor instead, so hashing never uses more than
+PASSWORD_HASH_WORKERS cores, and callers beyond PASSWORD_HASH_MAX_QUEUE are
+turned away with a 503 rather than queueing without bound.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "64"))
+
+pwd_context = CryptContext(
+    schemes=["bcrypt", "pbkdf2_sha256"],
+    deprecated="auto",
+)
+
+_executor = ThreadPoolExecutor(max_workers=max(1, PASSWORD_HASH_WORKERS), thread_name_prefix="password-hash")
+_lock = threading.Lock()
+_stats = {
+    "in_flight": 0,
+    "max_in_flight": 0,
+    "completed": 0,
+    "rejected": 0,
+    "rehashed": 0,
+    "queue_wait_ms_total": 0.0,
+    "run_ms_total": 0.0,
+}
+
+
+def _reserve() -> None:
+    with _lock:
+        if _stats["in_flight"] >= PASSWORD_HASH_WORKERS + PASSWORD_HASH_MAX_QUEUE:
+            _stats["rejected"] += 1
+            raise HTTPException(status_code=503, detail="Too many sign-in attempts, please retry shortly")
+        _stats["in_flight"] += 1
+        _stats["max_in_flight"] = max(_stats["max_in_flight"], _stats["in_flight"])
+
+
+def _timed(func, submitted_at: float, *args):
+    started_at = time.perf_counter()
+    try:
+        return func(*args)
+    finally:
+        finished_at = time.perf_counter()
+        with _lock:
+            _stats["in_flight"] -= 1
+            _stats["completed"] += 1
+            _stats["queue_wait_ms_total"] += (started_at - submitted_at) * 1000
+            _stats["run_ms_total"] += (finished_at - started_at) * 1000
+
+
+def _submit(func, *args):
+    _reserve()
+    return _executor.submit(_timed, func, time.perf_counter(), *args)
+
+
+def _safe_verify_and_update(plain: str, hashed: str | None) -> tuple[bool, str | None]:
+    if not hashed:
+        return False, None
+    try:
+        return pwd_context.verify_and_update(plain, hashed)
+    except Exception:
+        return False, None
+
+
+def hash_password(plain: str) -> str:
+    """Blocking; for sync (threadpool) endpoints."""
+    return _submit(pwd_context.hash, plain).result()
+
+
+def verify_password(plain: str, hashed: str | None) -> bool:
+    """Blocking; for sync (threadpool) endpoints."""
+    return _submit(_safe_verify_and_update, plain, hashed).result()[0]
+
+
+async def hash_password_async(plain: str) -> str:
+    return await asyncio.wrap_future(_submit(pwd_context.hash, plain))
+
+
+async def verify_and_update_password_async(plain: str, hashed: str | None) -> tuple[bool, str | None]:
+    """
+    (valid, new_hash). new_hash is set when the stored hash uses a deprecated
+    scheme or outdated rounds and should be replaced by the caller.
+    """
+    valid, new_hash = await asyncio.wrap_future(_submit(_safe_verify_and_update, plain, hashed))
+    if valid and new_hash:
+        with _lock:
+            _stats["rehashed"] += 1
+    return valid, new_hash
+
+
+def get_password_hashing_stats() -> dict:
+    with _lock:
+        stats = dict(_stats)
+    completed = stats["completed"]
+    stats.update(
+        {
+            "workers": PASSWORD_HASH_WORKERS,
+            "max_queue": PASSWORD_HASH_MAX_QUEUE,
+            "queued": max(0, stats["in_flight"] - PASSWORD_HASH_WORKERS),
+            "avg_queue_wait_ms": round(stats["queue_wait_ms_total"] / completed, 2) if completed else 0.0,
+            "avg_run_ms": round(stats["run_ms_total"] / completed, 2) if completed else 0.0,
+        }
+    )
+    stats["queue_wait_ms_total"] = round(stats["queue_wait_ms_total"], 2)
+    stats["run_ms_total"] = round(stats["run_ms_total"], 2)
+    return stats
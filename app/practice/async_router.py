@@ -0,0 +1,197 @@
+"""
+Async variants of the practice question/answer endpoints.
+
+Each handler runs the matching sync endpoint from app.practice.router under
+run_sync_async(), so selection, scoring and access rules stay in one place
+while every query goes through the async pool instead of holding a
+threadpool worker.
+
+Routers are split per module and registered ahead of the sync router for the
+modules listed in ASYNC_PRACTICE_MODULES, so modules can move over one at a
+time (and back, by removing them from the list).
+"""
+
+from typing import Optional
+
+from fastapi import APIRouter, Depends
+
+from app.auth import get_current_user_async
+from app.database_async import get_async_request_connection, run_sync_async
+from app.practice import router as practice
+
+
+spelling_router = APIRouter(prefix="/practice", tags=["practice"])
+words_router = APIRouter(prefix="/practice", tags=["practice"])
+math_router = APIRouter(prefix="/practice", tags=["practice"])
+nvr_router = APIRouter(prefix="/practice", tags=["practice"])
+comprehension_router = APIRouter(prefix="/practice", tags=["practice"])
+
+
+# -----------------------------
+# SpellingSprint
+# -----------------------------
+
+@spelling_router.get("/spelling/question")
+async def spelling_question(
+    lesson_id: Optional[int] = None,
+    word_id: Optional[int] = None,
+    session_id: Optional[str] = None,
+    user=Depends(get_current_user_async),
+    conn=Depends(get_async_request_connection, scope="function"),
+):
+    return await run_sync_async(
+        practice.spelling_question,
+        lesson_id=lesson_id,
+        word_id=word_id,
+        session_id=session_id,
+        user=user,
+        conn=conn,
+    )
+
+
+@spelling_router.post("/spelling/answer")
+async def spelling_answer(
+    payload: dict,
+    user=Depends(get_current_user_async),
+    conn=Depends(get_async_request_connection, scope="function"),
+):
+    return await run_sync_async(practice.spelling_answer, payload, user=user, conn=conn)
+
+
+@spelling_router.post("/spelling/submit")
+async def spelling_submit(
+    payload: dict,
+    user=Depends(get_current_user_async),
+    conn=Depends(get_async_request_connection, scope="function"),
+):
+    return await run_sync_async(practice.spelling_submit, payload, user=user, conn=conn)
+
+
+# -----------------------------
+# WordSprint (words + synonym)
+# -----------------------------
+
+@words_router.get("/words/question")
+async def words_question(
+    lesson_id: Optional[int] = None,
+    user=Depends(get_current_user_async),
+    conn=Depends(get_async_request_connection, scope="function"),
+):
+    return await run_sync_async(practice.words_question, lesson_id=lesson_id, user=user, conn=conn)
+
+
+@words_router.post("/words/submit")
+async def words_submit(
+    payload: dict,
+    user=Depends(get_current_user_async),
+    conn=Depends(get_async_request_connection, scope="function"),
+):
+    return await run_sync_async(practice.words_submit, payload, user=user, conn=conn)
+
+
+@words_router.get("/synonym/question")
+async def synonym_question(
+    user=Depends(get_current_user_async),
+    conn=Depends(get_async_request_connection, scope="function"),
+):
+    return await run_sync_async(practice.synonym_question, user=user, conn=conn)
+
+
+@words_router.post("/synonym/answer")
+async def synonym_answer(
+    req: practice.SynonymAnswerRequest,
+    user: dict = Depends(get_current_user_async),
+    conn=Depends(get_async_request_connection, scope="function"),
+):
+    return await run_sync_async(practice.synonym_answer, req, user=user, conn=conn)
+
+
+# -----------------------------
+# MathSprint
+# -----------------------------
+
+@math_router.get("/math/question")
+async def math_question(
+    lesson_id: Optional[int] = None,
+    session_id: Optional[str] = None,
+    user=Depends(get_current_user_async),
+    conn=Depends(get_async_request_connection, scope="function"),
+):
+    return await run_sync_async(
+        practice.math_question,
+        lesson_id=lesson_id,
+        session_id=session_id,
+        user=user,
+        conn=conn,
+    )
+
+
+@math_router.post("/math/submit")
+async def math_submit(
+    payload: dict,
+    user=Depends(get_current_user_async),
+    conn=Depends(get_async_request_connection, scope="function"),
+):
+    return await run_sync_async(practice.math_submit, payload, user=user, conn=conn)
+
+
+# -----------------------------
+# NVR Sprint
+# -----------------------------
+
+@nvr_router.get("/nvr/question")
+async def nvr_question(
+    lesson_id: Optional[int] = None,
+    user=Depends(get_current_user_async),
+    conn=Depends(get_async_request_connection, scope="function"),
+):
+    return await run_sync_async(practice.nvr_question_endpoint, lesson_id=lesson_id, user=user, conn=conn)
+
+
+@nvr_router.post("/nvr/submit")
+async def nvr_submit(
+    payload: dict,
+    user=Depends(get_current_user_async),
+    conn=Depends(get_async_request_connection, scope="function"),
+):
+    return await run_sync_async(practice.nvr_submit_endpoint, payload, user=user, conn=conn)
+
+
+# -----------------------------
+# Comprehension
+# -----------------------------
+
+@comprehension_router.get("/comprehension/question")
+async def comprehension_question(
+    passage_id: Optional[int] = None,
+    question_id: Optional[int] = None,
+    exclude_question_id: Optional[int] = None,
+    user=Depends(get_current_user_async),
+    conn=Depends(get_async_request_connection, scope="function"),
+):
+    return await run_sync_async(
+        practice.get_comprehension_question,
+        passage_id=passage_id,
+        question_id=question_id,
+        exclude_question_id=exclude_question_id,
+        user=user,
+        conn=conn,
+    )
+
+
+@comprehension_router.post("/comprehension/answer")
+async def comprehension_answer(
+    payload: dict,
+    user=Depends(get_current_user_async),
+    conn=Depends(get_async_request_connection, scope="function"),
+):
+    return await run_sync_async(practice.submit_comprehension_answer, payload, user=user, conn=conn)
+
+
+ASYNC_PRACTICE_ROUTERS = {
+    "spelling": spelling_router,
+    "words": words_router,
+    "math": math_router,
+    "nvr": nvr_router,
+    "comprehension": comprehension_router,
+}
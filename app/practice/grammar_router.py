@@ -8,6 +8,8 @@ from typing import Any
 from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
 
 from app.auth import get_current_user, resolve_verified_learning_user_id
+from app.content_cache import invalidate_lesson_content
+from app.question_prefetch import prefetch_next_question, take_prefetched_question
 from app.database import get_connection
 from app.entitlements import require_member_app_access
 from app.practice.grammar_engine import (
@@ -87,6 +89,10 @@ def grammar_question(
         raise HTTPException(status_code=400, detail="Missing required parameter: lesson_id")
 
     user_id = _resolve_user_id(user)
+    prefetched = take_prefetched_question("grammar", user_id, lesson_id, (session_id,))
+    if prefetched:
+        return prefetched
+
     result = get_grammar_question_for_lesson(
         lesson_id=lesson_id,
         user_id=user_id,
@@ -123,6 +129,15 @@ def grammar_submit(payload: dict, user=Depends(get_current_user)):
     )
     if isinstance(result, dict) and result.get("error"):
         raise HTTPException(status_code=400, detail=result["error"])
+
+    prefetch_next_question(
+        "grammar",
+        user_id,
+        lesson_id,
+        (session_id,),
+        lambda: get_grammar_question_for_lesson(lesson_id=int(lesson_id), user_id=user_id, session_id=session_id),
+        ready_key="question_id",
+    )
     return result
 
 
@@ -156,5 +171,6 @@ async def grammar_upload(file: UploadFile = File(...), user=Depends(get_current_
         raise HTTPException(status_code=400, detail="CSV file is empty")
 
     result = import_grammar_csv_for_admin(rows)
+    invalidate_lesson_content("grammar")
     result["filename"] = file.filename
     return result
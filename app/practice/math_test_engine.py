@@ -5,6 +5,9 @@ from datetime import datetime
 from fastapi import HTTPException
 
 from app.database import get_connection
+from app.entitlement_cache import get_member_entitlements, get_member_ids_for_email
+from app.sampling import has_random_key, sample_rows
+from app.schema_registry import get_table_columns
 
 PREVIEW_QUESTION_LIMIT = 5
 
@@ -70,15 +73,7 @@ def _json_answer_count(answers):
 
 
 def _get_table_columns(cur, table_name):
-    cur.execute(
-        """
-        SELECT column_name
-        FROM information_schema.columns
-        WHERE table_name = %s
-        """,
-        (table_name,),
-    )
-    return {row[0] for row in cur.fetchall()}
+    return get_table_columns(table_name, cur=cur)
 
 
 def _get_question_count(cur, paper_code, fallback_total):
@@ -297,15 +292,7 @@ def get_math_tests(user):
     # Step 2: get purchased tests
     purchased_tests = set()
     if member_id:
-        cur.execute(
-            """
-            SELECT test_id
-            FROM math_user_test_access
-            WHERE member_id = %s
-        """,
-            (member_id,),
-        )
-        purchased_tests = {row[0] for row in cur.fetchall()}
+        purchased_tests = set(get_member_entitlements(member_id, conn=conn).mock_test_ids)
 
     admin_bypass = user.get("role") == "admin" or email in ["rishi@test.com", "testrishi@gmail.com"]
 
@@ -466,27 +453,17 @@ def start_math_test(test_id, access_mode: str = "full"):
         return {"error": "Test not found"}
 
     total_questions = row[0]
-    cur.execute(
-        """
-        SELECT
-            q.id,
-            q.stem,
-            q.option_a,
-            q.option_b,
-            q.option_c,
-            q.option_d,
-            q.option_e,
-            q.correct_option
-        FROM math_questions q
-        ORDER BY RANDOM()
-        LIMIT %s;
-    """,
-        (total_questions,),
+    sampled_questions = sample_rows(
+        cur,
+        table="math_questions q",
+        columns="q.id, q.stem, q.option_a, q.option_b, q.option_c, q.option_d, q.option_e, q.correct_option",
+        limit=total_questions,
+        random_key=has_random_key(cur, "math_questions"),
     )
 
     questions = []
 
-    for q in cur.fetchall():
+    for q in sampled_questions:
         options = [q[2], q[3], q[4], q[5], q[6]]
 
         # remove null options
@@ -523,41 +500,11 @@ def start_math_test(test_id, access_mode: str = "full"):
 
 
 def check_mock_access(email: str, test_id: str):
-    conn = get_connection()
-    cur = conn.cursor()
+    member_ids = get_member_ids_for_email(email)
+    if not member_ids:
+        return False
 
-    try:
-        # Get member id
-        cur.execute(
-            """
-            SELECT id
-            FROM kiaro_membership.members
-            WHERE LOWER(email) = LOWER(%s)
-        """,
-            (email,),
-        )
-        row = cur.fetchone()
-
-        if not row:
-            return False
-
-        member_id = row[0]
-
-        # Check access
-        cur.execute(
-            """
-            SELECT 1
-            FROM math_user_test_access
-            WHERE member_id = %s
-            AND test_id = %s
-        """,
-            (member_id, test_id),
-        )
-
-        return cur.fetchone() is not None
-    finally:
-        cur.close()
-        conn.close()
+    return test_id in get_member_entitlements(member_ids[0]).mock_test_ids
 
 
 def submit_math_test(answers):
@@ -3,7 +3,6 @@ print("🚀 ROUTER FILE IS LOADING")
 
 import logging
 import uuid
-from datetime import datetime, timedelta
 
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query
 from typing import Optional
@@ -12,13 +11,14 @@ import csv
 import io
 import random
 
+from app.attempt_queue import ensure_attempts_visible
 from app.auth import (
     get_current_user,
     get_optional_current_user,
     require_member_app_access,
     resolve_verified_learning_user_id,
 )
-from app.database import get_connection
+from app.database import get_connection, get_request_connection
 
 # Engines
 from app.practice.math_engine import (
@@ -26,6 +26,9 @@ from app.practice.math_engine import (
     get_math_question,
     submit_math_answer
 )
+from app.repositories.activity_repository import get_activity_streak
+from app.repositories.daily_attempts_repository import get_weekly_attempt_totals
+from app.repositories.module_rollup_repository import SYNONYM_ATTEMPT_TABLES, get_user_module_rollup
 from app.repositories.nvr_repository import (
     get_nvr_lessons,
     get_nvr_question,
@@ -49,7 +52,6 @@ from app.practice.synonym_engine import (
     get_practice_session,
     get_next_session_question,
     get_latest_synonym_attempt_word_id,
-    get_synonym_attempt_summary,
     get_words_practice_access_mode,
 )
 from app.practice.spelling_engine import (
@@ -71,6 +73,7 @@ from app.comprehension.repository import (
     insert_passage,
     insert_question,
     get_next_comprehension_question,
+    get_ordered_passage_questions,
 )
 from app.repositories.vr_repository import (
     get_active_vr_papers,
@@ -87,7 +90,12 @@ from app.repositories.english_printable_repository import (
     record_english_attempt_batch,
     user_has_english_printable_access,
 )
+from app.content_cache import invalidate_lesson_content
+from app.entitlement_cache import get_member_entitlements, get_member_ids_for_email
+from app.entitlements import token_member_app_codes
 from app.product_catalog import user_has_product_code_access
+from app.question_prefetch import prefetch_next_question, take_prefetched_question
+from app.schema_registry import get_table_columns
 
 router = APIRouter(prefix="/practice", tags=["practice"])
 admin_router = APIRouter(tags=["admin"])
@@ -238,69 +246,26 @@ def _require_user_id(user):
     return user_id
 
 
-def _enforce_full_module_access(user, app_code: str):
+def _enforce_full_module_access(user, app_code: str, conn=None):
     if user.get("role") == "admin":
         return
 
-    conn = get_connection()
-    cur = conn.cursor()
-    try:
-        user_email = str(user.get("sub") or user.get("email") or "").strip().lower()
-        if not user_email:
-            raise HTTPException(
-                status_code=403,
-                detail={
-                    "code": "access_denied",
-                    "message": f"{app_code} access is required.",
-                    "required_app_code": app_code,
-                },
-            )
-
-        cur.execute(
-            """
-            SELECT id
-            FROM kiaro_membership.members
-            WHERE LOWER(email) = LOWER(%s)
-            ORDER BY id DESC
-            LIMIT 1
-            """,
-            (user_email,),
-        )
-        member_row = cur.fetchone()
-        if not member_row:
-            raise HTTPException(
-                status_code=403,
-                detail={
-                    "code": "access_denied",
-                    "message": f"{app_code} access is required.",
-                    "required_app_code": app_code,
-                },
-            )
+    # A grant in a token whose entitlement stamp is current needs no lookup.
+    if app_code in (token_member_app_codes(user, conn=conn) or ()):
+        return
 
-        member_id = int(member_row[0])
-        cur.execute(
-            """
-            SELECT 1
-            FROM kiaro_membership.member_apps
-            WHERE member_id = %s
-              AND app_code = %s
-            LIMIT 1
-            """,
-            (member_id, app_code),
+    user_email = str(user.get("sub") or user.get("email") or "").strip().lower()
+    member_ids = get_member_ids_for_email(user_email, conn=conn) if user_email else ()
+    # Latest member row for the email, then its cached member_apps.
+    if not member_ids or app_code not in get_member_entitlements(member_ids[-1], conn=conn).app_codes:
+        raise HTTPException(
+            status_code=403,
+            detail={
+                "code": "access_denied",
+                "message": f"{app_code} access is required.",
+                "required_app_code": app_code,
+            },
         )
-        has_access = cur.fetchone() is not None
-        if not has_access:
-            raise HTTPException(
-                status_code=403,
-                detail={
-                    "code": "access_denied",
-                    "message": f"{app_code} access is required.",
-                    "required_app_code": app_code,
-                },
-            )
-    finally:
-        cur.close()
-        conn.close()
 
 
 def _resolve_learning_user_id(cur, user) -> int | None:
@@ -322,55 +287,14 @@ def _raise_not_found(detail: str):
     raise HTTPException(status_code=404, detail=detail)
 
 
-def _get_table_columns(cur, table_name: str) -> set[str]:
-    cur.execute(
-        """
-        SELECT column_name
-        FROM information_schema.columns
-        WHERE table_name = %s
-        """,
-        (table_name,),
-    )
-    return {row[0] for row in cur.fetchall()}
+def _get_table_columns(cur, table_name: str) -> frozenset[str]:
+    return get_table_columns(table_name, cur=cur)
 
 
 def _first_matching_column(columns: set[str], candidates: list[str]) -> str | None:
     return next((candidate for candidate in candidates if candidate in columns), None)
 
 
-def _window_attempt_totals(cur, table_name: str, *, user_columns: list[str], correct_columns: list[str], user_id: int, days_back_start: int, days_back_end: int | None = None):
-    columns = _get_table_columns(cur, table_name)
-    matched_user_columns = [column for column in user_columns if column in columns]
-    matched_correct_column = next((column for column in correct_columns if column in columns), None)
-
-    if not matched_user_columns or not matched_correct_column:
-        return 0, 0
-
-    where_clause = " OR ".join(f"{column} = %s" for column in matched_user_columns)
-    params = [user_id for _ in matched_user_columns]
-
-    time_clause = "created_at >= NOW() - (%s || ' days')::interval"
-    params.append(days_back_start)
-
-    if days_back_end is not None:
-        time_clause += " AND created_at < NOW() - (%s || ' days')::interval"
-        params.append(days_back_end)
-
-    cur.execute(
-        f"""
-        SELECT
-            COUNT(*),
-            COUNT(*) FILTER (WHERE {matched_correct_column} = TRUE)
-        FROM {table_name}
-        WHERE ({where_clause})
-          AND {time_clause}
-        """,
-        tuple(params),
-    )
-    attempts, correct = cur.fetchone()
-    return attempts or 0, correct or 0
-
-
 def _safe_execute(label: str, func, *args, **kwargs):
     try:
         return func(*args, **kwargs)
@@ -617,11 +541,17 @@ def math_question(
     lesson_id: Optional[int] = None,
     session_id: Optional[str] = None,
     user=Depends(get_current_user),
+    conn=Depends(get_request_connection, scope="function"),
 ):
-    _enforce_full_module_access(user, "math")
+    _enforce_full_module_access(user, "math", conn=conn)
     if lesson_id is None:
         _missing_param("lesson_id")
 
+    prefetched = take_prefetched_question("math", user.get("user_id"), lesson_id, (session_id,), conn=conn)
+    if prefetched:
+        return prefetched
+    ensure_attempts_visible(user.get("user_id"), ("math_attempts",))
+
     result = _safe_execute(
         "math_question",
         get_math_question,
@@ -637,7 +567,7 @@ def math_question(
 
 
 @router.post("/math/submit")
-def math_submit(payload: dict, user=Depends(get_current_user)):
+def math_submit(payload: dict, user=Depends(get_current_user), conn=Depends(get_request_connection, scope="function")):
     user_id = _require_user_id(user)
     session_id = payload.get("session_id") or str(uuid.uuid4())
 
@@ -652,7 +582,7 @@ def math_submit(payload: dict, user=Depends(get_current_user)):
             ):
                 raise HTTPException(status_code=403, detail="Maths printable access required")
         else:
-            _enforce_full_module_access(user, "math")
+            _enforce_full_module_access(user, "math", conn=conn)
         return _safe_execute(
             "math_submit_paper",
             submit_math_paper,
@@ -662,7 +592,7 @@ def math_submit(payload: dict, user=Depends(get_current_user)):
             session_id=session_id,
         )
 
-    _enforce_full_module_access(user, "math")
+    _enforce_full_module_access(user, "math", conn=conn)
     lesson_id = _require_payload_param(payload, "lesson_id")
     question_id = _require_payload_param(payload, "question_id")
     selected_option = _require_payload_param(payload, "selected_option")
@@ -683,6 +613,16 @@ def math_submit(payload: dict, user=Depends(get_current_user)):
     if result.get("error"):
         logger.warning("Practice math submit rejected: %s", result["error"])
         raise HTTPException(status_code=400, detail=result["error"])
+
+    prefetch_next_question(
+        "math",
+        user_id,
+        lesson_id,
+        (payload.get("session_id"),),
+        lambda: get_math_question(lesson_id=lesson_id, user_id=user_id, session_id=payload.get("session_id")),
+        ready_key="question_id",
+        conn=conn,
+    )
     return result
 
 
@@ -698,11 +638,16 @@ def nvr_lessons_endpoint(user=Depends(get_current_user)):
 def nvr_question_endpoint(
     lesson_id: Optional[int] = None,
     user=Depends(get_current_user),
+    conn=Depends(get_request_connection, scope="function"),
 ):
-    _enforce_full_module_access(user, "nvr")
+    _enforce_full_module_access(user, "nvr", conn=conn)
     if lesson_id is None:
         _missing_param("lesson_id")
     user_id = user.get("user_id")
+    prefetched = take_prefetched_question("nvr", user_id, lesson_id, (), conn=conn)
+    if prefetched:
+        return prefetched
+
     result = get_nvr_question(lesson_id=lesson_id, user_id=user_id)
     if not result:
         _raise_not_found("Question not found")
@@ -710,20 +655,30 @@ def nvr_question_endpoint(
 
 
 @router.post("/nvr/submit")
-def nvr_submit_endpoint(payload: dict, user=Depends(get_current_user)):
-    _enforce_full_module_access(user, "nvr")
+def nvr_submit_endpoint(payload: dict, user=Depends(get_current_user), conn=Depends(get_request_connection, scope="function")):
+    _enforce_full_module_access(user, "nvr", conn=conn)
     user_id = _require_user_id(user)
     lesson_id = _require_payload_param(payload, "lesson_id")
     question_id = _require_payload_param(payload, "question_id")
     selected_option = _require_payload_param(payload, "selected_option")
     correct_option = payload.get("correct_option", "")
-    return submit_nvr_answer(
+    result = submit_nvr_answer(
         user_id=int(user_id),
         lesson_id=int(lesson_id),
         question_id=str(question_id),
         selected=str(selected_option),
         correct=str(correct_option),
     )
+    prefetch_next_question(
+        "nvr",
+        user_id,
+        lesson_id,
+        (),
+        lambda: get_nvr_question(lesson_id=int(lesson_id), user_id=user_id),
+        ready_key="question_id",
+        conn=conn,
+    )
+    return result
 
 
 @router.post("/math/retry-incorrect")
@@ -1014,14 +969,7 @@ def math_history(paper_code: str, user=Depends(get_current_user)):
     cur = conn.cursor()
 
     try:
-        cur.execute(
-            """
-            SELECT column_name
-            FROM information_schema.columns
-            WHERE table_name = 'math_attempts'
-            """
-        )
-        math_attempt_columns = {row[0] for row in cur.fetchall()}
+        math_attempt_columns = _get_table_columns(cur, "math_attempts")
 
         if {"user_id", "paper_code", "score", "total", "created_at"}.issubset(math_attempt_columns):
             cur.execute(
@@ -1371,13 +1319,14 @@ def spelling_question(
     lesson_id: Optional[int] = None,
     word_id: Optional[int] = None,
     session_id: Optional[str] = None,
-    user=Depends(get_current_user)
+    user=Depends(get_current_user),
+    conn=Depends(get_request_connection, scope="function"),
 ):
     """
     Returns the next spelling word for a lesson
     """
     user_id = _require_user_id(user)
-    _enforce_full_module_access(user, "spelling")
+    _enforce_full_module_access(user, "spelling", conn=conn)
 
     if word_id is not None:
         from app.practice.spelling_engine import get_word_by_id
@@ -1389,12 +1338,17 @@ def spelling_question(
     if lesson_id is None:
         _missing_param("lesson_id")
 
+    prefetched = take_prefetched_question("spelling", user_id, lesson_id, (session_id,), conn=conn)
+    if prefetched:
+        return prefetched
+
     result = _safe_execute(
         "spelling_question",
         get_spelling_question,
         lesson_id=lesson_id,
         user_id=user_id,
         session_id=session_id,
+        conn=conn,
     )
 
     if not result or result.get("word_id") is None:
@@ -1428,16 +1382,12 @@ def words_micro_challenge(
 
 
 @router.get("/engagement")
-def get_engagement(user=Depends(get_current_user)):
-    from app.database import get_connection
-
-    conn = get_connection()
+def get_engagement(user=Depends(get_current_user), conn=Depends(get_request_connection, scope="function")):
     cur = conn.cursor()
 
     user_id = _resolve_learning_user_id(cur, user)
     if not user_id:
         cur.close()
-        conn.close()
         return {"xp": 0, "streak": 0}
 
     try:
@@ -1452,124 +1402,25 @@ def get_engagement(user=Depends(get_current_user)):
         row = None
     if row and ((row[0] or 0) > 0 or (row[1] or 0) > 0):
         cur.close()
-        conn.close()
         return {
             "xp": row[0],
             "streak": row[1]
         }
 
-    def _maybe_add_activity_dates(query: str, params: tuple, collected_dates: set):
-        try:
-            cur.execute(query, params)
-            for activity_day, in cur.fetchall():
-                if activity_day:
-                    collected_dates.add(activity_day)
-        except Exception:
-            logger.exception("Failed to derive engagement activity dates")
-
-    def _maybe_add_attempts(table_name: str, *, user_candidates: list[str], timestamp_candidates: list[str]) -> int:
-        columns = _get_table_columns(cur, table_name)
-        matched_user_columns = [column for column in user_candidates if column in columns]
-        timestamp_column = _first_matching_column(columns, timestamp_candidates)
-
-        if not matched_user_columns:
-            return 0
-
-        where_clause = " OR ".join(f"{column} = %s" for column in matched_user_columns)
-        params = tuple(user_id for _ in matched_user_columns)
-
-        try:
-            cur.execute(
-                f"""
-                SELECT COUNT(*)
-                FROM {table_name}
-                WHERE {where_clause}
-                """,
-                params,
-            )
-            attempts = cur.fetchone()[0] or 0
-        except Exception:
-            logger.exception("Failed to derive engagement attempts from %s", table_name)
-            return 0
-
-        if timestamp_column:
-            _maybe_add_activity_dates(
-                f"""
-                SELECT DISTINCT DATE({timestamp_column})
-                FROM {table_name}
-                WHERE {where_clause}
-                """,
-                params,
-                activity_days,
-            )
-
-        return attempts
-
-    total_attempts = 0
-    activity_days: set = set()
-
     try:
-        total_attempts += _maybe_add_attempts(
-            "spelling_attempts",
-            user_candidates=["user_id"],
-            timestamp_candidates=["created_at", "submitted_at"],
-        )
-
-        words_table = None
-        words_columns = _get_table_columns(cur, "synonym_attempts")
-        if words_columns:
-            words_table = "synonym_attempts"
-        else:
-            words_columns = _get_table_columns(cur, "words_attempts")
-            if words_columns:
-                words_table = "words_attempts"
-
-        if words_table:
-            total_attempts += _maybe_add_attempts(
-                words_table,
-                user_candidates=["user_id"],
-                timestamp_candidates=["created_at", "submitted_at"],
-            )
-
-        total_attempts += _maybe_add_attempts(
-            "math_attempts",
-            user_candidates=["student_id", "user_id"],
-            timestamp_candidates=["created_at", "submitted_at"],
-        )
-
-        total_attempts += _maybe_add_attempts(
-            "comprehension_attempts",
-            user_candidates=["user_id"],
-            timestamp_candidates=["created_at", "submitted_at"],
-        )
+        rollup = get_user_module_rollup(cur, user_id)
+        activity_streak = get_activity_streak(cur, user_id)
     finally:
         cur.close()
-        conn.close()
-
-    sorted_days = sorted(activity_days, reverse=True)
-    today = datetime.utcnow().date()
-    current_streak = 0
-
-    for index, day in enumerate(sorted_days):
-        if index == 0:
-            if day == today or day == today - timedelta(days=1):
-                current_streak = 1
-            else:
-                break
-        elif sorted_days[index - 1] - day == timedelta(days=1):
-            current_streak += 1
-        else:
-            break
 
     return {
-        "xp": total_attempts * 10,
-        "streak": current_streak,
+        "xp": sum(entry["attempts"] for entry in rollup.values()) * 10,
+        "streak": activity_streak["current"],
     }
 
 
 @router.get("/progress/weekly-improvement")
-def get_weekly_improvement(user=Depends(get_current_user)):
-    conn = get_connection()
+def get_weekly_improvement(user=Depends(get_current_user), conn=Depends(get_request_connection, scope="function")):
     cur = conn.cursor()
 
     try:
@@ -1581,45 +1432,12 @@ def get_weekly_improvement(user=Depends(get_current_user)):
                 "improvement": 0.0,
             }
 
-        current_attempts = 0
-        current_correct = 0
-        previous_attempts = 0
-        previous_correct = 0
-
-        table_configs = [
-            ("spelling_attempts", ["user_id"], ["correct"]),
-            ("words_attempts", ["user_id"], ["correct"]),
-            ("math_attempts", ["student_id", "user_id"], ["is_correct", "correct"]),
-            ("comprehension_attempts", ["user_id"], ["correct"]),
-        ]
-
-        for table_name, user_columns, correct_columns in table_configs:
-            attempts, correct = _window_attempt_totals(
-                cur,
-                table_name,
-                user_columns=user_columns,
-                correct_columns=correct_columns,
-                user_id=user_id,
-                days_back_start=7,
-            )
-            current_attempts += attempts
-            current_correct += correct
-
-            attempts, correct = _window_attempt_totals(
-                cur,
-                table_name,
-                user_columns=user_columns,
-                correct_columns=correct_columns,
-                user_id=user_id,
-                days_back_start=14,
-                days_back_end=7,
-            )
-            previous_attempts += attempts
-            previous_correct += correct
+        totals = get_weekly_attempt_totals(cur, user_id)
     finally:
         cur.close()
-        conn.close()
 
+    current_attempts, current_correct = totals["current"]
+    previous_attempts, previous_correct = totals["previous"]
     current = (current_correct / current_attempts) if current_attempts else 0
     previous = (previous_correct / previous_attempts) if previous_attempts else 0
     improvement = current - previous
@@ -1647,41 +1465,48 @@ def submit_words_micro_challenge(
 
     conn = get_connection()
     cur = conn.cursor()
+    try:
+        word_id = payload["word_id"]
+        answers = payload["answers"]
 
-    word_id = payload["word_id"]
-    answers = payload["answers"]
-
-    # Fetch correct answer index (reuse existing structure)
-    cur.execute("""
-        SELECT correct_option_index
-        FROM words
-        WHERE id = %s
-    """, (word_id,))
+        # Fetch correct answer index (reuse existing structure)
+        cur.execute("""
+            SELECT correct_option_index
+            FROM words
+            WHERE id = %s
+        """, (word_id,))
 
-    row = cur.fetchone()
+        row = cur.fetchone()
 
-    if not row:
-        return {"error": "Word not found"}
+        if not row:
+            return {"error": "Word not found"}
 
-    correct_index = row[0]
+        correct_index = row[0]
 
-    correct_count = sum(1 for a in answers if a == correct_index)
-    accuracy = correct_count / len(answers)
-    cur.execute("""
-        SELECT accuracy
-        FROM spelling_word_stats
-        WHERE user_id = %s AND word_id = %s
-    """, (user["user_id"], word_id))
+        correct_count = sum(1 for a in answers if a == correct_index)
+        accuracy = correct_count / len(answers)
+        cur.execute("""
+            SELECT accuracy
+            FROM spelling_word_stats
+            WHERE user_id = %s AND word_id = %s
+        """, (user["user_id"], word_id))
 
-    row_prev = cur.fetchone()
-    previous_accuracy = row_prev[0] if row_prev else 0
-    improvement = accuracy - previous_accuracy
+        row_prev = cur.fetchone()
+        previous_accuracy = row_prev[0] if row_prev else 0
+        improvement = accuracy - previous_accuracy
 
-    xp = int(accuracy * 10)
+        xp = int(accuracy * 10)
 
-    from app.services.engagement_service import update_user_engagement
+        from app.services.engagement_service import update_user_engagement
 
-    engagement = update_user_engagement(user["user_id"], xp)
+        engagement = update_user_engagement(user["user_id"], xp, conn=conn)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
 
     return {
         "correct": correct_count,
@@ -1705,35 +1530,42 @@ def submit_micro_challenge(
 
     conn = get_connection()
     cur = conn.cursor()
+    try:
+        word_id = payload["word_id"]
+        answers = payload["answers"]
 
-    word_id = payload["word_id"]
-    answers = payload["answers"]
-
-    cur.execute("SELECT word FROM spelling_words WHERE id = %s", (word_id,))
-    row = cur.fetchone()
+        cur.execute("SELECT word FROM spelling_words WHERE id = %s", (word_id,))
+        row = cur.fetchone()
 
-    if not row:
-        return {"error": "Word not found"}
+        if not row:
+            return {"error": "Word not found"}
 
-    correct_word = row[0]
+        correct_word = row[0]
 
-    correct_count = sum(1 for a in answers if a.lower() == correct_word.lower())
-    accuracy = correct_count / len(answers)
-    cur.execute("""
-        SELECT accuracy
-        FROM spelling_word_stats
-        WHERE user_id = %s AND word_id = %s
-    """, (user["user_id"], word_id))
+        correct_count = sum(1 for a in answers if a.lower() == correct_word.lower())
+        accuracy = correct_count / len(answers)
+        cur.execute("""
+            SELECT accuracy
+            FROM spelling_word_stats
+            WHERE user_id = %s AND word_id = %s
+        """, (user["user_id"], word_id))
 
-    row_prev = cur.fetchone()
-    previous_accuracy = row_prev[0] if row_prev else 0
-    improvement = accuracy - previous_accuracy
+        row_prev = cur.fetchone()
+        previous_accuracy = row_prev[0] if row_prev else 0
+        improvement = accuracy - previous_accuracy
 
-    xp = int(accuracy * 10)
+        xp = int(accuracy * 10)
 
-    from app.services.engagement_service import update_user_engagement
+        from app.services.engagement_service import update_user_engagement
 
-    engagement = update_user_engagement(user["user_id"], xp)
+        engagement = update_user_engagement(user["user_id"], xp, conn=conn)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
 
     return {
         "correct": correct_count,
@@ -1751,12 +1583,30 @@ def submit_micro_challenge(
 # SpellingSprint Submit Answer
 # -----------------------------
 
+def _prefetch_spelling_question(payload: dict, *, user_id: int, lesson_id, conn) -> None:
+    # Runs inside the submit's transaction, so the selection sees the new attempt.
+    prefetch_next_question(
+        "spelling",
+        user_id,
+        lesson_id,
+        (payload.get("session_id"),),
+        lambda: get_spelling_question(
+            lesson_id=int(lesson_id),
+            user_id=user_id,
+            session_id=payload.get("session_id"),
+            conn=conn,
+        ),
+        ready_key="word_id",
+        conn=conn,
+    )
+
+
 @router.post("/spelling/answer")
-def spelling_answer(payload: dict, user=Depends(get_current_user)):
+def spelling_answer(payload: dict, user=Depends(get_current_user), conn=Depends(get_request_connection, scope="function")):
     """
     Saves spelling attempt and validates answer
     """
-    _enforce_full_module_access(user, "spelling")
+    _enforce_full_module_access(user, "spelling", conn=conn)
     user_id = _require_user_id(user)
     word_id = _require_payload_param(payload, "word_id")
     answer = _require_payload_param(payload, "answer")
@@ -1773,17 +1623,19 @@ def spelling_answer(payload: dict, user=Depends(get_current_user)):
         answer=answer,
         session_id=session_id,
         question_id=question_id,
+        conn=conn,
     )
 
     if not result or not result.get("correct_word"):
         _raise_not_found("Question not found")
 
+    _prefetch_spelling_question(payload, user_id=user_id, lesson_id=lesson_id, conn=conn)
     return result
 
 
 @router.post("/spelling/submit")
-def spelling_submit(payload: dict, user=Depends(get_current_user)):
-    _enforce_full_module_access(user, "spelling")
+def spelling_submit(payload: dict, user=Depends(get_current_user), conn=Depends(get_request_connection, scope="function")):
+    _enforce_full_module_access(user, "spelling", conn=conn)
     user_id = _require_user_id(user)
     word_id = _require_payload_param(payload, "word_id")
     answer = _require_payload_param(payload, "answer")
@@ -1805,11 +1657,13 @@ def spelling_submit(payload: dict, user=Depends(get_current_user)):
         response_ms=response_ms,
         session_id=session_id,
         question_id=question_id,
+        conn=conn,
     )
 
     if not result or not result.get("correct_word"):
         _raise_not_found("Question not found")
 
+    _prefetch_spelling_question(payload, user_id=user_id, lesson_id=lesson_id, conn=conn)
     return result
 
 
@@ -1843,13 +1697,22 @@ def words_courses(user=Depends(get_current_user)):
 
 
 @router.get("/words/question")
-def words_question(lesson_id: Optional[int] = None, user=Depends(get_current_user)):
-    _enforce_full_module_access(user, "general")
+def words_question(
+    lesson_id: Optional[int] = None,
+    user=Depends(get_current_user),
+    conn=Depends(get_request_connection, scope="function"),
+):
+    _enforce_full_module_access(user, "general", conn=conn)
     user_id = _require_user_id(user)
 
     if lesson_id is None:
         _missing_param("lesson_id")
 
+    prefetched = take_prefetched_question("words", user_id, lesson_id, (), conn=conn)
+    if prefetched:
+        return prefetched
+    ensure_attempts_visible(user_id, ("words_attempts",))
+
     result = _safe_execute(
         "words_question",
         get_words_question,
@@ -1864,11 +1727,12 @@ def words_question(lesson_id: Optional[int] = None, user=Depends(get_current_use
 
 
 @router.post("/words/submit")
-def words_submit(payload: dict, user=Depends(get_current_user)):
-    _enforce_full_module_access(user, "general")
+def words_submit(payload: dict, user=Depends(get_current_user), conn=Depends(get_request_connection, scope="function")):
+    _enforce_full_module_access(user, "general", conn=conn)
     user_id = _require_user_id(user)
     word_id = _require_payload_param(payload, "word_id")
     answer = _require_payload_param(payload, "answer")
+    lesson_id = payload.get("lesson_id")
 
     result = _safe_execute(
         "words_submit",
@@ -1876,11 +1740,21 @@ def words_submit(payload: dict, user=Depends(get_current_user)):
         user_id=user_id,
         word_id=word_id,
         answer=answer,
+        lesson_id=lesson_id,
     )
 
     if not result or not result.get("correct_answer"):
         _raise_not_found("Question not found")
 
+    prefetch_next_question(
+        "words",
+        user_id,
+        lesson_id,
+        (),
+        lambda: get_words_question(lesson_id=int(lesson_id), user_id=user_id),
+        ready_key="word_id",
+        conn=conn,
+    )
     return result
 
 # -----------------------------
@@ -1888,14 +1762,19 @@ def words_submit(payload: dict, user=Depends(get_current_user)):
 # -----------------------------
 
 @router.get("/synonym/question")
-def synonym_question(user=Depends(get_current_user)):
-    _enforce_full_module_access(user, "general")
+def synonym_question(user=Depends(get_current_user), conn=Depends(get_request_connection, scope="function")):
+    _enforce_full_module_access(user, "general", conn=conn)
+    ensure_attempts_visible(user.get("user_id"), SYNONYM_ATTEMPT_TABLES)
     return get_synonym_question(user["sub"])
 
 
 @router.post("/synonym/answer")
-def synonym_answer(req: SynonymAnswerRequest, user: dict = Depends(get_current_user)):
-    _enforce_full_module_access(user, "general")
+def synonym_answer(
+    req: SynonymAnswerRequest,
+    user: dict = Depends(get_current_user),
+    conn=Depends(get_request_connection, scope="function"),
+):
+    _enforce_full_module_access(user, "general", conn=conn)
     user_id = user.get("user_id")
     user_email = user.get("sub")
     access_mode = get_words_practice_access_mode(user_email, user_role=user.get("role"))
@@ -1912,14 +1791,16 @@ def synonym_answer(req: SynonymAnswerRequest, user: dict = Depends(get_current_u
 
 
 @router.get("/synonym/progress")
-def synonym_progress(user=Depends(get_current_user)):
-    _enforce_full_module_access(user, "general")
-    return get_synonym_progress(user["sub"])
+def synonym_progress(user=Depends(get_current_user), conn=Depends(get_request_connection, scope="function")):
+    _enforce_full_module_access(user, "general", conn=conn)
+    ensure_attempts_visible(user.get("user_id"), SYNONYM_ATTEMPT_TABLES)
+    return get_synonym_progress(user["sub"], conn=conn)
 
 
 @router.get("/synonym/next-question")
 def synonym_next(user=Depends(get_current_user)):
     _enforce_full_module_access(user, "general")
+    ensure_attempts_visible(user.get("user_id"), SYNONYM_ATTEMPT_TABLES)
     return get_next_synonym_question(user["sub"])
 
 
@@ -1939,6 +1820,7 @@ def start_session(lesson_id: Optional[int] = 7, user=Depends(get_current_user)):
     if lesson_id is None:
         lesson_id = 7
 
+    ensure_attempts_visible(user.get("user_id"), SYNONYM_ATTEMPT_TABLES)
     return get_practice_session(user["sub"], lesson_id, user_role=user.get("role"))
 
 
@@ -1966,6 +1848,7 @@ def session_next(lesson_id: Optional[int] = None, user=Depends(get_current_user)
     Returns next question in session.
     """
     _enforce_full_module_access(user, "general")
+    ensure_attempts_visible(user.get("user_id"), SYNONYM_ATTEMPT_TABLES)
     return get_next_session_question(user["sub"], lesson_id, user_role=user.get("role"))
 
 
@@ -1973,9 +1856,9 @@ def session_next(lesson_id: Optional[int] = None, user=Depends(get_current_user)
 # Dashboard
 # -----------------------------
 
-def get_dashboard_stats(user):
+def get_dashboard_stats(user, conn=None):
     user_email = user.get("sub")
-    progress = get_synonym_progress(user_email)
+    progress = {"mastered_words": 0, "words_due": 0, "total_attempts": 0, "accuracy": 0.0}
     is_admin = user.get("role") == "admin"
     entitled_apps: set[str] = set()
     modules = {
@@ -1985,122 +1868,56 @@ def get_dashboard_stats(user):
         "comprehension": {"unlocked": False, "attempts": 0, "accuracy": 0},
     }
 
-    conn = None
+    owns_connection = conn is None
     cursor = None
 
     try:
-        conn = get_connection()
+        if owns_connection:
+            conn = get_connection()
         cursor = conn.cursor()
 
         user_id = _resolve_learning_user_id(cursor, user)
-        member_id = None
-        if user_email:
-            cursor.execute(
-                """
-                SELECT id
-                FROM kiaro_membership.members
-                WHERE LOWER(email) = LOWER(%s)
-                ORDER BY id DESC
-                LIMIT 1
-                """,
-                (user_email,),
-            )
-            member_row = cursor.fetchone()
-            member_id = member_row[0] if member_row else None
 
         if is_admin:
             entitled_apps = {"spelling", "general", "math", "comprehension"}
-        elif member_id:
-            cursor.execute(
-                """
-                SELECT app_code
-                FROM kiaro_membership.member_apps
-                WHERE member_id = %s
-                """,
-                (member_id,),
-            )
-            entitled_apps = {row[0] for row in cursor.fetchall() if row and row[0]}
+        else:
+            member_ids = get_member_ids_for_email(user_email, conn=conn)
+            if member_ids:
+                entitled_apps = set(get_member_entitlements(member_ids[-1], conn=conn).app_codes)
 
         if user_id:
-            cursor.execute("""
-            SELECT
-            COUNT(*) as attempts,
-            COALESCE(AVG(CASE WHEN correct THEN 1 ELSE 0 END) * 100, 0)
-            FROM spelling_attempts
-            WHERE user_id = %s
-            """, (user_id,))
-
-            row = cursor.fetchone()
-
-            spelling_attempts = row[0] or 0
-            spelling_accuracy = round(row[1] or 0, 2)
-
-            modules["spelling"] = {
-                "unlocked": ("spelling" in entitled_apps),
-                "attempts": spelling_attempts,
-                "accuracy": spelling_accuracy
-            }
-
-            synonym_summary = get_synonym_attempt_summary(user_id)
-
-            modules["words"] = {
-                "unlocked": ("general" in entitled_apps),
-                "attempts": synonym_summary["attempts"],
-                "accuracy": synonym_summary["accuracy"],
-            }
-
-            math_attempt_columns = _get_table_columns(cursor, "math_attempts")
-            math_user_columns = [column for column in ("student_id", "user_id") if column in math_attempt_columns]
-            math_correct_column = _first_matching_column(math_attempt_columns, ["correct", "is_correct"])
-
-            if math_user_columns and math_correct_column:
-                math_where_clause = " OR ".join(f"{column} = %s" for column in math_user_columns)
-                math_params = tuple(user_id for _ in math_user_columns)
-                cursor.execute(
-                    f"""
-                    SELECT
-                    COUNT(*) as attempts,
-                    COALESCE(AVG(CASE WHEN {math_correct_column} THEN 1 ELSE 0 END) * 100, 0)
-                    FROM math_attempts
-                    WHERE {math_where_clause}
-                    """,
-                    math_params,
-                )
-                row = cursor.fetchone()
-            else:
-                row = (0, 0)
-
-            modules["maths"] = {
-                "unlocked": ("math" in entitled_apps),
-                "attempts": row[0] or 0,
-                "accuracy": round(row[1] or 0, 2)
-            }
-
-            cursor.execute("""
-            SELECT
-            COUNT(*) as attempts,
-            COALESCE(AVG(CASE WHEN correct THEN 1 ELSE 0 END) * 100, 0)
-            FROM comprehension_attempts
-            WHERE user_id = %s
-            """, (user_id,))
-
-            row = cursor.fetchone()
-
-            comprehension_attempts = row[0] or 0
-            comprehension_accuracy = round(row[1] or 0, 2)
+            # Attempt counts for every module plus the synonym word stats, in one read.
+            rollup = get_user_module_rollup(cursor, user_id, word_stats=bool(user_email))
+
+            if user_email:
+                words_attempts = rollup["words"]["attempts"]
+                progress = {
+                    "mastered_words": rollup["word_stats"]["mastered"],
+                    "words_due": rollup["word_stats"]["due"],
+                    "total_attempts": words_attempts,
+                    "accuracy": (round(float(rollup["words"]["accuracy"]), 2) / 100.0) if words_attempts else 0.0,
+                }
 
-            modules["comprehension"] = {
-                "unlocked": ("comprehension" in entitled_apps),
-                "attempts": comprehension_attempts,
-                "accuracy": comprehension_accuracy
-            }
+            for key, rollup_module, app_code in (
+                ("spelling", "spelling", "spelling"),
+                ("words", "words", "general"),
+                ("maths", "math", "math"),
+                ("comprehension", "comprehension", "comprehension"),
+            ):
+                accuracy = rollup[rollup_module]["accuracy"]
+                modules[key] = {
+                    "unlocked": (app_code in entitled_apps),
+                    "attempts": rollup[rollup_module]["attempts"],
+                    # words came from the synonym summary, which rounds a float.
+                    "accuracy": round(float(accuracy), 2) if key == "words" else round(accuracy or 0, 2),
+                }
 
     except Exception as e:
         print("Dashboard stats error:", e)
     finally:
         if cursor:
             cursor.close()
-        if conn:
+        if owns_connection and conn:
             conn.close()
 
     def compute_module_meta(module):
@@ -2158,16 +1975,15 @@ def get_dashboard_stats(user):
 
 
 @router.get("/dashboard")
-def dashboard(user=Depends(get_current_user)):
+def dashboard(user=Depends(get_current_user), conn=Depends(get_request_connection, scope="function")):
     """
     Returns student progress summary
     across learning modules.
     """
-    return get_dashboard_stats(user)
+    return get_dashboard_stats(user, conn=conn)
 
 @router.get("/resume")
-def get_resume_learning(user=Depends(get_current_user)):
-    conn = get_connection()
+def get_resume_learning(user=Depends(get_current_user), conn=Depends(get_request_connection, scope="function")):
     cur = conn.cursor()
 
     result = {
@@ -2203,7 +2019,7 @@ def get_resume_learning(user=Depends(get_current_user)):
 
         # WORDSPRINT
         try:
-            latest_word_id = get_latest_synonym_attempt_word_id(user_id)
+            latest_word_id = get_latest_synonym_attempt_word_id(user_id, conn=conn)
 
             if latest_word_id:
                 result["words"] = {
@@ -2268,11 +2084,10 @@ def get_resume_learning(user=Depends(get_current_user)):
 
     finally:
         cur.close()
-        conn.close()
 
 
 @router.get("/{module}/resume")
-def get_module_resume(module: str, user=Depends(get_current_user)):
+def get_module_resume(module: str, user=Depends(get_current_user), conn=Depends(get_request_connection, scope="function")):
     module_access_map = {
         "spelling": "spelling",
         "words": "general",
@@ -2283,11 +2098,10 @@ def get_module_resume(module: str, user=Depends(get_current_user)):
     }
     required_app_code = module_access_map.get((module or "").strip().lower())
     if required_app_code:
-        _enforce_full_module_access(user, required_app_code)
+        _enforce_full_module_access(user, required_app_code, conn=conn)
 
     user_id = _require_user_id(user)
 
-    conn = get_connection()
     cur = conn.cursor()
 
     try:
@@ -2302,7 +2116,6 @@ def get_module_resume(module: str, user=Depends(get_current_user)):
         raise HTTPException(status_code=500, detail="Internal error. Please try again.")
     finally:
         cur.close()
-        conn.close()
 
 
 @router.get("/spelling/test")
@@ -2468,151 +2281,158 @@ def start_comprehension(
     }
 
 
-@router.get("/comprehension/question")
-def get_comprehension_question(
-    passage_id: Optional[int] = None,
-    question_id: Optional[int] = None,
-    exclude_question_id: Optional[int] = None,
-    user=Depends(get_current_user),
+def _select_comprehension_question(
+    conn,
+    cur,
+    *,
+    user_id: int,
+    passage_id: int,
+    question_id: int | None = None,
+    exclude_question_id: int | None = None,
 ):
-    _enforce_full_module_access(user, "comprehension")
-    if passage_id is None:
-        _missing_param("passage_id")
+    selected_question_id = None
+    review_reason = None
+    attempt_count = 0
+    recent_question_id = None
+    effective_exclude_question_ids: list[int] = _unique_question_ids(exclude_question_id)
+    ordered_question_ids: list[int] = []
 
-    user_id = _require_user_id(user)
+    passage_questions = get_ordered_passage_questions(cur, passage_id)
+    ordered_question_ids = [row[0] for row in passage_questions if row and row[0] is not None]
 
-    conn = get_connection()
-    cur = conn.cursor()
+    recent_question_id, attempt_count = _get_recent_comprehension_attempt(
+        cur,
+        user_id,
+        passage_id,
+    )
 
-    try:
-        selected_question_id = None
-        review_reason = None
-        attempt_count = 0
-        recent_question_id = None
-        effective_exclude_question_ids: list[int] = _unique_question_ids(exclude_question_id)
-        ordered_question_ids: list[int] = []
+    session_result = None
+    if not effective_exclude_question_ids:
+        session_result = start_passage(passage_id, user_id)
 
-        cur.execute(
-            """
-            SELECT question_id
-            FROM comprehension_questions
-            WHERE passage_id = %s
-            ORDER BY sort_order ASC, question_id ASC
-            """,
-            (passage_id,),
-        )
-        ordered_question_ids = [row[0] for row in cur.fetchall() if row and row[0] is not None]
+    effective_exclude_question_ids = _resolve_comprehension_question_exclusions(
+        explicit_exclude_question_id=exclude_question_id,
+        recent_question_id=recent_question_id,
+        questions=session_result.get("questions") if isinstance(session_result, dict) else [],
+    )
+    excluded_question_id_set = set(effective_exclude_question_ids)
 
-        recent_question_id, attempt_count = _get_recent_comprehension_attempt(
-            cur,
-            user_id,
-            passage_id,
+    if question_id is not None:
+        if question_id not in ordered_question_ids:
+            _raise_not_found("Question not found")
+        selected_question_id = question_id
+
+    if selected_question_id is None:
+        next_question = get_next_comprehension_question(
+            user_id=user_id,
+            passage_id=passage_id,
+            conn=conn,
+            cooldown_distance=3,
+            exclude_question_ids=effective_exclude_question_ids or None,
         )
+        if next_question and next_question["question_id"] not in excluded_question_id_set:
+            selected_question_id = next_question["question_id"]
+            attempt_count = max(attempt_count, int(next_question.get("attempt_count") or 0))
+
+    if not selected_question_id:
+        if ordered_question_ids:
+            selected_question_id = next(
+                (
+                    candidate_question_id
+                    for candidate_question_id in ordered_question_ids
+                    if candidate_question_id not in excluded_question_id_set
+                ),
+                ordered_question_ids[0],
+            )
+
+    if not selected_question_id:
+        _raise_not_found("Question not found")
 
-        session_result = None
-        if not effective_exclude_question_ids:
-            session_result = start_passage(passage_id, user_id)
+    question = next((row for row in passage_questions if row[0] == selected_question_id), None)
 
-        effective_exclude_question_ids = _resolve_comprehension_question_exclusions(
-            explicit_exclude_question_id=exclude_question_id,
-            recent_question_id=recent_question_id,
-            questions=session_result.get("questions") if isinstance(session_result, dict) else [],
+    if question_id is not None and not question:
+        _raise_not_found("Question not found")
+
+    if not question:
+        question = next(
+            (
+                row
+                for row in passage_questions
+                if row and row[0] not in excluded_question_id_set
+            ),
+            None,
         )
-        excluded_question_id_set = set(effective_exclude_question_ids)
+        review_reason = None
 
-        if question_id is not None:
-            if question_id not in ordered_question_ids:
-                _raise_not_found("Question not found")
-            selected_question_id = question_id
+    if not question and passage_questions:
+        question = passage_questions[0]
+
+    if not question:
+        _raise_not_found("Question not found")
+
+    payload = {
+        "question_id": question[0],
+        "question_text": question[1],
+        "options": [question[2], question[3], question[4], question[5]],
+    }
+
+    return _add_review_metadata(
+        payload,
+        review_reason,
+        question_position=attempt_count + 1,
+        cooldown_distance=REVIEW_COOLDOWN_WINDOW if review_reason else None,
+    )
 
-        if selected_question_id is None:
-            next_question = get_next_comprehension_question(
+
+def _comprehension_prefetch_selector(conn, *, user_id: int, passage_id: int, exclude_question_id: int):
+    def select():
+        cur = conn.cursor()
+        try:
+            return _select_comprehension_question(
+                conn,
+                cur,
                 user_id=user_id,
                 passage_id=passage_id,
-                conn=conn,
-                cooldown_distance=3,
-                exclude_question_ids=effective_exclude_question_ids or None,
+                exclude_question_id=exclude_question_id,
             )
-            if next_question and next_question["question_id"] not in excluded_question_id_set:
-                selected_question_id = next_question["question_id"]
-                attempt_count = max(attempt_count, int(next_question.get("attempt_count") or 0))
-
-        if not selected_question_id:
-            if ordered_question_ids:
-                selected_question_id = next(
-                    (
-                        candidate_question_id
-                        for candidate_question_id in ordered_question_ids
-                        if candidate_question_id not in excluded_question_id_set
-                    ),
-                    ordered_question_ids[0],
-                )
+        except HTTPException:
+            return None
+        finally:
+            cur.close()
 
-        if not selected_question_id:
-            _raise_not_found("Question not found")
+    return select
 
-        cur.execute(
-            """
-            SELECT question_id, question_text, option_a, option_b, option_c, option_d
-            FROM comprehension_questions
-            WHERE question_id = %s
-              AND passage_id = %s
-            LIMIT 1
-            """,
-            (selected_question_id, passage_id),
-        )
-        question = cur.fetchone()
 
-        if question_id is not None and not question:
-            _raise_not_found("Question not found")
-
-        if not question:
-            cur.execute(
-                """
-                SELECT question_id, question_text, option_a, option_b, option_c, option_d
-                FROM comprehension_questions
-                WHERE passage_id = %s
-                ORDER BY sort_order ASC, question_id ASC
-                """,
-                (passage_id,),
-            )
-            question = next(
-                (
-                    row
-                    for row in cur.fetchall()
-                    if row and row[0] not in excluded_question_id_set
-                ),
-                None,
-            )
-            review_reason = None
+@router.get("/comprehension/question")
+def get_comprehension_question(
+    passage_id: Optional[int] = None,
+    question_id: Optional[int] = None,
+    exclude_question_id: Optional[int] = None,
+    user=Depends(get_current_user),
+    conn=Depends(get_request_connection, scope="function"),
+):
+    _enforce_full_module_access(user, "comprehension", conn=conn)
+    if passage_id is None:
+        _missing_param("passage_id")
 
-        if not question:
-            cur.execute(
-                """
-                SELECT question_id, question_text, option_a, option_b, option_c, option_d
-                FROM comprehension_questions
-                WHERE passage_id = %s
-                ORDER BY sort_order ASC, question_id ASC
-                LIMIT 1
-                """,
-                (passage_id,),
-            )
-            question = cur.fetchone()
+    user_id = _require_user_id(user)
 
-        if not question:
-            _raise_not_found("Question not found")
+    if question_id is None:
+        prefetched = take_prefetched_question("comprehension", user_id, passage_id, (exclude_question_id,), conn=conn)
+        if prefetched:
+            return prefetched
+    ensure_attempts_visible(user_id, ("comprehension_attempts",))
 
-        payload = {
-            "question_id": question[0],
-            "question_text": question[1],
-            "options": [question[2], question[3], question[4], question[5]],
-        }
+    cur = conn.cursor()
 
-        return _add_review_metadata(
-            payload,
-            review_reason,
-            question_position=attempt_count + 1,
-            cooldown_distance=REVIEW_COOLDOWN_WINDOW if review_reason else None,
+    try:
+        return _select_comprehension_question(
+            conn,
+            cur,
+            user_id=user_id,
+            passage_id=passage_id,
+            question_id=question_id,
+            exclude_question_id=exclude_question_id,
         )
 
     except HTTPException:
@@ -2622,7 +2442,6 @@ def get_comprehension_question(
         raise HTTPException(status_code=500, detail="Internal error. Please try again.")
     finally:
         cur.close()
-        conn.close()
 
 
 @router.get("/comprehension/passage-summary")
@@ -2723,8 +2542,8 @@ def get_next_passage(current_passage_id: int, user=Depends(get_current_user)):
 
 
 @router.post("/comprehension/answer")
-def submit_comprehension_answer(payload: dict, user=Depends(get_current_user)):
-    _enforce_full_module_access(user, "comprehension")
+def submit_comprehension_answer(payload: dict, user=Depends(get_current_user), conn=Depends(get_request_connection, scope="function")):
+    _enforce_full_module_access(user, "comprehension", conn=conn)
     user_id = _require_user_id(user)
     passage_id = _require_payload_param(payload, "passage_id")
     question_id = _require_payload_param(payload, "question_id")
@@ -2736,7 +2555,7 @@ def submit_comprehension_answer(payload: dict, user=Depends(get_current_user)):
     if not question or question.get("passage_id") != passage_id:
         _raise_not_found("Question not found")
 
-    return _safe_execute(
+    result = _safe_execute(
         "submit_comprehension_answer",
         submit_answer,
         user_id=user_id,
@@ -2744,6 +2563,21 @@ def submit_comprehension_answer(payload: dict, user=Depends(get_current_user)):
         question_id=question_id,
         selected_answer=selected_answer,
     )
+    prefetch_next_question(
+        "comprehension",
+        user_id,
+        passage_id,
+        (question_id,),
+        _comprehension_prefetch_selector(
+            conn,
+            user_id=user_id,
+            passage_id=passage_id,
+            exclude_question_id=question_id,
+        ),
+        ready_key="question_id",
+        conn=conn,
+    )
+    return result
 
 
 @router.post("/comprehension/upload")
@@ -2809,6 +2643,7 @@ def upload_comprehension_csv(
                     row.get("question_type", "comprehension"),
                     int(row.get("sort_order") or 0)
                 ))
+            invalidate_lesson_content("comprehension", cur=cur)
             conn.commit()
         finally:
             cur.close()
@@ -2871,6 +2706,7 @@ def delete_comprehension_passage(passage_id: int, user=Depends(get_current_user)
     try:
         cur.execute("DELETE FROM comprehension_questions WHERE passage_id = %s", (passage_id,))
         cur.execute("DELETE FROM comprehension_passages WHERE passage_id = %s", (passage_id,))
+        invalidate_lesson_content("comprehension", passage_id, cur=cur)
         conn.commit()
         return {"status": "deleted"}
     finally:
@@ -2890,6 +2726,8 @@ def toggle_comprehension_passage(passage_id: int, user=Depends(get_current_user)
             (passage_id,)
         )
         row = cur.fetchone()
+        if row:
+            invalidate_lesson_content("comprehension", passage_id, cur=cur)
         conn.commit()
         if not row:
             raise HTTPException(status_code=404, detail="Passage not found")
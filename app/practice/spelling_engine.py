@@ -2,31 +2,19 @@ import random
 import uuid
 import json
 import logging
+import threading
+import time
 from datetime import datetime, timezone, timedelta
 
 from app.database import get_connection
 from app.repositories.spelling_repository import (
-    get_resume_word_id,
-    get_weak_word_id,
-    get_lesson_id_for_word,
-    get_spelling_lesson_item_count,
-    get_session_recent_word_ids,
-    get_session_word_positions,
-    get_latest_attempt_summary,
-    has_prior_incorrect_attempt,
     is_word_eligible_for_review,
-    is_word_mastered,
-    get_word_timing_stats,
-    get_next_unmastered_word,
-    get_next_lesson_word_after,
     get_spelling_next_item,
     get_spelling_micro_challenge_data,
     get_spelling_word_details,
-    record_spelling_attempt,
-)
-from app.repositories.spelling_stats_repository import (
-    get_spelling_weak_pattern,
-    update_spelling_pattern_stats,
+    load_spelling_answer_context,
+    load_spelling_selection_context,
+    write_spelling_answer,
 )
 
 
@@ -36,6 +24,9 @@ SESSION_BOOTSTRAP_GAP = timedelta(minutes=15)
 REVIEW_COOLDOWN_DISTANCE = 5
 SESSION_RECENT_WINDOW = REVIEW_COOLDOWN_DISTANCE
 
+_answer_stats_lock = threading.Lock()
+_answer_stats = {"answers": 0, "stages": {}}
+
 
 def _build_session_state(*, is_review: bool, review_reason: str | None, question_position: int, cooldown_distance: int | None):
     return {
@@ -167,31 +158,23 @@ def _is_session_bootstrap(latest_attempt_summary) -> bool:
     return datetime.now(timezone.utc) - created_at > SESSION_BOOTSTRAP_GAP
 
 
+def _get_word_details(context, word_id: int, conn):
+    # Review words come from attempts and may have left the lesson since.
+    return context.word_details(word_id) or get_spelling_word_details(word_id=word_id, conn=conn)
+
+
 def _build_progression_candidate(
-    user_id: int,
-    lesson_id: int,
+    context,
     conn,
     latest_attempt_summary,
     session_bootstrap: bool,
 ):
-    resume_word_id = get_resume_word_id(
-        user_id=user_id,
-        lesson_id=lesson_id,
-        conn=conn,
-    )
+    resume_word_id = context.resume_word_id()
     latest_attempted_word_id = latest_attempt_summary["word_id"] if latest_attempt_summary else None
     next_progression_word_id = None
     if latest_attempted_word_id:
-        next_progression_word_id = get_next_lesson_word_after(
-            lesson_id=lesson_id,
-            current_word_id=latest_attempted_word_id,
-            conn=conn,
-        )
-    next_unmastered_word_id = get_next_unmastered_word(
-        user_id=user_id,
-        lesson_id=lesson_id,
-        conn=conn,
-    )
+        next_progression_word_id = context.next_lesson_word_after(latest_attempted_word_id)
+    next_unmastered_word_id = context.next_unmastered_word_id()
 
     if session_bootstrap:
         progression_word_id = resume_word_id or next_unmastered_word_id
@@ -208,32 +191,17 @@ def _build_progression_candidate(
     if not progression_word_id:
         return None, resume_word_id, next_unmastered_word_id
 
-    progression_word = get_spelling_word_details(
-        word_id=progression_word_id,
-        conn=conn,
-    )
+    progression_word = _get_word_details(context, progression_word_id, conn)
     if not progression_word:
         return None, resume_word_id, next_unmastered_word_id
 
-    timing_stats = get_word_timing_stats(
-        user_id=user_id,
-        lesson_id=lesson_id,
-        word_id=progression_word_id,
-        conn=conn,
-    )
-    mastered = is_word_mastered(
-        user_id=user_id,
-        lesson_id=lesson_id,
-        word_id=progression_word_id,
-        conn=conn,
-    )
     return (
         {
             "item": progression_word,
             "selection_strategy": selected_strategy,
             "selection_score": 50 if selected_strategy == "resume" else 40,
-            "timing": timing_stats,
-            "mastered": mastered,
+            "timing": context.word_timing_stats(progression_word_id),
+            "mastered": context.is_word_mastered(progression_word_id),
         },
         resume_word_id,
         next_unmastered_word_id,
@@ -241,24 +209,15 @@ def _build_progression_candidate(
 
 
 def _build_review_candidate(
-    user_id: int,
-    lesson_id: int,
+    context,
     conn,
     session_recent_word_ids: list[int],
 ):
-    weak_word_id = get_weak_word_id(
-        user_id=user_id,
-        lesson_id=lesson_id,
-        conn=conn,
-        exclude_word_ids=session_recent_word_ids,
-    )
+    weak_word_id = context.weak_word_id(exclude_word_ids=session_recent_word_ids)
     if not weak_word_id:
         return None
 
-    weak_word = get_spelling_word_details(
-        word_id=weak_word_id,
-        conn=conn,
-    )
+    weak_word = _get_word_details(context, weak_word_id, conn)
     if not weak_word:
         return None
 
@@ -266,18 +225,8 @@ def _build_review_candidate(
         "item": weak_word,
         "selection_strategy": "review",
         "selection_score": 100,
-        "timing": get_word_timing_stats(
-            user_id=user_id,
-            lesson_id=lesson_id,
-            word_id=weak_word_id,
-            conn=conn,
-        ),
-        "mastered": is_word_mastered(
-            user_id=user_id,
-            lesson_id=lesson_id,
-            word_id=weak_word_id,
-            conn=conn,
-        ),
+        "timing": context.word_timing_stats(weak_word_id),
+        "mastered": context.is_word_mastered(weak_word_id),
         "word_id": weak_word_id,
     }
 
@@ -347,17 +296,27 @@ def _get_lesson_attempt_count(user_id: int, lesson_id: int, conn) -> int:
     return int(row[0] or 0) if row else 0
 
 
-def get_spelling_question(lesson_id: int, user_id: int, session_id: str | None = None):
+def get_spelling_question(
+    lesson_id: int,
+    user_id: int,
+    session_id: str | None = None,
+    conn=None,
+    selection_context=None,
+):
+    """
+    Next spelling word for the learner. Selection runs over one
+    SpellingSelectionContext snapshot (see load_spelling_selection_context);
+    pass selection_context to replay a selection against another source.
+    """
+    owns_connection = conn is None
     try:
         print("Lesson ID:", lesson_id)
-        conn = get_connection()
+        if owns_connection:
+            conn = get_connection()
         try:
-            lesson_item_count = get_spelling_lesson_item_count(lesson_id, conn=conn)
-            latest_attempt_summary = get_latest_attempt_summary(
-                user_id=user_id,
-                lesson_id=lesson_id,
-                conn=conn,
-            )
+            context = selection_context or load_spelling_selection_context(user_id, lesson_id, conn)
+            lesson_item_count = context.lesson_item_count
+            latest_attempt_summary = context.latest_attempt_summary()
             session_bootstrap = _is_session_bootstrap(latest_attempt_summary)
             active_session_id = (
                 session_id
@@ -368,38 +327,24 @@ def get_spelling_question(lesson_id: int, user_id: int, session_id: str | None =
                 )
                 or str(uuid.uuid4())
             )
-            session_positions = get_session_word_positions(
-                user_id=user_id,
-                lesson_id=lesson_id,
-                session_id=active_session_id,
-                conn=conn,
-            )
+            session_positions = context.session_word_positions(active_session_id)
             current_question_position = int(session_positions["question_position"] or 1)
-            session_recent_word_ids = get_session_recent_word_ids(
-                user_id=user_id,
-                lesson_id=lesson_id,
-                session_id=active_session_id,
-                conn=conn,
+            session_recent_word_ids = context.session_recent_word_ids(
+                active_session_id,
                 limit=SESSION_RECENT_WINDOW,
             )
             recent_attempt_word_id_set = set(session_recent_word_ids)
 
             progression_candidate, resume_word_id, next_unmastered_word_id = _build_progression_candidate(
-                user_id=user_id,
-                lesson_id=lesson_id,
-                conn=conn,
+                context,
+                conn,
                 latest_attempt_summary=latest_attempt_summary,
                 session_bootstrap=session_bootstrap,
             )
-            blocked_review_word_id = get_weak_word_id(
-                user_id=user_id,
-                lesson_id=lesson_id,
-                conn=conn,
-            )
+            blocked_review_word_id = context.weak_word_id()
             review_candidate = _build_review_candidate(
-                user_id=user_id,
-                lesson_id=lesson_id,
-                conn=conn,
+                context,
+                conn,
                 session_recent_word_ids=session_recent_word_ids,
             )
             review_candidate_word_id = review_candidate["word_id"] if review_candidate else None
@@ -462,6 +407,7 @@ def get_spelling_question(lesson_id: int, user_id: int, session_id: str | None =
                     lesson_id,
                     recent_word_ids=session_recent_word_ids,
                     last_word_id=session_recent_word_ids[0] if session_recent_word_ids else None,
+                    conn=conn,
                 )
                 selected_strategy = item.get("_selection_strategy", "fallback") if item else "fallback"
                 best_score = 0
@@ -493,29 +439,14 @@ def get_spelling_question(lesson_id: int, user_id: int, session_id: str | None =
                 }, None, question_position=current_question_position)
 
             if selected_strategy == "fallback":
-                mastered = is_word_mastered(
-                    user_id=user_id,
-                    lesson_id=lesson_id,
-                    word_id=item["word_id"],
-                    conn=conn,
-                )
-                selected_timing_stats = get_word_timing_stats(
-                    user_id=user_id,
-                    lesson_id=lesson_id,
-                    word_id=item["word_id"],
-                    conn=conn,
-                )
+                mastered = context.is_word_mastered(item["word_id"])
+                selected_timing_stats = context.word_timing_stats(item["word_id"])
 
-            weak_pattern = get_spelling_weak_pattern(user_id)
+            weak_pattern = context.weak_pattern
             patterns = [weak_pattern] if weak_pattern else None
             question_id = str(uuid.uuid4())
             selected_word_id = item["word_id"]
-            prior_incorrect_attempt = has_prior_incorrect_attempt(
-                user_id=user_id,
-                lesson_id=lesson_id,
-                word_id=selected_word_id,
-                conn=conn,
-            )
+            prior_incorrect_attempt = context.has_prior_incorrect_attempt(selected_word_id)
             outside_cooldown = selected_word_id not in recent_attempt_word_id_set
             review_reason = None
             if prior_incorrect_attempt and outside_cooldown and selected_from_spaced_review:
@@ -576,7 +507,8 @@ def get_spelling_question(lesson_id: int, user_id: int, session_id: str | None =
                 cooldown_distance=REVIEW_COOLDOWN_DISTANCE if review_reason else None,
             )
         finally:
-            conn.close()
+            if owns_connection:
+                conn.close()
 
     except Exception as e:
         print("SPELLING QUESTION ERROR:", str(e))
@@ -660,6 +592,30 @@ def build_micro_challenge(user_id: int, word_id: int):
     }
 
 
+def _record_answer_timings(timings_ms: dict) -> None:
+    with _answer_stats_lock:
+        _answer_stats["answers"] += 1
+        for stage, elapsed_ms in timings_ms.items():
+            stage_stats = _answer_stats["stages"].setdefault(stage, {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+            stage_stats["count"] += 1
+            stage_stats["total_ms"] += elapsed_ms
+            stage_stats["max_ms"] = max(stage_stats["max_ms"], elapsed_ms)
+
+
+def get_spelling_answer_stats() -> dict:
+    """Per-stage timings of submit_spelling_answer: lookup (one query), evaluate, write (one round trip), total."""
+    with _answer_stats_lock:
+        stages = {
+            stage: {
+                "count": values["count"],
+                "avg_ms": round(values["total_ms"] / values["count"], 2) if values["count"] else 0.0,
+                "max_ms": round(values["max_ms"], 2),
+            }
+            for stage, values in _answer_stats["stages"].items()
+        }
+        return {"answers": _answer_stats["answers"], "stages": stages}
+
+
 def submit_spelling_answer(
     word_id: int,
     answer: str,
@@ -668,9 +624,21 @@ def submit_spelling_answer(
     session_id: str | None = None,
     question_id: str | None = None,
     lesson_id: int | None = None,
+    conn=None,
 ):
     try:
-        details = get_spelling_word_details(word_id)
+        timings_ms = {}
+        started_at = stage_started_at = time.perf_counter()
+
+        def _stage_done(stage: str) -> None:
+            nonlocal stage_started_at
+            now = time.perf_counter()
+            timings_ms[stage] = (now - stage_started_at) * 1000
+            stage_started_at = now
+
+        # Word, weakest pattern and fallback lesson in one query.
+        details = load_spelling_answer_context(user_id, word_id, conn=conn)
+        _stage_done("lookup")
         if not details:
             return {
                 "correct": False,
@@ -687,28 +655,30 @@ def submit_spelling_answer(
         pattern_hint = None
 
         if not correct:
-            pattern = get_spelling_weak_pattern(user_id)
+            pattern = details["weak_pattern"]
             if pattern and pattern in clean_correct_word.lower():
                 pattern_hint = f"Focus on pattern '{pattern}'"
 
-        resolved_lesson_id = lesson_id or get_lesson_id_for_word(word_id)
+        resolved_lesson_id = lesson_id or details["lesson_id"]
+        _stage_done("evaluate")
 
-        record_spelling_attempt(
+        # Attempt, word stats, pattern stats and counters in one transaction and round trip.
+        write_spelling_answer(
             user_id=user_id,
-            lesson_id=resolved_lesson_id,
             word_id=word_id,
             submitted_text=answer,
             correct=correct,
+            correct_word=details["word"],
+            patterns=extract_patterns(clean_correct_word),
             response_ms=response_ms,
             session_id=session_id,
             question_id=question_id,
+            lesson_id=resolved_lesson_id,
+            conn=conn,
         )
-
-        update_spelling_pattern_stats(
-            user_id,
-            extract_patterns(clean_correct_word),
-            correct,
-        )
+        _stage_done("write")
+        timings_ms["total"] = (time.perf_counter() - started_at) * 1000
+        _record_answer_timings(timings_ms)
 
         return {
             "correct": correct,
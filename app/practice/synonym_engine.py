@@ -1,3 +1,6 @@
+from datetime import datetime, timezone
+
+from app.attempt_queue import StatementRecorder, enqueue_attempt, ensure_attempts_visible, write_behind_enabled
 from app.database import get_connection
 import random
 from fastapi import HTTPException
@@ -7,6 +10,12 @@ from app.repositories.synonym_repository import (
     normalize_synonym_list,
 )
 from app.entitlements import email_has_member_app_access
+from app.content_cache import get_lesson_content
+from app.repositories.daily_attempts_repository import record_daily_attempt
+from app.repositories.mastery_repository import record_word_lessons_mastery_attempt
+from app.repositories.module_rollup_repository import SYNONYM_ATTEMPT_TABLES, record_word_module_attempt
+from app.sampling import has_random_key, pick_candidate, sample_rows
+from app.schema_registry import get_table_columns
 
 
 REVIEW_ENCOURAGEMENT_MESSAGE = "Let's practise this one again - you were close last time."
@@ -108,38 +117,12 @@ def get_words_practice_access_mode(user_email, user_role=None):
     return "full" if email_has_member_app_access(user_email, {"general"}) else "preview"
 
 
-def _table_exists(cur, table_name):
-    cur.execute(
-        """
-        SELECT 1
-        FROM information_schema.tables
-        WHERE table_schema = 'public'
-          AND table_name = %s
-        LIMIT 1
-        """,
-        (table_name,),
-    )
-    return cur.fetchone() is not None
-
-
-def _get_table_columns(cur, table_name):
-    cur.execute(
-        """
-        SELECT column_name
-        FROM information_schema.columns
-        WHERE table_schema = 'public'
-          AND table_name = %s
-        """,
-        (table_name,),
-    )
-    return {row[0] for row in cur.fetchall()}
-
-
 def _resolve_synonym_attempt_store(cur):
-    for table_name in ("synonym_attempts", "words_attempts"):
-        if _table_exists(cur, table_name):
-            return table_name, _get_table_columns(cur, table_name)
-    return None, set()
+    for table_name in SYNONYM_ATTEMPT_TABLES:
+        columns = get_table_columns(table_name, schema="public", cur=cur)
+        if columns:
+            return table_name, columns
+    return None, frozenset()
 
 
 def _get_synonym_correct_column(columns):
@@ -158,13 +141,13 @@ def _get_synonym_timestamp_column(columns):
     return None
 
 
-def _insert_synonym_attempt(cur, user_id, word_id, chosen, correct, response_ms):
+def _synonym_attempt_row(cur, user_id, word_id, chosen, correct, response_ms):
+    """(table, column -> value, timestamp column or None) for one attempt in the store's shape."""
     table_name, columns = _resolve_synonym_attempt_store(cur)
     if not table_name:
         raise HTTPException(status_code=500, detail="Synonym attempts table not available")
 
-    insert_columns = ["user_id", "word_id"]
-    insert_values = [user_id, word_id]
+    row = {"user_id": user_id, "word_id": word_id}
 
     answer_column = None
     for candidate in ("answer", "selected_answer", "chosen_answer"):
@@ -172,21 +155,17 @@ def _insert_synonym_attempt(cur, user_id, word_id, chosen, correct, response_ms)
             answer_column = candidate
             break
     if answer_column:
-        insert_columns.append(answer_column)
-        insert_values.append(chosen)
+        row[answer_column] = chosen
 
     correct_column = _get_synonym_correct_column(columns)
     if not correct_column:
         raise HTTPException(status_code=500, detail="Synonym attempts table missing correctness column")
-    insert_columns.append(correct_column)
-    insert_values.append(correct)
+    row[correct_column] = correct
 
     if "response_ms" in columns:
-        insert_columns.append("response_ms")
-        insert_values.append(response_ms or 0)
+        row["response_ms"] = response_ms or 0
     elif "time_taken_ms" in columns:
-        insert_columns.append("time_taken_ms")
-        insert_values.append(response_ms or 0)
+        row["time_taken_ms"] = response_ms or 0
 
     timestamp_column = None
     for candidate in ("created_at", "submitted_at"):
@@ -194,6 +173,21 @@ def _insert_synonym_attempt(cur, user_id, word_id, chosen, correct, response_ms)
             timestamp_column = candidate
             break
 
+    return table_name, row, timestamp_column
+
+
+def _record_synonym_counters(cur, table_name, user_id, word_id, correct, attempted_at=None):
+    record_word_lessons_mastery_attempt(cur, "synonym", user_id, word_id, correct)
+    record_word_module_attempt(cur, "words", user_id, word_id, correct, attempted_at)
+    # The words daily buckets count words_attempts, which holds synonym attempts without synonym_attempts.
+    if table_name == "words_attempts":
+        record_daily_attempt(cur, "words", user_id, correct, attempted_at)
+
+
+def _insert_synonym_attempt(cur, user_id, word_id, chosen, correct, response_ms):
+    """Insert one attempt and bump its counters in the caller's transaction."""
+    table_name, row, timestamp_column = _synonym_attempt_row(cur, user_id, word_id, chosen, correct, response_ms)
+    insert_columns = list(row)
     values_sql = ["%s"] * len(insert_columns)
     if timestamp_column:
         insert_columns.append(timestamp_column)
@@ -204,7 +198,19 @@ def _insert_synonym_attempt(cur, user_id, word_id, chosen, correct, response_ms)
         ({", ".join(insert_columns)})
         VALUES ({", ".join(values_sql)})
     """
-    cur.execute(query, tuple(insert_values))
+    cur.execute(query, tuple(row.values()))
+    _record_synonym_counters(cur, table_name, user_id, word_id, correct)
+
+
+def _enqueue_synonym_attempt(cur, user_id, word_id, chosen, correct, response_ms):
+    """Write-behind variant of _insert_synonym_attempt plus its counters (app.attempt_queue)."""
+    table_name, row, timestamp_column = _synonym_attempt_row(cur, user_id, word_id, chosen, correct, response_ms)
+    attempted_at = datetime.now(timezone.utc)
+    if timestamp_column:
+        row[timestamp_column] = attempted_at
+    counters = StatementRecorder()
+    _record_synonym_counters(counters, table_name, user_id, word_id, correct, attempted_at)
+    enqueue_attempt(f"public.{table_name}", row, counters.statements)
 
 
 def _get_recent_incorrect_synonym_word_ids(cur, user_id):
@@ -440,68 +446,73 @@ def _get_next_progression_word_id(cur, user_id, lesson_id, latest_attempt_word_i
     return None, lesson_word_ids
 
 
+def _load_lesson_synonym_words(cur, lesson_id):
+    """(word_id, difficulty, (word_id, headword, synonyms)) per lesson word with synonyms."""
+    cur.execute(
+        """
+        SELECT w.word_id, w.headword, w.synonyms, w.difficulty
+        FROM public.words w
+        JOIN public.lesson_words lw ON lw.word_id = w.word_id
+        WHERE lw.lesson_id = %s
+          AND w.synonyms IS NOT NULL
+          AND TRIM(w.synonyms) <> ''
+        ORDER BY w.word_id
+        """,
+        (lesson_id,),
+    )
+    return [
+        (row[0], "" if row[3] is None else str(row[3]), (row[0], row[1], row[2]))
+        for row in cur.fetchall()
+    ]
+
+
 def _fetch_random_synonym_row(cur, excluded_word_ids=None, lesson_id=None, difficulty_levels=None):
     """Fetch a random synonym word, optionally filtered by difficulty levels (list of ints 1/2/3)."""
     excluded_word_ids = [word_id for word_id in (excluded_word_ids or []) if word_id is not None]
-    diff_w = "AND w.difficulty = ANY(%s)" if difficulty_levels else ""
-    diff_b = "AND difficulty = ANY(%s)" if difficulty_levels else ""
-
-    def _run(sql, args):
-        cur.execute(sql, args)
-        return cur.fetchone()
-
-    if lesson_id is not None and excluded_word_ids:
-        row = _run(
-            f"""SELECT w.word_id, w.headword, w.synonyms
-            FROM public.words w JOIN public.lesson_words lw ON lw.word_id = w.word_id
-            WHERE lw.lesson_id = %s AND w.word_id <> ALL(%s)
-            AND w.synonyms IS NOT NULL AND TRIM(w.synonyms) <> '' {diff_w}
-            ORDER BY RANDOM() LIMIT 1""",
-            (lesson_id, excluded_word_ids, *([difficulty_levels] if difficulty_levels else [])),
-        )
-        if row:
-            return row
 
     if lesson_id is not None:
-        row = _run(
-            f"""SELECT w.word_id, w.headword, w.synonyms
-            FROM public.words w JOIN public.lesson_words lw ON lw.word_id = w.word_id
-            WHERE lw.lesson_id = %s AND w.synonyms IS NOT NULL AND TRIM(w.synonyms) <> '' {diff_w}
-            ORDER BY RANDOM() LIMIT 1""",
-            (lesson_id, *([difficulty_levels] if difficulty_levels else [])),
-        )
-        if row:
-            return row
-        # Fall back to any difficulty if filtered result is empty
-        if difficulty_levels:
-            row = _run(
-                """SELECT w.word_id, w.headword, w.synonyms
-                FROM public.words w JOIN public.lesson_words lw ON lw.word_id = w.word_id
-                WHERE lw.lesson_id = %s AND w.synonyms IS NOT NULL AND TRIM(w.synonyms) <> ''
-                ORDER BY RANDOM() LIMIT 1""",
-                (lesson_id,),
-            )
-            if row:
-                return row
+        levels = {str(level) for level in difficulty_levels} if difficulty_levels else None
+        # Excluding recent words first, then any word at the level, then (if
+        # filtered) any word in the lesson.
+        picks = []
+        if excluded_word_ids:
+            picks.append((excluded_word_ids, levels))
+        picks.append((None, levels))
+        if levels:
+            picks.append((None, None))
+
+        lesson_words = get_lesson_content("synonym", lesson_id, lambda: _load_lesson_synonym_words(cur, lesson_id))
+        for exclude, levels_filter in picks:
+            candidate = pick_candidate(lesson_words, exclude=exclude, difficulties=levels_filter)
+            if candidate is not None:
+                return candidate[2]
         return None
 
+    random_key = has_random_key(cur, "words", schema="public")
+    diff_clause = "AND difficulty = ANY(%s)" if difficulty_levels else ""
+    diff_params = (difficulty_levels,) if difficulty_levels else ()
+
     if excluded_word_ids:
-        row = _run(
-            f"""SELECT word_id, headword, synonyms FROM public.words
-            WHERE word_id <> ALL(%s) AND synonyms IS NOT NULL AND TRIM(synonyms) <> '' {diff_b}
-            ORDER BY RANDOM() LIMIT 1""",
-            (excluded_word_ids, *([difficulty_levels] if difficulty_levels else [])),
+        rows = sample_rows(
+            cur,
+            table="public.words",
+            columns="word_id, headword, synonyms",
+            where=f"word_id <> ALL(%s) AND synonyms IS NOT NULL AND TRIM(synonyms) <> '' {diff_clause}",
+            params=(excluded_word_ids, *diff_params),
+            random_key=random_key,
         )
-        if row:
-            return row
-
-    row = _run(
-        f"""SELECT word_id, headword, synonyms FROM public.words
-        WHERE synonyms IS NOT NULL AND TRIM(synonyms) <> '' {diff_b}
-        ORDER BY RANDOM() LIMIT 1""",
-        tuple([difficulty_levels] if difficulty_levels else []),
+        if rows:
+            return rows[0]
+
+    rows = sample_rows(
+        cur,
+        table="public.words",
+        columns="word_id, headword, synonyms",
+        where=f"synonyms IS NOT NULL AND TRIM(synonyms) <> '' {diff_clause}",
+        params=diff_params,
+        random_key=random_key,
     )
-    return row
+    return rows[0] if rows else None
 
 
 def _fetch_synonym_row_by_word_id(cur, word_id, lesson_id=None):
@@ -569,23 +580,20 @@ def _select_next_distinct_lesson_word_id(cur, user_id, lesson_id, latest_attempt
     return None, False, lesson_word_ids
 
 
-def get_synonym_attempt_summary(user_id):
-    conn = get_connection()
+def get_synonym_attempt_summary(user_id, conn=None):
+    owns_connection = conn is None
+    if owns_connection:
+        conn = get_connection()
     cur = conn.cursor()
 
     try:
-        table_name, columns = _resolve_synonym_attempt_store(cur)
-        correct_column = _get_synonym_correct_column(columns)
-        if not table_name or not correct_column:
-            return {"attempts": 0, "accuracy": 0.0}
-
+        # Counted per attempt into user_module_rollup (module "words").
         cur.execute(
-            f"""
-            SELECT
-                COUNT(*) AS attempts,
-                COALESCE(AVG(CASE WHEN {correct_column} THEN 1 ELSE 0 END) * 100, 0)
-            FROM public.{table_name}
+            """
+            SELECT attempts, COALESCE(correct::numeric / NULLIF(attempts, 0) * 100, 0)
+            FROM user_module_rollup
             WHERE user_id = %s
+              AND module = 'words'
             """,
             (user_id,),
         )
@@ -597,11 +605,14 @@ def get_synonym_attempt_summary(user_id):
         }
     finally:
         cur.close()
-        conn.close()
+        if owns_connection:
+            conn.close()
 
 
-def get_latest_synonym_attempt_word_id(user_id):
-    conn = get_connection()
+def get_latest_synonym_attempt_word_id(user_id, conn=None):
+    owns_connection = conn is None
+    if owns_connection:
+        conn = get_connection()
     cur = conn.cursor()
 
     try:
@@ -624,7 +635,8 @@ def get_latest_synonym_attempt_word_id(user_id):
         return row[0] if row else None
     finally:
         cur.close()
-        conn.close()
+        if owns_connection:
+            conn.close()
 
 
 def _get_latest_lesson_synonym_attempt_word_id(cur, user_id, lesson_id):
@@ -778,6 +790,7 @@ def submit_synonym_answer(user_id, user_email, word_id, chosen, response_ms, les
         effective_access_mode = access_mode or get_words_practice_access_mode(user_email)
         effective_lesson_id = lesson_id if lesson_id is not None else _resolve_lesson_id_for_word(cur, word_id)
         if effective_lesson_id is not None and effective_access_mode == "preview":
+            ensure_attempts_visible(user_id, SYNONYM_ATTEMPT_TABLES)
             attempt_count = _get_lesson_synonym_attempt_count(cur, user_id, effective_lesson_id)
             if attempt_count >= PREVIEW_QUESTION_LIMIT:
                 raise HTTPException(
@@ -879,7 +892,10 @@ def submit_synonym_answer(user_id, user_email, word_id, chosen, response_ms, les
 
         print("INSERT DEBUG:", user_id, word_id, selected_answers, correct)
 
-        _insert_synonym_attempt(cur, user_id, word_id, ", ".join(selected_answers), correct, response_ms)
+        if write_behind_enabled():
+            _enqueue_synonym_attempt(cur, user_id, word_id, ", ".join(selected_answers), correct, response_ms)
+        else:
+            _insert_synonym_attempt(cur, user_id, word_id, ", ".join(selected_answers), correct, response_ms)
 
         conn.commit()
 
@@ -934,8 +950,10 @@ def submit_synonym_answer(user_id, user_email, word_id, chosen, response_ms, les
 # PROGRESS
 # --------------------------------------------------
 
-def get_synonym_progress(user_email):
-    conn = get_connection()
+def get_synonym_progress(user_email, conn=None):
+    owns_connection = conn is None
+    if owns_connection:
+        conn = get_connection()
     cur = conn.cursor()
 
     try:
@@ -971,7 +989,7 @@ def get_synonym_progress(user_email):
         )
         due = cur.fetchone()[0]
 
-        attempt_summary = get_synonym_attempt_summary(user_id)
+        attempt_summary = get_synonym_attempt_summary(user_id, conn=conn)
         total = attempt_summary["attempts"]
         accuracy = (attempt_summary["accuracy"] / 100.0) if total else 0.0
 
@@ -984,7 +1002,8 @@ def get_synonym_progress(user_email):
 
     finally:
         cur.close()
-        conn.close()
+        if owns_connection:
+            conn.close()
 
 
 # --------------------------------------------------
@@ -89,7 +89,7 @@ def get_words_question(lesson_id: int, user_id: int):
     })
 
 
-def submit_words_answer(word_id: int, answer: str, user_id: int):
+def submit_words_answer(word_id: int, answer: str, user_id: int, lesson_id: int | None = None):
     details = get_word_details(word_id)
     if not details:
         return {
@@ -102,9 +102,15 @@ def submit_words_answer(word_id: int, answer: str, user_id: int):
     correct_word = clean_text(details["word"])
     correct = answer.strip().lower() == correct_word.lower()
 
+    # words_attempts has no lesson column; the lesson only feeds the mastery counter.
+    try:
+        lesson_id = int(lesson_id or 0)
+    except (TypeError, ValueError):
+        lesson_id = 0
+
     record_words_attempt(
         user_id=user_id,
-        lesson_id=0,
+        lesson_id=lesson_id,
         word_id=word_id,
         correct=correct,
         response_ms=0,
@@ -4,6 +4,11 @@ from dataclasses import dataclass
 from typing import Any
 
 from app.database import get_connection
+from app.entitlement_cache import (
+    get_member_entitlements,
+    get_member_ids_for_email,
+    invalidate_member_entitlements,
+)
 
 
 @dataclass(frozen=True)
@@ -417,6 +422,7 @@ def upsert_member_product_access(
                 str(status or "active").strip().lower(),
             ),
         )
+        invalidate_member_entitlements(member_id, cur=cur)
         if owns_connection:
             conn.commit()
     finally:
@@ -429,43 +435,11 @@ def get_owned_product_codes_for_email(user_email: str | None, *, families: set[s
     email = str(user_email or "").strip().lower()
     if not email:
         return set()
-    owns_connection = conn is None
-    if owns_connection:
-        conn = get_connection()
-    cur = conn.cursor()
-    try:
-        if families:
-            cur.execute(
-                """
-                SELECT DISTINCT mpa.product_code
-                FROM member_product_access mpa
-                JOIN kiaro_membership.members m
-                  ON m.id = mpa.member_id
-                JOIN catalog_products p
-                  ON p.product_code = mpa.product_code
-                WHERE LOWER(m.email) = LOWER(%s)
-                  AND mpa.status = 'active'
-                  AND p.product_family = ANY(%s)
-                """,
-                (email, list(families)),
-            )
-        else:
-            cur.execute(
-                """
-                SELECT DISTINCT mpa.product_code
-                FROM member_product_access mpa
-                JOIN kiaro_membership.members m
-                  ON m.id = mpa.member_id
-                WHERE LOWER(m.email) = LOWER(%s)
-                  AND mpa.status = 'active'
-                """,
-                (email,),
-            )
-        return {str(row[0]).strip().upper() for row in (cur.fetchall() or []) if row and row[0]}
-    finally:
-        cur.close()
-        if owns_connection:
-            conn.close()
+    owned_codes: set[str] = set()
+    # Every member row with the email counts, as purchases may sit on any of them.
+    for member_id in get_member_ids_for_email(email, conn=conn):
+        owned_codes.update(get_member_entitlements(member_id, conn=conn).owned_product_codes(families))
+    return owned_codes
 
 
 def user_has_product_code_access(
@@ -0,0 +1,268 @@
+"""
+Next-question prefetch for practice sessions.
+
+After an answer is submitted the client immediately asks for the next
+question, which re-runs the whole selection pipeline. The submit handlers
+now run that selection themselves, right after recording the answer, and
+park the result in a short-lived slot keyed by (module, user, lesson, the
+GET's own parameters). The following GET takes the slot instead of
+selecting again.
+
+A slot remembers the answer log it was computed against (row count and
+newest created_at of the module's attempts for that user and lesson). If
+the log has moved since (another device, another worker, a retried
+submit), the slot is dropped and the GET selects as usual. Slots are
+single use and expire after QUESTION_PREFETCH_TTL_SECONDS. Answers still
+in the write-behind queue (app.attempt_queue) count towards the log.
+
+Slots live in process by default. Anything with put(key, value, ttl_seconds),
+pop(key), clear() and __len__() can replace the store through
+set_prefetch_backend(), e.g. a shared cache when workers do not share
+sessions.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from app.attempt_queue import match_timestamp, pending_attempts
+from app.database import get_connection
+from app.schema_registry import get_table_columns
+
+
+QUESTION_PREFETCH_ENABLED = os.getenv("QUESTION_PREFETCH_ENABLED", "1").strip().lower() not in {"0", "false", "no"}
+QUESTION_PREFETCH_TTL_SECONDS = float(os.getenv("QUESTION_PREFETCH_TTL_SECONDS", "120"))
+QUESTION_PREFETCH_MAX_SLOTS = int(os.getenv("QUESTION_PREFETCH_MAX_SLOTS", "10000"))
+
+# module -> (attempts table, user column, lesson column or None)
+ANSWER_LOGS = {
+    "spelling": ("spelling_attempts", "user_id", "lesson_id"),
+    "words": ("words_attempts", "user_id", None),
+    "math": ("math_attempts", "student_id", "lesson_id"),
+    "nvr": ("nvr_attempts", "user_id", "lesson_id"),
+    "grammar": ("grammar_attempts", "user_id", "lesson_id"),
+    "comprehension": ("comprehension_attempts", "user_id", "passage_id"),
+}
+
+# Modules whose selection merges write-behind queued answers (app.attempt_queue).
+PENDING_AWARE_MODULES = {"spelling"}
+
+
+class InProcessPrefetchBackend:
+    """Bounded dict of slots, oldest evicted first."""
+
+    def __init__(self, max_slots: int = QUESTION_PREFETCH_MAX_SLOTS):
+        self.max_slots = max(1, max_slots)
+        self._slots: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, key, value, ttl_seconds: float) -> None:
+        with self._lock:
+            self._slots.pop(key, None)
+            self._slots[key] = (time.monotonic() + ttl_seconds, value)
+            while len(self._slots) > self.max_slots:
+                self._slots.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            entry = self._slots.pop(key, None)
+        if entry is None or entry[0] <= time.monotonic():
+            return None
+        return entry[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._slots.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._slots)
+
+
+_backend = InProcessPrefetchBackend()
+_lock = threading.Lock()
+_stats = {"stored": 0, "hits": 0, "misses": 0, "stale": 0, "errors": 0, "skipped_pending": 0, "prefetch_ms_total": 0.0}
+_module_stats: dict[str, dict[str, int]] = {}
+
+
+def set_prefetch_backend(backend) -> None:
+    global _backend
+    _backend = backend
+
+
+def _count(module: str, key: str, amount=1) -> None:
+    with _lock:
+        _stats[key] += amount
+        if key in {"hits", "misses", "stale"}:
+            module_stats = _module_stats.setdefault(module, {"hits": 0, "misses": 0, "stale": 0})
+            module_stats[key] += amount
+
+
+def _normalize_lesson_id(lesson_id):
+    try:
+        return int(lesson_id)
+    except (TypeError, ValueError):
+        return None
+
+
+def _slot_key(module: str, user_id, lesson_id, params) -> tuple:
+    # Query strings arrive as str, JSON bodies as int or str.
+    return (module, user_id, lesson_id, tuple(None if value is None else str(value) for value in params))
+
+
+def _answer_log_marker(cur, module: str, user_id: int, lesson_id) -> tuple:
+    table, user_column, lesson_column = ANSWER_LOGS[module]
+    columns = get_table_columns(table, cur=cur)
+    newest = "MAX(created_at)" if "created_at" in columns else "NULL"
+    where = f"{user_column} = %s"
+    params = [user_id]
+    if lesson_column:
+        where += f" AND {lesson_column} = %s"
+        params.append(lesson_id)
+    cur.execute(f"SELECT COUNT(*), {newest} FROM {table} WHERE {where}", tuple(params))
+    row = cur.fetchone()
+    count, newest_at = (int(row[0] or 0), row[1]) if row else (0, None)
+
+    # Answers still in the write-behind queue count as logged.
+    for pending in pending_attempts(table, user_id):
+        if lesson_column and _normalize_lesson_id(pending.get(lesson_column)) != lesson_id:
+            continue
+        count += 1
+        pending_at = match_timestamp(pending.get("created_at"), newest_at)
+        if pending_at is not None and (newest_at is None or pending_at > newest_at):
+            newest_at = pending_at
+    return count, newest_at
+
+
+def _with_cursor(conn, func):
+    owns_connection = conn is None
+    if owns_connection:
+        conn = get_connection()
+    cur = conn.cursor()
+    try:
+        return func(cur)
+    finally:
+        cur.close()
+        if owns_connection:
+            conn.close()
+
+
+def _with_savepoint(conn, name: str, func):
+    """
+    _with_cursor() that, on a caller's connection, runs func under a
+    savepoint, so a failing query does not abort the caller's transaction.
+    """
+    if conn is None:
+        return _with_cursor(conn, func)
+    cur = conn.cursor()
+    try:
+        cur.execute(f"SAVEPOINT {name}")
+        try:
+            result = func(cur)
+        except Exception:
+            cur.execute(f"ROLLBACK TO SAVEPOINT {name}")
+            raise
+        cur.execute(f"RELEASE SAVEPOINT {name}")
+        return result
+    finally:
+        cur.close()
+
+
+def prefetch_next_question(module: str, user_id, lesson_id, params: tuple, selector, *, ready_key: str, conn=None) -> None:
+    """
+    Run selector() (the GET's own selection) and park its payload for the
+    next GET with the same params. Pass the submit's connection (when the
+    answer is still uncommitted on it) so the marker sees the answer; the
+    selection then runs under a savepoint. A failed prefetch only means the
+    GET selects as usual.
+    """
+    lesson_id = _normalize_lesson_id(lesson_id)
+    if not QUESTION_PREFETCH_ENABLED or not user_id or lesson_id is None:
+        return
+    if module not in PENDING_AWARE_MODULES and pending_attempts(ANSWER_LOGS[module][0], user_id):
+        # The selection would not see the queued answer; the GET selects after
+        # its barrier instead (app.attempt_queue.ensure_attempts_visible).
+        _count(module, "skipped_pending")
+        return
+
+    started_at = time.perf_counter()
+    # The submit's transaction still holds the answer; a failing selection
+    # must not take it down with it.
+    released = False
+    if conn is not None:
+        _with_cursor(conn, lambda cur: cur.execute("SAVEPOINT question_prefetch"))
+    try:
+        # Marker first: an answer landing during selection then reads as stale.
+        marker = _with_cursor(conn, lambda cur: _answer_log_marker(cur, module, user_id, lesson_id))
+        payload = selector()
+        if conn is not None:
+            # Fails if the selection aborted the transaction, on psycopg2 and
+            # on the async bridge alike; the payload is then not parked.
+            _with_cursor(conn, lambda cur: cur.execute("RELEASE SAVEPOINT question_prefetch"))
+            released = True
+        if isinstance(payload, dict) and payload.get(ready_key) is not None:
+            _backend.put(_slot_key(module, user_id, lesson_id, params), (marker, payload), QUESTION_PREFETCH_TTL_SECONDS)
+            _count(module, "stored")
+    except Exception as e:
+        print("question prefetch failed:", module, e)
+        _count(module, "errors")
+        if conn is not None and not released:
+            _with_cursor(conn, lambda cur: cur.execute("ROLLBACK TO SAVEPOINT question_prefetch"))
+    finally:
+        _count(module, "prefetch_ms_total", (time.perf_counter() - started_at) * 1000)
+
+
+def take_prefetched_question(module: str, user_id, lesson_id, params: tuple, *, conn=None):
+    """The parked payload for this GET, or None (the caller then selects)."""
+    lesson_id = _normalize_lesson_id(lesson_id)
+    if not QUESTION_PREFETCH_ENABLED or not user_id:
+        return None
+
+    slot = _backend.pop(_slot_key(module, user_id, lesson_id, params))
+    if slot is None:
+        _count(module, "misses")
+        return None
+
+    marker, payload = slot
+    try:
+        current_marker = _with_savepoint(
+            conn, "question_prefetch_check", lambda cur: _answer_log_marker(cur, module, user_id, lesson_id)
+        )
+    except Exception as e:
+        print("question prefetch check failed:", module, e)
+        _count(module, "errors")
+        return None
+
+    if current_marker != marker:
+        _count(module, "stale")
+        return None
+
+    _count(module, "hits")
+    return payload
+
+
+def clear_prefetched_questions() -> None:
+    _backend.clear()
+
+
+def get_question_prefetch_stats() -> dict:
+    with _lock:
+        stats = dict(_stats)
+        modules = {module: dict(values) for module, values in _module_stats.items()}
+    lookups = stats["hits"] + stats["misses"] + stats["stale"]
+    stats.update(
+        {
+            "enabled": QUESTION_PREFETCH_ENABLED,
+            "backend": type(_backend).__name__,
+            "slots": len(_backend),
+            "ttl_seconds": QUESTION_PREFETCH_TTL_SECONDS,
+            "hit_ratio": round(stats["hits"] / lookups, 4) if lookups else 0.0,
+            "avg_prefetch_ms": round(stats["prefetch_ms_total"] / stats["stored"], 2) if stats["stored"] else 0.0,
+            "modules": modules,
+        }
+    )
+    stats["prefetch_ms_total"] = round(stats["prefetch_ms_total"], 2)
+    return stats
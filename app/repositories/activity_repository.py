@@ -0,0 +1,326 @@
+"""
+Practice activity days — user_activity_days and user_activity_streaks.
+
+user_activity_days holds one row per (user, day) with at least one practice
+attempt (spelling, words, math, comprehension: the modules the dashboards
+summarise). user_activity_streaks keeps, per user, the last active day, the
+first day of the run ending there and the longest run seen, so streaks are
+read in constant time instead of by collecting DISTINCT DATE(created_at) from
+every attempt table.
+
+Both are written by record_activity_day() from the attempt inserts (via
+app.repositories.module_rollup_repository). rebuild_user_activity() recomputes
+them from the attempt tables and reconcile_user_engagement() copies the
+streak into user_engagement; counter_backfill.py activity at the repo root
+runs both. Startup only creates the tables; the backfill is a deploy step, run
+before the first release that reads them. Days of attempts written outside
+this app are added by the scheduled repair (app.repositories.counter_rebuild).
+"""
+
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta
+
+from app.database import get_connection
+from app.repositories.counter_rebuild import filter_clauses, locked_for_rebuild, where_sql
+from app.schema_registry import get_table_columns
+
+
+# (table, user columns, timestamp columns) the activity days come from.
+ACTIVITY_SOURCES = (
+    ("spelling_attempts", ("user_id",), ("created_at", "submitted_at")),
+    ("synonym_attempts", ("user_id",), ("created_at", "submitted_at")),
+    ("math_attempts", ("student_id", "user_id"), ("created_at", "submitted_at")),
+    ("comprehension_attempts", ("user_id",), ("created_at", "submitted_at")),
+)
+
+
+def init_user_activity_tables() -> None:
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS user_activity_days (
+                user_id INTEGER NOT NULL,
+                activity_day DATE NOT NULL,
+                PRIMARY KEY (user_id, activity_day)
+            );
+
+            CREATE TABLE IF NOT EXISTS user_activity_streaks (
+                user_id INTEGER PRIMARY KEY,
+                last_active DATE NOT NULL,
+                run_start DATE NOT NULL,
+                longest INTEGER NOT NULL DEFAULT 1,
+                updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+            )
+            """
+        )
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+
+
+# =========================
+# Writes (inside the attempt's transaction)
+# =========================
+def record_activity_day(cur, user_id, attempted_at: datetime | None = None) -> None:
+    """
+    Mark today (or attempted_at's day, for a queued attempt) active for the
+    user; the streak row only changes on the first attempt of the day.
+    """
+    if not user_id:
+        return
+    cur.execute(
+        """
+        WITH new_day AS (
+            INSERT INTO user_activity_days (user_id, activity_day)
+            VALUES (%s, COALESCE(%s::timestamptz, NOW())::date)
+            ON CONFLICT DO NOTHING
+            RETURNING user_id, activity_day
+        )
+        INSERT INTO user_activity_streaks AS s (user_id, last_active, run_start, longest)
+        SELECT user_id, activity_day, activity_day, 1
+        FROM new_day
+        ON CONFLICT (user_id) DO UPDATE
+        SET run_start = CASE
+                WHEN EXCLUDED.last_active = s.last_active + 1 THEN s.run_start
+                WHEN EXCLUDED.last_active > s.last_active THEN EXCLUDED.last_active
+                ELSE s.run_start
+            END,
+            longest = GREATEST(
+                s.longest,
+                CASE WHEN EXCLUDED.last_active = s.last_active + 1 THEN EXCLUDED.last_active - s.run_start + 1 ELSE 1 END
+            ),
+            last_active = GREATEST(s.last_active, EXCLUDED.last_active),
+            updated_at = NOW()
+        """,
+        (user_id, attempted_at),
+    )
+
+
+# =========================
+# Reads
+# =========================
+def _streak_from_row(last_active: date | None, run_start: date | None, longest, recent_days, today: date) -> dict:
+    current = 0
+    if last_active and run_start and today - timedelta(days=1) <= last_active <= today:
+        current = (last_active - run_start).days + 1
+    recent = set(recent_days or [])
+    return {
+        "current": current,
+        "longest": int(longest or 0),
+        "last_active": last_active,
+        "active_days_last_7": [(today - timedelta(days=offset)) in recent for offset in range(6, -1, -1)],
+    }
+
+
+def get_activity_streak(cur, user_id: int, today: date | None = None) -> dict:
+    """{"current", "longest", "last_active", "active_days_last_7"} from the streak row and at most seven day rows."""
+    today = today or datetime.utcnow().date()
+    cur.execute(
+        """
+        SELECT s.last_active, s.run_start, s.longest,
+               ARRAY(
+                   SELECT d.activity_day
+                   FROM user_activity_days d
+                   WHERE d.user_id = s.user_id
+                     AND d.activity_day BETWEEN %s AND %s
+               )
+        FROM user_activity_streaks s
+        WHERE s.user_id = %s
+        """,
+        (today - timedelta(days=6), today, user_id),
+    )
+    row = cur.fetchone()
+    if not row:
+        return _streak_from_row(None, None, 0, [], today)
+    return _streak_from_row(row[0], row[1], row[2], row[3], today)
+
+
+# =========================
+# Rebuild / check / reconcile
+# =========================
+def _activity_source_sql(cur) -> str | None:
+    """SELECT user_id, activity_day over every attempt table, or None when none is present."""
+    selects = []
+    for table_name, user_candidates, timestamp_candidates in ACTIVITY_SOURCES:
+        columns = get_table_columns(table_name, cur=cur)
+        if table_name == "synonym_attempts" and not columns:
+            # The synonym store falls back to words_attempts.
+            table_name, columns = "words_attempts", get_table_columns("words_attempts", cur=cur)
+        user_columns = [column for column in user_candidates if column in columns]
+        timestamp_column = next((column for column in timestamp_candidates if column in columns), None)
+        if not user_columns or not timestamp_column:
+            continue
+        for user_column in user_columns:
+            selects.append(
+                f"""
+                SELECT {user_column} AS user_id, DATE({timestamp_column}) AS activity_day
+                FROM {table_name}
+                WHERE {user_column} IS NOT NULL AND {timestamp_column} IS NOT NULL
+                """
+            )
+    return " UNION ".join(selects) if selects else None
+
+
+_STREAKS_FROM_DAYS_SQL = """
+    WITH numbered AS (
+        SELECT user_id, activity_day,
+               activity_day - (ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY activity_day))::integer AS run_key
+        FROM user_activity_days
+        {where}
+    ),
+    runs AS (
+        SELECT user_id, MIN(activity_day) AS run_start, MAX(activity_day) AS run_end, COUNT(*) AS run_length
+        FROM numbered
+        GROUP BY user_id, run_key
+    )
+    SELECT user_id,
+           MAX(run_end),
+           (ARRAY_AGG(run_start ORDER BY run_end DESC))[1],
+           MAX(run_length)
+    FROM runs
+    GROUP BY user_id
+"""
+
+
+def rebuild_user_activity(user_id: int | None = None, conn=None) -> int:
+    """Recompute activity days and streaks from the attempt tables for one user or everyone. Returns day rows written."""
+    clauses, params = filter_clauses(user_id)
+    user_where = where_sql(clauses)
+    rows_written = 0
+    with locked_for_rebuild(("user_activity_days", "user_activity_streaks"), conn) as cur:
+        cur.execute(f"DELETE FROM user_activity_days {user_where}", params)
+        cur.execute(f"DELETE FROM user_activity_streaks {user_where}", params)
+
+        source_sql = _activity_source_sql(cur)
+        if source_sql:
+            cur.execute(
+                f"""
+                INSERT INTO user_activity_days (user_id, activity_day)
+                SELECT DISTINCT user_id, activity_day
+                FROM ({source_sql}) AS src
+                {user_where}
+                """,
+                params,
+            )
+            rows_written = cur.rowcount
+
+        cur.execute(
+            f"""
+            INSERT INTO user_activity_streaks (user_id, last_active, run_start, longest)
+            {_STREAKS_FROM_DAYS_SQL.format(where=user_where)}
+            """,
+            params,
+        )
+    return rows_written
+
+
+def check_user_activity(user_id: int | None = None, conn=None) -> list[dict]:
+    """Compare the stored streaks with ones recomputed from the attempt tables; one entry per differing user."""
+    owns_connection = conn is None
+    if owns_connection:
+        conn = get_connection()
+    cur = conn.cursor()
+    clauses, user_params = filter_clauses(user_id)
+    user_where = where_sql(clauses)
+    try:
+        expected: dict = {}
+        source_sql = _activity_source_sql(cur)
+        if source_sql:
+            cur.execute(
+                f"""
+                SELECT user_id, ARRAY_AGG(DISTINCT activity_day ORDER BY activity_day)
+                FROM ({source_sql}) AS src
+                {user_where}
+                GROUP BY user_id
+                """,
+                user_params,
+            )
+            expected = {row[0]: list(row[1]) for row in cur.fetchall()}
+
+        cur.execute(
+            f"""
+            SELECT user_id, ARRAY_AGG(activity_day ORDER BY activity_day)
+            FROM user_activity_days
+            {user_where}
+            GROUP BY user_id
+            """,
+            user_params,
+        )
+        stored_days = {row[0]: list(row[1]) for row in cur.fetchall()}
+
+        cur.execute(f"SELECT user_id, last_active, run_start, longest FROM user_activity_streaks {user_where}", user_params)
+        stored_streaks = {row[0]: (row[1], row[2], int(row[3])) for row in cur.fetchall()}
+    finally:
+        cur.close()
+        if owns_connection:
+            conn.close()
+
+    mismatches = []
+    for key in sorted(set(expected) | set(stored_days) | set(stored_streaks)):
+        days = expected.get(key, [])
+        expected_streak = None
+        if days:
+            run_start, longest, run_length = days[0], 1, 1
+            for previous_day, day in zip(days, days[1:]):
+                if day - previous_day == timedelta(days=1):
+                    run_length += 1
+                else:
+                    run_start, run_length = day, 1
+                longest = max(longest, run_length)
+            expected_streak = (days[-1], run_start, longest)
+        if days != stored_days.get(key, []) or expected_streak != stored_streaks.get(key):
+            mismatches.append(
+                {
+                    "user_id": key,
+                    "expected_days": len(days),
+                    "stored_days": len(stored_days.get(key, [])),
+                    "expected_streak": expected_streak,
+                    "stored_streak": stored_streaks.get(key),
+                }
+            )
+    return mismatches
+
+
+def reconcile_user_engagement(user_id: int | None = None, conn=None, today: date | None = None) -> int:
+    """Set user_engagement.current_streak / last_activity_date from the activity streaks. Returns rows changed."""
+    today = today or datetime.utcnow().date()
+    owns_connection = conn is None
+    if owns_connection:
+        conn = get_connection()
+    cur = conn.cursor()
+    try:
+        user_clause = "AND e.user_id = %s" if user_id is not None else ""
+        cur.execute(
+            f"""
+            UPDATE user_engagement e
+            SET current_streak = streak.current_streak,
+                last_activity_date = streak.last_active,
+                updated_at = NOW()
+            FROM (
+                SELECT user_id, last_active,
+                       CASE WHEN last_active BETWEEN %s::date - 1 AND %s::date THEN last_active - run_start + 1 ELSE 0 END AS current_streak
+                FROM user_activity_streaks
+            ) streak
+            WHERE streak.user_id = e.user_id
+              {user_clause}
+              AND (e.current_streak IS DISTINCT FROM streak.current_streak
+                   OR e.last_activity_date IS DISTINCT FROM streak.last_active)
+            """,
+            (today, today, *((user_id,) if user_id is not None else ())),
+        )
+        rows_changed = cur.rowcount
+        if owns_connection:
+            conn.commit()
+        return rows_changed
+    except Exception:
+        if owns_connection:
+            conn.rollback()
+        raise
+    finally:
+        cur.close()
+        if owns_connection:
+            conn.close()
@@ -0,0 +1,185 @@
+"""
+Rebuild and drift check shared by the per-user counter tables.
+
+user_lesson_mastery, user_module_rollup and user_daily_attempts all hold one
+row per (user_id, module, key columns...) with counts that the attempt
+inserts bump, and each module's rows can be recounted by a SELECT over its
+attempt table returning (user_id, key columns..., value columns...).
+A CounterTable describes one of them; rebuild_counters() and check_counters()
+do the rest. user_activity_days / user_activity_streaks do not have that
+shape, but share the lock and the user/day filters.
+
+counter_backfill.py at the repo root runs all of them.
+
+Only the attempt inserts in this app bump the counters. Attempt rows written
+by anything else (math paper attempts from other services, imports, SQL run
+by hand) are missing from them until a repair recounts those users, so every
+target is repaired on a schedule, e.g. nightly from cron:
+
+    python counter_backfill.py mastery --repair
+    python counter_backfill.py module-rollup --repair
+    python counter_backfill.py activity --repair
+    python counter_backfill.py daily-attempts --repair --since <today - 14 days>
+
+--repair checks the whole target, then rebuilds only the users (and modules)
+that differ, one user per transaction, so the EXCLUSIVE lock is held for one
+user's recount at a time. The weekly improvement endpoint reads 14 days of
+buckets, which is why daily-attempts only needs that window.
+"""
+
+from __future__ import annotations
+
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import date
+from typing import Callable
+
+from app.database import get_connection
+
+
+@dataclass(frozen=True)
+class CounterTable:
+    table: str
+    modules: tuple[str, ...]
+    # Columns after user_id that, with module, make the primary key.
+    key_columns: tuple[str, ...]
+    value_columns: tuple[str, ...]
+    # (cur, module) -> SELECT user_id, *key_columns, *value_columns; None when the module has no source.
+    source_sql: Callable[..., str | None]
+    # A module without a source keeps the rows counted at runtime (neither deleted nor checked).
+    keep_unsourced: bool = False
+    # Key column that --since applies to, if any.
+    day_column: str | None = None
+    # Stored value for a missing row, when a missing row and that value mean the same.
+    missing_value: tuple | None = None
+    # Stored / recounted values -> the form compared and reported.
+    normalize: Callable[[tuple], tuple] = lambda values: tuple(int(value) for value in values)
+
+
+def filter_clauses(user_id=None, since: date | None = None, day_column: str | None = None) -> tuple[list[str], list]:
+    clauses, params = [], []
+    if user_id is not None:
+        clauses.append("user_id = %s")
+        params.append(user_id)
+    if since is not None:
+        if not day_column:
+            raise ValueError("since needs a table with a day column")
+        clauses.append(f"{day_column} >= %s")
+        params.append(since)
+    return clauses, params
+
+
+def where_sql(clauses: list[str]) -> str:
+    return f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+
+@contextmanager
+def locked_for_rebuild(tables: tuple[str, ...], conn=None):
+    """Cursor holding EXCLUSIVE locks on tables; commits on exit when it opened the connection."""
+    owns_connection = conn is None
+    if owns_connection:
+        conn = get_connection()
+    cur = conn.cursor()
+    try:
+        # Attempt inserts wait for the rebuild, then count on top of it.
+        cur.execute(f"LOCK TABLE {', '.join(tables)} IN EXCLUSIVE MODE")
+        yield cur
+        if owns_connection:
+            conn.commit()
+    except Exception:
+        if owns_connection:
+            conn.rollback()
+        raise
+    finally:
+        cur.close()
+        if owns_connection:
+            conn.close()
+
+
+def _modules(counter: CounterTable, modules) -> tuple[str, ...]:
+    modules = tuple(modules or counter.modules)
+    unknown = sorted(set(modules) - set(counter.modules))
+    if unknown:
+        raise ValueError(f"unknown {counter.table} modules: {', '.join(unknown)}")
+    return modules
+
+
+def rebuild_counters(counter: CounterTable, user_id=None, modules=None, since: date | None = None, conn=None) -> int:
+    """Recompute counter rows from the attempt tables (optionally one user, from a day on). Returns rows written."""
+    modules = _modules(counter, modules)
+    clauses, params = filter_clauses(user_id, since, counter.day_column)
+    columns = ("user_id", *counter.key_columns, *counter.value_columns)
+    rows_written = 0
+    with locked_for_rebuild((counter.table,), conn) as cur:
+        for module in modules:
+            source_sql = counter.source_sql(cur, module)
+            if not source_sql and counter.keep_unsourced:
+                continue
+            cur.execute(
+                f"DELETE FROM {counter.table} {where_sql([*clauses, 'module = %s'])}",
+                (*params, module),
+            )
+            if not source_sql:
+                continue
+            cur.execute(
+                f"""
+                INSERT INTO {counter.table} (module, {', '.join(columns)})
+                SELECT %s, {', '.join(columns)}
+                FROM ({source_sql}) AS src ({', '.join(columns)})
+                {where_sql(clauses)}
+                """,
+                (module, *params),
+            )
+            rows_written += cur.rowcount
+    return rows_written
+
+
+def check_counters(counter: CounterTable, user_id=None, modules=None, since: date | None = None, conn=None) -> list[dict]:
+    """Compare counter rows with a recount from the attempt tables; one entry per differing row."""
+    modules = _modules(counter, modules)
+    clauses, params = filter_clauses(user_id, since, counter.day_column)
+    columns = ("user_id", *counter.key_columns, *counter.value_columns)
+    key_length = 1 + len(counter.key_columns)
+    owns_connection = conn is None
+    if owns_connection:
+        conn = get_connection()
+    cur = conn.cursor()
+    mismatches = []
+    try:
+        for module in modules:
+            expected = {}
+            source_sql = counter.source_sql(cur, module)
+            if not source_sql and counter.keep_unsourced:
+                continue
+            if source_sql:
+                cur.execute(
+                    f"""
+                    SELECT {', '.join(columns)}
+                    FROM ({source_sql}) AS src ({', '.join(columns)})
+                    {where_sql(clauses)}
+                    """,
+                    params,
+                )
+                expected = {tuple(row[:key_length]): counter.normalize(row[key_length:]) for row in cur.fetchall()}
+
+            cur.execute(
+                f"SELECT {', '.join(columns)} FROM {counter.table} {where_sql([*clauses, 'module = %s'])}",
+                (*params, module),
+            )
+            stored = {tuple(row[:key_length]): counter.normalize(row[key_length:]) for row in cur.fetchall()}
+
+            for key in sorted(set(expected) | set(stored)):
+                if expected.get(key, counter.missing_value) != stored.get(key, counter.missing_value):
+                    mismatches.append(
+                        {
+                            "module": module,
+                            **dict(zip(columns, key)),
+                            "expected": expected.get(key),
+                            "stored": stored.get(key),
+                        }
+                    )
+    finally:
+        cur.close()
+        if owns_connection:
+            conn.close()
+    return mismatches
@@ -0,0 +1,158 @@
+"""
+Per-user daily attempt buckets — user_daily_attempts.
+
+One row per (user, day, module) with the attempt and correct counts of that
+day, for the tables /practice/progress/weekly-improvement compares:
+  spelling      spelling_attempts
+  words         words_attempts (with the synonym attempts, when it is also
+                the synonym store)
+  math          math_attempts (student_id, or user_id where that column exists)
+  comprehension comprehension_attempts
+
+The attempt inserts bump today's bucket in their own transaction, so the
+last-7-days and previous-7-days windows are a sum over at most 14 days of
+rows on the primary key instead of a filtered COUNT per table and window.
+
+rebuild_user_daily_attempts() recomputes buckets from the attempt tables
+(counter_backfill.py daily-attempts at the repo root runs it) and
+check_user_daily_attempts() reports drift. weekly_improvement_verify.py
+compares the endpoint's figures against the raw tables. Startup only creates
+the table; the backfill is a deploy step, run before the first release that
+reads it. Attempts written outside this app reach the buckets through the
+scheduled repair (app.repositories.counter_rebuild).
+"""
+
+from __future__ import annotations
+
+from datetime import date, datetime
+
+from app.database import get_connection
+from app.repositories.counter_rebuild import CounterTable, check_counters, rebuild_counters
+from app.schema_registry import get_table_columns
+
+
+DAILY_ATTEMPT_MODULES = ("spelling", "words", "math", "comprehension")
+
+# module -> (table, user columns, correct columns)
+DAILY_ATTEMPT_SOURCES = {
+    "spelling": ("spelling_attempts", ("user_id",), ("correct",)),
+    "words": ("words_attempts", ("user_id",), ("correct",)),
+    "math": ("math_attempts", ("student_id", "user_id"), ("is_correct", "correct")),
+    "comprehension": ("comprehension_attempts", ("user_id",), ("correct",)),
+}
+
+WEEK_DAYS = 7
+
+
+def init_user_daily_attempts_table() -> None:
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS user_daily_attempts (
+                user_id INTEGER NOT NULL,
+                activity_day DATE NOT NULL,
+                module TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                correct INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (user_id, activity_day, module)
+            )
+            """
+        )
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+
+
+# =========================
+# Writes (inside the attempt's transaction)
+# =========================
+def record_daily_attempt(cur, module: str, user_id, correct, attempted_at: datetime | None = None) -> None:
+    """attempted_at picks the day for a queued attempt (app.attempt_queue); None means now."""
+    if not user_id:
+        return
+    cur.execute(
+        """
+        INSERT INTO user_daily_attempts AS b (user_id, activity_day, module, attempts, correct)
+        VALUES (%s, COALESCE(%s::timestamptz, NOW())::date, %s, 1, %s)
+        ON CONFLICT (user_id, activity_day, module) DO UPDATE
+        SET attempts = b.attempts + 1,
+            correct = b.correct + EXCLUDED.correct
+        """,
+        (user_id, attempted_at, module, 1 if correct else 0),
+    )
+
+
+# =========================
+# Reads
+# =========================
+def get_weekly_attempt_totals(cur, user_id: int, today: date | None = None) -> dict:
+    """
+    {"current": (attempts, correct), "previous": (attempts, correct)} for the
+    last WEEK_DAYS days (today included) and the WEEK_DAYS days before them.
+    """
+    cur.execute(
+        f"""
+        SELECT COALESCE(SUM(b.attempts) FILTER (WHERE b.activity_day > w.today - {WEEK_DAYS}), 0),
+               COALESCE(SUM(b.correct) FILTER (WHERE b.activity_day > w.today - {WEEK_DAYS}), 0),
+               COALESCE(SUM(b.attempts) FILTER (WHERE b.activity_day <= w.today - {WEEK_DAYS}), 0),
+               COALESCE(SUM(b.correct) FILTER (WHERE b.activity_day <= w.today - {WEEK_DAYS}), 0)
+        FROM (SELECT COALESCE(%s::date, CURRENT_DATE) AS today) w
+        LEFT JOIN user_daily_attempts b
+          ON b.user_id = %s
+         AND b.activity_day > w.today - {2 * WEEK_DAYS}
+         AND b.activity_day <= w.today
+        """,
+        (today, user_id),
+    )
+    row = cur.fetchone()
+    return {"current": (int(row[0]), int(row[1])), "previous": (int(row[2]), int(row[3]))}
+
+
+# =========================
+# Rebuild / check
+# =========================
+def _module_source_sql(cur, module: str) -> str | None:
+    """SELECT user_id, activity_day, attempts, correct for one module, or None when its table is missing."""
+    table_name, user_candidates, correct_candidates = DAILY_ATTEMPT_SOURCES[module]
+    columns = get_table_columns(table_name, cur=cur)
+    user_columns = [column for column in user_candidates if column in columns]
+    correct_column = next((column for column in correct_candidates if column in columns), None)
+    if not user_columns or not correct_column or "created_at" not in columns:
+        return None
+    # The endpoint matched either user column, so a row can count for two users.
+    return f"""
+        SELECT u.user_id, DATE(a.created_at), COUNT(*), COUNT(*) FILTER (WHERE a.{correct_column} = TRUE)
+        FROM {table_name} a
+        CROSS JOIN LATERAL (
+            SELECT DISTINCT candidate AS user_id
+            FROM unnest(ARRAY[{", ".join(f"a.{column}" for column in user_columns)}]) AS candidate
+            WHERE candidate IS NOT NULL
+        ) u
+        WHERE a.created_at IS NOT NULL
+        GROUP BY u.user_id, DATE(a.created_at)
+    """
+
+
+DAILY_ATTEMPT_COUNTERS = CounterTable(
+    table="user_daily_attempts",
+    modules=DAILY_ATTEMPT_MODULES,
+    key_columns=("activity_day",),
+    value_columns=("attempts", "correct"),
+    source_sql=_module_source_sql,
+    day_column="activity_day",
+    # A bucket of zero attempts and no bucket read the same.
+    missing_value=(0, 0),
+)
+
+
+def rebuild_user_daily_attempts(user_id: int | None = None, modules=None, since: date | None = None, conn=None) -> int:
+    """Recompute buckets from the attempt tables (optionally one user, from a day on). Returns rows written."""
+    return rebuild_counters(DAILY_ATTEMPT_COUNTERS, user_id, modules, since, conn=conn)
+
+
+def check_user_daily_attempts(user_id: int | None = None, modules=None, since: date | None = None, conn=None) -> list[dict]:
+    """Compare the buckets with a recount from the attempt tables; one entry per differing (user, day, module)."""
+    return check_counters(DAILY_ATTEMPT_COUNTERS, user_id, modules, since, conn=conn)
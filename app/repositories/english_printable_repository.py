@@ -2,6 +2,7 @@ from __future__ import annotations
 
 from typing import Any
 
+from app.batched_writes import execute_batched
 from app.database import get_connection
 from app.product_catalog import user_has_product_prefix_access
 
@@ -99,10 +100,11 @@ def init_english_printable_tables(conn=None) -> None:
             )
             """
         )
-        cur.executemany(
+        execute_batched(
+            cur,
             """
             INSERT INTO english_papers (paper_code, title, description, pdf_url, sort_order)
-            VALUES (%s, %s, %s, %s, %s)
+            VALUES %s
             ON CONFLICT (paper_code) DO UPDATE
             SET title = EXCLUDED.title,
                 description = EXCLUDED.description,
@@ -117,6 +119,22 @@ def init_english_printable_tables(conn=None) -> None:
             conn.close()
 
 
+def _load_existing_rows(cur, table: str, columns: str, keys) -> dict:
+    """{(paper_code, question_number): row} for the keys that already exist in table."""
+    if not keys:
+        return {}
+    cur.execute(
+        f"""
+        SELECT t.paper_code, t.question_number, {columns}
+        FROM {table} t
+        JOIN unnest(%s::text[], %s::int[]) AS k(paper_code, question_number)
+          ON k.paper_code = t.paper_code AND k.question_number = t.question_number
+        """,
+        ([key[0] for key in keys], [key[1] for key in keys]),
+    )
+    return {(row[0], row[1]): tuple(row[2:]) for row in cur.fetchall()}
+
+
 def bulk_upsert_english_questions(rows: list[dict], conn=None) -> dict:
     owns_connection = conn is None
     if owns_connection:
@@ -124,40 +142,42 @@ def bulk_upsert_english_questions(rows: list[dict], conn=None) -> dict:
     cur = conn.cursor()
     inserted = updated = existing = 0
     try:
+        incoming = []
         for row in rows:
-            paper_code = normalize_english_paper_code(row["paper_code"])
             question_number = int(row["question_number"])
-            question_text = str(row.get("question_text") or f"Question {question_number}").strip()
-            cur.execute(
-                """
-                SELECT question_text
-                FROM english_questions
-                WHERE paper_code = %s AND question_number = %s
-                """,
-                (paper_code, question_number),
-            )
-            current = cur.fetchone()
-            if not current:
-                cur.execute(
-                    """
-                    INSERT INTO english_questions (paper_code, question_number, question_text)
-                    VALUES (%s, %s, %s)
-                    """,
-                    (paper_code, question_number, question_text),
+            incoming.append(
+                (
+                    (normalize_english_paper_code(row["paper_code"]), question_number),
+                    str(row.get("question_text") or f"Question {question_number}").strip(),
                 )
+            )
+        stored = _load_existing_rows(
+            cur, "english_questions", "t.question_text", list(dict.fromkeys(key for key, _ in incoming))
+        )
+        # Replay the rows in order so a repeated question sees the earlier row's write.
+        current = {key: row[0] for key, row in stored.items()}
+        changed = {}
+        for key, question_text in incoming:
+            if key not in current:
                 inserted += 1
-            elif str(current[0] or "").strip() == question_text:
+            elif str(current[key] or "").strip() == question_text:
                 existing += 1
+                continue
             else:
-                cur.execute(
-                    """
-                    UPDATE english_questions
-                    SET question_text = %s
-                    WHERE paper_code = %s AND question_number = %s
-                    """,
-                    (question_text, paper_code, question_number),
-                )
                 updated += 1
+            current[key] = changed[key] = question_text
+
+        if changed:
+            execute_batched(
+                cur,
+                """
+                INSERT INTO english_questions (paper_code, question_number, question_text)
+                VALUES %s
+                ON CONFLICT (paper_code, question_number) DO UPDATE
+                SET question_text = EXCLUDED.question_text
+                """,
+                [(*key, question_text) for key, question_text in changed.items()],
+            )
         if owns_connection:
             conn.commit()
         return {"inserted": inserted, "updated": updated, "existing": existing}
@@ -174,45 +194,51 @@ def bulk_upsert_english_answers(rows: list[dict], conn=None) -> dict:
     cur = conn.cursor()
     inserted = updated = unchanged = 0
     try:
-        for row in rows:
-            paper_code = normalize_english_paper_code(row["paper_code"])
-            question_number = int(row["question_number"])
-            correct_answer = str(row["correct_answer"]).strip()
-            explanation = str(row.get("explanation") or "").strip()
-            answer_source = str(row.get("answer_source") or "admin_csv").strip()
-            cur.execute(
-                """
-                SELECT correct_answer, COALESCE(explanation, '')
-                FROM english_answers
-                WHERE paper_code = %s AND question_number = %s
-                """,
-                (paper_code, question_number),
+        incoming = [
+            (
+                (normalize_english_paper_code(row["paper_code"]), int(row["question_number"])),
+                str(row["correct_answer"]).strip(),
+                str(row.get("explanation") or "").strip(),
+                str(row.get("answer_source") or "admin_csv").strip(),
             )
-            existing_row = cur.fetchone()
-            if not existing_row:
-                cur.execute(
-                    """
-                    INSERT INTO english_answers (paper_code, question_number, correct_answer, explanation, answer_source)
-                    VALUES (%s, %s, %s, %s, %s)
-                    """,
-                    (paper_code, question_number, correct_answer, explanation, answer_source),
-                )
+            for row in rows
+        ]
+        current = _load_existing_rows(
+            cur,
+            "english_answers",
+            "t.correct_answer, COALESCE(t.explanation, '')",
+            list(dict.fromkeys(key for key, *_ in incoming)),
+        )
+        changed = {}
+        for key, correct_answer, explanation, answer_source in incoming:
+            existing_row = current.get(key)
+            if existing_row is None:
                 inserted += 1
-            elif str(existing_row[0] or "").strip().lower() == correct_answer.lower() and str(existing_row[1] or "").strip() == explanation:
+            elif (
+                str(existing_row[0] or "").strip().lower() == correct_answer.lower()
+                and str(existing_row[1] or "").strip() == explanation
+            ):
                 unchanged += 1
+                continue
             else:
-                cur.execute(
-                    """
-                    UPDATE english_answers
-                    SET correct_answer = %s,
-                        explanation = %s,
-                        answer_source = %s,
-                        updated_at = NOW()
-                    WHERE paper_code = %s AND question_number = %s
-                    """,
-                    (correct_answer, explanation, answer_source, paper_code, question_number),
-                )
                 updated += 1
+            current[key] = (correct_answer, explanation)
+            changed[key] = (correct_answer, explanation, answer_source)
+
+        if changed:
+            execute_batched(
+                cur,
+                """
+                INSERT INTO english_answers (paper_code, question_number, correct_answer, explanation, answer_source)
+                VALUES %s
+                ON CONFLICT (paper_code, question_number) DO UPDATE
+                SET correct_answer = EXCLUDED.correct_answer,
+                    explanation = EXCLUDED.explanation,
+                    answer_source = EXCLUDED.answer_source,
+                    updated_at = NOW()
+                """,
+                [(*key, *values) for key, values in changed.items()],
+            )
 
         cur.execute(
             """
@@ -222,7 +248,7 @@ def bulk_upsert_english_answers(rows: list[dict], conn=None) -> dict:
             )
             WHERE p.paper_code = ANY(%s)
             """,
-            (sorted({normalize_english_paper_code(row["paper_code"]) for row in rows}),),
+            (sorted({key[0] for key, *_ in incoming}),),
         )
         if owns_connection:
             conn.commit()
@@ -423,10 +449,11 @@ def record_english_attempt_batch(*, user_id: int, paper_code: str, answers: list
         conn = get_connection()
     cur = conn.cursor()
     try:
-        cur.executemany(
+        execute_batched(
+            cur,
             """
             INSERT INTO english_attempts (user_id, paper_code, question_number, student_answer, is_correct)
-            VALUES (%s, %s, %s, %s, %s)
+            VALUES %s
             """,
             [
                 (
@@ -3,43 +3,31 @@ from __future__ import annotations
 from datetime import datetime, timezone
 from typing import Any
 
+from app.bulk_ingest import copy_rows, create_staging_table, use_bulk_ingest
+from app.content_cache import get_lesson_content
 from app.database import get_connection
+from app.repositories.mastery_repository import record_lesson_mastery_attempt
+from app.schema_registry import get_column_type, get_table_columns
 
 DEFAULT_GRAMMAR_COURSE_NAME = "GrammarSprint v1"
 REVIEW_COOLDOWN_WINDOW = 4
 
+# Every character str.strip() removes (the last one is U+3000), for BTRIM in
+# the bulk import: plain BTRIM only strips spaces, _clean_text strips tabs,
+# newlines, NBSPs and the rest too.
+_STRIP_CHARS = "".join(char for char in map(chr, range(0x3001)) if char.isspace())
+
 
 def _first_matching_column(columns: set[str], candidates: list[str]) -> str | None:
     return next((c for c in candidates if c in columns), None)
 
 
-def _get_table_columns(cur, table_name: str) -> set[str]:
-    cur.execute(
-        """
-        SELECT column_name
-        FROM information_schema.columns
-        WHERE table_name = %s
-        """,
-        (table_name,),
-    )
-    return {str(row[0]).strip().lower() for row in cur.fetchall() if row and row[0]}
+def _get_table_columns(cur, table_name: str) -> frozenset[str]:
+    return get_table_columns(table_name, cur=cur)
 
 
 def _get_table_column_type(cur, table_name: str, column_name: str) -> str:
-    cur.execute(
-        """
-        SELECT LOWER(COALESCE(data_type, '')), LOWER(COALESCE(udt_name, ''))
-        FROM information_schema.columns
-        WHERE table_name = %s
-          AND column_name = %s
-        LIMIT 1
-        """,
-        (table_name, column_name),
-    )
-    row = cur.fetchone()
-    if not row:
-        return ""
-    return ":".join(str(part or "").strip().lower() for part in row if part is not None)
+    return get_column_type(table_name, column_name, cur=cur)
 
 
 def _order_by_existing_columns(*, columns: set[str], preferred: list[str], alias: str | None = None) -> str:
@@ -294,11 +282,10 @@ def _ensure_lesson(
     return lesson_id, True
 
 
-def _ensure_question(cur, row: dict[str, Any], lesson_id: int, course_id: int) -> tuple[int, bool]:
+def _question_insert_fields(cur, row: dict[str, Any], lesson_id: int, course_id: int) -> list[tuple[str, Any]]:
     question_text = _clean_text(_first_value(row, "question_text", default=""))
     question_type = _clean_text(_first_value(row, "question_type", default="mcq")) or "mcq"
-    question_columns = _get_table_columns(cur, "grammar_questions")
-    insert_fields = [
+    return [
         ("course_id", course_id),
         ("lesson_id", lesson_id),
         ("question_type", question_type),
@@ -313,6 +300,12 @@ def _ensure_question(cur, row: dict[str, Any], lesson_id: int, course_id: int) -
         ("skill_tag", _clean_text(_first_value(row, "skill_tag", default=""))),
         ("source_ref", _clean_text(_first_value(row, "source_ref", default=""))),
     ]
+
+
+def _ensure_question(cur, row: dict[str, Any], lesson_id: int, course_id: int) -> tuple[int, bool]:
+    question_text = _clean_text(_first_value(row, "question_text", default=""))
+    question_columns = _get_table_columns(cur, "grammar_questions")
+    insert_fields = _question_insert_fields(cur, row, lesson_id, course_id)
     if "course_id" in question_columns:
         cur.execute(
             """
@@ -418,10 +411,30 @@ def _ensure_lesson_item(cur, lesson_id: int, question_id: int, sort_order: int)
     return True
 
 
-def import_grammar_csv_rows(rows: list[dict[str, Any]]) -> dict[str, Any]:
-    conn = get_connection()
-    cur = conn.cursor()
-    stats = {
+def _parse_import_row(index: int, row: dict[str, Any]) -> dict[str, Any] | None:
+    """One CSV line as the importer uses it, or None for a line it skips."""
+    clean_row = {str(key).strip().lower(): value for key, value in (row or {}).items() if key}
+    if not any(str(value or "").strip() for value in clean_row.values()):
+        return None
+
+    course_name = _clean_text(_first_value(clean_row, "course_name", default="")) or DEFAULT_GRAMMAR_COURSE_NAME
+    lesson_code = _clean_text(_first_value(clean_row, "lesson_code", default="")) or _slugify(_clean_text(_first_value(clean_row, "lesson_name", default="")))
+    lesson_name = _clean_text(_first_value(clean_row, "lesson_name", default=""))
+    question_text = _clean_text(_first_value(clean_row, "question_text", default=""))
+    if not lesson_name or not question_text:
+        return None
+
+    return {
+        "row": clean_row,
+        "course_name": course_name,
+        "lesson_code": lesson_code,
+        "lesson_name": lesson_name,
+        "sort_order": _clean_int(_first_value(clean_row, "sort_order", default=index), default=index),
+    }
+
+
+def _grammar_import_stats() -> dict[str, int]:
+    return {
         "rows_processed": 0,
         "rows_skipped": 0,
         "courses_created": 0,
@@ -434,31 +447,33 @@ def import_grammar_csv_rows(rows: list[dict[str, Any]]) -> dict[str, Any]:
         "lesson_items_updated": 0,
     }
 
+
+def import_grammar_csv_rows(rows: list[dict[str, Any]], *, bulk: bool | None = None) -> dict[str, Any]:
+    """bulk (default CSV_BULK_INGEST) loads through app.bulk_ingest instead of row by row."""
+    if use_bulk_ingest(bulk) and _grammar_question_scope_column() is not None:
+        return _bulk_import_grammar_csv_rows(rows)
+
+    conn = get_connection()
+    cur = conn.cursor()
+    stats = _grammar_import_stats()
+
     try:
         for index, row in enumerate(rows, start=1):
-            clean_row = {str(key).strip().lower(): value for key, value in (row or {}).items() if key}
-            if not any(str(value or "").strip() for value in clean_row.values()):
-                stats["rows_skipped"] += 1
-                continue
-
-            course_name = _clean_text(_first_value(clean_row, "course_name", default="")) or DEFAULT_GRAMMAR_COURSE_NAME
-            lesson_code = _clean_text(_first_value(clean_row, "lesson_code", default="")) or _slugify(_clean_text(_first_value(clean_row, "lesson_name", default="")))
-            lesson_name = _clean_text(_first_value(clean_row, "lesson_name", default=""))
-            question_text = _clean_text(_first_value(clean_row, "question_text", default=""))
-            if not lesson_name or not question_text:
+            parsed = _parse_import_row(index, row)
+            if parsed is None:
                 stats["rows_skipped"] += 1
                 continue
 
-            sort_order = _clean_int(_first_value(clean_row, "sort_order", default=index), default=index)
-            course_id, course_created = _ensure_course(cur, course_name, sort_order)
+            sort_order = parsed["sort_order"]
+            course_id, course_created = _ensure_course(cur, parsed["course_name"], sort_order)
             lesson_id, lesson_created = _ensure_lesson(
                 cur,
                 course_id=course_id,
-                lesson_code=lesson_code,
-                lesson_name=lesson_name,
+                lesson_code=parsed["lesson_code"],
+                lesson_name=parsed["lesson_name"],
                 sort_order=sort_order,
             )
-            question_id, question_created = _ensure_question(cur, clean_row, lesson_id, course_id)
+            question_id, question_created = _ensure_question(cur, parsed["row"], lesson_id, course_id)
             lesson_item_created = _ensure_lesson_item(cur, lesson_id, question_id, sort_order)
 
             stats["rows_processed"] += 1
@@ -483,6 +498,234 @@ def import_grammar_csv_rows(rows: list[dict[str, Any]]) -> dict[str, Any]:
         conn.close()
 
 
+def _grammar_question_scope_column() -> str | None:
+    """The column _ensure_question matches question text within: course_id, else the lesson (via lesson items)."""
+    question_columns = get_table_columns("grammar_questions")
+    if "course_id" in question_columns:
+        return "course_id"
+    # New questions are matched back to their lesson through this column.
+    if "lesson_id" in question_columns:
+        return "lesson_id"
+    return None
+
+
+def _bulk_import_grammar_csv_rows(rows: list[dict[str, Any]]) -> dict[str, Any]:
+    """
+    Same end state and counters as the row-by-row import: one _ensure_course /
+    _ensure_lesson per distinct course and lesson (with the values its last
+    line leaves behind), then every question and lesson item through a COPY
+    staging table and set-based upserts. A key repeated in the file ends with
+    its last line's values; created counts the first line of each new key.
+    """
+    stats = _grammar_import_stats()
+    parsed_rows = []
+    for index, row in enumerate(rows, start=1):
+        parsed = _parse_import_row(index, row)
+        if parsed is None:
+            stats["rows_skipped"] += 1
+        else:
+            parsed_rows.append(parsed)
+    stats["rows_processed"] = len(parsed_rows)
+
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        # The first line of a course / lesson names it; the last sets the rest.
+        courses: dict[str, dict[str, Any]] = {}
+        for parsed in parsed_rows:
+            course = courses.setdefault(parsed["course_name"].lower(), {"name": parsed["course_name"]})
+            course["sort_order"] = parsed["sort_order"]
+        for course in courses.values():
+            course["course_id"], created = _ensure_course(cur, course["name"], course["sort_order"])
+            stats["courses_created"] += int(created)
+
+        lessons: dict[tuple, dict[str, Any]] = {}
+        for parsed in parsed_rows:
+            course_id = courses[parsed["course_name"].lower()]["course_id"]
+            parsed["course_id"] = course_id
+            lesson = lessons.setdefault((course_id, parsed["lesson_code"].lower()), {"code": parsed["lesson_code"]})
+            lesson.update(name=parsed["lesson_name"], sort_order=parsed["sort_order"])
+            parsed["lesson_key"] = (course_id, parsed["lesson_code"].lower())
+        for (course_id, _), lesson in lessons.items():
+            lesson["lesson_id"], created = _ensure_lesson(
+                cur,
+                course_id=course_id,
+                lesson_code=lesson["code"],
+                lesson_name=lesson["name"],
+                sort_order=lesson["sort_order"],
+            )
+            stats["lessons_created"] += int(created)
+
+        question_columns = _get_table_columns(cur, "grammar_questions")
+        scope_column = _grammar_question_scope_column()
+        staged = []
+        for line_no, parsed in enumerate(parsed_rows, start=1):
+            course_id = parsed["course_id"]
+            lesson_id = lessons[parsed["lesson_key"]]["lesson_id"]
+            fields = [
+                (column, value)
+                for column, value in _question_insert_fields(cur, parsed["row"], lesson_id, course_id)
+                if column in question_columns
+            ]
+            scope_id = course_id if scope_column == "course_id" else lesson_id
+            staged.append((line_no, scope_id, lesson_id, parsed["sort_order"], *(value for _, value in fields)))
+        field_columns = [column for column, _ in fields] if staged else []
+
+        if staged:
+            questions_created, lesson_items_created = _merge_grammar_import_stage(
+                cur, staged, field_columns, scope_column
+            )
+            stats["questions_created"] = questions_created
+            stats["lesson_items_created"] = lesson_items_created
+
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+
+    for kind in ("courses", "lessons", "questions", "lesson_items"):
+        stats[f"{kind}_updated"] = stats["rows_processed"] - stats[f"{kind}_created"]
+    stats["course_name"] = DEFAULT_GRAMMAR_COURSE_NAME
+    stats["total_rows"] = len(rows)
+    return stats
+
+
+def _merge_grammar_import_stage(cur, staged: list[tuple], field_columns: list[str], scope_column: str) -> tuple[int, int]:
+    """COPY the lines, then match, update and insert questions and lesson items. Returns (questions, items) created."""
+    create_staging_table(
+        cur,
+        "grammar_ingest_stage",
+        "grammar_questions",
+        field_columns,
+        [("line_no", "INTEGER"), ("scope_id", "INTEGER"), ("item_lesson_id", "INTEGER"), ("item_sort_order", "INTEGER")],
+    )
+    copy_rows(
+        cur,
+        "grammar_ingest_stage",
+        ["line_no", "scope_id", "item_lesson_id", "item_sort_order", *field_columns],
+        staged,
+    )
+
+    # One row per question key (scope, lower-cased text), carrying its last line.
+    cur.execute(
+        """
+        CREATE TEMP TABLE grammar_ingest_questions ON COMMIT DROP AS
+        SELECT DISTINCT ON (scope_id, LOWER(COALESCE(question_text, '')))
+               scope_id, LOWER(COALESCE(question_text, '')) AS match_key, line_no, NULL::integer AS question_id
+        FROM grammar_ingest_stage
+        ORDER BY scope_id, LOWER(COALESCE(question_text, '')), line_no DESC
+        """
+    )
+
+    if scope_column == "course_id":
+        existing_sql = """
+            SELECT DISTINCT ON (q.course_id, LOWER(COALESCE(q.question_text, '')))
+                   q.course_id AS scope_id, LOWER(COALESCE(q.question_text, '')) AS match_key, q.question_id
+            FROM grammar_questions q
+            JOIN grammar_ingest_questions k
+              ON k.scope_id = q.course_id
+             AND k.match_key = LOWER(COALESCE(q.question_text, ''))
+            ORDER BY q.course_id, LOWER(COALESCE(q.question_text, '')), q.question_id
+        """
+    else:
+        existing_sql = """
+            SELECT DISTINCT ON (li.lesson_id, LOWER(COALESCE(q.question_text, '')))
+                   li.lesson_id AS scope_id, LOWER(COALESCE(q.question_text, '')) AS match_key, q.question_id
+            FROM grammar_questions q
+            JOIN grammar_lesson_items li
+              ON li.question_id = q.question_id
+            JOIN grammar_ingest_questions k
+              ON k.scope_id = li.lesson_id
+             AND k.match_key = LOWER(COALESCE(q.question_text, ''))
+            ORDER BY li.lesson_id, LOWER(COALESCE(q.question_text, '')), q.question_id
+        """
+    cur.execute(
+        f"""
+        UPDATE grammar_ingest_questions k
+        SET question_id = e.question_id
+        FROM ({existing_sql}) e
+        WHERE e.scope_id = k.scope_id
+          AND e.match_key = k.match_key
+        """
+    )
+
+    # Existing questions: a column changes only when its trimmed text differs,
+    # trimmed as _clean_text does in _ensure_question.
+    differs = {
+        column: (
+            f"BTRIM(COALESCE(q.{column}::text, ''), %(strip_chars)s)"
+            f" <> BTRIM(COALESCE(s.{column}::text, ''), %(strip_chars)s)"
+        )
+        for column in field_columns
+    }
+    cur.execute(
+        f"""
+        UPDATE grammar_questions q
+        SET {", ".join(f"{column} = CASE WHEN {differs[column]} THEN s.{column} ELSE q.{column} END" for column in field_columns)}
+        FROM grammar_ingest_questions k
+        JOIN grammar_ingest_stage s ON s.line_no = k.line_no
+        WHERE q.question_id = k.question_id
+          AND ({" OR ".join(differs.values())})
+        """,
+        {"strip_chars": _STRIP_CHARS},
+    )
+
+    cur.execute(
+        f"""
+        WITH inserted AS (
+            INSERT INTO grammar_questions ({", ".join(field_columns)})
+            SELECT {", ".join(f"s.{column}" for column in field_columns)}
+            FROM grammar_ingest_questions k
+            JOIN grammar_ingest_stage s ON s.line_no = k.line_no
+            WHERE k.question_id IS NULL
+            ORDER BY s.line_no
+            RETURNING question_id, {scope_column} AS scope_id, LOWER(COALESCE(question_text, '')) AS match_key
+        )
+        UPDATE grammar_ingest_questions k
+        SET question_id = inserted.question_id
+        FROM inserted
+        WHERE inserted.scope_id = k.scope_id
+          AND inserted.match_key = k.match_key
+        """
+    )
+    questions_created = cur.rowcount
+
+    cur.execute(
+        """
+        WITH items AS (
+            SELECT DISTINCT ON (s.item_lesson_id, k.question_id)
+                   s.item_lesson_id AS lesson_id, k.question_id, s.item_sort_order AS sort_order
+            FROM grammar_ingest_stage s
+            JOIN grammar_ingest_questions k
+              ON k.scope_id = s.scope_id
+             AND k.match_key = LOWER(COALESCE(s.question_text, ''))
+            ORDER BY s.item_lesson_id, k.question_id, s.line_no DESC
+        ),
+        updated AS (
+            UPDATE grammar_lesson_items li
+            SET sort_order = items.sort_order
+            FROM items
+            WHERE li.lesson_id = items.lesson_id
+              AND li.question_id = items.question_id
+              AND COALESCE(li.sort_order, 0) <> items.sort_order
+        )
+        INSERT INTO grammar_lesson_items (lesson_id, question_id, sort_order)
+        SELECT lesson_id, question_id, sort_order
+        FROM items
+        WHERE NOT EXISTS (
+            SELECT 1
+            FROM grammar_lesson_items li
+            WHERE li.lesson_id = items.lesson_id
+              AND li.question_id = items.question_id
+        )
+        """
+    )
+    return questions_created, cur.rowcount
+
+
 def _lesson_payload(lesson: dict[str, Any], progress: dict[str, Any] | None = None) -> dict[str, Any]:
     progress = progress or {}
     total_questions = int(progress.get("total_questions") or lesson.get("question_count") or lesson.get("item_count") or 0)
@@ -643,7 +886,7 @@ def _fetch_grammar_lessons_map(cur) -> dict[int, dict[str, Any]]:
     }
 
 
-def _fetch_grammar_question_map(cur, lesson_id: int) -> list[dict[str, Any]]:
+def _load_grammar_question_map(cur, lesson_id: int) -> list[dict[str, Any]]:
     lesson_item_columns = _get_table_columns(cur, "grammar_lesson_items")
     question_order_by = _order_by_existing_columns(columns=lesson_item_columns, preferred=["sort_order", "question_id"], alias="li")
     cur.execute(
@@ -661,15 +904,21 @@ def _fetch_grammar_question_map(cur, lesson_id: int) -> list[dict[str, Any]]:
     return _rows_as_dicts(cur)
 
 
-def _fetch_question_stats(cur, user_id: int) -> dict[int, dict[str, Any]]:
+def _fetch_grammar_question_map(cur, lesson_id: int):
+    """Read-only question rows for the lesson, from app.content_cache."""
+    return get_lesson_content("grammar", lesson_id, lambda: _load_grammar_question_map(cur, lesson_id))
+
+
+def _fetch_question_stats(cur, user_id: int, question_ids: list[int]) -> dict[int, dict[str, Any]]:
     try:
         cur.execute(
             """
             SELECT *
             FROM grammar_question_stats
             WHERE user_id = %s
+              AND question_id = ANY(%s)
             """,
-            (user_id,),
+            (user_id, question_ids),
         )
         stats = {}
         for row in _rows_as_dicts(cur):
@@ -773,7 +1022,11 @@ def get_grammar_question(lesson_id: int, user_id: int, session_id: str | None =
         adaptive_questions = filter_by_difficulty(questions, preferred)
         questions = adaptive_questions if adaptive_questions else questions
 
-        stats_rows = _fetch_question_stats(cur, user_id)
+        stats_rows = _fetch_question_stats(
+            cur,
+            user_id,
+            [int(_first_value(question, "question_id", "id", default=0) or 0) for question in questions],
+        )
         attempts = _fetch_attempt_history(cur, user_id, lesson_id)
         recent_question_ids = {
             int(_first_value(row, "question_id", default=0) or 0)
@@ -947,6 +1200,7 @@ def record_grammar_attempt(
             (user_id, _course_id, lesson_id, question_id, selected_option, correct, _session_uuid),
         )
         attempt_row = cur.fetchone()
+        record_lesson_mastery_attempt(cur, "grammar", user_id, lesson_id, correct)
         _upsert_question_stats(cur, user_id, question_id, correct)
         progress_row = _upsert_lesson_progress(cur, user_id, lesson_id)
         conn.commit()
@@ -0,0 +1,340 @@
+"""
+Per-lesson mastery counters — user_lesson_mastery.
+
+One row per (user, module, lesson) holding the attempt and correct-answer
+counts that app.adaptive_difficulty turns into a mastery level. Every attempt
+insert bumps its row in the same transaction, so the adaptive read on each
+question fetch is a primary key lookup instead of an aggregate over the
+user's whole attempt history.
+
+Modules and the attempt tables they are rebuilt from:
+  math          math_attempts (student_id, lesson_id)
+  nvr           nvr_attempts (lesson_id, or the legacy pattern_id mapping)
+  grammar       grammar_attempts
+  words         words_attempts, only when it carries lesson_id
+  spelling      spelling_attempts
+  comprehension comprehension_attempts (passage_id is the lesson)
+  synonym       synonym_attempts / words_attempts, one row per lesson_words
+                lesson containing the word
+
+rebuild_user_lesson_mastery() recomputes the table from those sources
+(counter_backfill.py mastery at the repo root runs it) and
+check_user_lesson_mastery() reports drift. Startup only creates the table;
+the backfill is a deploy step, run before the first release that reads it,
+and the scheduled repair (see app.repositories.counter_rebuild) picks up
+attempts written outside this app. A module whose source cannot
+supply lessons (words_attempts without lesson_id) is left as counted at
+runtime: its rows are neither deleted nor checked.
+
+When words_attempts is the synonym store (no synonym_attempts table), every
+row in it counts towards synonym, so the words submit path counts its
+attempts as synonym attempts as well.
+
+The admin student-mastery report (iter_student_mastery_report) is served
+from the same rows, so it is current as of the last attempt and its cost
+follows the number of user x lesson rows, not the number of attempts.
+"""
+
+from __future__ import annotations
+
+from app.database import get_connection
+from app.repositories.counter_rebuild import CounterTable, check_counters, rebuild_counters
+from app.schema_registry import get_table_columns
+
+
+MASTERY_MODULES = ("math", "nvr", "grammar", "words", "spelling", "comprehension", "synonym")
+# Modules listed in the admin report, in report order, with their app names.
+REPORT_MODULES = {"math": "MathSprint", "nvr": "NVRSprint", "grammar": "GrammarSprint"}
+REPORT_FETCH_SIZE = 500
+
+_UPSERT_SQL = """
+    INSERT INTO user_lesson_mastery AS m (user_id, module, lesson_id, attempts, correct, updated_at)
+    {source}
+    ON CONFLICT (user_id, module, lesson_id) DO UPDATE
+    SET attempts = m.attempts + EXCLUDED.attempts,
+        correct = m.correct + EXCLUDED.correct,
+        updated_at = NOW()
+"""
+
+
+def init_user_lesson_mastery_table() -> None:
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS user_lesson_mastery (
+                user_id INTEGER NOT NULL,
+                module TEXT NOT NULL,
+                lesson_id INTEGER NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                correct INTEGER NOT NULL DEFAULT 0,
+                updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                PRIMARY KEY (user_id, module, lesson_id)
+            )
+            """
+        )
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+
+
+# =========================
+# Writes (inside the attempt's transaction)
+# =========================
+def record_lesson_mastery_attempt(cur, module: str, user_id, lesson_id, correct) -> None:
+    """Count one attempt against (user, module, lesson). Attempts without a lesson are not tracked."""
+    if not user_id or not lesson_id:
+        return
+    cur.execute(
+        _UPSERT_SQL.format(source="VALUES (%s, %s, %s, 1, %s, NOW())"),
+        (user_id, module, lesson_id, 1 if correct is True else 0),
+    )
+
+
+def record_word_lessons_mastery_attempt(cur, module: str, user_id, word_id, correct) -> None:
+    """Count one word attempt against every lesson_words lesson containing the word."""
+    if not user_id or not word_id:
+        return
+    cur.execute(
+        _UPSERT_SQL.format(
+            source="""
+            SELECT %s, %s, lw.lesson_id, 1, %s, NOW()
+            FROM public.lesson_words lw
+            WHERE lw.word_id = %s
+            GROUP BY lw.lesson_id
+            """
+        ),
+        (user_id, module, 1 if correct is True else 0, word_id),
+    )
+
+
+# =========================
+# Reads
+# =========================
+def get_lesson_mastery(cur, module: str, user_id, lesson_id) -> tuple[int, float]:
+    """(attempts, accuracy percent) for one user and lesson."""
+    cur.execute(
+        """
+        SELECT attempts, correct
+        FROM user_lesson_mastery
+        WHERE user_id = %s
+          AND module = %s
+          AND lesson_id = %s
+        """,
+        (user_id, module, lesson_id),
+    )
+    row = cur.fetchone()
+    if not row or not row[0]:
+        return 0, 0.0
+    attempts, correct = int(row[0]), int(row[1] or 0)
+    return attempts, correct * 100.0 / attempts
+
+
+# =========================
+# Rebuild / check
+# =========================
+def _synonym_source(cur) -> tuple[str, str] | tuple[None, None]:
+    for table_name in ("synonym_attempts", "words_attempts"):
+        columns = get_table_columns(table_name, schema="public", cur=cur)
+        if columns:
+            correct_column = "is_correct" if "is_correct" in columns else "correct" if "correct" in columns else None
+            return (table_name, correct_column) if correct_column else (None, None)
+    return None, None
+
+
+def _module_source_sql(cur, module: str) -> str | None:
+    """SELECT user_id, lesson_id, attempts, correct for one module, or None when its table cannot supply lessons."""
+    if module == "math":
+        if not get_table_columns("math_attempts", cur=cur):
+            return None
+        return """
+            SELECT student_id, lesson_id, COUNT(*), COUNT(*) FILTER (WHERE is_correct IS TRUE)
+            FROM math_attempts
+            WHERE student_id IS NOT NULL AND lesson_id IS NOT NULL AND lesson_id <> 0
+            GROUP BY student_id, lesson_id
+        """
+
+    if module == "nvr":
+        columns = get_table_columns("nvr_attempts", cur=cur)
+        lesson_sources = []
+        if "lesson_id" in columns:
+            lesson_sources.append("na.lesson_id")
+        if "pattern_id" in columns:
+            # Older rows only carry the question code.
+            lesson_sources.append(
+                """
+                (SELECT MIN(lq.lesson_id)
+                 FROM nvr_questions nq
+                 JOIN nvr_lesson_questions lq ON lq.question_id = nq.id
+                 WHERE nq.question_id = na.pattern_id)
+                """
+            )
+        if not lesson_sources:
+            return None
+        lesson_expr = lesson_sources[0] if len(lesson_sources) == 1 else f"COALESCE({', '.join(lesson_sources)})"
+        return f"""
+            SELECT user_id, lesson_id, COUNT(*), COUNT(*) FILTER (WHERE is_correct IS TRUE)
+            FROM (
+                SELECT na.user_id, {lesson_expr} AS lesson_id, na.is_correct
+                FROM nvr_attempts na
+            ) attempts
+            WHERE user_id IS NOT NULL AND lesson_id IS NOT NULL AND lesson_id <> 0
+            GROUP BY user_id, lesson_id
+        """
+
+    simple_sources = {
+        "grammar": ("grammar_attempts", "lesson_id"),
+        "words": ("words_attempts", "lesson_id"),
+        "spelling": ("spelling_attempts", "lesson_id"),
+        "comprehension": ("comprehension_attempts", "passage_id"),
+    }
+    if module in simple_sources:
+        table_name, lesson_column = simple_sources[module]
+        if lesson_column not in get_table_columns(table_name, cur=cur):
+            return None
+        return f"""
+            SELECT user_id, {lesson_column}, COUNT(*), COUNT(*) FILTER (WHERE correct IS TRUE)
+            FROM {table_name}
+            WHERE user_id IS NOT NULL AND {lesson_column} IS NOT NULL AND {lesson_column} <> 0
+            GROUP BY user_id, {lesson_column}
+        """
+
+    if module == "synonym":
+        table_name, correct_column = _synonym_source(cur)
+        if not table_name or not get_table_columns("lesson_words", schema="public", cur=cur):
+            return None
+        return f"""
+            SELECT sa.user_id, lw.lesson_id, COUNT(*), COUNT(*) FILTER (WHERE sa.{correct_column} IS TRUE)
+            FROM public.{table_name} sa
+            JOIN (SELECT DISTINCT lesson_id, word_id FROM public.lesson_words) lw
+              ON lw.word_id = sa.word_id
+            WHERE sa.user_id IS NOT NULL
+            GROUP BY sa.user_id, lw.lesson_id
+        """
+
+    raise ValueError(f"Unknown mastery module: {module}")
+
+
+MASTERY_COUNTERS = CounterTable(
+    table="user_lesson_mastery",
+    modules=MASTERY_MODULES,
+    key_columns=("lesson_id",),
+    value_columns=("attempts", "correct"),
+    source_sql=_module_source_sql,
+    keep_unsourced=True,
+)
+
+
+def rebuild_user_lesson_mastery(user_id: int | None = None, modules=None, conn=None) -> int:
+    """Recompute user_lesson_mastery from the attempt tables for one user or everyone. Returns rows written."""
+    return rebuild_counters(MASTERY_COUNTERS, user_id, modules, conn=conn)
+
+
+def check_user_lesson_mastery(user_id: int | None = None, modules=None, conn=None) -> list[dict]:
+    """Compare user_lesson_mastery with a recount from the attempt tables; one entry per differing row."""
+    return check_counters(MASTERY_COUNTERS, user_id, modules, conn=conn)
+
+
+# =========================
+# Admin report
+# =========================
+def encode_report_cursor(row: dict) -> str:
+    # Email last: it may itself contain ":".
+    return f"{row['module_rank']}:{row['user_id']}:{row['lesson_id']}:{row['email']}"
+
+
+def decode_report_cursor(cursor: str) -> tuple[int, str, int, int]:
+    """(module_rank, email, user_id, lesson_id) after which the next page starts; ValueError if malformed."""
+    module_rank, user_id, lesson_id, email = str(cursor).split(":", 3)
+    return int(module_rank), email, int(user_id), int(lesson_id)
+
+
+def iter_student_mastery_report(
+    *,
+    modules=None,
+    mastery_level: str | None = None,
+    email: str | None = None,
+    after: tuple[int, str, int, int] | None = None,
+    limit: int | None = None,
+):
+    """
+    Yield admin report rows (one per user and lesson) ordered by module,
+    email, user (emails are not unique) and lesson. Filters: report module
+    keys, a mastery level, and an email substring. after is a decoded
+    cursor; without limit every remaining row is streamed from a
+    server-side cursor.
+    """
+    from app.adaptive_difficulty import DEVELOPING_THRESHOLD, MASTERY_MIN_ATTEMPTS, MASTERY_THRESHOLD
+
+    modules = [module for module in REPORT_MODULES if module in set(modules or REPORT_MODULES)]
+    filters = []
+    params: list = [MASTERY_MIN_ATTEMPTS, MASTERY_THRESHOLD, DEVELOPING_THRESHOLD, modules]
+    if mastery_level:
+        filters.append("mastery_level = %s")
+        params.append(mastery_level)
+    if email:
+        escaped = email.strip().lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        filters.append("email LIKE %s")
+        params.append(f"%{escaped}%")
+    if after is not None:
+        filters.append("(module_rank, email, user_id, lesson_id) > (%s, %s, %s, %s)")
+        params.extend(after)
+    limit_sql = ""
+    if limit is not None:
+        limit_sql = "LIMIT %s"
+        params.append(limit)
+
+    query = f"""
+        SELECT module_rank, module, user_id, name, email, lesson_id, lesson, attempts, accuracy, mastery_level
+        FROM (
+            SELECT CASE m.module WHEN 'math' THEN 1 WHEN 'nvr' THEN 2 ELSE 3 END AS module_rank,
+                   m.module, u.user_id, u.name, LOWER(u.email) AS email, m.lesson_id,
+                   COALESCE(ml.display_name, ml.lesson_name, nl.display_name, nl.lesson_name,
+                            gl.display_name, gl.lesson_name) AS lesson,
+                   m.attempts,
+                   m.correct * 100.0 / m.attempts AS accuracy,
+                   CASE
+                       WHEN m.attempts < %s THEN 'beginner'
+                       WHEN m.correct * 100.0 / m.attempts >= %s THEN 'mastered'
+                       WHEN m.correct * 100.0 / m.attempts >= %s THEN 'developing'
+                       ELSE 'beginner'
+                   END AS mastery_level
+            FROM user_lesson_mastery m
+            JOIN users u ON u.user_id = m.user_id
+            LEFT JOIN math_lessons ml ON m.module = 'math' AND ml.id = m.lesson_id
+            LEFT JOIN nvr_lessons nl ON m.module = 'nvr' AND nl.id = m.lesson_id
+            LEFT JOIN grammar_lessons gl ON m.module = 'grammar' AND gl.lesson_id = m.lesson_id
+            WHERE m.module = ANY(%s)
+              AND u.role != 'admin'
+              AND m.attempts >= 1
+              AND (ml.id IS NOT NULL OR nl.id IS NOT NULL OR gl.lesson_id IS NOT NULL)
+        ) report
+        {"WHERE " + " AND ".join(filters) if filters else ""}
+        ORDER BY module_rank, email, user_id, lesson_id
+        {limit_sql}
+    """
+
+    conn = get_connection()
+    # Named (server-side) cursor: rows arrive REPORT_FETCH_SIZE at a time.
+    cur = conn.cursor(name="student_mastery_report")
+    cur.itersize = REPORT_FETCH_SIZE
+    try:
+        cur.execute(query, tuple(params))
+        for row in cur:
+            yield {
+                "module_rank": row[0],
+                "module": row[1],
+                "user_id": row[2],
+                "name": row[3],
+                "email": row[4],
+                "lesson_id": row[5],
+                "lesson": row[6],
+                "attempts": int(row[7] or 0),
+                "accuracy": float(row[8] or 0),
+                "mastery_level": row[9],
+            }
+    finally:
+        cur.close()
+        conn.close()
@@ -1,8 +1,13 @@
-from datetime import datetime
+from datetime import datetime, timezone
 from app.adaptive_difficulty import get_student_mastery_math, target_difficulty, filter_by_difficulty
 import re
 
+from app.attempt_queue import StatementRecorder, enqueue_attempt, write_behind_enabled
+from app.content_cache import get_lesson_content
 from app.database import get_connection
+from app.repositories.daily_attempts_repository import record_daily_attempt
+from app.repositories.mastery_repository import record_lesson_mastery_attempt
+from app.repositories.module_rollup_repository import record_module_attempt
 from app.repositories.math_stats_repository import ensure_math_stats_table, update_math_stats_from_attempt
 
 
@@ -63,15 +68,9 @@ def _map_question_rows(rows) -> list[dict]:
             "option_c": row[4],
             "option_d": row[5],
             "correct_option": row[6],
-            "times_seen": row[7],
-            "times_correct": row[8],
-            "times_wrong": row[9],
-            "accuracy": float(row[10] or 0),
-            "last_seen_at": row[11],
-            "is_weak": bool(row[12]),
-            "geometry_schema": row[13],
-            "hint": row[14] if len(row) > 14 else "",
-            "explanation": row[15] if len(row) > 15 else "",
+            "geometry_schema": row[7],
+            "hint": row[8],
+            "explanation": row[9],
         }
         for row in rows
     ]
@@ -105,7 +104,7 @@ def _get_lesson_details(cur, lesson_id: int):
     }
 
 
-def _fetch_questions_for_filter(cur, user_id: int, where_sql: str, params: tuple) -> list[dict]:
+def _fetch_questions_for_filter(cur, where_sql: str, params: tuple) -> list[dict]:
     cur.execute(
         f"""
         SELECT
@@ -116,28 +115,41 @@ def _fetch_questions_for_filter(cur, user_id: int, where_sql: str, params: tuple
             q.option_c,
             q.option_d,
             q.correct_option,
-            COALESCE(s.times_seen, 0) AS times_seen,
-            COALESCE(s.times_correct, 0) AS times_correct,
-            COALESCE(s.times_wrong, 0) AS times_wrong,
-            COALESCE(s.accuracy, 0) AS accuracy,
-            s.last_seen_at,
-            COALESCE(s.is_weak, FALSE) AS is_weak,
             q.geometry_schema,
             COALESCE(q.hint, '') AS hint,
             COALESCE(q.explanation, '') AS explanation
         FROM math_questions q
-        LEFT JOIN math_question_stats s
-            ON s.question_id = q.id
-           AND s.user_id = %s
         WHERE {where_sql}
         ORDER BY q.id ASC
         """,
-        (user_id, *params),
+        params,
     )
 
     return _map_question_rows(cur.fetchall())
 
 
+def _fetch_question_stats(cur, user_id: int, question_ids: list[int]) -> dict:
+    if not question_ids:
+        return {}
+    cur.execute(
+        """
+        SELECT
+            question_id,
+            COALESCE(times_seen, 0),
+            COALESCE(times_correct, 0),
+            COALESCE(times_wrong, 0),
+            COALESCE(accuracy, 0),
+            last_seen_at,
+            COALESCE(is_weak, FALSE)
+        FROM math_question_stats
+        WHERE user_id = %s
+          AND question_id = ANY(%s)
+        """,
+        (user_id, question_ids),
+    )
+    return {row[0]: row[1:] for row in cur.fetchall()}
+
+
 def _extract_lesson_keywords(lesson: dict) -> list[str]:
     raw_parts = [
         lesson.get("display_name") or "",
@@ -161,6 +173,30 @@ def _extract_lesson_keywords(lesson: dict) -> list[str]:
 
 
 def _fetch_lesson_questions(cur, user_id: int, lesson_id: int) -> list[dict]:
+    content = get_lesson_content("math", lesson_id, lambda: _load_lesson_question_content(cur, lesson_id))
+    stats = _fetch_question_stats(cur, user_id, [item["question_id"] for item in content])
+
+    questions = []
+    for item in content:
+        times_seen, times_correct, times_wrong, accuracy, last_seen_at, is_weak = stats.get(
+            item["question_id"], (0, 0, 0, 0, None, False)
+        )
+        questions.append(
+            {
+                **item,
+                "times_seen": times_seen,
+                "times_correct": times_correct,
+                "times_wrong": times_wrong,
+                "accuracy": float(accuracy or 0),
+                "last_seen_at": last_seen_at,
+                "is_weak": bool(is_weak),
+            }
+        )
+    return questions
+
+
+def _load_lesson_question_content(cur, lesson_id: int) -> list[dict]:
+    """The lesson's questions: topic and difficulty, then topic, difficulty, lesson keywords."""
     lesson = _get_lesson_details(cur, lesson_id)
     if not lesson:
         return []
@@ -171,7 +207,6 @@ def _fetch_lesson_questions(cur, user_id: int, lesson_id: int) -> list[dict]:
     if topic and difficulty:
         rows = _fetch_questions_for_filter(
             cur,
-            user_id,
             "LOWER(COALESCE(q.topic, '')) = LOWER(%s) AND LOWER(COALESCE(q.difficulty, '')) = LOWER(%s)",
             (topic, difficulty),
         )
@@ -181,7 +216,6 @@ def _fetch_lesson_questions(cur, user_id: int, lesson_id: int) -> list[dict]:
     if topic:
         rows = _fetch_questions_for_filter(
             cur,
-            user_id,
             "LOWER(COALESCE(q.topic, '')) = LOWER(%s)",
             (topic,),
         )
@@ -191,7 +225,6 @@ def _fetch_lesson_questions(cur, user_id: int, lesson_id: int) -> list[dict]:
     if difficulty:
         rows = _fetch_questions_for_filter(
             cur,
-            user_id,
             "LOWER(COALESCE(q.difficulty, '')) = LOWER(%s)",
             (difficulty,),
         )
@@ -211,7 +244,6 @@ def _fetch_lesson_questions(cur, user_id: int, lesson_id: int) -> list[dict]:
 
         rows = _fetch_questions_for_filter(
             cur,
-            user_id,
             " OR ".join(keyword_clauses),
             tuple(keyword_params),
         )
@@ -412,6 +444,12 @@ def get_math_question_record(question_id: int):
         conn.close()
 
 
+def _record_math_counters(cur, user_id: int, lesson_id: int, correct: bool, attempted_at=None) -> None:
+    record_lesson_mastery_attempt(cur, "math", user_id, lesson_id, correct)
+    record_module_attempt(cur, "math", user_id, correct, lesson_id, attempted_at)
+    record_daily_attempt(cur, "math", user_id, correct, attempted_at)
+
+
 def record_math_attempt(
     user_id: int,
     lesson_id: int,
@@ -424,6 +462,30 @@ def record_math_attempt(
     if not question:
         return
 
+    if write_behind_enabled():
+        attempted_at = datetime.now(timezone.utc)
+        counters = StatementRecorder()
+        _record_math_counters(counters, user_id, lesson_id, correct, attempted_at)
+        enqueue_attempt(
+            "math_attempts",
+            {
+                "student_id": user_id,
+                "question_id": question_id,
+                "lesson_id": lesson_id,
+                "selected_option": selected_option,
+                "is_correct": correct,
+                "created_at": attempted_at,
+                "attempted_at": attempted_at,
+                "session_id": session_id,
+                "submitted_at": attempted_at,
+                "contract_version": "v1",
+            },
+            counters.statements,
+            user_column="student_id",
+        )
+        update_math_stats_from_attempt(user_id, question_id, correct)
+        return
+
     conn = get_connection()
     cur = conn.cursor()
 
@@ -455,6 +517,7 @@ def record_math_attempt(
                 "v1",
             ),
         )
+        _record_math_counters(cur, user_id, lesson_id, correct)
         conn.commit()
     except Exception:
         conn.rollback()
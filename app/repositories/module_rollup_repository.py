@@ -0,0 +1,291 @@
+"""
+Per-user dashboard counters — user_module_rollup.
+
+One row per (user, module) for the modules the dashboards summarise:
+  spelling      spelling_attempts
+  words         the synonym attempt store (synonym_attempts, else words_attempts)
+  math          math_attempts (student_id, or user_id where that column exists)
+  comprehension comprehension_attempts
+
+Each row holds the attempt count, the correct count and the lessons the user
+has attempted (lesson_ids; passages for comprehension, the
+words_lesson_words lessons of the attempted words for words). The attempt
+inserts update the row in their own transaction, so both /dashboard and
+/practice/dashboard are served by one read keyed on user_id instead of
+full-history scans. The same writes mark the day active in
+user_activity_days (app.repositories.activity_repository), which the streaks
+are read from.
+
+rebuild_user_module_rollup() recomputes rows from the attempt tables
+(counter_backfill.py module-rollup at the repo root runs it) and
+check_user_module_rollup() reports drift, e.g. after words_lesson_words
+was remapped. Startup only creates the table; the backfill is a deploy step,
+run before the first release that reads it. Attempts written outside this app
+are counted by the scheduled repair (app.repositories.counter_rebuild).
+"""
+
+from __future__ import annotations
+
+from app.database import get_connection
+from app.repositories.counter_rebuild import CounterTable, check_counters, rebuild_counters
+from app.repositories.activity_repository import record_activity_day
+from app.schema_registry import get_table_columns
+
+
+ROLLUP_MODULES = ("spelling", "words", "math", "comprehension")
+
+_UPSERT_SQL = """
+    INSERT INTO user_module_rollup AS r (user_id, module, attempts, correct, lesson_ids, updated_at)
+    VALUES (%s, %s, 1, %s, {lesson_ids}, NOW())
+    ON CONFLICT (user_id, module) DO UPDATE
+    SET attempts = r.attempts + 1,
+        correct = r.correct + EXCLUDED.correct,
+        lesson_ids = CASE
+            WHEN EXCLUDED.lesson_ids <@ r.lesson_ids THEN r.lesson_ids
+            ELSE ARRAY(SELECT DISTINCT lesson_id FROM unnest(r.lesson_ids || EXCLUDED.lesson_ids) AS lesson_id ORDER BY 1)
+        END,
+        updated_at = NOW()
+"""
+
+
+def init_user_module_rollup_table() -> None:
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS user_module_rollup (
+                user_id INTEGER NOT NULL,
+                module TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                correct INTEGER NOT NULL DEFAULT 0,
+                lesson_ids INTEGER[] NOT NULL DEFAULT '{}',
+                updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                PRIMARY KEY (user_id, module)
+            )
+            """
+        )
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+
+
+# =========================
+# Writes (inside the attempt's transaction)
+# =========================
+def record_module_attempt(cur, module: str, user_id, correct, lesson_id=None, attempted_at=None) -> None:
+    if not user_id:
+        return
+    cur.execute(
+        _UPSERT_SQL.format(lesson_ids="%s::integer[]"),
+        (user_id, module, 1 if correct else 0, [lesson_id] if lesson_id is not None else []),
+    )
+    record_activity_day(cur, user_id, attempted_at)
+
+
+def record_word_module_attempt(cur, module: str, user_id, word_id, correct, attempted_at=None) -> None:
+    """Like record_module_attempt, with the lessons taken from words_lesson_words for the word."""
+    if not user_id:
+        return
+    cur.execute(
+        _UPSERT_SQL.format(
+            lesson_ids="ARRAY(SELECT DISTINCT lesson_id FROM words_lesson_words WHERE word_id = %s ORDER BY 1)"
+        ),
+        (user_id, module, 1 if correct else 0, word_id),
+    )
+    record_activity_day(cur, user_id, attempted_at)
+
+
+# Where synonym answers may be stored, preferred first.
+SYNONYM_ATTEMPT_TABLES = ("synonym_attempts", "words_attempts")
+
+
+def synonym_attempt_store(cur) -> tuple[str | None, str | None]:
+    """(table, correct column) the words module counts; mirrors the synonym engine's store choice."""
+    for table_name in SYNONYM_ATTEMPT_TABLES:
+        columns = get_table_columns(table_name, schema="public", cur=cur)
+        if columns:
+            correct_column = "is_correct" if "is_correct" in columns else "correct" if "correct" in columns else None
+            return table_name, correct_column
+    return None, None
+
+
+# =========================
+# Reads
+# =========================
+def _active_filter(table_name: str, alias: str, cur) -> str:
+    return f"AND COALESCE({alias}.is_active, TRUE) = TRUE" if "is_active" in get_table_columns(table_name, cur=cur) else ""
+
+
+def _lesson_count_sql(cur) -> dict[str, tuple[str, str]]:
+    """module -> (completed lessons among r.lesson_ids, total lessons) SQL expressions."""
+    expressions = {
+        "spelling": (
+            "(SELECT COUNT(*) FROM spelling_lessons l WHERE l.lesson_id = ANY(r.lesson_ids) AND COALESCE(l.is_active, TRUE) = TRUE)",
+            "(SELECT COUNT(*) FROM spelling_lessons l WHERE COALESCE(l.is_active, TRUE) = TRUE)",
+        ),
+        "words": (
+            f"(SELECT COUNT(*) FROM words_lessons l WHERE l.id = ANY(r.lesson_ids) {_active_filter('words_lessons', 'l', cur)})",
+            f"(SELECT COUNT(*) FROM words_lessons l WHERE TRUE {_active_filter('words_lessons', 'l', cur)})",
+        ),
+        "comprehension": (
+            "COALESCE(cardinality(r.lesson_ids), 0)",
+            "(SELECT COUNT(*) FROM comprehension_passages)",
+        ),
+    }
+
+    math_lessons_columns = get_table_columns("math_lessons", cur=cur)
+    if not math_lessons_columns:
+        expressions["math"] = ("0", "0")
+    else:
+        active = _active_filter("math_lessons", "l", cur)
+        lesson_pk_column = next((column for column in ("lesson_id", "id") if column in math_lessons_columns), None)
+        completed = (
+            f"(SELECT COUNT(*) FROM math_lessons l WHERE l.{lesson_pk_column} = ANY(r.lesson_ids) {active})"
+            if lesson_pk_column
+            else "COALESCE(cardinality(r.lesson_ids), 0)"
+        )
+        if "lesson_id" not in get_table_columns("math_attempts", cur=cur):
+            completed = "0"
+        expressions["math"] = (completed, f"(SELECT COUNT(*) FROM math_lessons l WHERE TRUE {active})")
+    return expressions
+
+
+def get_user_module_rollup(cur, user_id: int, *, lessons: bool = False, word_stats: bool = False) -> dict:
+    """
+    {module: {"attempts", "accuracy"}} for ROLLUP_MODULES in one query;
+    accuracy is the percentage as numeric, like the AVG it replaces. With
+    lessons each module also gets "completed_lessons" and "total_lessons";
+    with word_stats the result gains "word_stats": {"mastered", "due"}.
+    """
+    lesson_columns = ""
+    if lessons:
+        expressions = _lesson_count_sql(cur)
+        completed = " ".join(f"WHEN '{module}' THEN {sql[0]}" for module, sql in expressions.items())
+        total = " ".join(f"WHEN '{module}' THEN {sql[1]}" for module, sql in expressions.items())
+        lesson_columns = f", CASE m.module {completed} END, CASE m.module {total} END"
+
+    word_stats_columns = ""
+    params: list = []
+    if word_stats:
+        if get_table_columns("word_stats", schema="public", cur=cur):
+            word_stats_columns = """,
+                (SELECT COUNT(*) FROM public.word_stats WHERE user_id = %s AND mastered = TRUE),
+                (SELECT COUNT(*) FROM public.word_stats WHERE user_id = %s AND due_date IS NOT NULL AND due_date <= NOW())
+            """
+            params.extend([user_id, user_id])
+        else:
+            word_stats_columns = ", 0, 0"
+
+    cur.execute(
+        f"""
+        SELECT m.module,
+               COALESCE(r.attempts, 0),
+               COALESCE(r.correct::numeric / NULLIF(r.attempts, 0) * 100, 0)
+               {lesson_columns}
+               {word_stats_columns}
+        FROM (VALUES {", ".join(f"('{module}')" for module in ROLLUP_MODULES)}) AS m (module)
+        LEFT JOIN user_module_rollup r
+          ON r.user_id = %s
+         AND r.module = m.module
+        """,
+        (*params, user_id),
+    )
+    result: dict = {}
+    for row in cur.fetchall():
+        entry = {"attempts": int(row[1] or 0), "accuracy": row[2]}
+        if lessons:
+            entry["completed_lessons"] = int(row[3] or 0)
+            entry["total_lessons"] = int(row[4] or 0)
+        if word_stats:
+            result["word_stats"] = {"mastered": int(row[-2] or 0), "due": int(row[-1] or 0)}
+        result[row[0]] = entry
+    return result
+
+
+# =========================
+# Rebuild / check
+# =========================
+def _module_source_sql(cur, module: str) -> str | None:
+    """SELECT user_id, attempts, correct, lesson_ids for one module, or None when its table is missing."""
+    if module in ("spelling", "comprehension"):
+        table_name, lesson_column = (
+            ("spelling_attempts", "lesson_id") if module == "spelling" else ("comprehension_attempts", "passage_id")
+        )
+        if not get_table_columns(table_name, cur=cur):
+            return None
+        return f"""
+            SELECT user_id, COUNT(*), COUNT(*) FILTER (WHERE correct),
+                   COALESCE(ARRAY_AGG(DISTINCT {lesson_column} ORDER BY {lesson_column})
+                            FILTER (WHERE {lesson_column} IS NOT NULL), '{{}}')
+            FROM {table_name}
+            WHERE user_id IS NOT NULL
+            GROUP BY user_id
+        """
+
+    if module == "math":
+        columns = get_table_columns("math_attempts", cur=cur)
+        user_columns = [column for column in ("student_id", "user_id") if column in columns]
+        correct_column = next((column for column in ("is_correct", "correct") if column in columns), None)
+        if not user_columns or not correct_column:
+            return None
+        lesson_expr = "ma.lesson_id" if "lesson_id" in columns else "NULL::integer"
+        # The dashboards match either user column, so a row can count for two users.
+        return f"""
+            SELECT u.user_id, COUNT(*), COUNT(*) FILTER (WHERE ma.{correct_column}),
+                   COALESCE(ARRAY_AGG(DISTINCT {lesson_expr} ORDER BY {lesson_expr})
+                            FILTER (WHERE {lesson_expr} IS NOT NULL), '{{}}')
+            FROM math_attempts ma
+            CROSS JOIN LATERAL (
+                SELECT DISTINCT candidate AS user_id
+                FROM unnest(ARRAY[{", ".join(f"ma.{column}" for column in user_columns)}]) AS candidate
+                WHERE candidate IS NOT NULL
+            ) u
+            GROUP BY u.user_id
+        """
+
+    if module == "words":
+        table_name, correct_column = synonym_attempt_store(cur)
+        if not table_name or not correct_column:
+            return None
+        lessons_sql = "'{}'::integer[]"
+        if get_table_columns("words_lesson_words", cur=cur):
+            lessons_sql = f"""
+                COALESCE((
+                    SELECT ARRAY_AGG(DISTINCT lw.lesson_id ORDER BY lw.lesson_id)
+                    FROM words_lesson_words lw
+                    WHERE lw.word_id IN (SELECT DISTINCT word_id FROM public.{table_name} WHERE user_id = counts.user_id)
+                ), '{{}}')
+            """
+        return f"""
+            SELECT counts.user_id, counts.attempts, counts.correct, {lessons_sql}
+            FROM (
+                SELECT user_id, COUNT(*) AS attempts, COUNT(*) FILTER (WHERE {correct_column}) AS correct
+                FROM public.{table_name}
+                WHERE user_id IS NOT NULL
+                GROUP BY user_id
+            ) counts
+        """
+
+    raise ValueError(f"Unknown rollup module: {module}")
+
+
+ROLLUP_COUNTERS = CounterTable(
+    table="user_module_rollup",
+    modules=ROLLUP_MODULES,
+    key_columns=(),
+    value_columns=("attempts", "correct", "lesson_ids"),
+    source_sql=_module_source_sql,
+    normalize=lambda values: (int(values[0]), int(values[1]), sorted(values[2] or [])),
+)
+
+
+def rebuild_user_module_rollup(user_id: int | None = None, modules=None, conn=None) -> int:
+    """Recompute user_module_rollup from the attempt tables for one user or everyone. Returns rows written."""
+    return rebuild_counters(ROLLUP_COUNTERS, user_id, modules, conn=conn)
+
+
+def check_user_module_rollup(user_id: int | None = None, modules=None, conn=None) -> list[dict]:
+    """Compare user_module_rollup with a recount from the attempt tables; one entry per differing row."""
+    return check_counters(ROLLUP_COUNTERS, user_id, modules, conn=conn)
@@ -4,6 +4,9 @@ Mirrors math_repository.py patterns.
 """
 from app.database import get_connection
 from app.adaptive_difficulty import get_student_mastery_nvr, target_difficulty
+from app.content_cache import get_lesson_content
+from app.repositories.mastery_repository import record_lesson_mastery_attempt
+from app.sampling import pick_candidate
 
 
 def get_nvr_lessons():
@@ -46,108 +49,75 @@ def get_nvr_lessons():
         conn.close()
 
 
+NVR_QUESTION_COLUMNS = """
+    q.id, q.question_id, q.stem, q.option_a, q.option_b, q.option_c,
+    q.option_d, q.option_e, q.correct_option, q.topic, q.difficulty,
+    q.explanation, q.hint, q.geometry_schema::text
+"""
+
+
+def _nvr_question_from_row(row):
+    import json
+    geo = None
+    if row[13]:
+        try:
+            geo = json.loads(row[13])
+        except Exception:
+            geo = None
+    return {
+        "db_id": row[0],
+        "question_id": row[1],
+        "stem": row[2],
+        "option_a": row[3],
+        "option_b": row[4],
+        "option_c": row[5],
+        "option_d": row[6],
+        "option_e": row[7],
+        "correct_option": row[8],
+        "topic": row[9],
+        "difficulty": row[10],
+        "explanation": row[11],
+        "hint": row[12],
+        "geometry_schema": geo,
+    }
+
+
+def _load_nvr_lesson_questions(cur, lesson_id: int):
+    """(db_id, lowercased difficulty, question) per question in the lesson."""
+    cur.execute(
+        f"""
+        SELECT {NVR_QUESTION_COLUMNS}
+        FROM nvr_questions q
+        JOIN nvr_lesson_questions lq ON lq.question_id = q.id
+        WHERE lq.lesson_id = %s
+        ORDER BY q.id
+        """,
+        (lesson_id,),
+    )
+    return [
+        (row[0], str(row[10] or "").lower(), _nvr_question_from_row(row))
+        for row in cur.fetchall()
+    ]
+
+
 def get_nvr_question(lesson_id: int, seen_ids: list[int] | None = None, user_id: int | None = None):
     """Return one unseen question from the lesson, biased by student mastery difficulty."""
     conn = get_connection()
     cur = conn.cursor()
     try:
-        # Adaptive difficulty: determine preferred difficulty band
-        difficulty_filter = ""
-        diff_params: list = []
+        # Adaptive difficulty: try each preferred difficulty band first, then any.
+        picks: list = []
         if user_id:
-            from app.adaptive_difficulty import filter_by_difficulty
             mastery = get_student_mastery_nvr(cur, user_id, lesson_id)
-            preferred = target_difficulty(mastery)
-            # Try preferred difficulty first, fall back if no results
-            for diff in preferred:
-                exclusion_inner = ""
-                p_inner: list = [lesson_id, diff]
-                if seen_ids:
-                    exclusion_inner = "AND q.id != ALL(%s)"
-                    p_inner.append(seen_ids)
-                cur.execute(
-                    f"""
-                    SELECT q.id, q.question_id, q.stem, q.option_a, q.option_b, q.option_c,
-                           q.option_d, q.option_e, q.correct_option, q.topic, q.difficulty,
-                           q.explanation, q.hint, q.geometry_schema::text
-                    FROM nvr_questions q
-                    JOIN nvr_lesson_questions lq ON lq.question_id = q.id
-                    WHERE lq.lesson_id = %s AND LOWER(COALESCE(q.difficulty,'')) = LOWER(%s)
-                      {exclusion_inner}
-                    ORDER BY RANDOM() LIMIT 1;
-                    """,
-                    p_inner,
-                )
-                row = cur.fetchone()
-                if row:
-                    import json
-                    geo = None
-                    if row[13]:
-                        try: geo = json.loads(row[13])
-                        except Exception: geo = None
-                    return {"db_id": row[0], "question_id": row[1], "stem": row[2],
-                            "option_a": row[3], "option_b": row[4], "option_c": row[5],
-                            "option_d": row[6], "option_e": row[7], "correct_option": row[8],
-                            "topic": row[9], "difficulty": row[10], "explanation": row[11],
-                            "hint": row[12], "geometry_schema": geo}
-        exclusion = ""
-        params: list = [lesson_id]
-        if seen_ids:
-            exclusion = "AND q.id != ALL(%s)"
-            params.append(seen_ids)
+            picks.extend({str(diff or "").lower()} for diff in target_difficulty(mastery))
+        picks.append(None)
 
-        cur.execute(
-            f"""
-            SELECT
-                q.id,
-                q.question_id,
-                q.stem,
-                q.option_a,
-                q.option_b,
-                q.option_c,
-                q.option_d,
-                q.option_e,
-                q.correct_option,
-                q.topic,
-                q.difficulty,
-                q.explanation,
-                q.hint,
-                q.geometry_schema::text
-            FROM nvr_questions q
-            JOIN nvr_lesson_questions lq ON lq.question_id = q.id
-            WHERE lq.lesson_id = %s
-              {exclusion}
-            ORDER BY RANDOM()
-            LIMIT 1;
-            """,
-            params,
-        )
-        row = cur.fetchone()
-        if not row:
-            return None
-        import json
-        geo = None
-        if row[13]:
-            try:
-                geo = json.loads(row[13])
-            except Exception:
-                geo = None
-        return {
-            "db_id": row[0],
-            "question_id": row[1],
-            "stem": row[2],
-            "option_a": row[3],
-            "option_b": row[4],
-            "option_c": row[5],
-            "option_d": row[6],
-            "option_e": row[7],
-            "correct_option": row[8],
-            "topic": row[9],
-            "difficulty": row[10],
-            "explanation": row[11],
-            "hint": row[12],
-            "geometry_schema": geo,
-        }
+        questions = get_lesson_content("nvr", lesson_id, lambda: _load_nvr_lesson_questions(cur, lesson_id))
+        for difficulties in picks:
+            candidate = pick_candidate(questions, exclude=seen_ids, difficulties=difficulties)
+            if candidate is not None:
+                return dict(candidate[2])
+        return None
     finally:
         cur.close()
         conn.close()
@@ -166,6 +136,8 @@ def submit_nvr_answer(user_id: int, lesson_id: int, question_id: str, selected:
             """,
             (user_id, lesson_id, question_id, selected, correct, selected.upper() == correct.upper()),
         )
+        if cur.rowcount == 1:
+            record_lesson_mastery_attempt(cur, "nvr", user_id, lesson_id, selected.upper() == correct.upper())
         conn.commit()
         return {"ok": True}
     except Exception:
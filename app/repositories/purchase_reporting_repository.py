@@ -7,6 +7,7 @@ from datetime import datetime
 from typing import Any
 
 from app.database import get_connection
+from app.schema_registry import get_table_columns
 
 
 def _normalize(value: Any) -> str:
@@ -89,14 +90,7 @@ def list_purchase_events(
     conn = get_connection()
     cur = conn.cursor()
     try:
-        cur.execute(
-            """
-            SELECT column_name
-            FROM information_schema.columns
-            WHERE table_name = 'math_gumroad_events'
-            """
-        )
-        event_columns = {str(row[0]).strip().lower() for row in (cur.fetchall() or [])}
+        event_columns = get_table_columns("math_gumroad_events", cur=cur)
         created_col = "e.created_at" if "created_at" in event_columns else "NULL::timestamp"
 
         cur.execute(
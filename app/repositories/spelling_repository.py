@@ -1,9 +1,27 @@
+from bisect import bisect_right
 from datetime import datetime, timezone
 from itertools import zip_longest
 import re
 
+from app.attempt_queue import (
+    StatementRecorder,
+    enqueue_attempt,
+    match_timestamp,
+    pending_attempts,
+    write_behind_enabled,
+)
+from app.batched_writes import join_statements
+from app.content_cache import get_lesson_content
 from app.database import get_connection
-from app.repositories.spelling_stats_repository import update_spelling_stats_from_attempt
+from app.repositories.daily_attempts_repository import record_daily_attempt
+from app.repositories.mastery_repository import record_lesson_mastery_attempt
+from app.repositories.module_rollup_repository import record_module_attempt
+from app.repositories.spelling_stats_repository import (
+    PATTERN_STATS_UPSERT_SQL,
+    WORD_STATS_UPSERT_SQL,
+    spelling_stats_params,
+    update_spelling_stats_from_attempt,
+)
 
 
 def _normalize_example_sentence(word: str | None, example_sentence: str | None) -> str:
@@ -452,52 +470,284 @@ def get_next_lesson_word_after(lesson_id: int, current_word_id: int, conn):
     return result[0] if result else None
 
 
-def _fetch_lesson_words(cur, user_id: int, lesson_id: int) -> list[dict]:
+def _load_lesson_word_content(cur, lesson_id: int) -> list[dict]:
     cur.execute(
         """
-        SELECT
+        SELECT DISTINCT
             w.word_id,
             w.word,
             COALESCE(w.hint, '') AS hint,
-            COALESCE(w.example_sentence, '') AS example_sentence,
-            COALESCE(s.attempts_count, 0) AS times_seen,
-            COALESCE(s.correct_count, 0) AS times_correct,
-            COALESCE(s.wrong_count, 0) AS times_wrong,
-            COALESCE(s.accuracy, 0) AS accuracy,
-            s.last_attempt_at
+            COALESCE(w.example_sentence, '') AS example_sentence
         FROM spelling_lesson_items li
         JOIN spelling_lessons l
             ON l.lesson_id = li.lesson_id
         JOIN spelling_words w
             ON li.word_id = w.word_id
-        LEFT JOIN spelling_word_stats s
-            ON s.word_id = w.word_id
-           AND s.user_id = %s
         WHERE li.lesson_id = %s
           AND l.is_active = TRUE
         ORDER BY w.word_id ASC
         """,
-        (user_id, lesson_id),
+        (lesson_id,),
     )
-
-    rows = cur.fetchall()
-    words = [
+    return [
         {
             "word_id": row[0],
             "word": row[1],
             "hint": row[2],
             "example_sentence": _normalize_example_sentence(row[1], row[3]),
-            "times_seen": row[4],
-            "times_correct": row[5],
-            "times_wrong": row[6],
-            "accuracy": float(row[7] or 0),
-            "last_seen_at": row[8],
-            "is_weak": row[4] >= 2 and float(row[7] or 0) < 0.7,
         }
-        for row in rows
+        for row in cur.fetchall()
     ]
-    deduped_words = list({item["word_id"]: item for item in words}.values())
-    return deduped_words
+
+
+def _fetch_word_stats(cur, user_id: int, word_ids: list[int]) -> dict:
+    if not word_ids:
+        return {}
+    cur.execute(
+        """
+        SELECT
+            word_id,
+            COALESCE(attempts_count, 0),
+            COALESCE(correct_count, 0),
+            COALESCE(wrong_count, 0),
+            COALESCE(accuracy, 0),
+            last_attempt_at
+        FROM spelling_word_stats
+        WHERE user_id = %s
+          AND word_id = ANY(%s)
+        """,
+        (user_id, word_ids),
+    )
+    return {row[0]: row[1:] for row in cur.fetchall()}
+
+
+def _fetch_lesson_words(cur, user_id: int, lesson_id: int) -> list[dict]:
+    content = get_lesson_content("spelling", lesson_id, lambda: _load_lesson_word_content(cur, lesson_id))
+    stats = _fetch_word_stats(cur, user_id, [item["word_id"] for item in content])
+
+    words = []
+    for item in content:
+        times_seen, times_correct, times_wrong, accuracy, last_seen_at = stats.get(item["word_id"], (0, 0, 0, 0, None))
+        words.append(
+            {
+                **item,
+                "times_seen": times_seen,
+                "times_correct": times_correct,
+                "times_wrong": times_wrong,
+                "accuracy": float(accuracy or 0),
+                "last_seen_at": last_seen_at,
+                "is_weak": times_seen >= 2 and float(accuracy or 0) < 0.7,
+            }
+        )
+    return words
+
+
+def _load_lesson_item_count(cur, lesson_id: int) -> list[int]:
+    cur.execute(
+        """
+        SELECT COUNT(*)
+        FROM spelling_lesson_items
+        WHERE lesson_id = %s
+        """,
+        (lesson_id,),
+    )
+    row = cur.fetchone()
+    return [int(row[0] or 0) if row else 0]
+
+
+def _normalize_lesson_id(lesson_id):
+    # Queued rows keep the lesson id as the request sent it (int or str).
+    try:
+        return int(lesson_id)
+    except (TypeError, ValueError):
+        return None
+
+
+def _attempt_sort_key(attempt):
+    return (_sort_last_seen(attempt[2]), attempt[0] or 0)
+
+
+class SpellingSelectionContext:
+    """
+    Everything get_spelling_question needs to pick a word for one learner in
+    one lesson: the lesson's words (app.content_cache), the learner's
+    attempts in the lesson and their weakest spelling pattern.
+
+    Each method answers the same question as the per-call repository helper
+    of the same name (get_resume_word_id, get_weak_word_id, is_word_mastered,
+    ...), but over the snapshot instead of with a query.
+    """
+
+    def __init__(self, *, lesson_item_count: int, items, attempts, weak_pattern):
+        self.lesson_item_count = lesson_item_count
+        self.weak_pattern = weak_pattern
+        self._items = {item["word_id"]: item for item in items}
+        self._item_ids = sorted(self._items)
+        # (attempt_id, word_id, created_at, correct, session_id, time_taken), oldest first
+        self._attempts = sorted(attempts, key=_attempt_sort_key)
+        self._by_word: dict = {}
+        for attempt in self._attempts:
+            self._by_word.setdefault(attempt[1], []).append(attempt)
+
+    def word_details(self, word_id):
+        item = self._items.get(word_id)
+        return dict(item) if item is not None else None
+
+    def latest_attempt_summary(self):
+        if not self._attempts:
+            return None
+        _attempt_id, word_id, created_at, correct, session_id, _time_taken = self._attempts[-1]
+        return {
+            "word_id": word_id,
+            "correct": bool(correct),
+            "created_at": created_at,
+            "session_id": session_id,
+        }
+
+    def _session_word_ids(self, session_id) -> list[int]:
+        return [
+            attempt[1]
+            for attempt in self._attempts
+            if attempt[4] == session_id and attempt[1] is not None
+        ]
+
+    def session_word_positions(self, session_id) -> dict:
+        if not session_id:
+            return {"question_position": 1, "last_seen_positions": {}}
+        ordered_attempts = self._session_word_ids(session_id)
+        last_seen_positions = {}
+        for position, attempted_word_id in enumerate(ordered_attempts, start=1):
+            last_seen_positions[attempted_word_id] = position
+        return {
+            "question_position": len(ordered_attempts) + 1,
+            "last_seen_positions": last_seen_positions,
+        }
+
+    def session_recent_word_ids(self, session_id, limit: int = 4) -> list[int]:
+        if not session_id:
+            return []
+        return self._session_word_ids(session_id)[::-1][:limit]
+
+    def next_lesson_word_after(self, word_id):
+        index = bisect_right(self._item_ids, word_id)
+        return self._item_ids[index] if index < len(self._item_ids) else None
+
+    def resume_word_id(self):
+        last_correct = next((attempt for attempt in reversed(self._attempts) if attempt[3] is True), None)
+        if last_correct is None or last_correct[1] is None:
+            return None
+        return self.next_lesson_word_after(last_correct[1])
+
+    def next_unmastered_word_id(self):
+        mastered = {
+            word_id
+            for word_id, attempts in self._by_word.items()
+            if sum(1 for attempt in attempts if attempt[3] is True) >= 2
+            and not any(attempt[3] is False for attempt in attempts)
+        }
+        # get_next_unmastered_word uses NOT IN, which matches nothing once the set holds a NULL.
+        if None in mastered:
+            return None
+        return next((word_id for word_id in self._item_ids if word_id not in mastered), None)
+
+    def weak_word_id(self, exclude_word_ids: list[int] | None = None):
+        exclude_set = {word_id for word_id in (exclude_word_ids or []) if word_id is not None}
+        # Same contract as get_weak_word_id: no exclusion list, no pick.
+        if not exclude_set:
+            return None
+
+        ranked = []
+        for word_id, attempts in self._by_word.items():
+            correct_count = sum(1 for attempt in attempts if attempt[3] is True)
+            wrong_count = sum(1 for attempt in attempts if attempt[3] is False)
+            if wrong_count > correct_count:
+                # MAX(created_at) skips NULLs; it is NULL only when every attempt has none.
+                last_attempt_at = max(
+                    (_sort_last_seen(attempt[2]) for attempt in attempts if attempt[2] is not None),
+                    default=_NULL_TIMESTAMP_SORT_KEY,
+                )
+                ranked.append((correct_count / len(attempts), last_attempt_at, word_id))
+        ranked.sort(key=lambda row: (row[0], row[1], row[2] if row[2] is not None else 0))
+
+        for _accuracy, _last_attempt_at, word_id in ranked:
+            if word_id not in exclude_set:
+                return word_id
+        return None
+
+    def is_word_mastered(self, word_id) -> bool:
+        recent_attempts = self._by_word.get(word_id, [])[-2:]
+        return len(recent_attempts) == 2 and all(attempt[3] is True for attempt in recent_attempts)
+
+    def word_timing_stats(self, word_id) -> dict:
+        attempts = self._by_word.get(word_id, [])
+        attempt_count = len(attempts)
+        avg_time_ms = float(sum(attempt[5] for attempt in attempts) / attempt_count) if attempt_count else 0.0
+        return {
+            "attempt_count": attempt_count,
+            "avg_time_ms": avg_time_ms,
+            "is_slow": avg_time_ms > 10000 if attempt_count > 0 else False,
+        }
+
+    def has_prior_incorrect_attempt(self, word_id) -> bool:
+        return any(attempt[3] is False for attempt in self._by_word.get(word_id, []))
+
+
+def load_spelling_selection_context(user_id: int, lesson_id: int, conn) -> SpellingSelectionContext:
+    """
+    Two queries (the learner's attempts in the lesson, their weakest
+    pattern) plus their queued answers; the lesson's words and item count
+    come from app.content_cache.
+    """
+    with conn.cursor() as cur:
+        items = get_lesson_content("spelling", lesson_id, lambda: _load_lesson_word_content(cur, lesson_id))
+        lesson_item_count = get_lesson_content(
+            "spelling",
+            lesson_id,
+            lambda: _load_lesson_item_count(cur, lesson_id),
+            kind="item_count",
+        )[0]
+        cur.execute(
+            """
+            SELECT attempt_id, word_id, created_at, correct, session_id, COALESCE(time_taken, 0)
+            FROM spelling_attempts
+            WHERE user_id = %s
+              AND lesson_id = %s
+            """,
+            (user_id, lesson_id),
+        )
+        attempts = list(cur.fetchall() or [])
+        # Answers still in the write-behind queue (app.attempt_queue).
+        like = next((attempt[2] for attempt in attempts if attempt[2] is not None), None)
+        attempts.extend(
+            (
+                None,
+                row["word_id"],
+                match_timestamp(row["created_at"], like),
+                row["correct"],
+                row["session_id"],
+                row["time_taken"] or 0,
+            )
+            for row in pending_attempts("spelling_attempts", user_id)
+            if _normalize_lesson_id(row["lesson_id"]) == _normalize_lesson_id(lesson_id)
+        )
+        cur.execute(
+            """
+            SELECT pattern
+            FROM spelling_pattern_stats
+            WHERE user_id = %s
+            ORDER BY accuracy ASC, last_attempt_at ASC NULLS FIRST
+            LIMIT 1
+            """,
+            (user_id,),
+        )
+        pattern_row = cur.fetchone()
+
+    return SpellingSelectionContext(
+        lesson_item_count=lesson_item_count,
+        items=items,
+        attempts=attempts,
+        weak_pattern=pattern_row[0] if pattern_row else None,
+    )
 
 
 def _get_latest_word_id(cur, user_id: int, lesson_id: int):
@@ -536,8 +786,15 @@ def _avoid_recent_review_repeat(items: list[dict], recent_word_ids: list[int]):
     return filtered or items
 
 
+# NULL timestamps sort after every real one, as in SQL's ASC ordering.
+_NULL_TIMESTAMP_SORT_KEY = datetime.max.replace(tzinfo=timezone.utc)
+
+
 def _sort_last_seen(value):
-    return value if value is not None else datetime.min
+    if value is None:
+        return _NULL_TIMESTAMP_SORT_KEY
+    # spelling_attempts.created_at is naive; read it as UTC so it compares with the aware fallback.
+    return value if value.tzinfo is not None else value.replace(tzinfo=timezone.utc)
 
 
 def _count_wrong_letters(submitted_text: str, correct_word: str) -> int:
@@ -559,8 +816,11 @@ def get_spelling_next_item(
     lesson_id: int,
     recent_word_ids: list[int] | None = None,
     last_word_id: int | None = None,
+    conn=None,
 ):
-    conn = get_connection()
+    owns_connection = conn is None
+    if owns_connection:
+        conn = get_connection()
     cur = conn.cursor()
 
     try:
@@ -594,7 +854,8 @@ def get_spelling_next_item(
         return selected_item
     finally:
         cur.close()
-        conn.close()
+        if owns_connection:
+            conn.close()
 
 
 def get_spelling_word_details(word_id: int, conn=None):
@@ -629,6 +890,69 @@ def get_spelling_word_details(word_id: int, conn=None):
             conn.close()
 
 
+_SPELLING_ATTEMPT_INSERT_SQL = """
+    INSERT INTO spelling_attempts (
+        user_id,
+        word_id,
+        correct,
+        time_taken,
+        blanks_count,
+        wrong_letters_count,
+        created_at,
+        course_id,
+        member_id,
+
+        -- NEW FIELDS (SAFE ADDITIVE)
+        lesson_id,
+        question_id,
+        session_id,
+        submitted_at,
+        contract_version
+    )
+    VALUES (
+        %(user_id)s, %(word_id)s, %(correct)s, %(time_taken)s, %(blanks_count)s,
+        %(wrong_letters_count)s, %(created_at)s, %(course_id)s, %(member_id)s,
+        %(lesson_id)s, %(question_id)s, %(session_id)s, NOW(), %(contract_version)s
+    )
+"""
+
+
+def _spelling_attempt_params(
+    user_id: int,
+    word_id: int,
+    submitted_text: str,
+    correct: bool,
+    correct_word: str,
+    response_ms: int,
+    session_id: str | None,
+    question_id: str | None,
+    lesson_id: int | None,
+) -> dict:
+    return {
+        "user_id": user_id,
+        "word_id": word_id,
+        "correct": correct,
+        "time_taken": max(int(response_ms or 0), 0),
+        "blanks_count": (submitted_text or "").count("_"),
+        "wrong_letters_count": 0 if correct else _count_wrong_letters(submitted_text, correct_word),
+        "created_at": datetime.now(timezone.utc),
+        "course_id": 0,
+        "member_id": None,
+
+        # NEW FIELDS
+        "lesson_id": lesson_id if lesson_id else None,
+        "question_id": question_id if question_id else None,
+        "session_id": session_id if session_id else None,
+        "contract_version": "v1",
+    }
+
+
+def _record_spelling_counters(cur, user_id: int, lesson_id: int | None, correct: bool, attempted_at=None) -> None:
+    record_lesson_mastery_attempt(cur, "spelling", user_id, lesson_id, correct)
+    record_module_attempt(cur, "spelling", user_id, correct, lesson_id, attempted_at)
+    record_daily_attempt(cur, "spelling", user_id, correct, attempted_at)
+
+
 def record_spelling_attempt(
     user_id: int,
     word_id: int,
@@ -638,77 +962,170 @@ def record_spelling_attempt(
     session_id: str | None = None,
     question_id: str | None = None,
     lesson_id: int | None = None,
+    conn=None,
 ):
-    conn = get_connection()
+    owns_connection = conn is None
+    if owns_connection:
+        conn = get_connection()
     cur = conn.cursor()
 
     try:
-        time_taken = max(int(response_ms or 0), 0)
         correct_word = ""
         word_details = get_spelling_word_details(word_id, conn=conn)
         if word_details:
             correct_word = word_details["word"]
 
-        blanks_count = (submitted_text or "").count("_")
-        wrong_letters_count = 0 if correct else _count_wrong_letters(submitted_text, correct_word)
-        created_at = datetime.now(timezone.utc)
-        course_id = 0
-        member_id = None
-
-        lesson_id = lesson_id if lesson_id else None
-        question_id = question_id if question_id else None
-        session_id = session_id if session_id else None
-        contract_version = "v1"
-
-        query = """
-            INSERT INTO spelling_attempts (
-                user_id,
-                word_id,
-                correct,
-                time_taken,
-                blanks_count,
-                wrong_letters_count,
-                created_at,
-                course_id,
-                member_id,
-
-                -- NEW FIELDS (SAFE ADDITIVE)
-                lesson_id,
-                question_id,
-                session_id,
-                submitted_at,
-                contract_version
-            )
-            VALUES (
-                %s, %s, %s, %s, %s, %s, %s, %s, %s,
-                %s, %s, %s, NOW(), %s
-            )
-        """
-
-        values = (
-            user_id,
-            word_id,
-            correct,
-            time_taken,
-            blanks_count,
-            wrong_letters_count,
-            created_at,
-            course_id,
-            member_id,
-
-            # NEW FIELDS
-            lesson_id,
-            question_id,
-            session_id,
-            contract_version,
+        params = _spelling_attempt_params(
+            user_id, word_id, submitted_text, correct, correct_word, response_ms, session_id, question_id, lesson_id
         )
-        cur.execute(query, values)
-        conn.commit()
+        cur.execute(_SPELLING_ATTEMPT_INSERT_SQL, params)
+        _record_spelling_counters(cur, user_id, params["lesson_id"], correct)
+        if owns_connection:
+            conn.commit()
     except Exception:
-        conn.rollback()
+        if owns_connection:
+            conn.rollback()
         raise
     finally:
         cur.close()
-        conn.close()
+        if owns_connection:
+            conn.close()
+
+    # An owned connection is already released here; the stats upsert then opens its own.
+    update_spelling_stats_from_attempt(user_id, word_id, correct, conn=None if owns_connection else conn)
+
 
-    update_spelling_stats_from_attempt(user_id, word_id, correct)
+# =========================
+# Answer commit (submit_spelling_answer)
+# =========================
+def load_spelling_answer_context(user_id: int, word_id: int, conn=None) -> dict | None:
+    """
+    Everything an answer needs before it is written, in one query: the word
+    (as get_spelling_word_details), the user's weakest pattern (as
+    get_spelling_weak_pattern) and the word's first lesson (as
+    get_lesson_id_for_word). None when the word does not exist.
+    """
+    owns_connection = conn is None
+    if owns_connection:
+        conn = get_connection()
+    cur = conn.cursor()
+
+    try:
+        cur.execute(
+            """
+            SELECT
+                w.word_id,
+                w.word,
+                COALESCE(w.hint, ''),
+                COALESCE(w.example_sentence, ''),
+                (
+                    SELECT ps.pattern
+                    FROM spelling_pattern_stats ps
+                    WHERE ps.user_id = %s
+                    ORDER BY ps.accuracy ASC, ps.last_attempt_at ASC NULLS FIRST
+                    LIMIT 1
+                ),
+                (
+                    SELECT li.lesson_id
+                    FROM spelling_lesson_items li
+                    WHERE li.word_id = w.word_id
+                    ORDER BY li.lesson_id ASC
+                    LIMIT 1
+                )
+            FROM spelling_words w
+            WHERE w.word_id = %s
+            LIMIT 1
+            """,
+            (user_id, word_id),
+        )
+        row = cur.fetchone()
+        if not row:
+            return None
+        return {
+            "word_id": row[0],
+            "word": row[1],
+            "hint": row[2],
+            "example_sentence": _normalize_example_sentence(row[1], row[3]),
+            "weak_pattern": row[4],
+            "lesson_id": row[5],
+        }
+    finally:
+        cur.close()
+        if owns_connection:
+            conn.close()
+
+
+_SPELLING_ANSWER_WRITE_SQL = f"""
+    WITH attempt AS (
+        {_SPELLING_ATTEMPT_INSERT_SQL}
+        RETURNING 1
+    ),
+    word_stats AS (
+        {WORD_STATS_UPSERT_SQL}
+        RETURNING 1
+    ),
+    pattern_stats AS (
+        {PATTERN_STATS_UPSERT_SQL}
+        RETURNING 1
+    )
+    SELECT 1
+"""
+
+
+def write_spelling_answer(
+    user_id: int,
+    word_id: int,
+    submitted_text: str,
+    correct: bool,
+    correct_word: str,
+    patterns: list[str],
+    response_ms: int = 0,
+    session_id: str | None = None,
+    question_id: str | None = None,
+    lesson_id: int | None = None,
+    conn=None,
+) -> None:
+    """
+    The writes of record_spelling_attempt, update_spelling_stats_from_attempt
+    and update_spelling_pattern_stats in one round trip: the attempt, word
+    stats and pattern stats as one CTE chain, followed in the same batch by
+    the mastery / rollup / daily counters. In write-behind mode
+    (app.attempt_queue) the same writes are queued instead.
+    """
+    params = _spelling_attempt_params(
+        user_id, word_id, submitted_text, correct, correct_word, response_ms, session_id, question_id, lesson_id
+    )
+    queued = write_behind_enabled()
+    # Queued writes run at flush time, so they carry the answer's own timestamp.
+    attempted_at = params["created_at"] if queued else None
+    stats_params = spelling_stats_params(
+        user_id, correct, attempted_at, word_id=word_id, patterns=list(patterns or [])
+    )
+    counters = StatementRecorder()
+    _record_spelling_counters(counters, user_id, params["lesson_id"], correct, attempted_at)
+
+    if queued:
+        enqueue_attempt(
+            "spelling_attempts",
+            {**params, "submitted_at": params["created_at"]},
+            [(WORD_STATS_UPSERT_SQL, stats_params), (PATTERN_STATS_UPSERT_SQL, stats_params), *counters.statements],
+        )
+        return
+
+    owns_connection = conn is None
+    if owns_connection:
+        conn = get_connection()
+    cur = conn.cursor()
+
+    try:
+        cur.execute(*join_statements([(_SPELLING_ANSWER_WRITE_SQL, {**params, **stats_params}), *counters.statements]))
+        if owns_connection:
+            conn.commit()
+    except Exception:
+        if owns_connection:
+            conn.rollback()
+        raise
+    finally:
+        cur.close()
+        if owns_connection:
+            conn.close()
@@ -50,8 +50,10 @@ def get_spelling_weak_items(user_id: int, lesson_id: int) -> list[dict]:
         conn.close()
 
 
-def get_spelling_weak_pattern(user_id: int):
-    conn = get_connection()
+def get_spelling_weak_pattern(user_id: int, conn=None):
+    owns_connection = conn is None
+    if owns_connection:
+        conn = get_connection()
     cur = conn.cursor()
 
     try:
@@ -69,119 +71,127 @@ def get_spelling_weak_pattern(user_id: int):
         return row[0] if row else None
     finally:
         cur.close()
-        conn.close()
+        if owns_connection:
+            conn.close()
+
+
+# Named parameters: user_id, word_id, correct_count, wrong_count, accuracy, attempted_at.
+WORD_STATS_UPSERT_SQL = """
+    INSERT INTO spelling_word_stats (
+        user_id,
+        word_id,
+        attempts_count,
+        correct_count,
+        wrong_count,
+        last_attempt_at,
+        last_correct_at,
+        accuracy
+    )
+    VALUES (
+        %(user_id)s,
+        %(word_id)s,
+        1,
+        %(correct_count)s,
+        %(wrong_count)s,
+        COALESCE(%(attempted_at)s::timestamptz, NOW()),
+        CASE WHEN %(correct_count)s = 1 THEN COALESCE(%(attempted_at)s::timestamptz, NOW()) ELSE NULL END,
+        %(accuracy)s
+    )
+    ON CONFLICT (user_id, word_id)
+    DO UPDATE SET
+        attempts_count = spelling_word_stats.attempts_count + 1,
+        correct_count = spelling_word_stats.correct_count + EXCLUDED.correct_count,
+        wrong_count = spelling_word_stats.wrong_count + EXCLUDED.wrong_count,
+        last_attempt_at = GREATEST(spelling_word_stats.last_attempt_at, EXCLUDED.last_attempt_at),
+        last_correct_at = CASE
+            WHEN EXCLUDED.correct_count = 1 THEN GREATEST(spelling_word_stats.last_correct_at, EXCLUDED.last_correct_at)
+            ELSE spelling_word_stats.last_correct_at
+        END,
+        accuracy = (
+            (spelling_word_stats.correct_count + EXCLUDED.correct_count)::float /
+            (spelling_word_stats.attempts_count + 1)
+        )
+"""
+
+# Named parameters: user_id, patterns (text[]), correct_count, wrong_count, accuracy, attempted_at.
+# A pattern listed n times counts n attempts, as n single upserts would.
+PATTERN_STATS_UPSERT_SQL = """
+    INSERT INTO spelling_pattern_stats (
+        user_id,
+        pattern,
+        attempts_count,
+        correct_count,
+        wrong_count,
+        accuracy,
+        last_attempt_at
+    )
+    SELECT %(user_id)s, pattern, COUNT(*), COUNT(*) * %(correct_count)s, COUNT(*) * %(wrong_count)s, %(accuracy)s,
+           COALESCE(%(attempted_at)s::timestamptz, NOW())
+    FROM unnest(%(patterns)s::text[]) AS pattern
+    GROUP BY pattern
+    ON CONFLICT (user_id, pattern)
+    DO UPDATE SET
+        attempts_count = spelling_pattern_stats.attempts_count + EXCLUDED.attempts_count,
+        correct_count = spelling_pattern_stats.correct_count + EXCLUDED.correct_count,
+        wrong_count = spelling_pattern_stats.wrong_count + EXCLUDED.wrong_count,
+        last_attempt_at = GREATEST(spelling_pattern_stats.last_attempt_at, EXCLUDED.last_attempt_at),
+        accuracy = (
+            (spelling_pattern_stats.correct_count + EXCLUDED.correct_count)::float /
+            (spelling_pattern_stats.attempts_count + EXCLUDED.attempts_count)
+        )
+"""
 
 
-def update_spelling_stats_from_attempt(user_id: int, word_id: int, correct: bool):
-    conn = get_connection()
-    cur = conn.cursor()
+def spelling_stats_params(user_id: int, correct: bool, attempted_at=None, **extra) -> dict:
+    """attempted_at stamps a queued attempt's stats with its answer time (app.attempt_queue); None means now."""
+    return {
+        "user_id": user_id,
+        "correct_count": 1 if correct else 0,
+        "wrong_count": 0 if correct else 1,
+        "accuracy": 1.0 if correct else 0.0,
+        "attempted_at": attempted_at,
+        **extra,
+    }
 
-    correct_count = 1 if correct else 0
-    wrong_count = 0 if correct else 1
+
+def update_spelling_stats_from_attempt(user_id: int, word_id: int, correct: bool, conn=None):
+    owns_connection = conn is None
+    if owns_connection:
+        conn = get_connection()
+    cur = conn.cursor()
 
     try:
-        cur.execute(
-            """
-            INSERT INTO spelling_word_stats (
-                user_id,
-                word_id,
-                attempts_count,
-                correct_count,
-                wrong_count,
-                last_attempt_at,
-                last_correct_at,
-                accuracy
-            )
-            VALUES (
-                %s,
-                %s,
-                1,
-                %s,
-                %s,
-                NOW(),
-                CASE WHEN %s = 1 THEN NOW() ELSE NULL END,
-                %s
-            )
-            ON CONFLICT (user_id, word_id)
-            DO UPDATE SET
-                attempts_count = spelling_word_stats.attempts_count + 1,
-                correct_count = spelling_word_stats.correct_count + EXCLUDED.correct_count,
-                wrong_count = spelling_word_stats.wrong_count + EXCLUDED.wrong_count,
-                last_attempt_at = NOW(),
-                last_correct_at = CASE
-                    WHEN EXCLUDED.correct_count = 1 THEN NOW()
-                    ELSE spelling_word_stats.last_correct_at
-                END,
-                accuracy = (
-                    (spelling_word_stats.correct_count + EXCLUDED.correct_count)::float /
-                    (spelling_word_stats.attempts_count + 1)
-                )
-            """,
-            (
-                user_id,
-                word_id,
-                correct_count,
-                wrong_count,
-                correct_count,
-                1.0 if correct else 0.0,
-            ),
-        )
-        conn.commit()
+        cur.execute(WORD_STATS_UPSERT_SQL, spelling_stats_params(user_id, correct, word_id=word_id))
+        if owns_connection:
+            conn.commit()
     except Exception:
-        conn.rollback()
+        if owns_connection:
+            conn.rollback()
         raise
     finally:
         cur.close()
-        conn.close()
+        if owns_connection:
+            conn.close()
 
 
-def update_spelling_pattern_stats(user_id: int, patterns: list[str], correct: bool):
+def update_spelling_pattern_stats(user_id: int, patterns: list[str], correct: bool, conn=None):
     if not patterns:
         return
 
-    conn = get_connection()
+    owns_connection = conn is None
+    if owns_connection:
+        conn = get_connection()
     cur = conn.cursor()
 
-    correct_count = 1 if correct else 0
-    wrong_count = 0 if correct else 1
-
     try:
-        for pattern in patterns:
-            cur.execute(
-                """
-                INSERT INTO spelling_pattern_stats (
-                    user_id,
-                    pattern,
-                    attempts_count,
-                    correct_count,
-                    wrong_count,
-                    accuracy,
-                    last_attempt_at
-                )
-                VALUES (%s, %s, 1, %s, %s, %s, NOW())
-                ON CONFLICT (user_id, pattern)
-                DO UPDATE SET
-                    attempts_count = spelling_pattern_stats.attempts_count + 1,
-                    correct_count = spelling_pattern_stats.correct_count + EXCLUDED.correct_count,
-                    wrong_count = spelling_pattern_stats.wrong_count + EXCLUDED.wrong_count,
-                    last_attempt_at = NOW(),
-                    accuracy = (
-                        (spelling_pattern_stats.correct_count + EXCLUDED.correct_count)::float /
-                        (spelling_pattern_stats.attempts_count + 1)
-                    )
-                """,
-                (
-                    user_id,
-                    pattern,
-                    correct_count,
-                    wrong_count,
-                    1.0 if correct else 0.0,
-                ),
-            )
-        conn.commit()
+        cur.execute(PATTERN_STATS_UPSERT_SQL, spelling_stats_params(user_id, correct, patterns=list(patterns)))
+        if owns_connection:
+            conn.commit()
     except Exception:
-        conn.rollback()
+        if owns_connection:
+            conn.rollback()
         raise
     finally:
         cur.close()
-        conn.close()
+        if owns_connection:
+            conn.close()
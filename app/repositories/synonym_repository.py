@@ -2,6 +2,8 @@ import json
 import logging
 import random
 
+from app.sampling import has_random_key, sample_rows
+
 
 logger = logging.getLogger(__name__)
 
@@ -114,24 +116,36 @@ def audit_synonym_question_integrity(*, headword, correct_answer=None, correct_a
 
 
 def _build_distractor_pool(cur, *, word_id, correct_answers, headword, randomize):
-    order_sql = "RANDOM()" if randomize else "word_id ASC"
-    cur.execute(
-        f"""
-        SELECT synonyms
-        FROM public.words
-        WHERE word_id != %s
-          AND synonyms IS NOT NULL
-          AND TRIM(synonyms) <> ''
-        ORDER BY {order_sql}
-        LIMIT 100
-        """,
-        (word_id,),
-    )
+    if randomize:
+        rows = sample_rows(
+            cur,
+            table="public.words",
+            columns="synonyms",
+            where="word_id != %s AND synonyms IS NOT NULL AND TRIM(synonyms) <> ''",
+            params=(word_id,),
+            limit=100,
+            spread=2,
+            random_key=has_random_key(cur, "words", schema="public"),
+        )
+    else:
+        cur.execute(
+            """
+            SELECT synonyms
+            FROM public.words
+            WHERE word_id != %s
+              AND synonyms IS NOT NULL
+              AND TRIM(synonyms) <> ''
+            ORDER BY word_id ASC
+            LIMIT 100
+            """,
+            (word_id,),
+        )
+        rows = cur.fetchall()
 
     distractor_pool = []
     seen = set()
     correct_lowers = {value.lower() for value in correct_answers}
-    for row in cur.fetchall():
+    for row in rows:
         for candidate in normalize_synonym_list(row[0], headword=headword):
             lowered = candidate.lower()
             if lowered in correct_lowers:
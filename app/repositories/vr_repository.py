@@ -3,7 +3,9 @@ from __future__ import annotations
 from dataclasses import dataclass
 from typing import Any
 
+from app.batched_writes import execute_batched
 from app.database import get_connection
+from app.entitlement_cache import get_member_entitlements, get_member_ids_for_email
 from app.product_catalog import user_has_product_prefix_access
 
 
@@ -112,10 +114,11 @@ def init_vr_tables(conn=None) -> None:
             )
             """
         )
-        cur.executemany(
+        execute_batched(
+            cur,
             """
             INSERT INTO vr_papers (paper_code, title, description, pdf_url, sort_order)
-            VALUES (%s, %s, %s, %s, %s)
+            VALUES %s
             ON CONFLICT (paper_code) DO UPDATE
             SET title = EXCLUDED.title,
                 description = EXCLUDED.description,
@@ -183,6 +186,22 @@ def create_or_update_vr_paper(*, paper_code: str, title: str, description: str |
             conn.close()
 
 
+def _load_existing_rows(cur, table: str, columns: str, keys) -> dict:
+    """{(paper_code, question_number): row} for the keys that already exist in table."""
+    if not keys:
+        return {}
+    cur.execute(
+        f"""
+        SELECT t.paper_code, t.question_number, {columns}
+        FROM {table} t
+        JOIN unnest(%s::text[], %s::int[]) AS k(paper_code, question_number)
+          ON k.paper_code = t.paper_code AND k.question_number = t.question_number
+        """,
+        ([key[0] for key in keys], [key[1] for key in keys]),
+    )
+    return {(row[0], row[1]): tuple(row[2:]) for row in cur.fetchall()}
+
+
 def bulk_upsert_vr_questions(rows: list[dict], conn=None) -> dict:
     owns_connection = conn is None
     if owns_connection:
@@ -190,25 +209,59 @@ def bulk_upsert_vr_questions(rows: list[dict], conn=None) -> dict:
     cur = conn.cursor()
     inserted = updated = unchanged = 0
     try:
+        incoming = []
         for row in rows:
-            paper_code = normalize_vr_paper_code(row["paper_code"])
             question_number = int(row["question_number"])
-            question_text = row.get("question_text") or f"Question {question_number}"
-            cur.execute(
-                """
-                SELECT question_type, question_text, option_a, option_b, option_c, option_d, option_e
-                FROM vr_questions
-                WHERE paper_code = %s AND question_number = %s
-                """,
-                (paper_code, question_number),
+            incoming.append(
+                (
+                    (normalize_vr_paper_code(row["paper_code"]), question_number),
+                    (
+                        row.get("question_type"),
+                        row.get("question_text") or f"Question {question_number}",
+                        row.get("option_a"),
+                        row.get("option_b"),
+                        row.get("option_c"),
+                        row.get("option_d"),
+                        row.get("option_e"),
+                    ),
+                )
             )
-            existing = cur.fetchone()
 
-            cur.execute(
+        existing = _load_existing_rows(
+            cur,
+            "vr_questions",
+            "t.question_type, t.question_text, t.option_a, t.option_b, t.option_c, t.option_d, t.option_e",
+            list(dict.fromkeys(key for key, _ in incoming)),
+        )
+        # Replay the rows in order (a repeated question sees the earlier row's
+        # write), then upsert each changed question once with its merged values.
+        current = dict(existing)
+        merged = {}
+        for key, signature in incoming:
+            state = current.get(key)
+            if state is None:
+                inserted += 1
+                current[key] = signature
+            elif state == signature:
+                unchanged += 1
+            else:
+                updated += 1
+                current[key] = tuple(value if value is not None else old for value, old in zip(signature, state))
+            previous = merged.get(key)
+            merged[key] = (
+                signature
+                if previous is None
+                else tuple(value if value is not None else old for value, old in zip(signature, previous))
+            )
+
+        values = [(*key, *merged[key]) for key in merged if current[key] != existing.get(key)]
+        if values:
+            execute_batched(
+                cur,
                 """
                 INSERT INTO vr_questions
                 (paper_code, question_number, question_type, question_text, option_a, option_b, option_c, option_d, option_e)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+                VALUES %s
                 ON CONFLICT (paper_code, question_number) DO UPDATE
                 SET question_type = COALESCE(EXCLUDED.question_type, vr_questions.question_type),
                     question_text = COALESCE(EXCLUDED.question_text, vr_questions.question_text),
@@ -218,33 +271,8 @@ def bulk_upsert_vr_questions(rows: list[dict], conn=None) -> dict:
                     option_d = COALESCE(EXCLUDED.option_d, vr_questions.option_d),
                     option_e = COALESCE(EXCLUDED.option_e, vr_questions.option_e)
                 """,
-                (
-                    paper_code,
-                    question_number,
-                    row.get("question_type"),
-                    question_text,
-                    row.get("option_a"),
-                    row.get("option_b"),
-                    row.get("option_c"),
-                    row.get("option_d"),
-                    row.get("option_e"),
-                ),
-            )
-            incoming_signature = (
-                row.get("question_type"),
-                question_text,
-                row.get("option_a"),
-                row.get("option_b"),
-                row.get("option_c"),
-                row.get("option_d"),
-                row.get("option_e"),
+                values,
             )
-            if not existing:
-                inserted += 1
-            elif tuple(existing) == incoming_signature:
-                unchanged += 1
-            else:
-                updated += 1
         if owns_connection:
             conn.commit()
         return {"inserted": inserted, "updated": updated, "existing": unchanged}
@@ -261,45 +289,50 @@ def bulk_upsert_vr_answers(rows: list[dict], conn=None) -> dict:
     cur = conn.cursor()
     inserted = updated = unchanged = 0
     try:
-        for row in rows:
-            paper_code = normalize_vr_paper_code(row["paper_code"])
-            question_number = int(row["question_number"])
-            correct_answer = str(row["correct_answer"]).strip().upper()
-            explanation = str(row.get("explanation") or "").strip()
-            answer_source = row.get("answer_source") or "admin_csv"
-            cur.execute(
-                """
-                SELECT id, correct_answer, COALESCE(explanation, '')
-                FROM vr_answers
-                WHERE paper_code = %s AND question_number = %s
-                """,
-                (paper_code, question_number),
+        incoming = [
+            (
+                (normalize_vr_paper_code(row["paper_code"]), int(row["question_number"])),
+                str(row["correct_answer"]).strip().upper(),
+                str(row.get("explanation") or "").strip(),
+                row.get("answer_source") or "admin_csv",
             )
-            existing = cur.fetchone()
-            if not existing:
-                cur.execute(
-                    """
-                    INSERT INTO vr_answers (paper_code, question_number, correct_answer, explanation, answer_source)
-                    VALUES (%s, %s, %s, %s, %s)
-                    """,
-                    (paper_code, question_number, correct_answer, explanation, answer_source),
-                )
+            for row in rows
+        ]
+        existing = _load_existing_rows(
+            cur,
+            "vr_answers",
+            "t.correct_answer, COALESCE(t.explanation, ''), t.answer_source",
+            list(dict.fromkeys(key for key, *_ in incoming)),
+        )
+        current = dict(existing)
+        changed = set()
+        for key, correct_answer, explanation, answer_source in incoming:
+            state = current.get(key)
+            if state is None:
                 inserted += 1
-            elif (existing[1] or "").strip().upper() == correct_answer and (existing[2] or "").strip() == explanation:
+            elif (state[0] or "").strip().upper() == correct_answer and (state[1] or "").strip() == explanation:
                 unchanged += 1
+                continue
             else:
-                cur.execute(
-                    """
-                    UPDATE vr_answers
-                    SET correct_answer = %s,
-                        explanation = %s,
-                        answer_source = %s,
-                        updated_at = NOW()
-                    WHERE paper_code = %s AND question_number = %s
-                    """,
-                    (correct_answer, explanation, answer_source, paper_code, question_number),
-                )
                 updated += 1
+            current[key] = (correct_answer, explanation, answer_source)
+            changed.add(key)
+
+        values = [(*key, *current[key]) for key in current if key in changed]
+        if values:
+            execute_batched(
+                cur,
+                """
+                INSERT INTO vr_answers (paper_code, question_number, correct_answer, explanation, answer_source)
+                VALUES %s
+                ON CONFLICT (paper_code, question_number) DO UPDATE
+                SET correct_answer = EXCLUDED.correct_answer,
+                    explanation = EXCLUDED.explanation,
+                    answer_source = EXCLUDED.answer_source,
+                    updated_at = NOW()
+                """,
+                values,
+            )
 
         cur.execute(
             """
@@ -309,7 +342,7 @@ def bulk_upsert_vr_answers(rows: list[dict], conn=None) -> dict:
             )
             WHERE p.paper_code = ANY(%s)
             """,
-            (sorted({normalize_vr_paper_code(row["paper_code"]) for row in rows}),),
+            (sorted({key[0] for key, *_ in incoming}),),
         )
         if owns_connection:
             conn.commit()
@@ -590,10 +623,11 @@ def record_vr_attempt_batch(*, user_id: int, paper_code: str, answers: list[dict
         conn = get_connection()
     cur = conn.cursor()
     try:
-        cur.executemany(
+        execute_batched(
+            cur,
             """
             INSERT INTO vr_attempts (user_id, paper_code, question_number, student_answer, is_correct)
-            VALUES (%s, %s, %s, %s, %s)
+            VALUES %s
             """,
             [
                 (
@@ -647,34 +681,7 @@ def user_has_vr_access(*, user_email: str, user_role: str | None = None, conn=No
         return True
     if user_has_product_prefix_access(user_email=user_email, prefixes={"VRPP"}, conn=conn):
         return True
-    owns_connection = conn is None
-    if owns_connection:
-        conn = get_connection()
-    cur = conn.cursor()
-    try:
-        cur.execute(
-            """
-            SELECT m.id
-            FROM kiaro_membership.members m
-            WHERE LOWER(m.email) = LOWER(%s)
-            """,
-            (user_email,),
-        )
-        row = cur.fetchone()
-        if not row:
-            return False
-        member_id = row[0]
-        cur.execute(
-            """
-            SELECT app_code
-            FROM kiaro_membership.member_apps
-            WHERE member_id = %s
-            """,
-            (member_id,),
-        )
-        codes = {str(item[0]).strip().lower() for item in cur.fetchall()}
-        return bool(codes & VR_UNLOCK_CODES)
-    finally:
-        cur.close()
-        if owns_connection:
-            conn.close()
+    member_ids = get_member_ids_for_email(user_email, conn=conn)
+    if not member_ids:
+        return False
+    return bool(get_member_entitlements(member_ids[0], conn=conn).app_codes & VR_UNLOCK_CODES)
@@ -1,7 +1,12 @@
-from datetime import datetime
+from datetime import datetime, timezone
 
+from app.attempt_queue import StatementRecorder, enqueue_attempt, write_behind_enabled
 from app.database import get_connection
+from app.repositories.daily_attempts_repository import record_daily_attempt
+from app.repositories.mastery_repository import record_lesson_mastery_attempt, record_word_lessons_mastery_attempt
+from app.repositories.module_rollup_repository import record_word_module_attempt, synonym_attempt_store
 from app.repositories.words_stats_repository import update_words_stats_from_attempt
+from app.schema_registry import get_table_columns, table_exists
 
 
 def get_words_lesson_item_count(lesson_id: int) -> int:
@@ -67,49 +72,75 @@ def get_words_courses_tree():
         conn.close()
 
 
-def _fetch_lesson_words(cur, user_id: int, lesson_id: int) -> list[dict]:
+def _load_lesson_word_content(cur, lesson_id: int) -> list[dict]:
     cur.execute(
         """
         SELECT
             w.id,
             w.word,
             COALESCE(w.hint, '') AS hint,
-            COALESCE(w.example, '') AS example,
-            COALESCE(s.attempts_count, 0) AS times_seen,
-            COALESCE(s.correct_count, 0) AS times_correct,
-            COALESCE(s.wrong_count, 0) AS times_wrong,
-            COALESCE(s.accuracy, 0) AS accuracy,
-            s.last_attempt_at
+            COALESCE(w.example, '') AS example
         FROM words_lesson_words lw
         JOIN words_words w
             ON lw.word_id = w.id
-        LEFT JOIN words_word_stats s
-            ON s.word_id = w.id
-           AND s.user_id = %s
         WHERE lw.lesson_id = %s
         ORDER BY w.id ASC
         """,
-        (user_id, lesson_id),
+        (lesson_id,),
     )
-
-    rows = cur.fetchall()
     return [
         {
             "word_id": row[0],
             "word": row[1],
             "hint": row[2],
             "example": row[3],
-            "times_seen": row[4],
-            "times_correct": row[5],
-            "times_wrong": row[6],
-            "accuracy": float(row[7] or 0),
-            "last_seen_at": row[8],
-            "is_weak": row[4] >= 2 and float(row[7] or 0) < 0.7,
         }
-        for row in rows
+        for row in cur.fetchall()
     ]
 
 
+def _fetch_word_stats(cur, user_id: int, word_ids: list[int]) -> dict:
+    if not word_ids:
+        return {}
+    cur.execute(
+        """
+        SELECT
+            word_id,
+            COALESCE(attempts_count, 0),
+            COALESCE(correct_count, 0),
+            COALESCE(wrong_count, 0),
+            COALESCE(accuracy, 0),
+            last_attempt_at
+        FROM words_word_stats
+        WHERE user_id = %s
+          AND word_id = ANY(%s)
+        """,
+        (user_id, word_ids),
+    )
+    return {row[0]: row[1:] for row in cur.fetchall()}
+
+
+def _fetch_lesson_words(cur, user_id: int, lesson_id: int) -> list[dict]:
+    content = get_lesson_content("words", lesson_id, lambda: _load_lesson_word_content(cur, lesson_id))
+    stats = _fetch_word_stats(cur, user_id, [item["word_id"] for item in content])
+
+    words = []
+    for item in content:
+        times_seen, times_correct, times_wrong, accuracy, last_seen_at = stats.get(item["word_id"], (0, 0, 0, 0, None))
+        words.append(
+            {
+                **item,
+                "times_seen": times_seen,
+                "times_correct": times_correct,
+                "times_wrong": times_wrong,
+                "accuracy": float(accuracy or 0),
+                "last_seen_at": last_seen_at,
+                "is_weak": times_seen >= 2 and float(accuracy or 0) < 0.7,
+            }
+        )
+    return words
+
+
 def _get_latest_word_id(cur, user_id: int, lesson_id: int):
     cur.execute(
         """
@@ -224,19 +255,67 @@ def get_words_micro_challenge_data(word_id: int):
         conn.close()
 
 
+def _record_words_counters(
+    cur, user_id: int, lesson_id: int, word_id: int, correct: bool, schema_cur, attempted_at=None
+) -> None:
+    """cur may be a StatementRecorder; schema_cur is a real cursor (or None) for the schema registry."""
+    # words_attempts has no lesson column; only a caller-supplied lesson is counted.
+    record_lesson_mastery_attempt(cur, "words", user_id, lesson_id, correct)
+    record_daily_attempt(cur, "words", user_id, correct, attempted_at)
+    # The dashboards' words figures and the synonym mastery rebuild follow the
+    # synonym store, which is this table only without synonym_attempts.
+    if synonym_attempt_store(schema_cur)[0] == "words_attempts":
+        record_word_module_attempt(cur, "words", user_id, word_id, correct, attempted_at)
+        if table_exists("lesson_words", schema="public", cur=schema_cur):
+            record_word_lessons_mastery_attempt(cur, "synonym", user_id, word_id, correct)
+
+
+def _words_attempt_row(cur, user_id: int, lesson_id: int, word_id: int, correct: bool, response_ms: int) -> dict:
+    row = {
+        "user_id": user_id,
+        "word_id": word_id,
+        "correct": correct,
+        "time_taken": response_ms or 0,
+        "blanks_count": 0,
+        "wrong_letters_count": 0,
+        "course_id": 0,
+    }
+    # Some deployments carry lesson_id, which the mastery rebuild counts from.
+    if "lesson_id" in get_table_columns("words_attempts", cur=cur):
+        row["lesson_id"] = lesson_id or None
+    return row
+
+
 def record_words_attempt(user_id: int, lesson_id: int, word_id: int, correct: bool, response_ms: int = 0):
+    if write_behind_enabled():
+        attempted_at = datetime.now(timezone.utc)
+        counters = StatementRecorder()
+        _record_words_counters(counters, user_id, lesson_id, word_id, correct, None, attempted_at)
+        enqueue_attempt(
+            "words_attempts",
+            {
+                **_words_attempt_row(None, user_id, lesson_id, word_id, correct, response_ms),
+                "created_at": attempted_at,
+            },
+            counters.statements,
+        )
+        update_words_stats_from_attempt(user_id, word_id, correct)
+        return
+
     conn = get_connection()
     cur = conn.cursor()
 
     try:
+        row = _words_attempt_row(cur, user_id, lesson_id, word_id, correct, response_ms)
         cur.execute(
-            """
+            f"""
             INSERT INTO words_attempts
-            (user_id, word_id, correct, time_taken, blanks_count, wrong_letters_count, course_id)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
+            ({", ".join(row)})
+            VALUES ({", ".join(["%s"] * len(row))})
             """,
-            (user_id, word_id, correct, response_ms or 0, 0, 0, 0),
+            tuple(row.values()),
         )
+        _record_words_counters(cur, user_id, lesson_id, word_id, correct, cur)
         conn.commit()
     except Exception:
         conn.rollback()
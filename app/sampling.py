@@ -0,0 +1,101 @@
+"""
+Random question sampling without ORDER BY RANDOM().
+
+ORDER BY RANDOM() LIMIT n reads and sorts every candidate row on each call.
+Two replacements, depending on the candidate set:
+
+- Lesson scoped pools (a lesson's words / NVR questions) are small and already
+  held by app.content_cache, so the pick happens in Python: exclusion and
+  difficulty filters are a list comprehension over the cached lesson.
+- Table wide pools (all synonym words, the math question bank) use a
+  random_key column (sql/2026-10-17_random_sampling_keys.sql): seek to a
+  random point in the random_key index and read forward, wrapping around.
+  Until the migration has run, they fall back to ORDER BY RANDOM().
+"""
+
+from __future__ import annotations
+
+import random
+
+from app.schema_registry import get_table_columns
+
+
+RANDOM_KEY_COLUMN = "random_key"
+
+
+# =========================
+# Lesson candidates
+# =========================
+def pick_candidate(candidates, *, exclude=None, difficulties=None):
+    """
+    Random candidate from (id, difficulty, ...) tuples, skipping ids in
+    exclude and keeping only difficulties (when given).
+    """
+    excluded = set(exclude or ())
+    allowed = set(difficulties) if difficulties else None
+    eligible = [
+        candidate
+        for candidate in candidates
+        if candidate[0] not in excluded and (allowed is None or candidate[1] in allowed)
+    ]
+    return random.choice(eligible) if eligible else None
+
+
+# =========================
+# random_key index seek
+# =========================
+def has_random_key(cur, table_name: str, *, schema: str | None = None) -> bool:
+    return RANDOM_KEY_COLUMN in get_table_columns(table_name, schema=schema, cur=cur)
+
+
+def sample_rows(cur, *, table: str, columns: str, where: str = "TRUE", params=(), limit: int = 1, spread: int = 16, random_key: bool = True) -> list:
+    """
+    Up to limit random rows of table matching where, told apart by their
+    first column.
+
+    With random_key every row comes from its own seek: a random start key,
+    the next spread rows in random_key order (wrapping around to the lowest
+    keys), one of those at random. A lone row per seek would favour rows that
+    follow large gaps between keys, and one range for all the rows would keep
+    returning the same neighbours together. The seeks go out as one query,
+    with a few spare ones for collisions; a pool too small to fill limit
+    after them falls back to ORDER BY RANDOM(), as do tables not yet
+    migrated (random_key=False) and limit=None.
+    """
+    params = tuple(params)
+    if random_key and limit is not None:
+        limit = max(1, limit)
+        rows = _seek_rows(cur, table, columns, where, params, limit + max(2, limit // 4), max(1, spread))
+        picked = list({row[0]: row for row in rows}.values())[:limit]
+        # No row at all means no row matches: the wrap-around branch reads from the lowest key.
+        if len(picked) == limit or not picked:
+            return picked
+
+    cur.execute(
+        f"SELECT {columns} FROM {table} WHERE {where} ORDER BY RANDOM() LIMIT %s",
+        (*params, limit),
+    )
+    return list(cur.fetchall() or [])
+
+
+def _seek_rows(cur, table: str, columns: str, where: str, params: tuple, seeks: int, spread: int) -> list:
+    candidates = f"SELECT {columns} FROM {table} WHERE ({where})"
+    cur.execute(
+        f"""
+        SELECT picked.*
+        FROM unnest(%s::double precision[]) AS seek(start)
+        CROSS JOIN LATERAL (
+            SELECT *
+            FROM (
+                ({candidates} AND {RANDOM_KEY_COLUMN} >= seek.start ORDER BY {RANDOM_KEY_COLUMN} LIMIT %s)
+                UNION ALL
+                ({candidates} ORDER BY {RANDOM_KEY_COLUMN} LIMIT %s)
+                LIMIT %s
+            ) run
+            ORDER BY random()
+            LIMIT 1
+        ) picked
+        """,
+        ([random.random() for _ in range(seeks)], *params, spread, *params, spread, spread),
+    )
+    return list(cur.fetchall() or [])
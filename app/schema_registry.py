@@ -0,0 +1,160 @@
+"""
+Process-wide registry of tables, columns and column types.
+
+Several hot paths adapt their SQL to whichever columns a table actually has
+(legacy words_attempts vs synonym_attempts, optional created_at columns, ...).
+They used to ask information_schema on every call; they now read one snapshot
+loaded at startup.
+
+Refresh:
+- refresh_schema_registry() reloads immediately (startup, POST
+  /admin/schema-registry/refresh, which also tells the other workers).
+- schema_changed() is the hook for code that runs DDL at request time. Pass
+  the DDL transaction's cursor and every worker reloads once it commits.
+- SCHEMA_REGISTRY_TTL_SECONDS bounds staleness for DDL applied out of band
+  (sql/ migrations); 0 keeps a snapshot until it is refreshed explicitly.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+
+from app.database import get_connection
+from app.entitlement_cache import add_notification_handler
+
+
+SCHEMA_REGISTRY_TTL_SECONDS = float(os.getenv("SCHEMA_REGISTRY_TTL_SECONDS", "300"))
+SCHEMA_REGISTRY_CHANNEL = os.getenv("SCHEMA_REGISTRY_CHANNEL", "kiaro_schema")
+
+SCHEMA_REGISTRY_SQL = """
+    SELECT
+        table_schema,
+        table_name,
+        column_name,
+        LOWER(COALESCE(data_type, '')),
+        LOWER(COALESCE(udt_name, ''))
+    FROM information_schema.columns
+    WHERE table_schema NOT IN ('pg_catalog', 'information_schema')
+    ORDER BY table_schema, table_name, ordinal_position
+"""
+
+# table_name -> table_schema -> column_name -> "data_type:udt_name"
+_tables: dict[str, dict[str, dict[str, str]]] = {}
+_loaded_at: float | None = None
+_lock = threading.Lock()
+_stats = {"loads": 0, "lookups": 0, "invalidations": 0, "last_load_ms": 0.0}
+
+
+def _load(cur) -> None:
+    global _tables, _loaded_at
+    started_at = time.perf_counter()
+    cur.execute(SCHEMA_REGISTRY_SQL)
+    tables: dict[str, dict[str, dict[str, str]]] = {}
+    for table_schema, table_name, column_name, data_type, udt_name in cur.fetchall() or []:
+        tables.setdefault(table_name, {}).setdefault(table_schema, {})[column_name] = f"{data_type}:{udt_name}"
+
+    with _lock:
+        _tables = tables
+        _loaded_at = time.monotonic()
+        _stats["loads"] += 1
+        _stats["last_load_ms"] = round((time.perf_counter() - started_at) * 1000, 2)
+
+
+def _is_stale() -> bool:
+    if _loaded_at is None:
+        return True
+    return SCHEMA_REGISTRY_TTL_SECONDS > 0 and time.monotonic() - _loaded_at > SCHEMA_REGISTRY_TTL_SECONDS
+
+
+def refresh_schema_registry(conn=None, *, broadcast: bool = False) -> dict:
+    """Reload now; with broadcast=True the other workers drop their snapshots too."""
+    owns_connection = conn is None
+    if owns_connection:
+        conn = get_connection()
+    cur = conn.cursor()
+    try:
+        _load(cur)
+        if broadcast:
+            cur.execute("SELECT pg_notify(%s, '')", (SCHEMA_REGISTRY_CHANNEL,))
+            conn.commit()
+    finally:
+        cur.close()
+        if owns_connection:
+            conn.close()
+    return get_schema_registry_stats()
+
+
+def _table_schemas(table_name: str, cur=None) -> dict[str, dict[str, str]]:
+    """
+    Schemas holding table_name. A stale or missing snapshot is (re)loaded on
+    the caller's cursor so no extra connection is checked out.
+    """
+    if _is_stale():
+        if cur is not None:
+            _load(cur)
+        else:
+            refresh_schema_registry()
+    with _lock:
+        _stats["lookups"] += 1
+        return _tables.get(table_name, {})
+
+
+def get_table_columns(table_name: str, *, schema: str | None = None, cur=None) -> frozenset[str]:
+    """Columns of table_name in schema, or across every schema when schema is None."""
+    schemas = _table_schemas(table_name, cur)
+    if schema is not None:
+        return frozenset(schemas.get(schema, {}))
+    return frozenset(column for columns in schemas.values() for column in columns)
+
+
+def table_exists(table_name: str, *, schema: str | None = None, cur=None) -> bool:
+    schemas = _table_schemas(table_name, cur)
+    return bool(schemas.get(schema) if schema is not None else schemas)
+
+
+def get_column_type(table_name: str, column_name: str, *, schema: str | None = None, cur=None) -> str:
+    """"data_type:udt_name" (lowercase), or "" when the column is unknown."""
+    schemas = _table_schemas(table_name, cur)
+    candidates = [schemas.get(schema, {})] if schema is not None else schemas.values()
+    for columns in candidates:
+        if column_name in columns:
+            return columns[column_name]
+    return ""
+
+
+def invalidate_schema_registry() -> None:
+    global _loaded_at
+    with _lock:
+        _loaded_at = None
+        _stats["invalidations"] += 1
+
+
+def schema_changed(cur=None) -> None:
+    """
+    Call after DDL. Drops the local snapshot and, given the DDL transaction's
+    cursor, tells the other workers to drop theirs once it commits.
+    """
+    invalidate_schema_registry()
+    if cur is not None:
+        cur.execute("SELECT pg_notify(%s, '')", (SCHEMA_REGISTRY_CHANNEL,))
+
+
+def get_schema_registry_stats() -> dict:
+    with _lock:
+        stats = dict(_stats)
+        tables = _tables
+        loaded_at = _loaded_at
+    stats.update(
+        {
+            "tables": len(tables),
+            "columns": sum(len(columns) for schemas in tables.values() for columns in schemas.values()),
+            "age_seconds": round(time.monotonic() - loaded_at, 1) if loaded_at is not None else None,
+            "ttl_seconds": SCHEMA_REGISTRY_TTL_SECONDS,
+        }
+    )
+    return stats
+
+
+add_notification_handler(SCHEMA_REGISTRY_CHANNEL, lambda _payload: invalidate_schema_registry())
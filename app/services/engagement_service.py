@@ -1,67 +1,194 @@
-from datetime import date, timedelta
+"""
+XP and daily streak — user_engagement.
 
+Every award is one INSERT ... ON CONFLICT (user_id) DO UPDATE that adds the
+XP and moves the streak in SQL:
+  same day as last_activity_date   streak unchanged
+  the day after                    streak + 1
+  any later day                    streak back to 1
+  an earlier day (late write)      streak and last_activity_date unchanged
+The conflicting row is locked for the update, so concurrent awards for one
+learner queue up instead of overwriting each other's total.
+
+apply_engagement_xp_batch() awards many users in one statement per activity
+day (write-behind flushers, backfills). engagement_concurrency_check.py at the
+repo root hammers one learner from many threads and checks no XP is lost.
+"""
+
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import date
+
+from app.batched_writes import execute_batched
 from app.database import get_connection
 
 
-def update_user_engagement(user_id: int, xp_earned: int):
-    conn = get_connection()
-    cur = conn.cursor()
+_UPSERT_ENGAGEMENT_SQL = """
+    INSERT INTO user_engagement AS e (user_id, total_xp, current_streak, last_activity_date)
+    VALUES %s
+    ON CONFLICT (user_id) DO UPDATE
+    SET total_xp = COALESCE(e.total_xp, 0) + EXCLUDED.total_xp,
+        current_streak = CASE
+            WHEN e.last_activity_date IS NULL THEN 1
+            WHEN EXCLUDED.last_activity_date <= e.last_activity_date THEN e.current_streak
+            WHEN EXCLUDED.last_activity_date = e.last_activity_date + 1 THEN COALESCE(e.current_streak, 0) + 1
+            ELSE 1
+        END,
+        last_activity_date = GREATEST(e.last_activity_date, EXCLUDED.last_activity_date),
+        updated_at = NOW()
+    RETURNING user_id, total_xp, current_streak
+"""
 
-    cur.execute(
-        """
-        SELECT total_xp, current_streak, last_activity_date
-        FROM user_engagement
-        WHERE user_id = %s
-        """,
-        (user_id,),
-    )
+_UPSERT_ENGAGEMENT_ROW = "(%s, %s, 1, %s::date)"
 
-    row = cur.fetchone()
-    today = date.today()
 
-    if not row:
+def init_user_engagement_table() -> None:
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
         cur.execute(
             """
-            INSERT INTO user_engagement (user_id, total_xp, current_streak, last_activity_date)
-            VALUES (%s, %s, %s, %s)
-            """,
-            (user_id, xp_earned, 1, today),
+            CREATE TABLE IF NOT EXISTS user_engagement (
+                user_id INTEGER PRIMARY KEY,
+                total_xp INTEGER NOT NULL DEFAULT 0,
+                current_streak INTEGER NOT NULL DEFAULT 0,
+                last_activity_date DATE,
+                updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+            )
+            """
         )
-
+        cur.execute("ALTER TABLE user_engagement ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ DEFAULT NOW()")
+        # ON CONFLICT (user_id) needs a unique index; older databases may have
+        # the table without one.
+        cur.execute(
+            """
+            SELECT EXISTS (
+                SELECT 1
+                FROM pg_index i
+                JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0]
+                WHERE i.indrelid = 'user_engagement'::regclass
+                  AND i.indisunique
+                  AND i.indnkeyatts = 1
+                  AND i.indpred IS NULL
+                  AND a.attname = 'user_id'
+            )
+            """
+        )
+        if not cur.fetchone()[0]:
+            # Without the index, older databases may hold several rows per
+            # user. Merge them into one (XP summed, the latest day and the
+            # longest streak kept) so the index can be built; the lock keeps
+            # new duplicates out until it is.
+            cur.execute("LOCK TABLE user_engagement IN SHARE ROW EXCLUSIVE MODE")
+            cur.execute(
+                """
+                WITH duplicates AS (
+                    SELECT user_id,
+                           (ARRAY_AGG(ctid ORDER BY last_activity_date DESC NULLS LAST))[1] AS keep_ctid,
+                           SUM(COALESCE(total_xp, 0)) AS total_xp,
+                           MAX(COALESCE(current_streak, 0)) AS current_streak,
+                           MAX(last_activity_date) AS last_activity_date
+                    FROM user_engagement
+                    WHERE user_id IS NOT NULL
+                    GROUP BY user_id
+                    HAVING COUNT(*) > 1
+                ),
+                merged AS (
+                    UPDATE user_engagement e
+                    SET total_xp = d.total_xp,
+                        current_streak = d.current_streak,
+                        last_activity_date = d.last_activity_date,
+                        updated_at = NOW()
+                    FROM duplicates d
+                    WHERE e.ctid = d.keep_ctid
+                )
+                DELETE FROM user_engagement e
+                USING duplicates d
+                WHERE e.user_id = d.user_id
+                  AND e.ctid <> d.keep_ctid
+                """
+            )
+            if cur.rowcount:
+                print("user_engagement: merged", cur.rowcount, "duplicate rows before adding the user_id unique index")
+            cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS user_engagement_user_id_uidx ON user_engagement (user_id)")
         conn.commit()
+    finally:
         cur.close()
         conn.close()
 
-        return {"xp": xp_earned, "streak": 1}
-
-    total_xp, current_streak, last_activity = row
 
-    if last_activity == today:
-        new_streak = current_streak
-    elif last_activity == today - timedelta(days=1):
-        new_streak = current_streak + 1
-    else:
-        new_streak = 1
+def update_user_engagement(user_id: int, xp_earned: int, conn=None, today: date | None = None):
+    owns_connection = conn is None
+    if owns_connection:
+        conn = get_connection()
+    cur = conn.cursor()
+    try:
+        rows = execute_batched(
+            cur,
+            _UPSERT_ENGAGEMENT_SQL,
+            [(user_id, xp_earned, today or date.today())],
+            template=_UPSERT_ENGAGEMENT_ROW,
+            fetch=True,
+        )
+        if owns_connection:
+            conn.commit()
+    except Exception:
+        if owns_connection:
+            conn.rollback()
+        raise
+    finally:
+        cur.close()
+        if owns_connection:
+            conn.close()
 
-    new_total_xp = total_xp + xp_earned
+    _, total_xp, streak = rows[0]
+    return {
+        "xp": total_xp,
+        "streak": streak,
+    }
 
-    cur.execute(
-        """
-        UPDATE user_engagement
-        SET total_xp = %s,
-            current_streak = %s,
-            last_activity_date = %s,
-            updated_at = NOW()
-        WHERE user_id = %s
-        """,
-        (new_total_xp, new_streak, today, user_id),
-    )
 
-    conn.commit()
-    cur.close()
-    conn.close()
+def apply_engagement_xp_batch(awards, conn=None, today: date | None = None) -> dict:
+    """
+    Apply (user_id, xp) or (user_id, xp, activity_date) awards; the date
+    defaults to today. Awards for one user and day are summed, days are
+    applied oldest first. Returns {user_id: {"xp": total, "streak": n}}.
+    """
+    today = today or date.today()
+    by_day = defaultdict(lambda: defaultdict(int))
+    for award in awards:
+        user_id, xp_earned = award[0], award[1]
+        activity_date = award[2] if len(award) > 2 and award[2] is not None else today
+        by_day[activity_date][user_id] += xp_earned
+    if not by_day:
+        return {}
 
-    return {
-        "xp": new_total_xp,
-        "streak": new_streak,
-    }
+    owns_connection = conn is None
+    if owns_connection:
+        conn = get_connection()
+    cur = conn.cursor()
+    results = {}
+    try:
+        for activity_date in sorted(by_day):
+            # Sorted by user so concurrent batches lock rows in the same order.
+            rows = execute_batched(
+                cur,
+                _UPSERT_ENGAGEMENT_SQL,
+                [(user_id, xp_earned, activity_date) for user_id, xp_earned in sorted(by_day[activity_date].items())],
+                template=_UPSERT_ENGAGEMENT_ROW,
+                fetch=True,
+            )
+            for user_id, total_xp, streak in rows:
+                results[user_id] = {"xp": total_xp, "streak": streak}
+        if owns_connection:
+            conn.commit()
+        return results
+    except Exception:
+        if owns_connection:
+            conn.rollback()
+        raise
+    finally:
+        cur.close()
+        if owns_connection:
+            conn.close()
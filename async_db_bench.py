@@ -0,0 +1,116 @@
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description=(
+            "Concurrency ceiling of the sync (threadpool + psycopg2 pool) path versus the "
+            "async (event loop + psycopg async pool) path for the same handler."
+        )
+    )
+    parser.add_argument("--concurrency", default="10,40,80,160", help="Comma separated in-flight request counts.")
+    parser.add_argument("--requests", type=int, default=400, help="Requests per concurrency level.")
+    parser.add_argument("--query-ms", type=int, default=50, help="Server-side time per query (pg_sleep).")
+    parser.add_argument("--queries", type=int, default=3, help="Queries per simulated request.")
+    parser.add_argument("--pool-size", type=int, default=80, help="Max connections for each pool.")
+    return parser.parse_args()
+
+
+ARGS = parse_args()
+# Pool sizes are read at import time; both pools start fully warm.
+for name in ("DB_POOL_MIN_SIZE", "DB_POOL_MAX_SIZE", "DB_ASYNC_POOL_MIN_SIZE", "DB_ASYNC_POOL_MAX_SIZE"):
+    os.environ[name] = str(ARGS.pool_size)
+
+from starlette.concurrency import run_in_threadpool  # noqa: E402
+
+from app.database import close_pool, get_connection, get_pool  # noqa: E402
+from app.database_async import close_async_pool, get_async_pool, run_sync_async  # noqa: E402
+
+
+def simulated_request():
+    """Shape of a practice request: one connection, a few short queries."""
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        for _ in range(ARGS.queries):
+            cur.execute("SELECT pg_sleep(%s)", (ARGS.query_ms / 1000.0 / ARGS.queries,))
+            cur.fetchone()
+    finally:
+        cur.close()
+        conn.close()
+
+
+async def run_level(mode: str, concurrency: int) -> dict:
+    dispatch = run_in_threadpool if mode == "sync" else run_sync_async
+    latencies: list[float] = []
+    remaining = ARGS.requests
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            started_at = time.perf_counter()
+            await dispatch(simulated_request)
+            latencies.append(time.perf_counter() - started_at)
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started_at
+
+    latencies.sort()
+    return {
+        "mode": mode,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 1),
+    }
+
+
+async def run_bench() -> list[dict]:
+    levels = [int(value) for value in ARGS.concurrency.split(",") if value.strip()]
+    results = []
+
+    get_pool().warm()
+    for concurrency in levels:
+        results.append(await run_level("sync", concurrency))
+    close_pool()
+
+    await get_async_pool().open(wait=True)
+    for concurrency in levels:
+        results.append(await run_level("async", concurrency))
+    await close_async_pool()
+
+    return results
+
+
+def main():
+    try:
+        results = asyncio.run(run_bench())
+    except Exception as exc:
+        print(json.dumps({"status": "failed", "error": str(exc)}, indent=2))
+        sys.exit(1)
+
+    print(
+        json.dumps(
+            {
+                "status": "ok",
+                "pool_size": ARGS.pool_size,
+                "query_ms": ARGS.query_ms,
+                "queries_per_request": ARGS.queries,
+                "results": results,
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
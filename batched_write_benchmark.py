@@ -0,0 +1,212 @@
+import argparse
+import json
+import sys
+import time
+
+from app import batched_writes
+from app.batched_writes import BULK_WRITE_PAGE_SIZE
+from app.database import get_connection
+from app.repositories.english_printable_repository import (
+    bulk_upsert_english_answers,
+    bulk_upsert_english_questions,
+    record_english_attempt_batch,
+)
+from app.repositories.vr_repository import (
+    bulk_upsert_vr_answers,
+    bulk_upsert_vr_questions,
+    record_vr_attempt_batch,
+)
+
+
+MODES = ("executemany", "batched")
+BENCH_USER_ID = 0
+
+# module (table prefix) -> (questions writer, answers writer, attempts writer)
+WRITERS = {
+    "vr": (bulk_upsert_vr_questions, bulk_upsert_vr_answers, record_vr_attempt_batch),
+    "english": (bulk_upsert_english_questions, bulk_upsert_english_answers, record_english_attempt_batch),
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description=(
+            "Rows/sec of the VR and English paper writers: one executemany round trip per row versus "
+            "app.batched_writes.execute_batched (multi-row VALUES). Loads a 60-question paper and a "
+            "synthetic 5,000-row paper into throwaway BENCH papers and deletes them afterwards."
+        )
+    )
+    parser.add_argument("--loads", default="60,5000", help="Comma separated rows per paper.")
+    parser.add_argument("--modules", default=",".join(WRITERS), help="Comma separated: vr, english.")
+    parser.add_argument("--modes", default=",".join(MODES), help="Comma separated: executemany, batched.")
+    parser.add_argument("--page-size", type=int, default=BULK_WRITE_PAGE_SIZE, help="Rows per batched statement.")
+    return parser.parse_args()
+
+
+def synthetic_rows(paper_code: str, rows: int) -> tuple[list[dict], list[dict], list[dict]]:
+    questions = [
+        {
+            "paper_code": paper_code,
+            "question_number": number,
+            "question_text": f"Question {number}: find the odd one out.",
+            "option_a": "apple",
+            "option_b": "pear",
+            "option_c": "plum",
+            "option_d": "carrot",
+            "option_e": "grape",
+        }
+        for number in range(1, rows + 1)
+    ]
+    answers = [
+        {"paper_code": paper_code, "question_number": number, "correct_answer": "D", "explanation": "Not a fruit."}
+        for number in range(1, rows + 1)
+    ]
+    attempts = [
+        {"question_number": number, "student_answer": "D" if number % 4 else "A", "is_correct": bool(number % 4)}
+        for number in range(1, rows + 1)
+    ]
+    return questions, answers, attempts
+
+
+def executemany_writes(conn, module: str, paper_code: str, questions, answers, attempts) -> None:
+    """The pre-batching write path: the same statements, one row per round trip."""
+    cur = conn.cursor()
+    try:
+        if module == "vr":
+            cur.executemany(
+                """
+                INSERT INTO vr_questions
+                (paper_code, question_number, question_text, option_a, option_b, option_c, option_d, option_e)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                ON CONFLICT (paper_code, question_number) DO NOTHING
+                """,
+                [
+                    (paper_code, row["question_number"], row["question_text"], row["option_a"], row["option_b"],
+                     row["option_c"], row["option_d"], row["option_e"])
+                    for row in questions
+                ],
+            )
+        else:
+            cur.executemany(
+                """
+                INSERT INTO english_questions (paper_code, question_number, question_text)
+                VALUES (%s, %s, %s)
+                ON CONFLICT (paper_code, question_number) DO NOTHING
+                """,
+                [(paper_code, row["question_number"], row["question_text"]) for row in questions],
+            )
+        cur.executemany(
+            f"""
+            INSERT INTO {module}_answers (paper_code, question_number, correct_answer, explanation)
+            VALUES (%s, %s, %s, %s)
+            ON CONFLICT (paper_code, question_number) DO NOTHING
+            """,
+            [(paper_code, row["question_number"], row["correct_answer"], row["explanation"]) for row in answers],
+        )
+        cur.executemany(
+            f"""
+            INSERT INTO {module}_attempts (user_id, paper_code, question_number, student_answer, is_correct)
+            VALUES (%s, %s, %s, %s, %s)
+            """,
+            [
+                (BENCH_USER_ID, paper_code, row["question_number"], row["student_answer"], row["is_correct"])
+                for row in attempts
+            ],
+        )
+    finally:
+        cur.close()
+
+
+def batched_repository_writes(conn, module: str, paper_code: str, questions, answers, attempts) -> None:
+    write_questions, write_answers, write_attempts = WRITERS[module]
+    write_questions(questions, conn=conn)
+    write_answers(answers, conn=conn)
+    write_attempts(user_id=BENCH_USER_ID, paper_code=paper_code, answers=attempts, conn=conn)
+
+
+def run_load(conn, module: str, mode: str, rows: int, paper_code: str) -> dict:
+    questions, answers, attempts = synthetic_rows(paper_code, rows)
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            f"INSERT INTO {module}_papers (paper_code, title, is_active) VALUES (%s, %s, FALSE)",
+            (paper_code, f"{paper_code} benchmark"),
+        )
+        conn.commit()
+    finally:
+        cur.close()
+
+    started_at = time.perf_counter()
+    if mode == "executemany":
+        executemany_writes(conn, module, paper_code, questions, answers, attempts)
+    else:
+        batched_repository_writes(conn, module, paper_code, questions, answers, attempts)
+    conn.commit()
+    seconds = time.perf_counter() - started_at
+
+    written = 3 * rows
+    return {
+        "module": module,
+        "mode": mode,
+        "rows": rows,
+        "rows_written": written,
+        "seconds": round(seconds, 4),
+        "rows_per_second": round(written / seconds, 1) if seconds else None,
+    }
+
+
+def main():
+    args = parse_args()
+    modules = [module.strip() for module in args.modules.split(",") if module.strip()]
+    modes = [mode.strip() for mode in args.modes.split(",") if mode.strip()]
+    unknown = [value for value in modules if value not in WRITERS] + [value for value in modes if value not in MODES]
+    if unknown:
+        print(json.dumps({"status": "failed", "error": f"unknown module or mode: {', '.join(unknown)}"}, indent=2))
+        sys.exit(1)
+    try:
+        loads = [int(value) for value in args.loads.split(",") if value.strip()]
+    except ValueError:
+        print(json.dumps({"status": "failed", "error": f"invalid --loads: {args.loads}"}, indent=2))
+        sys.exit(1)
+
+    # execute_batched() reads the module default per call, so this covers the repository writers too.
+    batched_writes.BULK_WRITE_PAGE_SIZE = max(1, args.page_size)
+
+    report = {"page_size": args.page_size, "results": [], "speedup": {}}
+    run_id = time.strftime("%Y%m%d%H%M%S")
+
+    conn = get_connection()
+    try:
+        for module in modules:
+            for rows in loads:
+                timings = {}
+                for mode in modes:
+                    paper_code = f"BENCH-{run_id}-{mode.upper()}-{rows}"
+                    try:
+                        result = run_load(conn, module, mode, rows, paper_code)
+                    finally:
+                        conn.rollback()
+                        cur = conn.cursor()
+                        try:
+                            # Questions, answers and attempts cascade from the paper.
+                            cur.execute(f"DELETE FROM {module}_papers WHERE paper_code = %s", (paper_code,))
+                            conn.commit()
+                        finally:
+                            cur.close()
+                    report["results"].append(result)
+                    timings[mode] = result["seconds"]
+                if len(timings) == 2 and timings["batched"]:
+                    report["speedup"][f"{module}_{rows}"] = round(timings["executemany"] / timings["batched"], 1)
+    except Exception as exc:
+        conn.rollback()
+        print(json.dumps({"status": "failed", "error": str(exc), "partial": report}, indent=2, default=str))
+        sys.exit(1)
+    finally:
+        conn.close()
+
+    report["status"] = "ok"
+    print(json.dumps(report, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
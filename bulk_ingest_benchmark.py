@@ -0,0 +1,187 @@
+import argparse
+import io
+import json
+import sys
+import time
+
+import pandas as pd
+
+from app.admin.repositories.math_practice_ingest_admin import ingest_math_practice_csv
+from app.admin.repositories.nvr_practice_ingest_admin import ingest_nvr_practice_csv
+from app.database import get_connection
+from app.repositories.grammar_repository import import_grammar_csv_rows
+from app.schema_registry import get_table_columns
+
+
+MODULES = ("math", "nvr", "grammar")
+MODES = ("row", "bulk")
+LESSONS_PER_FILE = 20
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description=(
+            "Time the admin CSV imports row by row versus the COPY staging path (app.bulk_ingest) "
+            "on generated files. Writes real rows under a run-specific prefix into the content "
+            "tables and deletes them afterwards: run it against a staging database."
+        )
+    )
+    parser.add_argument("--rows", type=int, default=10000, help="Questions per generated file.")
+    parser.add_argument("--modules", default=",".join(MODULES), help="Comma separated: math, nvr, grammar.")
+    parser.add_argument("--modes", default=",".join(MODES), help="Comma separated: row, bulk.")
+    parser.add_argument("--math-course-id", type=int, default=1, help="course_id for the MathSprint lessons.")
+    parser.add_argument("--keep", action="store_true", help="Leave the last run's rows in place.")
+    return parser.parse_args()
+
+
+def practice_csv(prefix: str, rows: int) -> bytes:
+    df = pd.DataFrame(
+        {
+            "question_id": [f"{prefix}-{index:06d}" for index in range(rows)],
+            "topic": [f"{prefix} topic {index % LESSONS_PER_FILE}" for index in range(rows)],
+            "difficulty": ["Core" if index % 3 else "Stretch" for index in range(rows)],
+            "stem": [f"What is {index} + {index + 1}?" for index in range(rows)],
+            "option_a": [str(2 * index + 1) for index in range(rows)],
+            "option_b": [str(2 * index) for index in range(rows)],
+            "option_c": [str(2 * index + 2) for index in range(rows)],
+            "option_d": [str(index) for index in range(rows)],
+            "correct_option": ["A"] * rows,
+            "option_e": [""] * rows,
+            "explanation": ["Add the two numbers."] * rows,
+            "hint": [""] * rows,
+            "geometry_schema": ['{"type":"series","n":%d}' % index if index % 10 == 0 else "" for index in range(rows)],
+        }
+    )
+    buffer = io.BytesIO()
+    df.to_csv(buffer, index=False)
+    return buffer.getvalue()
+
+
+def grammar_rows(prefix: str, rows: int) -> list[dict]:
+    return [
+        {
+            "course_name": f"{prefix} course",
+            "lesson_code": f"{prefix}-lesson-{index % LESSONS_PER_FILE}",
+            "lesson_name": f"{prefix} lesson {index % LESSONS_PER_FILE}",
+            "question_text": f"{prefix} question {index}: choose the noun.",
+            "option_a": "cat",
+            "option_b": "run",
+            "option_c": "blue",
+            "option_d": "quickly",
+            "correct_option": "A",
+            "explanation": "A noun names a thing.",
+            "difficulty": "easy",
+            "sort_order": str(index % LESSONS_PER_FILE + 1),
+        }
+        for index in range(rows)
+    ]
+
+
+def cleanup(cur, module: str, prefix: str) -> None:
+    pattern = f"{prefix}%"
+    if module in ("math", "nvr"):
+        cur.execute(
+            f"DELETE FROM {module}_lesson_questions WHERE question_id IN (SELECT id FROM {module}_questions WHERE question_id LIKE %s)",
+            (pattern,),
+        )
+        cur.execute(f"DELETE FROM {module}_questions WHERE question_id LIKE %s", (pattern,))
+        cur.execute(f"DELETE FROM {module}_lessons WHERE display_name LIKE %s", (pattern,))
+        return
+
+    cur.execute(
+        """
+        DELETE FROM grammar_lesson_items
+        WHERE lesson_id IN (
+            SELECT l.lesson_id
+            FROM grammar_lessons l
+            JOIN grammar_courses c ON c.course_id = l.course_id
+            WHERE c.course_name LIKE %s
+        )
+        """,
+        (pattern,),
+    )
+    cur.execute("DELETE FROM grammar_questions WHERE question_text LIKE %s", (pattern,))
+    cur.execute(
+        "DELETE FROM grammar_lessons WHERE course_id IN (SELECT course_id FROM grammar_courses WHERE course_name LIKE %s)",
+        (pattern,),
+    )
+    cur.execute("DELETE FROM grammar_courses WHERE course_name LIKE %s", (pattern,))
+
+
+def run_import(module: str, mode: str, prefix: str, args) -> dict:
+    bulk = mode == "bulk"
+    if module == "math":
+        payload = practice_csv(prefix, args.rows)
+        started_at = time.perf_counter()
+        counters = ingest_math_practice_csv(io.BytesIO(payload), course_id=args.math_course_id, bulk=bulk)
+    elif module == "nvr":
+        payload = practice_csv(prefix, args.rows)
+        started_at = time.perf_counter()
+        counters = ingest_nvr_practice_csv(io.BytesIO(payload), bulk=bulk)
+    else:
+        rows = grammar_rows(prefix, args.rows)
+        started_at = time.perf_counter()
+        counters = import_grammar_csv_rows(rows, bulk=bulk)
+    seconds = time.perf_counter() - started_at
+    return {
+        "module": module,
+        "mode": mode,
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(args.rows / seconds, 1) if seconds else None,
+        "counters": counters,
+    }
+
+
+def main():
+    args = parse_args()
+    modules = [module.strip() for module in args.modules.split(",") if module.strip()]
+    modes = [mode.strip() for mode in args.modes.split(",") if mode.strip()]
+    unknown = [value for value in modules if value not in MODULES] + [value for value in modes if value not in MODES]
+    if unknown:
+        print(json.dumps({"status": "failed", "error": f"unknown module or mode: {', '.join(unknown)}"}, indent=2))
+        sys.exit(1)
+
+    report = {"rows": args.rows, "results": [], "speedup": {}, "counter_mismatches": []}
+    run_id = time.strftime("%Y%m%d%H%M%S")
+
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        for module in modules:
+            if module == "grammar" and not get_table_columns("grammar_questions"):
+                report["results"].append({"module": module, "skipped": "grammar_questions not found"})
+                continue
+            timings = {}
+            counters = {}
+            for mode in modes:
+                # Same content per mode, each into an empty prefix, so both paths do inserts.
+                prefix = f"BENCH-{run_id}-{module}-{mode}"
+                try:
+                    result = run_import(module, mode, prefix, args)
+                finally:
+                    if not args.keep:
+                        cleanup(cur, module, prefix)
+                        conn.commit()
+                report["results"].append(result)
+                timings[mode] = result["seconds"]
+                counters[mode] = result["counters"]
+            if len(timings) == 2 and timings["bulk"]:
+                report["speedup"][module] = round(timings["row"] / timings["bulk"], 1)
+            if len(counters) == 2 and counters["row"] != counters["bulk"]:
+                report["counter_mismatches"].append({"module": module, **counters})
+    except Exception as exc:
+        conn.rollback()
+        print(json.dumps({"status": "failed", "error": str(exc), "partial": report}, indent=2, default=str))
+        sys.exit(1)
+    finally:
+        cur.close()
+        conn.close()
+
+    report["status"] = "ok" if not report["counter_mismatches"] else "mismatch"
+    print(json.dumps(report, indent=2, default=str))
+    if report["counter_mismatches"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
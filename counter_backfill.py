@@ -0,0 +1,144 @@
+import argparse
+import json
+import sys
+from datetime import date
+
+from app.repositories.activity_repository import (
+    check_user_activity,
+    rebuild_user_activity,
+    reconcile_user_engagement,
+)
+from app.repositories.counter_rebuild import check_counters, rebuild_counters
+from app.repositories.daily_attempts_repository import DAILY_ATTEMPT_COUNTERS
+from app.repositories.mastery_repository import MASTERY_COUNTERS
+from app.repositories.module_rollup_repository import ROLLUP_COUNTERS
+
+
+COUNTER_TARGETS = {
+    "mastery": MASTERY_COUNTERS,
+    "module-rollup": ROLLUP_COUNTERS,
+    "daily-attempts": DAILY_ATTEMPT_COUNTERS,
+}
+
+
+def _counter_target(counter):
+    def check(args):
+        return check_counters(counter, args.user_id, args.module, getattr(args, "since", None))
+
+    def rebuild(args):
+        return {"rows_written": rebuild_counters(counter, args.user_id, args.module, getattr(args, "since", None))}
+
+    return check, rebuild
+
+
+def _activity_check(args):
+    return check_user_activity(args.user_id)
+
+
+def _activity_rebuild(args):
+    rows_written = rebuild_user_activity(args.user_id)
+    engagement_rows = 0 if args.skip_engagement else reconcile_user_engagement(args.user_id)
+    return {"rows_written": rows_written, "engagement_rows_updated": engagement_rows}
+
+
+def _repair(args, check, rebuild) -> dict:
+    mismatches = check(args)
+    modules_by_user: dict = {}
+    for mismatch in mismatches:
+        modules = modules_by_user.setdefault(mismatch["user_id"], set())
+        if "module" in mismatch:
+            modules.add(mismatch["module"])
+
+    totals: dict = {}
+    remaining = 0
+    for user_id, modules in sorted(modules_by_user.items()):
+        user_args = argparse.Namespace(**{**vars(args), "user_id": user_id, "module": sorted(modules) or None})
+        for key, value in rebuild(user_args).items():
+            totals[key] = totals.get(key, 0) + value
+        remaining += len(check(user_args))
+    return {
+        "status": "ok" if not remaining else "mismatch",
+        "users_repaired": len(modules_by_user),
+        **totals,
+        "mismatch_count": len(mismatches),
+        "remaining_mismatch_count": remaining,
+    }
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description=(
+            "Rebuild (repair) a per-user counter table from the practice attempt tables, or compare "
+            "it against a recount."
+        )
+    )
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--user-id", type=int, help="Limit to one user (default: everyone).")
+    mode = common.add_mutually_exclusive_group()
+    mode.add_argument("--check", action="store_true", help="Only report mismatches; exit 1 if any.")
+    mode.add_argument(
+        "--repair",
+        action="store_true",
+        help="Rebuild only the users (and modules) that mismatch, one user per transaction.",
+    )
+    targets = parser.add_subparsers(dest="target", required=True)
+
+    for name, counter in COUNTER_TARGETS.items():
+        target = targets.add_parser(name, parents=[common], help=counter.table)
+        target.add_argument(
+            "--module",
+            action="append",
+            choices=counter.modules,
+            help="Limit to a module; repeat for several (default: all).",
+        )
+        if counter.day_column:
+            target.add_argument("--since", type=date.fromisoformat, help="Only days from this date (YYYY-MM-DD) on.")
+        target.set_defaults(actions=_counter_target(counter))
+
+    activity = targets.add_parser(
+        "activity",
+        parents=[common],
+        help="user_activity_days / user_activity_streaks, and the streaks copied into user_engagement",
+    )
+    activity.add_argument(
+        "--skip-engagement",
+        action="store_true",
+        help="Do not reconcile user_engagement.current_streak / last_activity_date.",
+    )
+    activity.set_defaults(actions=(_activity_check, _activity_rebuild))
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    check, rebuild = args.actions
+
+    try:
+        if args.check:
+            mismatches = check(args)
+            result = {
+                "status": "ok" if not mismatches else "mismatch",
+                "mismatch_count": len(mismatches),
+                "mismatches": mismatches[:100],
+            }
+        elif args.repair:
+            result = _repair(args, check, rebuild)
+        else:
+            written = rebuild(args)
+            mismatches = check(args)
+            result = {
+                "status": "ok" if not mismatches else "mismatch",
+                **written,
+                "mismatch_count": len(mismatches),
+            }
+    except Exception as exc:
+        print(json.dumps({"status": "failed", "error": str(exc)}, indent=2))
+        sys.exit(1)
+
+    print(json.dumps(result, indent=2, default=str))
+    if result["status"] != "ok":
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
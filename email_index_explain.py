@@ -0,0 +1,100 @@
+import argparse
+import json
+import sys
+
+from app.auth import MEMBER_ID_FOR_EMAIL_SQL, VERIFIED_LEARNING_USER_ID_SQL
+from app.database import get_connection
+from app.entitlement_cache import MEMBER_IDS_FOR_EMAIL_SQL
+from app.entitlements import PRINTABLE_EVENTS_FOR_EMAIL_SQL
+from app.main import ADMIN_USERS_SQL, LOGIN_RECORD_SQL, LOGIN_STATE_SQL, PENDING_GUMROAD_EVENTS_SQL
+
+
+# (call site, the SQL string the application executes, tables that must not be scanned in full)
+CALL_SITES = [
+    ("login: LOGIN_STATE_SQL", LOGIN_STATE_SQL, {"members", "users"}),
+    ("login: LOGIN_RECORD_SQL", LOGIN_RECORD_SQL, {"users"}),
+    ("resolve_member_id / gumroad_webhook / pending grants", MEMBER_ID_FOR_EMAIL_SQL, {"members"}),
+    ("resolve_verified_learning_user_id", VERIFIED_LEARNING_USER_ID_SQL, {"users"}),
+    ("get_member_ids_for_email", MEMBER_IDS_FOR_EMAIL_SQL, {"members"}),
+    ("_replay_pending_gumroad_grants", PENDING_GUMROAD_EVENTS_SQL, {"math_gumroad_events"}),
+    ("printable state replay", PRINTABLE_EVENTS_FOR_EMAIL_SQL, {"math_gumroad_events"}),
+    # Lists every member, so members is scanned in full; the users side of the
+    # join must be able to use the LOWER(email) index.
+    ("/admin/users", ADMIN_USERS_SQL, {"users"}),
+]
+
+
+def _full_scans(plan: dict) -> list[str]:
+    """
+    Tables read without searching by email: seq scans, and index scans with
+    no Index Cond (a walk over the whole pkey, filtering each row) unless the
+    index walked is an email index (a merge join reading it in email order).
+    """
+    found = []
+    node_type = plan.get("Node Type")
+    if node_type == "Seq Scan":
+        found.append(plan.get("Relation Name"))
+    elif node_type in ("Index Scan", "Index Only Scan") and not plan.get("Index Cond"):
+        if "email" not in (plan.get("Index Name") or ""):
+            found.append(plan.get("Relation Name"))
+    for child in plan.get("Plans", []) or []:
+        found.extend(_full_scans(child))
+    return found
+
+
+def explain_call_sites(email: str) -> list[dict]:
+    conn = get_connection()
+    cur = conn.cursor()
+    results = []
+    try:
+        # Tiny dev tables make seq scans cheapest even with an index; disabling
+        # them means a remaining full scan has no usable index behind it.
+        cur.execute("SET LOCAL enable_seqscan = off")
+        for name, sql, tables in CALL_SITES:
+            # Plain EXPLAIN plans without executing, so LOGIN_RECORD_SQL writes nothing.
+            cur.execute("EXPLAIN (FORMAT JSON) " + sql, (email,) * sql.count("%s"))
+            plan = cur.fetchone()[0][0]["Plan"]
+            offending = sorted({table for table in _full_scans(plan) if table in tables})
+            results.append(
+                {
+                    "call_site": name,
+                    "status": "ok" if not offending else "full_scan",
+                    "full_scan_tables": offending,
+                }
+            )
+        return results
+    finally:
+        conn.rollback()
+        cur.close()
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=(
+            "EXPLAIN the application's LOWER(email) identity lookups (the query strings the code "
+            "executes) and fail if any of them scans a whole identity table."
+        )
+    )
+    parser.add_argument("--email", default="someone@example.com", help="Email bound into each query.")
+    args = parser.parse_args()
+
+    try:
+        results = explain_call_sites(args.email)
+    except Exception as exc:
+        print(json.dumps({"status": "failed", "error": str(exc)}, indent=2))
+        sys.exit(1)
+
+    failures = [result for result in results if result["status"] != "ok"]
+    print(
+        json.dumps(
+            {"status": "ok" if not failures else "failed", "results": results},
+            indent=2,
+        )
+    )
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import argparse
+import json
+import sys
+import threading
+import time
+
+from app.database import get_connection
+from app.services.engagement_service import apply_engagement_xp_batch, update_user_engagement
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description=(
+            "Award XP to the same learners from many threads at once, through update_user_engagement() "
+            "and apply_engagement_xp_batch(), and check user_engagement.total_xp grew by exactly the XP "
+            "awarded. Uses throwaway user ids (negative by default) and deletes their rows afterwards."
+        )
+    )
+    parser.add_argument("--first-user-id", type=int, default=-900000, help="Lowest throwaway user id.")
+    parser.add_argument("--users", type=int, default=3, help="Learners to award concurrently.")
+    parser.add_argument("--threads", type=int, default=8, help="Concurrent writers.")
+    parser.add_argument("--awards", type=int, default=50, help="Awards per writer.")
+    parser.add_argument("--xp", type=int, default=10, help="XP per award.")
+    return parser.parse_args()
+
+
+def load_totals(user_ids: list[int]) -> dict:
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            "SELECT user_id, total_xp, current_streak FROM user_engagement WHERE user_id = ANY(%s)",
+            (user_ids,),
+        )
+        return {row[0]: {"xp": row[1], "streak": row[2]} for row in cur.fetchall()}
+    finally:
+        cur.close()
+        conn.close()
+
+
+def delete_rows(user_ids: list[int]) -> None:
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("DELETE FROM user_engagement WHERE user_id = ANY(%s)", (user_ids,))
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+
+
+def main():
+    args = parse_args()
+    user_ids = list(range(args.first_user_id, args.first_user_id + args.users))
+
+    if load_totals(user_ids):
+        print(json.dumps({"status": "failed", "error": f"user_engagement already has rows for {user_ids}"}, indent=2))
+        sys.exit(1)
+
+    barrier = threading.Barrier(args.threads)
+    errors = []
+
+    def writer(index: int) -> None:
+        try:
+            barrier.wait()
+            for award in range(args.awards):
+                # Half the writers use the batch path, so both race each other.
+                if index % 2:
+                    apply_engagement_xp_batch([(user_id, args.xp) for user_id in user_ids])
+                else:
+                    update_user_engagement(user_ids[award % len(user_ids)], args.xp)
+        except Exception as exc:
+            errors.append(f"writer {index}: {exc}")
+
+    threads = [threading.Thread(target=writer, args=(index,)) for index in range(args.threads)]
+    started_at = time.perf_counter()
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        seconds = time.perf_counter() - started_at
+        stored = load_totals(user_ids)
+    finally:
+        delete_rows(user_ids)
+
+    expected = {user_id: 0 for user_id in user_ids}
+    for index in range(args.threads):
+        for award in range(args.awards):
+            if index % 2:
+                for user_id in user_ids:
+                    expected[user_id] += args.xp
+            else:
+                expected[user_ids[award % len(user_ids)]] += args.xp
+
+    lost = {
+        user_id: expected[user_id] - (stored.get(user_id) or {}).get("xp", 0)
+        for user_id in user_ids
+        if (stored.get(user_id) or {}).get("xp") != expected[user_id]
+    }
+    report = {
+        "threads": args.threads,
+        "awards_per_thread": args.awards,
+        "seconds": round(seconds, 3),
+        "expected_xp": expected,
+        "stored": stored,
+        "lost_xp": lost,
+        "errors": errors[:20],
+        "status": "ok" if not lost and not errors else "failed",
+    }
+    print(json.dumps(report, indent=2, default=str))
+    if report["status"] != "ok":
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+
+import httpx
+
+import app.main as main_module
+from app.passwords import get_password_hashing_stats, pwd_context
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description=(
+            "Login burst against the in-process app: login latency plus the latency of an "
+            "unrelated endpoint while the burst runs."
+        )
+    )
+    parser.add_argument("--email", required=True, help="Existing member email.")
+    parser.add_argument("--password", required=True, help="Password for --email.")
+    parser.add_argument("--logins", type=int, default=100, help="Logins per mode.")
+    parser.add_argument("--concurrency", type=int, default=20, help="Logins in flight.")
+    parser.add_argument("--probe-path", default="/", help="Unrelated endpoint sampled during the burst.")
+    parser.add_argument("--probe-interval-ms", type=int, default=10, help="Delay between probe requests.")
+    parser.add_argument(
+        "--modes",
+        default="inline,offload",
+        help="inline = bcrypt on the event loop (previous behaviour), offload = password hashing pool.",
+    )
+    return parser.parse_args()
+
+
+def _percentile(values: list[float], fraction: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(len(ordered) * fraction)) - 1))
+    return round(ordered[index] * 1000, 1)
+
+
+def _summary(values: list[float]) -> dict:
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "p50_ms": round(statistics.median(values) * 1000, 1),
+        "p99_ms": _percentile(values, 0.99),
+        "max_ms": round(max(values) * 1000, 1),
+    }
+
+
+async def _inline_verify(plain, hashed):
+    try:
+        return pwd_context.verify_and_update(plain, hashed)
+    except Exception:
+        return False, None
+
+
+async def run_mode(args, mode: str) -> dict:
+    offload_verify = main_module.verify_and_update_password_async
+    if mode == "inline":
+        main_module.verify_and_update_password_async = _inline_verify
+
+    transport = httpx.ASGITransport(app=main_module.app)
+    login_latencies: list[float] = []
+    probe_latencies: list[float] = []
+    failures = 0
+    remaining = args.logins
+    burst_done = asyncio.Event()
+
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest") as client:
+            async def login_worker():
+                nonlocal remaining, failures
+                while remaining > 0:
+                    remaining -= 1
+                    started_at = time.perf_counter()
+                    response = await client.post("/login", json={"email": args.email, "password": args.password})
+                    login_latencies.append(time.perf_counter() - started_at)
+                    if response.status_code != 200:
+                        failures += 1
+
+            async def probe():
+                while not burst_done.is_set():
+                    started_at = time.perf_counter()
+                    await client.get(args.probe_path)
+                    probe_latencies.append(time.perf_counter() - started_at)
+                    await asyncio.sleep(args.probe_interval_ms / 1000.0)
+
+            probe_task = asyncio.create_task(probe())
+            started_at = time.perf_counter()
+            await asyncio.gather(*(login_worker() for _ in range(args.concurrency)))
+            elapsed = time.perf_counter() - started_at
+            burst_done.set()
+            await probe_task
+    finally:
+        main_module.verify_and_update_password_async = offload_verify
+
+    return {
+        "mode": mode,
+        "logins_per_second": round(len(login_latencies) / elapsed, 1),
+        "login_failures": failures,
+        "login": _summary(login_latencies),
+        "probe_during_burst": _summary(probe_latencies),
+    }
+
+
+async def run_test(args) -> dict:
+    transport = httpx.ASGITransport(app=main_module.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://loadtest") as client:
+        # Warm-up and idle baseline for the probe endpoint.
+        await client.post("/login", json={"email": args.email, "password": args.password})
+        baseline = []
+        for _ in range(50):
+            started_at = time.perf_counter()
+            await client.get(args.probe_path)
+            baseline.append(time.perf_counter() - started_at)
+
+    results = []
+    for mode in [value.strip() for value in args.modes.split(",") if value.strip()]:
+        results.append(await run_mode(args, mode))
+
+    return {
+        "probe_path": args.probe_path,
+        "probe_idle": _summary(baseline),
+        "results": results,
+        "password_hashing": get_password_hashing_stats(),
+    }
+
+
+def main():
+    args = parse_args()
+    try:
+        report = asyncio.run(run_test(args))
+    except Exception as exc:
+        print(json.dumps({"status": "failed", "error": str(exc)}, indent=2))
+        sys.exit(1)
+
+    failed = any(result["login_failures"] for result in report["results"])
+    print(json.dumps({"status": "failed" if failed else "ok", **report}, indent=2))
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+import argparse
+import json
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+from jose import jwt
+
+import app.database as database
+from app.database import begin_request_db_stats, end_request_db_stats, get_connection
+from app.entitlements import build_entitlement_claims
+from app.main import JWT_ALGO, JWT_SECRET, _complete_login, _load_login_state
+
+
+def legacy_login_queries(email: str) -> None:
+    """The query sequence /login issued before it was collapsed (bcrypt excluded)."""
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            """
+            SELECT email, password_hash, account_type
+            FROM kiaro_membership.members
+            WHERE LOWER(email) = LOWER(%s)
+            ORDER BY id DESC
+            LIMIT 1
+            """,
+            (email,),
+        )
+        cur.fetchone()
+    finally:
+        cur.close()
+        conn.close()
+
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            """
+            SELECT user_id, role, is_active
+            FROM users
+            WHERE LOWER(email) = LOWER(%s)
+            """,
+            (email,),
+        )
+        user_row = cur.fetchone()
+        cur.execute(
+            """
+            SELECT id
+            FROM kiaro_membership.members
+            WHERE LOWER(email) = LOWER(%s)
+            ORDER BY id DESC
+            LIMIT 1
+            """,
+            (email,),
+        )
+        row = cur.fetchone()
+        cur.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS last_login TIMESTAMPTZ")
+        cur.execute(
+            "UPDATE users SET last_login = NOW() WHERE LOWER(email) = LOWER(%s)",
+            (email,),
+        )
+        conn.commit()
+        claims = build_entitlement_claims(cur, row[0] if row else None)
+        jwt.encode(
+            {
+                "sub": email,
+                "user_id": user_row[0] if user_row else None,
+                "member_id": row[0] if row else None,
+                "exp": datetime.utcnow() + timedelta(hours=2),
+                **claims,
+            },
+            JWT_SECRET,
+            algorithm=JWT_ALGO,
+        )
+    finally:
+        cur.close()
+        conn.close()
+
+
+def collapsed_login_queries(email: str) -> None:
+    login_state = _load_login_state(email)
+    if not login_state:
+        raise RuntimeError(f"No member for {email}")
+    _complete_login(email, login_state, None)
+
+
+def measure(func, email: str, iterations: int) -> dict:
+    latencies = []
+    stats = {}
+    for _ in range(iterations):
+        token = begin_request_db_stats()
+        started_at = time.perf_counter()
+        func(email)
+        latencies.append(time.perf_counter() - started_at)
+        stats = end_request_db_stats(token)
+
+    latencies.sort()
+    return {
+        "round_trips": stats.get("queries"),
+        "connections": stats.get("connections"),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p95_ms": round(latencies[max(0, int(len(latencies) * 0.95) - 1)] * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Round trips and DB latency per /login, before and after collapsing.")
+    parser.add_argument("--email", required=True, help="Existing member email.")
+    parser.add_argument("--iterations", type=int, default=200, help="Logins per variant.")
+    parser.add_argument(
+        "--simulated-rtt-ms",
+        type=float,
+        default=0.0,
+        help="Sleep added per statement to model a database across the network.",
+    )
+    args = parser.parse_args()
+
+    if args.simulated_rtt_ms:
+        execute = database.CountingCursor.execute
+        delay = args.simulated_rtt_ms / 1000.0
+
+        def execute_with_rtt(self, query, vars=None):
+            time.sleep(delay)
+            return execute(self, query, vars)
+
+        database.CountingCursor.execute = execute_with_rtt
+
+    try:
+        email = args.email.strip().lower()
+        # Warm the pool and the plan cache for both variants.
+        legacy_login_queries(email)
+        collapsed_login_queries(email)
+        results = {
+            "before": measure(legacy_login_queries, email, args.iterations),
+            "after": measure(collapsed_login_queries, email, args.iterations),
+        }
+    except Exception as exc:
+        print(json.dumps({"status": "failed", "error": str(exc)}, indent=2))
+        sys.exit(1)
+
+    print(
+        json.dumps(
+            {
+                "status": "ok",
+                "iterations": args.iterations,
+                "simulated_rtt_ms": args.simulated_rtt_ms,
+                **results,
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
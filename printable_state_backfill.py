@@ -0,0 +1,45 @@
+import argparse
+import json
+import sys
+
+from app.entitlements import check_member_printable_state, rebuild_member_printable_state
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=(
+            "Rebuild member_printable_state from math_gumroad_events, or compare the table "
+            "against a full replay."
+        )
+    )
+    parser.add_argument("--email", help="Limit to one email (default: everyone).")
+    parser.add_argument("--check", action="store_true", help="Only report mismatches; exit 1 if any.")
+    args = parser.parse_args()
+
+    try:
+        if args.check:
+            mismatches = check_member_printable_state(args.email)
+            result = {
+                "status": "ok" if not mismatches else "mismatch",
+                "mismatch_count": len(mismatches),
+                "mismatches": mismatches[:100],
+            }
+        else:
+            rows_written = rebuild_member_printable_state(args.email)
+            mismatches = check_member_printable_state(args.email)
+            result = {
+                "status": "ok" if not mismatches else "mismatch",
+                "rows_written": rows_written,
+                "mismatch_count": len(mismatches),
+            }
+    except Exception as exc:
+        print(json.dumps({"status": "failed", "error": str(exc)}, indent=2))
+        sys.exit(1)
+
+    print(json.dumps(result, indent=2))
+    if result["status"] != "ok":
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+
+from app.database import get_connection
+from app.sampling import pick_candidate, sample_rows
+
+
+LESSON_SIZE = 40
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description=(
+            "ORDER BY RANDOM() versus app.sampling (random_key index seek and cached lesson "
+            "candidates) over synthetic question banks in temporary tables."
+        )
+    )
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="Comma separated question bank sizes.")
+    parser.add_argument("--iterations", type=int, default=50, help="Picks per strategy and size.")
+    parser.add_argument("--test-size", type=int, default=20, help="Rows per multi-row pick (math test).")
+    return parser.parse_args()
+
+
+def build_bank(cur, size: int) -> None:
+    cur.execute("DROP TABLE IF EXISTS bench_words")
+    cur.execute(
+        """
+        CREATE TEMP TABLE bench_words AS
+        SELECT
+            g AS word_id,
+            'word' || g AS headword,
+            CASE WHEN g %% 10 = 0 THEN NULL ELSE 'alpha, beta, gamma' END AS synonyms,
+            1 + (g %% 3) AS difficulty,
+            1 + (g / %s) AS lesson_id,
+            random() AS random_key
+        FROM generate_series(1, %s) AS g
+        """,
+        (LESSON_SIZE, size),
+    )
+    cur.execute("ALTER TABLE bench_words ADD PRIMARY KEY (word_id)")
+    cur.execute(
+        """
+        CREATE INDEX ON bench_words (random_key)
+        WHERE synonyms IS NOT NULL AND TRIM(synonyms) <> ''
+        """
+    )
+    cur.execute("CREATE INDEX ON bench_words (lesson_id)")
+    cur.execute("ANALYZE bench_words")
+
+
+def timed(func, iterations: int) -> dict:
+    latencies = []
+    for _ in range(iterations):
+        started_at = time.perf_counter()
+        func()
+        latencies.append((time.perf_counter() - started_at) * 1000)
+    latencies.sort()
+    return {
+        "p50_ms": round(statistics.median(latencies), 3),
+        "p95_ms": round(latencies[max(0, int(len(latencies) * 0.95) - 1)], 3),
+    }
+
+
+def run_size(cur, size: int, args) -> dict:
+    build_bank(cur, size)
+    lesson_count = max(1, size // LESSON_SIZE)
+    where = "word_id <> ALL(%s) AND synonyms IS NOT NULL AND TRIM(synonyms) <> '' AND difficulty = ANY(%s)"
+
+    def params():
+        return ([random.randint(1, size) for _ in range(10)], [1, 2])
+
+    def single(random_key):
+        return lambda: sample_rows(
+            cur, table="bench_words", columns="word_id, headword, synonyms", where=where, params=params(), random_key=random_key
+        )
+
+    def multi(random_key):
+        return lambda: sample_rows(
+            cur,
+            table="bench_words",
+            columns="word_id, headword, synonyms",
+            where="synonyms IS NOT NULL AND TRIM(synonyms) <> ''",
+            limit=args.test_size,
+            random_key=random_key,
+        )
+
+    def lesson_order_by_random():
+        cur.execute(
+            """
+            SELECT word_id, headword, synonyms
+            FROM bench_words
+            WHERE lesson_id = %s AND word_id <> ALL(%s)
+              AND synonyms IS NOT NULL AND TRIM(synonyms) <> ''
+            ORDER BY RANDOM() LIMIT 1
+            """,
+            (random.randint(1, lesson_count), params()[0]),
+        )
+        cur.fetchone()
+
+    # Candidate arrays as app.sampling caches them (loaded once per lesson).
+    cur.execute(
+        """
+        SELECT lesson_id, ARRAY_AGG(word_id), ARRAY_AGG(difficulty::text)
+        FROM bench_words
+        WHERE synonyms IS NOT NULL AND TRIM(synonyms) <> ''
+        GROUP BY lesson_id
+        """
+    )
+    candidates = {lesson_id: tuple(zip(ids, levels)) for lesson_id, ids, levels in cur.fetchall()}
+
+    def lesson_candidates():
+        lesson_id = random.randint(1, lesson_count)
+        candidate = pick_candidate(candidates.get(lesson_id, ()), exclude=params()[0])
+        if candidate is not None:
+            cur.execute("SELECT word_id, headword, synonyms FROM bench_words WHERE word_id = %s", (candidate[0],))
+            cur.fetchone()
+
+    # Spread check: distinct rows over repeated single picks (higher is better).
+    picked = [single(True)()[0][0] for _ in range(args.iterations)]
+
+    return {
+        "rows": size,
+        "single_pick": {
+            "order_by_random": timed(single(False), args.iterations),
+            "random_key": timed(single(True), args.iterations),
+        },
+        "multi_pick": {
+            "rows": args.test_size,
+            "order_by_random": timed(multi(False), args.iterations),
+            "random_key": timed(multi(True), args.iterations),
+        },
+        "lesson_pick": {
+            "order_by_random": timed(lesson_order_by_random, args.iterations),
+            "cached_candidates": timed(lesson_candidates, args.iterations),
+        },
+        "random_key_distinct_picks": f"{len(set(picked))}/{len(picked)}",
+    }
+
+
+def main():
+    args = parse_args()
+    sizes = [int(value) for value in args.sizes.split(",") if value.strip()]
+
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        results = [run_size(cur, size, args) for size in sizes]
+    except Exception as exc:
+        print(json.dumps({"status": "failed", "error": str(exc)}, indent=2))
+        sys.exit(1)
+    finally:
+        cur.close()
+        conn.close()
+
+    print(json.dumps({"status": "ok", "iterations": args.iterations, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+import argparse
+import contextlib
+import json
+import sys
+
+from app.database import begin_request_db_stats, end_request_db_stats, get_connection
+from app.practice.spelling_engine import get_spelling_question
+from app.repositories.spelling_repository import (
+    get_latest_attempt_summary,
+    get_next_lesson_word_after,
+    get_next_unmastered_word,
+    get_resume_word_id,
+    get_session_recent_word_ids,
+    get_session_word_positions,
+    get_spelling_lesson_item_count,
+    get_weak_word_id,
+    get_word_timing_stats,
+    has_prior_incorrect_attempt,
+    is_word_mastered,
+    load_spelling_selection_context,
+)
+from app.repositories.spelling_stats_repository import get_spelling_weak_pattern
+
+
+COMPARED_FIELDS = (
+    "word_id",
+    "hint",
+    "example_sentence",
+    "lesson_item_count",
+    "weak_word_id",
+    "resume_from_word_id",
+    "next_unmastered_word_id",
+    "resumed",
+    "selection_strategy",
+    "selection_score",
+    "mastered",
+    "timing",
+    "review_reason",
+    "is_review",
+    "session_state",
+)
+
+
+class LegacySelectionContext:
+    """The per-call queries get_spelling_question issued before the selection context."""
+
+    def __init__(self, user_id: int, lesson_id: int, conn):
+        self.user_id = user_id
+        self.lesson_id = lesson_id
+        self.conn = conn
+        self.lesson_item_count = get_spelling_lesson_item_count(lesson_id, conn=conn)
+        self.weak_pattern = get_spelling_weak_pattern(user_id, conn=conn)
+
+    def word_details(self, word_id):
+        return None
+
+    def latest_attempt_summary(self):
+        return get_latest_attempt_summary(user_id=self.user_id, lesson_id=self.lesson_id, conn=self.conn)
+
+    def session_word_positions(self, session_id):
+        return get_session_word_positions(
+            user_id=self.user_id, lesson_id=self.lesson_id, session_id=session_id, conn=self.conn
+        )
+
+    def session_recent_word_ids(self, session_id, limit: int = 4):
+        return get_session_recent_word_ids(
+            user_id=self.user_id, lesson_id=self.lesson_id, session_id=session_id, conn=self.conn, limit=limit
+        )
+
+    def next_lesson_word_after(self, word_id):
+        return get_next_lesson_word_after(lesson_id=self.lesson_id, current_word_id=word_id, conn=self.conn)
+
+    def resume_word_id(self):
+        return get_resume_word_id(user_id=self.user_id, lesson_id=self.lesson_id, conn=self.conn)
+
+    def next_unmastered_word_id(self):
+        return get_next_unmastered_word(user_id=self.user_id, lesson_id=self.lesson_id, conn=self.conn)
+
+    def weak_word_id(self, exclude_word_ids=None):
+        return get_weak_word_id(
+            user_id=self.user_id, lesson_id=self.lesson_id, conn=self.conn, exclude_word_ids=exclude_word_ids
+        )
+
+    def is_word_mastered(self, word_id):
+        return is_word_mastered(user_id=self.user_id, lesson_id=self.lesson_id, word_id=word_id, conn=self.conn)
+
+    def word_timing_stats(self, word_id):
+        return get_word_timing_stats(user_id=self.user_id, lesson_id=self.lesson_id, word_id=word_id, conn=self.conn)
+
+    def has_prior_incorrect_attempt(self, word_id):
+        return has_prior_incorrect_attempt(
+            user_id=self.user_id, lesson_id=self.lesson_id, word_id=word_id, conn=self.conn
+        )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description=(
+            "Replay recorded spelling sessions through get_spelling_question twice, once with the "
+            "legacy per-call queries and once with the selection context, and diff the selections. "
+            "With --replay-positions every position of a session is rebuilt by deleting the later "
+            "attempts inside a transaction that is always rolled back."
+        )
+    )
+    parser.add_argument("--sessions", type=int, default=50, help="Most recent sessions to replay.")
+    parser.add_argument("--user-id", type=int, help="Only sessions of this user.")
+    parser.add_argument("--lesson-id", type=int, help="Only sessions of this lesson.")
+    parser.add_argument("--replay-positions", action="store_true", help="Compare at every recorded position, not just the latest.")
+    parser.add_argument("--max-diffs", type=int, default=20, help="Diffs to include in the output.")
+    return parser.parse_args()
+
+
+def load_sessions(cur, args) -> list[tuple]:
+    filters = ["session_id IS NOT NULL", "lesson_id IS NOT NULL"]
+    params = []
+    if args.user_id is not None:
+        filters.append("user_id = %s")
+        params.append(args.user_id)
+    if args.lesson_id is not None:
+        filters.append("lesson_id = %s")
+        params.append(args.lesson_id)
+    cur.execute(
+        f"""
+        SELECT user_id, lesson_id, session_id
+        FROM spelling_attempts
+        WHERE {' AND '.join(filters)}
+        GROUP BY user_id, lesson_id, session_id
+        ORDER BY MAX(created_at) DESC
+        LIMIT %s
+        """,
+        (*params, args.sessions),
+    )
+    return cur.fetchall()
+
+
+def normalize(payload: dict) -> dict:
+    result = {field: payload.get(field) for field in COMPARED_FIELDS}
+    timing = result.get("timing")
+    if isinstance(timing, dict):
+        result["timing"] = {**timing, "avg_time_ms": round(float(timing.get("avg_time_ms") or 0), 6)}
+    return result
+
+
+def select(conn, user_id: int, lesson_id: int, session_id: str, legacy: bool) -> tuple[dict, int]:
+    token = begin_request_db_stats()
+    try:
+        # get_spelling_question prints progress; keep stdout for the JSON report.
+        with contextlib.redirect_stdout(sys.stderr):
+            context = (
+                LegacySelectionContext(user_id, lesson_id, conn)
+                if legacy
+                else load_spelling_selection_context(user_id, lesson_id, conn)
+            )
+            payload = get_spelling_question(
+                lesson_id=lesson_id,
+                user_id=user_id,
+                session_id=session_id,
+                conn=conn,
+                selection_context=context,
+            )
+    finally:
+        stats = end_request_db_stats(token)
+    return normalize(payload), stats["queries"]
+
+
+def compare(conn, user_id: int, lesson_id: int, session_id: str, position, report: dict, max_diffs: int) -> None:
+    legacy, legacy_queries = select(conn, user_id, lesson_id, session_id, legacy=True)
+    current, current_queries = select(conn, user_id, lesson_id, session_id, legacy=False)
+    report["selections"] += 1
+    report["legacy_queries"] += legacy_queries
+    report["context_queries"] += current_queries
+    if legacy == current:
+        return
+
+    report["mismatches"] += 1
+    if len(report["diffs"]) < max_diffs:
+        report["diffs"].append(
+            {
+                "user_id": user_id,
+                "lesson_id": lesson_id,
+                "session_id": session_id,
+                "position": position,
+                "fields": {
+                    field: {"legacy": legacy[field], "context": current[field]}
+                    for field in COMPARED_FIELDS
+                    if legacy[field] != current[field]
+                },
+            }
+        )
+
+
+def main():
+    args = parse_args()
+    report = {"selections": 0, "mismatches": 0, "legacy_queries": 0, "context_queries": 0, "diffs": []}
+
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        sessions = load_sessions(cur, args)
+        for user_id, lesson_id, session_id in sessions:
+            if not args.replay_positions:
+                compare(conn, user_id, lesson_id, session_id, None, report, args.max_diffs)
+                continue
+
+            cur.execute(
+                """
+                SELECT attempt_id, created_at
+                FROM spelling_attempts
+                WHERE user_id = %s
+                  AND lesson_id = %s
+                  AND session_id = %s
+                ORDER BY created_at ASC, attempt_id ASC
+                """,
+                (user_id, lesson_id, session_id),
+            )
+            session_attempts = cur.fetchall()
+            for position, (attempt_id, created_at) in enumerate(session_attempts, start=1):
+                cur.execute("SAVEPOINT spelling_replay")
+                cur.execute(
+                    """
+                    DELETE FROM spelling_attempts
+                    WHERE user_id = %s
+                      AND lesson_id = %s
+                      AND (created_at, attempt_id) > (%s, %s)
+                    """,
+                    (user_id, lesson_id, created_at, attempt_id),
+                )
+                try:
+                    compare(conn, user_id, lesson_id, session_id, position, report, args.max_diffs)
+                finally:
+                    cur.execute("ROLLBACK TO SAVEPOINT spelling_replay")
+    except Exception as exc:
+        print(json.dumps({"status": "failed", "error": str(exc)}, indent=2))
+        sys.exit(1)
+    finally:
+        conn.rollback()
+        cur.close()
+        conn.close()
+
+    selections = report["selections"]
+    report["sessions"] = len(sessions)
+    report["avg_queries"] = {
+        "legacy": round(report.pop("legacy_queries") / selections, 2) if selections else 0,
+        "context": round(report.pop("context_queries") / selections, 2) if selections else 0,
+    }
+    report["status"] = "ok" if report["mismatches"] == 0 else "mismatch"
+    print(json.dumps(report, indent=2, default=str))
+    if report["mismatches"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+-- Email lookup indexes
+-- Additive only migration for shared production Postgres.
+-- No renames, no drops, and no changes to existing columns.
+-- Existing queries keep their LOWER(email) = LOWER(%s) predicates; the
+-- expression indexes below match them as written.
+-- Verify with: python email_index_explain.py (EXPLAINs the application's own
+-- query strings).
+--
+-- CREATE INDEX CONCURRENTLY builds without blocking writes to members/users,
+-- and cannot run inside a transaction block, so there is no BEGIN/COMMIT here:
+-- run the file with autocommit (psql's default). If a build is interrupted it
+-- leaves an INVALID index behind; drop that index and re-run the statement.
+
+-- 1) kiaro_membership.members
+-- login, resolve_member_id, gumroad_webhook, get_member_ids_for_email and
+-- check_mock_access look members up by LOWER(email), usually with
+-- ORDER BY id DESC/ASC LIMIT 1. A (LOWER(email), id) btree serves the plain
+-- equality lookups as well as both orderings, so no separate single-column
+-- LOWER(email) index is added (it would only add write cost).
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_members_lower_email_id
+    ON kiaro_membership.members (LOWER(email), id);
+
+-- 2) public.users
+-- login, resolve_verified_learning_user_id, the password reset routes and the
+-- /admin/users join match users by LOWER(email), ordering by user_id.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_users_lower_email_user_id
+    ON public.users (LOWER(email), user_id);
+
+-- 3) public.math_gumroad_events
+-- Pending-grant replay reads one email's events by LOWER(email); the
+-- printable state rebuild reads them by LOWER(TRIM(email)), in id order.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_math_gumroad_events_lower_email_id
+    ON public.math_gumroad_events (LOWER(email), id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_math_gumroad_events_lower_trim_email_id
+    ON public.math_gumroad_events (LOWER(TRIM(email)), id);
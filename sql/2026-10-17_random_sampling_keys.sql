@@ -0,0 +1,102 @@
+-- Random sampling keys
+-- Additive only migration for shared production Postgres.
+-- No renames, no drops, and no changes to existing columns.
+-- app.sampling seeks into these indexes instead of ORDER BY RANDOM() once the
+-- random_key column exists (it checks the schema registry, so the old path
+-- keeps working until this has run).
+-- Verify with: python random_sampling_bench.py
+--
+-- Nothing here rewrites a table or holds ACCESS EXCLUSIVE beyond a catalog
+-- update:
+-- - ADD COLUMN without a default and SET DEFAULT are catalog-only. (ADD COLUMN
+--   ... DEFAULT random() would rewrite the table: the default is volatile.)
+-- - The default is set before the backfill, so rows inserted meanwhile get a
+--   key and the backfill only has existing rows to visit.
+-- - Existing rows are backfilled 5,000 ids at a time, each batch its own
+--   transaction.
+-- - CREATE INDEX CONCURRENTLY builds without blocking writes.
+-- The batch COMMITs and CONCURRENTLY cannot run inside a transaction block,
+-- so there is no BEGIN/COMMIT here: run the file with autocommit (psql's
+-- default). Every statement can be re-run. An interrupted index build leaves
+-- an INVALID index behind; drop it and re-run the statement.
+--
+-- Until the backfill is done, the seek skips rows whose key is still NULL.
+-- Services pick the column up from the NOTIFY at the end, or within
+-- SCHEMA_REGISTRY_TTL_SECONDS, so run the file in one go.
+
+SET lock_timeout = '5s';
+
+-- 1) public.words
+-- _fetch_random_synonym_row (no lesson) and _build_distractor_pool pick
+-- random words that have synonyms. The partial index matches that predicate
+-- as written.
+ALTER TABLE IF EXISTS public.words
+    ADD COLUMN IF NOT EXISTS random_key DOUBLE PRECISION;
+
+ALTER TABLE IF EXISTS public.words
+    ALTER COLUMN random_key SET DEFAULT random();
+
+DO $$
+DECLARE
+    last_id bigint;
+    batch_last_id bigint;
+BEGIN
+    IF to_regclass('public.words') IS NULL THEN
+        RETURN;
+    END IF;
+    SELECT MIN(id) - 1 INTO last_id FROM public.words;
+    LOOP
+        SELECT MAX(id) INTO batch_last_id
+        FROM (SELECT id FROM public.words WHERE id > last_id ORDER BY id LIMIT 5000) batch;
+        EXIT WHEN batch_last_id IS NULL;
+        UPDATE public.words
+        SET random_key = random()
+        WHERE id > last_id AND id <= batch_last_id AND random_key IS NULL;
+        last_id := batch_last_id;
+        COMMIT;
+    END LOOP;
+END
+$$;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_words_random_key_with_synonyms
+    ON public.words (random_key)
+    WHERE synonyms IS NOT NULL AND TRIM(synonyms) <> '';
+
+-- 2) public.math_questions
+-- start_math_test draws a test's questions from the whole bank.
+ALTER TABLE IF EXISTS public.math_questions
+    ADD COLUMN IF NOT EXISTS random_key DOUBLE PRECISION;
+
+ALTER TABLE IF EXISTS public.math_questions
+    ALTER COLUMN random_key SET DEFAULT random();
+
+DO $$
+DECLARE
+    last_id bigint;
+    batch_last_id bigint;
+BEGIN
+    IF to_regclass('public.math_questions') IS NULL THEN
+        RETURN;
+    END IF;
+    SELECT MIN(id) - 1 INTO last_id FROM public.math_questions;
+    LOOP
+        SELECT MAX(id) INTO batch_last_id
+        FROM (SELECT id FROM public.math_questions WHERE id > last_id ORDER BY id LIMIT 5000) batch;
+        EXIT WHEN batch_last_id IS NULL;
+        UPDATE public.math_questions
+        SET random_key = random()
+        WHERE id > last_id AND id <= batch_last_id AND random_key IS NULL;
+        last_id := batch_last_id;
+        COMMIT;
+    END LOOP;
+END
+$$;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_math_questions_random_key
+    ON public.math_questions (random_key);
+
+-- Lesson scoped picks (lesson words, NVR lesson questions) need no column:
+-- app.sampling caches each lesson's candidate ids.
+
+-- Running services reload their schema registry.
+NOTIFY kiaro_schema;
@@ -0,0 +1,130 @@
+import argparse
+import json
+import sys
+
+from app.database import get_connection
+from app.repositories.daily_attempts_repository import DAILY_ATTEMPT_SOURCES, WEEK_DAYS, get_weekly_attempt_totals
+from app.schema_registry import get_table_columns
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description=(
+            "Compare /practice/progress/weekly-improvement as served from user_daily_attempts with the "
+            "same windows counted from the raw attempt tables. Also reports how many users' figures "
+            "differ from the old rolling NOW() - 7 days windows (informational)."
+        )
+    )
+    parser.add_argument("--user-id", type=int, help="Only this user.")
+    parser.add_argument("--users", type=int, default=500, help="Users active in the last two weeks to compare.")
+    parser.add_argument("--max-diffs", type=int, default=20, help="Diffs to include in the output.")
+    return parser.parse_args()
+
+
+def improvement(current: tuple, previous: tuple) -> dict:
+    current_accuracy = (current[1] / current[0]) if current[0] else 0
+    previous_accuracy = (previous[1] / previous[0]) if previous[0] else 0
+    return {
+        "current_accuracy": round(current_accuracy * 100, 1),
+        "previous_accuracy": round(previous_accuracy * 100, 1),
+        "improvement": round((current_accuracy - previous_accuracy) * 100, 1),
+    }
+
+
+def raw_window_totals(cur, user_id: int, *, rolling: bool) -> dict:
+    if rolling:
+        current_filter = f"created_at >= NOW() - INTERVAL '{WEEK_DAYS} days'"
+        previous_filter = (
+            f"created_at >= NOW() - INTERVAL '{2 * WEEK_DAYS} days' AND created_at < NOW() - INTERVAL '{WEEK_DAYS} days'"
+        )
+    else:
+        current_filter = f"DATE(created_at) > CURRENT_DATE - {WEEK_DAYS} AND DATE(created_at) <= CURRENT_DATE"
+        previous_filter = (
+            f"DATE(created_at) > CURRENT_DATE - {2 * WEEK_DAYS} AND DATE(created_at) <= CURRENT_DATE - {WEEK_DAYS}"
+        )
+
+    totals = {"current": [0, 0], "previous": [0, 0]}
+    for table_name, user_candidates, correct_candidates in DAILY_ATTEMPT_SOURCES.values():
+        columns = get_table_columns(table_name, cur=cur)
+        user_columns = [column for column in user_candidates if column in columns]
+        correct_column = next((column for column in correct_candidates if column in columns), None)
+        if not user_columns or not correct_column or "created_at" not in columns:
+            continue
+        cur.execute(
+            f"""
+            SELECT COUNT(*) FILTER (WHERE {current_filter}),
+                   COUNT(*) FILTER (WHERE {current_filter} AND {correct_column} = TRUE),
+                   COUNT(*) FILTER (WHERE {previous_filter}),
+                   COUNT(*) FILTER (WHERE {previous_filter} AND {correct_column} = TRUE)
+            FROM {table_name}
+            WHERE ({" OR ".join(f"{column} = %s" for column in user_columns)})
+            """,
+            tuple(user_id for _ in user_columns),
+        )
+        row = cur.fetchone()
+        totals["current"][0] += row[0]
+        totals["current"][1] += row[1]
+        totals["previous"][0] += row[2]
+        totals["previous"][1] += row[3]
+    return {window: tuple(values) for window, values in totals.items()}
+
+
+def load_user_ids(cur, args) -> list[int]:
+    if args.user_id is not None:
+        return [args.user_id]
+    selects = []
+    for table_name, user_candidates, _ in DAILY_ATTEMPT_SOURCES.values():
+        columns = get_table_columns(table_name, cur=cur)
+        if "created_at" not in columns:
+            continue
+        for column in user_candidates:
+            if column in columns:
+                selects.append(
+                    f"SELECT {column} AS user_id FROM {table_name} "
+                    f"WHERE created_at >= CURRENT_DATE - {2 * WEEK_DAYS} AND {column} IS NOT NULL"
+                )
+    if not selects:
+        return []
+    cur.execute(f"SELECT DISTINCT user_id FROM ({' UNION '.join(selects)}) AS src ORDER BY user_id LIMIT %s", (args.users,))
+    return [row[0] for row in cur.fetchall()]
+
+
+def main():
+    args = parse_args()
+    report = {"users": 0, "mismatches": 0, "rolling_window_differences": 0, "diffs": []}
+
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        for user_id in load_user_ids(cur, args):
+            totals = get_weekly_attempt_totals(cur, user_id)
+            served = improvement(totals["current"], totals["previous"])
+            raw = raw_window_totals(cur, user_id, rolling=False)
+            expected = improvement(raw["current"], raw["previous"])
+            rolling = raw_window_totals(cur, user_id, rolling=True)
+
+            report["users"] += 1
+            if improvement(rolling["current"], rolling["previous"]) != served:
+                report["rolling_window_differences"] += 1
+            if totals != raw:
+                report["mismatches"] += 1
+                if len(report["diffs"]) < args.max_diffs:
+                    report["diffs"].append(
+                        {"user_id": user_id, "buckets": totals, "raw": raw, "served": served, "expected": expected}
+                    )
+    except Exception as exc:
+        print(json.dumps({"status": "failed", "error": str(exc)}, indent=2))
+        sys.exit(1)
+    finally:
+        conn.rollback()
+        cur.close()
+        conn.close()
+
+    report["status"] = "ok" if report["mismatches"] == 0 else "mismatch"
+    print(json.dumps(report, indent=2, default=str))
+    if report["mismatches"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()